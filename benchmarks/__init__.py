@@ -0,0 +1 @@
+"""Performance benchmarks for mdpi_api."""
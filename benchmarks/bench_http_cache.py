@@ -0,0 +1,88 @@
+"""
+Bandwidth and latency benchmark for response compression and conditional GET.
+
+Every endpoint is requested three ways: plain, with ``Accept-Encoding: gzip``
+and revalidated with ``If-None-Match`` (answered with ``304 Not Modified``)::
+
+    python -m benchmarks.bench_http_cache --cities 200 --iterations 300
+"""
+import argparse
+import asyncio
+from typing import Any, Dict
+
+from benchmarks.harness import BenchApp, bench_app
+from benchmarks.utils import Stopwatch, emit, percentiles
+
+
+async def measure(
+    bench: BenchApp,
+    url: str,
+    headers: Dict[str, str],
+    iterations: int,
+) -> Dict[str, Any]:
+    """
+    Measure the latency and the transferred body size of a request.
+
+    :param bench: The benchmark application.
+    :param url: URL to request.
+    :param headers: Extra request headers.
+    :param iterations: Number of requests.
+    :return: Latency percentiles, status code and body size in bytes.
+    """
+    stopwatch = Stopwatch()
+    response = None
+    for _ in range(iterations):
+        with stopwatch:
+            response = await bench.client.get(
+                url,
+                headers={**bench.headers, **headers},
+            )
+    assert response is not None  # noqa: S101
+    return {
+        "status_code": response.status_code,
+        "bytes": response.num_bytes_downloaded,
+        "content_encoding": response.headers.get("content-encoding"),
+        **percentiles(stopwatch.samples),
+    }
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    """
+    Run the benchmark.
+
+    :param args: Parsed command line arguments.
+    :return: Results per endpoint and request variant.
+    """
+    results: Dict[str, Any] = {}
+    async with bench_app(cities=args.cities) as bench:
+        urls = {
+            "cities": f"/api/cities/?limit={args.cities}",
+            "weather": f"/api/cities/weather?city_id={bench.city_ids[0]}",
+        }
+        for name, url in urls.items():
+            response = await bench.client.get(url, headers=bench.headers)
+            variants = {
+                "plain": {"Accept-Encoding": "identity"},
+                "gzip": {"Accept-Encoding": "gzip"},
+                "not_modified": {
+                    "Accept-Encoding": "gzip",
+                    "If-None-Match": response.headers["etag"],
+                },
+            }
+            results[name] = {
+                variant: await measure(bench, url, headers, args.iterations)
+                for variant, headers in variants.items()
+            }
+    return results
+
+
+def main() -> None:
+    """Entrypoint of the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--cities", type=int, default=100)
+    parser.add_argument("--iterations", type=int, default=200)
+    emit(asyncio.run(run(parser.parse_args())))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+"""
+Weather insert throughput and lookup latency, before and after the index cleanup.
+
+``before`` is the schema of the initial migration: a secondary index on the
+primary key of every table, on ``weather.city_id`` and on
+``favorite_cities.user_id``. ``after`` is the schema of the models: those
+indexes dropped and weather indexed by city and time. For both, the hourly
+refresh is replayed, the weather of every city inserted in one transaction
+per hour without the ORM, and the latest weather of one city and of a page
+of cities is looked up::
+
+    python -m benchmarks.bench_indexes --cities 1000 --hours 168
+
+Use ``--db-url`` to run against a scratch PostgreSQL database, whose tables
+are dropped and created again for every schema.
+"""
+import argparse
+import asyncio
+import random
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, Sequence
+
+from benchmarks.utils import Stopwatch, emit, percentiles
+from loguru import logger
+from mdpi_api.db.dao.weather_dao import WeatherDAO
+from mdpi_api.db.meta import meta
+from mdpi_api.db.models import load_all_models
+from mdpi_api.db.models.city_model import CityModel
+from mdpi_api.db.models.weather_model import WeatherModel
+from sqlalchemy import insert, text
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
+
+START = datetime(2023, 1, 1)
+PAGE_SIZE = 50
+# Turns the schema of the models back into the one of the initial migration
+BEFORE_DDL = (
+    "DROP INDEX ix_weather_city_id_created_at",
+    "CREATE INDEX ix_weather_id ON weather (id)",
+    "CREATE INDEX ix_weather_city_id ON weather (city_id)",
+    "CREATE INDEX ix_cities_id ON cities (id)",
+    "CREATE INDEX ix_users_id ON users (id)",
+    "CREATE INDEX ix_favorite_cities_id ON favorite_cities (id)",
+    "CREATE INDEX ix_favorite_cities_user_id ON favorite_cities (user_id)",
+)
+SCHEMAS: Dict[str, Sequence[str]] = {"before": BEFORE_DDL, "after": ()}
+
+
+async def create_schema(engine: AsyncEngine, ddl: Sequence[str], cities: int) -> None:
+    """
+    Create the tables, change their indexes and insert the cities.
+
+    :param engine: The database engine.
+    :param ddl: Statements run after the tables are created.
+    :param cities: Number of cities.
+    """
+    async with engine.begin() as connection:
+        await connection.run_sync(meta.drop_all)
+        await connection.run_sync(meta.create_all)
+        for statement in ddl:
+            await connection.execute(text(statement))
+        await connection.execute(
+            insert(CityModel),
+            [{"id": city_id, "name": f"City {city_id}"} for city_id in range(cities)],
+        )
+
+
+async def refresh(
+    engine: AsyncEngine,
+    cities: int,
+    hours: int,
+) -> float:
+    """
+    Insert the weather of every city, hour after hour.
+
+    :param engine: The database engine.
+    :param cities: Number of cities.
+    :param hours: Number of refreshes.
+    :return: Rows inserted per second.
+    """
+    elapsed: float = 0
+    for hour in range(hours):
+        created_at = START + timedelta(hours=hour)
+        rows = [
+            {
+                "city_id": city_id,
+                "created_at": created_at,
+                "data": {"temp": round(random.uniform(-10, 35), 1)},
+            }
+            for city_id in range(cities)
+        ]
+        started = time.perf_counter()
+        async with engine.begin() as connection:
+            await connection.execute(insert(WeatherModel), rows)
+        elapsed += time.perf_counter() - started
+    return cities * hours / elapsed
+
+
+async def lookups(
+    session_factory: async_sessionmaker[Any],
+    cities: int,
+    queries: int,
+) -> Dict[str, Any]:
+    """
+    Time the lookups of the latest weather.
+
+    :param session_factory: Factory of database sessions.
+    :param cities: Number of cities.
+    :param queries: Number of lookups of each kind.
+    :return: Latency percentiles of each kind of lookup.
+    """
+    one_city = Stopwatch()
+    page = Stopwatch()
+    async with session_factory() as session:
+        dao = WeatherDAO(session)
+        for _ in range(queries):
+            with one_city:
+                await dao.get_latest_weather(random.randrange(cities), START)
+            city_ids = random.sample(range(cities), min(PAGE_SIZE, cities))
+            with page:
+                await dao.get_latest_weathers(city_ids, START)
+    return {
+        "latest_weather": percentiles(one_city.samples),
+        "latest_weathers": percentiles(page.samples),
+    }
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    """
+    Time the inserts and lookups on both schemas.
+
+    :param args: Parsed command line arguments.
+    :return: Benchmark results.
+    """
+    load_all_models()
+    logger.remove()
+    results: Dict[str, Any] = {
+        "cities": args.cities,
+        "hours": args.hours,
+        "queries": args.queries,
+    }
+    for name, ddl in SCHEMAS.items():
+        random.seed(args.seed)
+        engine = create_async_engine(args.db_url)
+        results["dialect"] = engine.dialect.name
+        await create_schema(engine, ddl, args.cities)
+        session_factory = async_sessionmaker(engine, expire_on_commit=False)
+        rows_per_second = await refresh(engine, args.cities, args.hours)
+        results[name] = {
+            "insert_rows_per_second": round(rows_per_second),
+            **await lookups(session_factory, args.cities, args.queries),
+        }
+        await engine.dispose()
+    return results
+
+
+def main() -> None:
+    """Entrypoint of the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--db-url", default="sqlite+aiosqlite:///:memory:")
+    parser.add_argument("--cities", type=int, default=1000)
+    parser.add_argument("--hours", type=int, default=168)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    emit(asyncio.run(run(parser.parse_args())))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Logging overhead per request.
+
+Requests ``GET /api/cities/`` with the log sinks written synchronously, with
+the enqueued sinks, and with the enqueued sinks keeping the info logs of 10%
+of the requests, against no sinks at all. Also times a debug log below the
+configured level formatted eagerly (f-string) and lazily (arguments)::
+
+    python -m benchmarks.bench_logging --iterations 2000
+"""
+import argparse
+import asyncio
+import io
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from benchmarks.harness import BenchApp, bench_app
+from benchmarks.utils import Stopwatch, emit, percentiles
+from loguru import logger
+from mdpi_api.logging import add_sinks, log_settings
+
+# Sinks enqueued and share of requests logged at info level, None for no sinks
+VARIANTS = {
+    "no_sinks": None,
+    "sync": (False, 1.0),
+    "enqueued": (True, 1.0),
+    "enqueued_sampled": (True, 0.1),
+}
+
+
+async def measure(bench: BenchApp, iterations: int) -> Dict[str, float]:
+    """
+    Measure the latency of listing cities.
+
+    :param bench: The benchmark application.
+    :param iterations: Number of requests.
+    :return: Latency percentiles.
+    """
+    stopwatch = Stopwatch()
+    for _ in range(iterations):
+        with stopwatch:
+            await bench.client.get("/api/cities/", headers=bench.headers)
+    return percentiles(stopwatch.samples)
+
+
+def measure_debug_log(iterations: int) -> Dict[str, float]:
+    """
+    Time a debug log of a model while the level is info.
+
+    :param iterations: Number of logs.
+    :return: Microseconds per log, formatted eagerly and lazily.
+    """
+    logger.remove()
+    add_sinks(stream=io.StringIO())
+    payload = {"city_id": 1, "data": {"temp": 21.5, "weather": [{"main": "Rain"}]}}
+    started = time.perf_counter()
+    for _ in range(iterations):
+        logger.debug(f"Got weather: {payload}")  # noqa: WPS237
+    eager = time.perf_counter() - started
+    started = time.perf_counter()
+    for _ in range(iterations):  # noqa: WPS440
+        logger.debug("Got weather: {0}", payload)
+    lazy = time.perf_counter() - started
+    logger.remove()
+    return {
+        "eager_us": round(eager / iterations * 1e6, 3),
+        "lazy_us": round(lazy / iterations * 1e6, 3),
+    }
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    """
+    Run the benchmark.
+
+    :param args: Parsed command line arguments.
+    :return: Latency per variant and overhead over no sinks.
+    """
+    results: Dict[str, Any] = {}
+    baseline: Optional[float] = None
+    log_dir = Path(tempfile.mkdtemp(prefix="bench_logging_"))
+    async with bench_app(cities=args.cities) as bench:
+        await measure(bench, args.iterations // 10)
+        for name, variant in VARIANTS.items():
+            if variant is not None:
+                log_settings.enqueue = variant[0]
+                log_settings.info_sample_rate = variant[1]
+                add_sinks(stream=io.StringIO(), path=log_dir / f"{name}.json.log")
+            latency = await measure(bench, args.iterations)
+            logger.remove()
+            if baseline is None:
+                baseline = latency["mean"]
+            results[name] = {
+                **latency,
+                "overhead_ms": round(latency["mean"] - baseline, 3),
+            }
+    results["debug_log_below_level"] = measure_debug_log(args.iterations * 10)
+    results["json_log_dir"] = str(log_dir)
+    return results
+
+
+def main() -> None:
+    """Entrypoint of the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--cities", type=int, default=50)
+    parser.add_argument("--iterations", type=int, default=1000)
+    emit(asyncio.run(run(parser.parse_args())))
+
+
+if __name__ == "__main__":
+    main()
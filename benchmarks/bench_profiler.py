@@ -0,0 +1,188 @@
+"""
+Attribution and overhead of the sampling profiler.
+
+Serves a mix of city list, weather and favorites requests from concurrent
+clients for ``--seconds``, without and then with the profiler running, and
+reports the throughput lost to profiling and the share of the sampled time
+under the weather service, the DAOs and the middlewares, a stack counting
+under every component it passes through.
+
+To check the attribution, a calibration middleware in front of the
+application spins a known ``--calibration-ms`` of CPU per request: its
+expected share of the CPU time of the process is compared with the share of
+the samples under it::
+
+    python -m benchmarks.bench_profiler --seconds 5 --concurrency 8
+"""
+import argparse
+import asyncio
+import re
+import time
+from typing import Any, Dict, Pattern, Tuple
+
+from benchmarks.harness import BenchApp, bench_app
+from benchmarks.utils import emit
+from httpx import ASGITransport, AsyncClient
+from mdpi_api.diagnostics.profiler import CPU, Profile, SamplingProfiler
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+# Frames counted under every component, by module:qualified name
+COMPONENTS: Dict[str, Pattern[str]] = {
+    "weather_service": re.compile(r":WeatherService\."),
+    "daos": re.compile(r"\.db\.dao\."),
+    "middlewares": re.compile(r"^mdpi_api\.web\.middlewares\."),
+    "sqlalchemy": re.compile(r"^sqlalchemy\."),
+    "idle": re.compile("^selectors:"),
+}
+CALIBRATION = ":CalibrationMiddleware.__call__"
+# Path and query of every request of the mix
+Request = Tuple[str, Dict[str, Any]]
+REQUESTS: Tuple[Request, ...] = (
+    ("/api/cities/", {"limit": 50}),
+    ("/api/cities/weather", {"city_id": 0}),
+    ("/api/cities/weather", {"city_ids": ""}),
+    ("/api/favorites/", {}),
+)
+MANY_CITIES = 10
+
+
+class CalibrationMiddleware:
+    """Spins a known CPU time per request."""
+
+    def __init__(self, app: ASGIApp, seconds: float) -> None:
+        self.app = app
+        self.seconds = seconds
+        self.spun: float = 0
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        """
+        Spin, then handle the request.
+
+        :param scope: The ASGI scope.
+        :param receive: The ASGI receive channel.
+        :param send: The ASGI send channel.
+        """
+        started = time.perf_counter()
+        while time.perf_counter() - started < self.seconds:  # noqa: WPS328
+            pass  # noqa: WPS420
+        self.spun += time.perf_counter() - started
+        await self.app(scope, receive, send)
+
+
+async def serve(client: AsyncClient, bench: BenchApp, deadline: float) -> int:
+    """
+    Send the request mix until the deadline.
+
+    :param client: Client of the calibrated application.
+    :param bench: The benchmark application.
+    :param deadline: Monotonic time to stop at.
+    :return: Number of requests sent.
+    """
+    sent = 0
+    many = ",".join(map(str, bench.city_ids[:MANY_CITIES]))
+    while time.monotonic() < deadline:
+        url, params = REQUESTS[sent % len(REQUESTS)]
+        if "city_id" in params:
+            params = {"city_id": bench.city_ids[sent % len(bench.city_ids)]}
+        elif "city_ids" in params:
+            params = {"city_ids": many}
+        response = await client.get(url, params=params, headers=bench.headers)
+        response.raise_for_status()
+        sent += 1
+    return sent
+
+
+async def load(client: AsyncClient, bench: BenchApp, args: argparse.Namespace) -> int:
+    """
+    Serve requests from concurrent clients for a while.
+
+    :param client: Client of the calibrated application.
+    :param bench: The benchmark application.
+    :param args: Parsed command line arguments.
+    :return: Number of requests served.
+    """
+    deadline = time.monotonic() + args.seconds
+    clients = [serve(client, bench, deadline) for _ in range(args.concurrency)]
+    return sum(await asyncio.gather(*clients))
+
+
+def shares(profile: Profile) -> Dict[str, float]:
+    """
+    Share of the sampled time under every component.
+
+    :param profile: The profile.
+    :return: Share by component, a stack counts once per component.
+    """
+    total = sum(profile.weights.values()) or 1
+    component_shares = {}
+    for component, pattern in COMPONENTS.items():
+        weight = sum(
+            stack_weight
+            for stack, stack_weight in profile.weights.items()
+            if any(pattern.search(frame.name) for frame in stack)
+        )
+        component_shares[component] = round(weight / total, 4)
+    return component_shares
+
+
+def calibration_share(profile: Profile) -> float:
+    """
+    Share of the sampled time spinning in the calibration middleware.
+
+    :param profile: The profile.
+    :return: Share of the stacks ending in the middleware itself.
+    """
+    total = sum(profile.weights.values()) or 1
+    spinning = sum(
+        weight
+        for stack, weight in profile.weights.items()
+        if stack[-1].name.endswith(CALIBRATION)
+    )
+    return round(spinning / total, 4)
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    """
+    Run the benchmark.
+
+    :param args: Parsed command line arguments.
+    :return: Throughput, profiler overhead and attribution.
+    """
+    async with bench_app(cities=args.cities) as bench:
+        calibration = CalibrationMiddleware(bench.app, args.calibration_ms / 1000)
+        transport = ASGITransport(app=calibration)  # type: ignore[arg-type]
+        base_url = str(bench.client.base_url)
+        async with AsyncClient(transport=transport, base_url=base_url) as client:
+            unprofiled = await load(client, bench, args)
+            profiler = SamplingProfiler(interval=args.interval_ms / 1000)
+            calibration.spun = 0
+            cpu_started = time.process_time()
+            profiling = asyncio.create_task(profiler.profile(args.seconds, CPU))
+            profiled = await load(client, bench, args)
+            profile = await profiling
+            cpu_seconds = time.process_time() - cpu_started
+            spun = calibration.spun
+    return {
+        "unprofiled_rps": round(unprofiled / args.seconds, 1),
+        "profiled_rps": round(profiled / args.seconds, 1),
+        "samples": profile.samples,
+        "sampler_overhead": round(profile.overhead, 4),
+        "calibration_expected_share": round(spun / cpu_seconds, 4),
+        "calibration_sampled_share": calibration_share(profile),
+        "shares": shares(profile),
+    }
+
+
+def main() -> None:
+    """Entrypoint of the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--cities", type=int, default=200)
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--interval-ms", type=float, default=5)
+    parser.add_argument("--calibration-ms", type=float, default=1)
+    emit(asyncio.run(run(parser.parse_args())))
+
+
+if __name__ == "__main__":
+    main()
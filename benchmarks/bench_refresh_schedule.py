@@ -0,0 +1,144 @@
+"""
+Simulation of upstream weather API traffic around the hourly refresh.
+
+Two strategies are simulated over one hour, at one second resolution:
+
+* ``minute_0``: the old cron job at minute 0, refreshing every city in one
+  sequential loop. Reads of a city that was not refreshed yet miss the cache
+  and call the upstream API as well.
+* ``staggered``: the refresh planner, spreading refreshes over the window
+  before the hour with per-city slots and jitter.
+
+The result lists upstream calls, peak and mean QPS and cold reads::
+
+    python -m benchmarks.bench_refresh_schedule --cities 5000 --reads-per-second 50
+"""
+import argparse
+import random
+from collections import Counter
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Set, Tuple
+
+from benchmarks.utils import emit
+from mdpi_api.services.refresh_planner import plan_refreshes, refresh_window
+
+HOUR = datetime(2024, 9, 1, 12)
+HOUR_SECONDS = 3600
+
+Refreshes = List[Tuple[int, int]]
+
+
+def cron_refreshes(cities: int, latency: float) -> Refreshes:
+    """
+    Schedule the old refresh, one sequential loop from minute 0.
+
+    :param cities: Number of cities.
+    :param latency: Upstream call latency in seconds.
+    :return: (second relative to the hour, city ID) of every refresh.
+    """
+    return [(int(city_id * latency), city_id) for city_id in range(cities)]
+
+
+def staggered_refreshes(cities: int, seed: int) -> Refreshes:
+    """
+    Schedule the refresh with the refresh planner.
+
+    :param cities: Number of cities.
+    :param seed: Seed of the jitter.
+    :return: (second relative to the hour, city ID) of every refresh.
+    """
+    plan = plan_refreshes(
+        dict.fromkeys(range(cities), 1),
+        HOUR - refresh_window(),
+        rng=random.Random(seed),
+    )
+    return [
+        (int((refresh.at - HOUR).total_seconds()), refresh.city_id) for refresh in plan
+    ]
+
+
+def simulate(
+    refreshes: Refreshes,
+    cities: int,
+    reads_per_second: int,
+    seed: int,
+) -> Dict[str, Any]:
+    """
+    Count upstream calls per second for a refresh schedule.
+
+    A city is cold from the hour boundary until it is refreshed or a read
+    of it misses and fetches it.
+
+    :param refreshes: (second relative to the hour, city ID) of every refresh.
+    :param cities: Number of cities.
+    :param reads_per_second: User reads per second, uniform over cities.
+    :param seed: Seed of the read pattern.
+    :return: Traffic statistics.
+    """
+    rng = random.Random(seed)  # noqa: S311
+    start = min(0, refreshes[0][0])
+    by_second: Dict[int, List[int]] = {}
+    for refresh_second, city_id in refreshes:
+        by_second.setdefault(refresh_second, []).append(city_id)
+
+    warm: Set[int] = set()
+    calls: Counter[int] = Counter()
+    cold_reads = 0
+    for second in range(start, HOUR_SECONDS):
+        calls[second] += _warm_up(by_second.get(second, ()), warm)
+        if second >= 0:
+            read_city_ids = [rng.randrange(cities) for _ in range(reads_per_second)]
+            misses = _warm_up(read_city_ids, warm)
+            calls[second] += misses
+            cold_reads += misses
+
+    duration = HOUR_SECONDS - start
+    total = sum(calls.values())
+    peak_second, peak = calls.most_common(1)[0]
+    mean = total / duration
+    return {
+        "upstream_calls": total,
+        "peak_qps": peak,
+        "peak_second": peak_second,
+        "mean_qps": round(mean, 3),
+        "peak_to_mean": round(peak / mean, 1),
+        "cold_reads": cold_reads,
+    }
+
+
+def _warm_up(city_ids: Iterable[int], warm: Set[int]) -> int:
+    """
+    Fetch the cold ones of the cities from the upstream API.
+
+    :param city_ids: IDs of the requested cities.
+    :param warm: IDs of the cities with current weather, updated in place.
+    :return: Number of upstream calls.
+    """
+    cold = set(city_ids) - warm
+    warm.update(cold)
+    return len(cold)
+
+
+def main() -> None:
+    """Entrypoint of the simulation."""
+    parser = argparse.ArgumentParser(description="Hourly refresh traffic.")
+    parser.add_argument("--cities", type=int, default=5000)
+    parser.add_argument("--reads-per-second", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    schedules = {
+        "minute_0": cron_refreshes(args.cities, args.latency),
+        "staggered": staggered_refreshes(args.cities, args.seed),
+    }
+    emit(
+        {
+            name: simulate(refreshes, args.cities, args.reads_per_second, args.seed)
+            for name, refreshes in schedules.items()
+        },
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""
+Serialization benchmark for API responses.
+
+Compares the previous path, where FastAPI re-validated the returned
+``APIResponse`` against ``response_model``, ran ``jsonable_encoder`` and then
+``UJSONResponse``, with ``APIJSONResponse`` rendering the already validated
+model through pydantic-core.
+
+Usage::
+
+    python -m benchmarks.bench_serialization --iterations 2000
+"""
+import argparse
+import asyncio
+import time
+from importlib.util import find_spec
+from typing import Any, Dict, Type
+
+from benchmarks.utils import emit
+from fastapi.responses import JSONResponse, UJSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+from mdpi_api.web.api.schemas.city import CityDTO
+from mdpi_api.web.api.schemas.common import APIResponse
+from mdpi_api.web.api.schemas.weather import WeatherDTO
+from mdpi_api.web.responses import APIJSONResponse
+from pydantic import BaseModel
+
+# ujson is no longer a dependency; fall back to the stdlib encoder without it.
+legacy_response_class: Type[JSONResponse] = (
+    UJSONResponse if find_spec("ujson") else JSONResponse
+)
+
+
+def weather_data(city_id: int) -> Dict[str, Any]:
+    """
+    Build a weather payload shaped like the manipulated OpenWeather response.
+
+    :param city_id: The ID of the city.
+    :return: Weather data.
+    """
+    return {
+        "coord": {"lon": 20.4651, "lat": 44.804},
+        "weather": [
+            {"id": 800, "main": "Clear", "description": "clear sky", "icon": "01d"},
+        ],
+        "base": "stations",
+        "visibility": 10000,
+        "wind": {"speed": 3.6, "deg": 140, "gust": 5.2},
+        "clouds": {"all": 0},
+        "dt": 1727100000,
+        "sys": {
+            "type": 2,
+            "country": "RS",
+            "sunrise": 1727064000,
+            "sunset": 1727108000,
+        },
+        "timezone": 7200,
+        "id": city_id,
+        "name": f"City {city_id}",
+        "cod": 200,
+        "temp": 21.0,
+        "feels_like": 21.0,
+        "temp_min": 19.0,
+        "temp_max": 23.0,
+        "pressure": 1015,
+        "humidity": 55,
+        "sea_level": 1015,
+        "grnd_level": 998,
+    }
+
+
+async def legacy_render(model: BaseModel) -> bytes:
+    """
+    Render a response the way FastAPI did before ``APIJSONResponse``.
+
+    :param model: The returned response model.
+    :return: Response body.
+    """
+    field = create_response_field(name="Response", type_=type(model))
+    content = await serialize_response(field=field, response_content=model)
+    return legacy_response_class(content).body
+
+
+def fast_render(model: BaseModel) -> bytes:
+    """
+    Render a response with ``APIJSONResponse``.
+
+    :param model: The returned response model.
+    :return: Response body.
+    """
+    return APIJSONResponse(model).body
+
+
+async def measure(model: BaseModel, iterations: int) -> Dict[str, Any]:
+    """
+    Time both render paths for one payload.
+
+    :param model: The response model.
+    :param iterations: Number of renders per path.
+    :return: Timings in microseconds per render.
+    """
+    started = time.perf_counter()
+    for _ in range(iterations):
+        legacy_body = await legacy_render(model)
+    legacy = (time.perf_counter() - started) / iterations
+
+    started = time.perf_counter()
+    for _ in range(iterations):
+        fast_body = fast_render(model)
+    fast = (time.perf_counter() - started) / iterations
+
+    return {
+        "bytes": len(fast_body),
+        "legacy_bytes": len(legacy_body),
+        "legacy_us": round(legacy * 1e6, 2),
+        "fast_us": round(fast * 1e6, 2),
+        "speedup": round(legacy / fast, 2),
+    }
+
+
+async def run(iterations: int) -> Dict[str, Any]:
+    """
+    Run the benchmark for the city page and weather payloads.
+
+    :param iterations: Number of renders per path.
+    :return: Benchmark results.
+    """
+    cities = [
+        CityDTO(id=city_id, name=f"City {city_id}")  # noqa: WPS221
+        for city_id in range(100)
+    ]
+    city_page = APIResponse[CityDTO].create(message="Success", data=cities)
+    weather_page = APIResponse[WeatherDTO].create(
+        message="Success",
+        data=[
+            WeatherDTO(
+                city_id=city_id,
+                city_name=f"City {city_id}",
+                data=weather_data(city_id),
+            )
+            for city_id in range(100)
+        ],
+    )
+    return {
+        "legacy_response_class": legacy_response_class.__name__,
+        "iterations": iterations,
+        "city_page_100": await measure(city_page, iterations),
+        "weather_100": await measure(weather_page, iterations),
+    }
+
+
+def main() -> None:
+    """Entrypoint of the benchmark."""
+    parser = argparse.ArgumentParser(description="API response serialization.")
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+    emit(asyncio.run(run(args.iterations)))
+
+
+if __name__ == "__main__":
+    main()
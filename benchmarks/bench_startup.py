@@ -0,0 +1,158 @@
+"""
+Startup time of a worker.
+
+Starts fresh interpreters, as a new worker would, and reports:
+
+* the import time of the application, from ``python -X importtime``, with
+  the packages that take most of it;
+* the time to first request, from starting the interpreter to the response
+  of ``GET /api/metrics``, which needs neither the database nor the
+  scheduler;
+* the heavy packages loaded by then, which should only be imported on first
+  use.
+
+Runs are repeated and the medians reported, the first runs are discarded to
+warm the disk cache::
+
+    python -m benchmarks.bench_startup --runs 10
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess  # noqa: S404
+import sys
+import time
+from collections import defaultdict
+from typing import Any, DefaultDict, Dict, List
+
+from benchmarks.utils import emit
+
+APPLICATION = "mdpi_api.web.application"
+HEAVY_PACKAGES = ("polars", "passlib", "apscheduler", "pyarrow")
+IMPORTTIME_PREFIX = "import time:"
+MICROSECONDS = 1e6
+WARMUP_RUNS = 2
+# Seconds spent importing the modules of every package
+Packages = DefaultDict[str, float]
+# Run in the worker: build the application and serve one request
+FIRST_REQUEST = """
+import asyncio, json, sys, time
+from httpx import ASGITransport, AsyncClient
+from mdpi_api.web.application import get_app
+
+async def first_request():
+    transport = ASGITransport(app=get_app())
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        response = await client.get("/api/metrics")
+    response.raise_for_status()
+
+asyncio.run(first_request())
+served = time.time()
+loaded = [name for name in {heavy} if name in sys.modules]
+print(json.dumps({{"served": served, "loaded": loaded}}))
+"""
+
+
+def import_times(stderr: str) -> Packages:
+    """
+    Sum the import time of every package from ``-X importtime`` output.
+
+    :param stderr: Standard error of the interpreter.
+    :return: Seconds spent importing the modules of every package.
+    """
+    packages: Packages = defaultdict(float)
+    for line in stderr.splitlines():
+        if not line.startswith(IMPORTTIME_PREFIX):
+            continue
+        own, _, module = line[len(IMPORTTIME_PREFIX) :].split("|")
+        if own.strip().isdigit():
+            package = module.strip().split(".")[0]
+            packages[package] += int(own) / MICROSECONDS
+    return packages
+
+
+def measure_import() -> Packages:
+    """
+    Import the application in a fresh interpreter.
+
+    :return: Seconds spent importing every package.
+    """
+    completed = subprocess.run(  # noqa: S603
+        [sys.executable, "-X", "importtime", "-c", f"import {APPLICATION}"],
+        capture_output=True,
+        text=True,
+        check=True,
+        env=os.environ,
+    )
+    return import_times(completed.stderr)
+
+
+def measure_first_request() -> Dict[str, Any]:
+    """
+    Serve a first request from a fresh interpreter.
+
+    :return: Seconds from starting the interpreter to the response, and the
+        heavy packages loaded by then.
+    """
+    code = FIRST_REQUEST.format(heavy=HEAVY_PACKAGES)
+    started = time.time()
+    completed = subprocess.run(  # noqa: S603
+        [sys.executable, "-c", code],
+        capture_output=True,
+        text=True,
+        check=True,
+        env=os.environ,
+    )
+    child = json.loads(completed.stdout.splitlines()[-1])
+    return {"seconds": child["served"] - started, "loaded": child["loaded"]}
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    """
+    Run the benchmark.
+
+    :param args: Parsed command line arguments.
+    :return: Median import and first request times, and the heavy packages.
+    """
+    imports: List[Packages] = []
+    first_requests: List[Dict[str, Any]] = []
+    for run_number in range(args.runs + WARMUP_RUNS):
+        packages = measure_import()
+        first_request = measure_first_request()
+        if run_number >= WARMUP_RUNS:
+            imports.append(packages)
+            first_requests.append(first_request)
+    totals = [sum(packages.values()) for packages in imports]
+    median_packages = {
+        package: round(
+            statistics.median(packages[package] for packages in imports) * 1000,
+            1,
+        )
+        for package in imports[-1]
+    }
+    slowest = sorted(median_packages.items(), key=lambda item: -item[1])
+    return {
+        "runs": args.runs,
+        "import_ms": round(statistics.median(totals) * 1000, 1),
+        "slowest_packages_ms": dict(slowest[: args.top]),
+        "first_request_ms": round(
+            statistics.median(request["seconds"] for request in first_requests) * 1000,
+            1,
+        ),
+        "heavy_packages_loaded": sorted(
+            {name for request in first_requests for name in request["loaded"]},
+        ),
+    }
+
+
+def main() -> None:
+    """Entrypoint of the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10)
+    emit(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Microbenchmark for message translation.
+
+Compares the module import and dictionary walk that ``Translator.t`` did on
+every call with the preloaded message catalog. A successful response
+translates one message and an error response two (message and detail)::
+
+    python -m benchmarks.bench_translator --iterations 200000
+"""
+import argparse
+import importlib
+import time
+from typing import Any, Callable, Dict, Optional
+
+from benchmarks.utils import emit
+from loguru import logger
+from mdpi_api.localization.catalog import catalog
+from mdpi_api.localization.translator import Translator
+
+Translate = Callable[..., Optional[str]]
+
+KEYS = {
+    "hit": "response_messages.auth-success",
+    "miss": "response_messages.Success",
+}
+
+
+def legacy_translate(  # noqa: WPS231
+    lang: str,
+    key: str,
+    **kwargs: Any,
+) -> Optional[str]:
+    """
+    Translate a key the way ``Translator.t`` did before the catalog.
+
+    :param lang: The locale.
+    :param key: Key to be translated.
+    :param kwargs: Keyword arguments to be used for string formatting.
+    :return: Translated string.
+
+    :raises KeyError: If the key is not found in the locale file.
+    """
+    try:
+        file_key, *translation_keys = key.split(".")
+        translation = importlib.import_module(
+            f"mdpi_api.localization.{lang}.{file_key}",
+        ).locale
+        for translation_key in translation_keys:
+            translation = translation.get(translation_key, None)
+            if translation is None:
+                raise KeyError(f"Key {key} not found in {lang} locale")
+        if kwargs.keys():
+            translation = translation.format(**kwargs)
+        return translation
+    except Exception as exception:
+        logger.debug(f"Error while translating key {key}: {exception}")
+        return None
+
+
+def measure(translate: Translate, key: str, iterations: int) -> float:
+    """
+    Time one translation path.
+
+    :param translate: Function translating a key in the ``sr`` locale.
+    :param key: Key to be translated.
+    :param iterations: Number of translations.
+    :return: Seconds per translation.
+    """
+    started = time.perf_counter()
+    for _ in range(iterations):
+        translate(key)
+    return (time.perf_counter() - started) / iterations
+
+
+def run(iterations: int) -> Dict[str, Any]:
+    """
+    Run the benchmark.
+
+    :param iterations: Number of translations per path and key.
+    :return: Benchmark results.
+    """
+    catalog.load()
+    translator = Translator("sr")
+    paths: Dict[str, Translate] = {
+        "legacy": lambda translation_key: legacy_translate("sr", translation_key),
+        "catalog": translator.t,
+    }
+    results: Dict[str, Any] = {"iterations": iterations}
+    for name, key in KEYS.items():
+        legacy = measure(paths["legacy"], key, iterations)
+        preloaded = measure(paths["catalog"], key, iterations)
+        saved = legacy - preloaded
+        results[name] = {
+            "legacy_per_sec": round(1 / legacy),
+            "catalog_per_sec": round(1 / preloaded),
+            "saved_success_response_us": round(saved * 1e6, 2),
+            "saved_error_response_us": round(saved * 2e6, 2),
+        }
+    return results
+
+
+def main() -> None:
+    """Entrypoint of the benchmark."""
+    parser = argparse.ArgumentParser(description="Message translation.")
+    parser.add_argument("--iterations", type=int, default=100000)
+    # Misses are logged at debug level, keep them out of the timings
+    logger.remove()
+    emit(run(parser.parse_args().iterations))
+
+
+if __name__ == "__main__":
+    main()
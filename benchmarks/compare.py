@@ -0,0 +1,171 @@
+"""
+Compare two load test results and fail on regressions.
+
+Every operation of the baseline is compared with the same operation of the
+candidate: p50 and p95 latency may grow and throughput may drop by the
+relative ``--tolerance``, SQL statements per request may grow by
+``--query-tolerance``. Exits with status 1 when anything regressed, and
+with status 2 when the runs are not comparable (other arguments, e.g.
+concurrency or seed), so it can gate a change in CI::
+
+    python -m benchmarks.compare baseline.json candidate.json --tolerance 0.15
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence
+
+from benchmarks.utils import emit
+
+LATENCY_METRICS = ("p50", "p95")
+THROUGHPUT_METRIC = "throughput_per_sec"
+QUERIES_METRIC = "queries_per_request"
+NOT_COMPARABLE = 2
+
+# Load test results as written by benchmarks.loadtest
+Results = Dict[str, Any]
+
+
+def compare(
+    baseline: Results,
+    candidate: Results,
+    tolerance: float,
+    query_tolerance: float,
+) -> Results:
+    """
+    Compare the operations of two load test results.
+
+    :param baseline: Results of the reference run.
+    :param candidate: Results of the run under test.
+    :param tolerance: Largest relative change of latency and throughput
+        not counted as a regression.
+    :param query_tolerance: Largest growth of SQL statements per request not
+        counted as a regression.
+    :return: Changes per operation and metric, and the regressions.
+    """
+    changes: Dict[str, Results] = {}
+    regressions: List[str] = []
+    operations = {"summary": baseline["summary"], **baseline["operations"]}
+    for name, before in operations.items():
+        after = _operation(candidate, name)
+        if after is None:
+            regressions.append(f"{name}: missing from the candidate")
+            continue
+        changes[name] = {}
+        for metric in (*LATENCY_METRICS, THROUGHPUT_METRIC, QUERIES_METRIC):
+            change = Change(metric, before[metric], after[metric])
+            changes[name][metric] = change.report()
+            if change.regressed(tolerance, query_tolerance):
+                regressions.append(f"{name}: {change}")
+    return {"changes": changes, "regressions": regressions}
+
+
+class Change(NamedTuple):
+    """Change of a metric between the baseline and the candidate."""
+
+    metric: str
+    baseline: float
+    candidate: float
+
+    @property
+    def relative(self) -> float:
+        """
+        Relative change.
+
+        :return: Change over the baseline, 0 if the baseline is 0.
+        """
+        if not self.baseline:
+            return 0
+        return (self.candidate - self.baseline) / self.baseline
+
+    def regressed(self, tolerance: float, query_tolerance: float) -> bool:
+        """
+        Check whether the change is a regression.
+
+        :param tolerance: Largest relative change of latency and throughput.
+        :param query_tolerance: Largest growth of SQL statements per request.
+        :return: True if the candidate is worse beyond the tolerance.
+        """
+        if self.metric == QUERIES_METRIC:
+            return self.candidate - self.baseline > query_tolerance
+        if self.metric == THROUGHPUT_METRIC:
+            return self.relative < -tolerance
+        return self.relative > tolerance
+
+    def report(self) -> Results:
+        """
+        Describe the change.
+
+        :return: Both values and the relative change.
+        """
+        return {
+            "baseline": self.baseline,
+            "candidate": self.candidate,
+            "change": round(self.relative, 3),
+        }
+
+    def __str__(self) -> str:
+        """
+        Describe the change in a line.
+
+        :return: The metric and both values.
+        """
+        return f"{self.metric} {self.baseline} -> {self.candidate}"
+
+
+def differences(baseline: Results, candidate: Results) -> List[str]:
+    """
+    Find the arguments the two runs differ in.
+
+    :param baseline: Results of the reference run.
+    :param candidate: Results of the run under test.
+    :return: Names of the differing arguments.
+    """
+    before = baseline["meta"]["args"]
+    after = candidate["meta"]["args"]
+    # Arguments are plain values, items differing in value or presence
+    differing = before.items() ^ after.items()
+    return sorted({key for key, _ in differing})
+
+
+def _operation(results: Results, name: str) -> Optional[Results]:
+    if name == "summary":
+        return results["summary"]
+    return results["operations"].get(name)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    """
+    Entrypoint of the comparison.
+
+    :param argv: Command line arguments, those of the process if None.
+    """
+    parser = argparse.ArgumentParser(description="Compare load test results.")
+    parser.add_argument("baseline", type=Path)
+    parser.add_argument("candidate", type=Path)
+    parser.add_argument("--tolerance", type=float, default=0.1)
+    parser.add_argument("--query-tolerance", type=float, default=0)
+    args = parser.parse_args(argv)
+    baseline = json.loads(args.baseline.read_text())
+    candidate = json.loads(args.candidate.read_text())
+
+    mismatched = differences(baseline, candidate)
+    if mismatched:
+        emit({"comparable": False, "differing_args": mismatched})
+        sys.exit(NOT_COMPARABLE)
+    report = compare(baseline, candidate, args.tolerance, args.query_tolerance)
+    emit(
+        {
+            "comparable": True,
+            "baseline_commit": baseline["meta"]["commit"],
+            "candidate_commit": candidate["meta"]["commit"],
+            **report,
+        },
+    )
+    if report["regressions"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
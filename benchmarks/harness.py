@@ -0,0 +1,270 @@
+import asyncio
+import random
+import uuid
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import AsyncIterator, Dict, List, Optional
+
+import uvicorn
+from benchmarks.bench_serialization import weather_data
+from fastapi import FastAPI
+from httpx import ASGITransport, AsyncClient
+from loguru import logger
+from mdpi_api.db.meta import meta
+from mdpi_api.db.models import load_all_models
+from mdpi_api.db.models.city_model import CityModel
+from mdpi_api.db.models.favorite_cities_model import FavoriteCityModel
+from mdpi_api.db.models.user_model import UserModel
+from mdpi_api.db.models.weather_model import WeatherModel
+from mdpi_api.integrations import weather_client
+from mdpi_api.integrations.openweather_recording import Recording
+from mdpi_api.integrations.openweather_stub import (
+    Faults,
+    OpenWeatherStub,
+    create_stub_app,
+)
+from mdpi_api.services.jwt_service import JWTService
+from mdpi_api.web import application
+from passlib.hash import bcrypt
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
+    AsyncSession,
+    async_sessionmaker,
+    create_async_engine,
+)
+
+BENCH_PASSWORD_HASH = "not-a-bcrypt-hash"  # noqa: S105
+# Cheapest bcrypt cost, logins stay on the real verification path
+BENCH_BCRYPT_ROUNDS = 4
+STUB_HOST = "127.0.0.1"
+STARTUP_POLL_SECONDS = 0.01
+
+
+@dataclass
+class BenchUser:
+    """A seeded user, able to log in when passwords were hashed."""
+
+    id: uuid.UUID
+    email: str
+    password: str
+    headers: Dict[str, str]
+    favorite_ids: List[int]
+
+
+@dataclass
+class BenchApp:
+    """An application instance wired to a seeded benchmark database."""
+
+    app: FastAPI
+    client: AsyncClient
+    engine: AsyncEngine
+    session_factory: async_sessionmaker[AsyncSession]
+    city_ids: List[int]
+    headers: Dict[str, str] = field(default_factory=dict)
+    users: List[BenchUser] = field(default_factory=list)
+
+
+async def seed_database(
+    engine: AsyncEngine,
+    cities: int,
+    with_weather: bool,
+) -> List[int]:
+    """
+    Create the schema and seed cities, one user and the current hour weather.
+
+    :param engine: The database engine.
+    :param cities: Number of cities to create.
+    :param with_weather: Whether to store current hour weather for every city.
+    :return: IDs of the created cities.
+    """
+    load_all_models()
+    city_ids = list(range(1, cities + 1))
+    hour_start = datetime.utcnow().replace(minute=0, second=0, microsecond=0)
+    async with engine.begin() as connection:
+        await connection.run_sync(meta.create_all)
+        await connection.execute(
+            insert(CityModel),
+            [{"id": city_id, "name": f"City {city_id}"} for city_id in city_ids],
+        )
+        if with_weather:
+            await connection.execute(
+                insert(WeatherModel),
+                [
+                    {
+                        "id": city_id,
+                        "city_id": city_id,
+                        "data": weather_data(city_id),
+                        "created_at": hour_start,
+                    }
+                    for city_id in city_ids
+                ],
+            )
+    return city_ids
+
+
+async def seed_users(  # noqa: WPS211
+    engine: AsyncEngine,
+    users: int,
+    city_ids: List[int],
+    favorites: int,
+    hash_passwords: bool,
+    seed: int,
+) -> List[BenchUser]:
+    """
+    Seed users, each with random favorite cities.
+
+    :param engine: The database engine.
+    :param users: Number of users to create.
+    :param city_ids: IDs of the cities to pick favorites from.
+    :param favorites: Number of favorite cities per user.
+    :param hash_passwords: Whether to store bcrypt hashes, needed to log in.
+    :param seed: Seed of the favorites picked.
+    :return: The users.
+    """
+    rng = random.Random(seed)  # noqa: S311
+    bench_users = []
+    for index in range(users):
+        user_id = uuid.UUID(int=rng.getrandbits(128))
+        token = JWTService.sign_jwt(user_id=user_id)
+        bench_users.append(
+            BenchUser(
+                id=user_id,
+                email=f"bench{index}@mdpi.com",
+                password=f"bench-password-{index}",
+                headers={"Authorization": f"Bearer {token}"},
+                favorite_ids=rng.sample(city_ids, min(favorites, len(city_ids))),
+            ),
+        )
+    hasher = bcrypt.using(rounds=BENCH_BCRYPT_ROUNDS)
+    user_rows = [
+        {
+            "id": user.id,
+            "email": user.email,
+            "password": (
+                hasher.hash(user.password) if hash_passwords else BENCH_PASSWORD_HASH
+            ),
+        }
+        for user in bench_users
+    ]
+    favorite_rows = [
+        {"user_id": user.id, "city_id": city_id}
+        for user in bench_users
+        for city_id in user.favorite_ids
+    ]
+    async with engine.begin() as connection:
+        await connection.execute(insert(UserModel), user_rows)
+        if favorite_rows:
+            await connection.execute(insert(FavoriteCityModel), favorite_rows)
+    return bench_users
+
+
+@asynccontextmanager
+async def bench_app(  # noqa: WPS211
+    db_url: str = "sqlite+aiosqlite:///:memory:",
+    cities: int = 100,
+    with_weather: bool = True,
+    users: int = 1,
+    favorites: int = 0,
+    hash_passwords: bool = False,
+    seed: int = 0,
+) -> AsyncIterator[BenchApp]:
+    """
+    Build the application against a freshly seeded database.
+
+    Startup events are not run: the engine and session factory are attached
+    to the application state directly and the rate limiter is lifted, so the
+    benchmark measures request handling only.
+
+    :param db_url: Database URL of an empty database.
+    :param cities: Number of cities to create.
+    :param with_weather: Whether to store current hour weather for every city.
+    :param users: Number of users to create.
+    :param favorites: Number of favorite cities per user.
+    :param hash_passwords: Whether to store bcrypt hashes, needed to log in.
+    :param seed: Seed of the generated data.
+    :yield: The benchmark application, ``headers`` authenticate the first user.
+    """
+    engine = create_async_engine(db_url)
+    city_ids = await seed_database(engine, cities, with_weather)
+    bench_users = await seed_users(
+        engine,
+        users,
+        city_ids,
+        favorites,
+        hash_passwords,
+        seed,
+    )
+
+    application.settings.rate_limit.capacity = 10**9
+    application.settings.rate_limit.refill_rate = 10**9
+    app = application.get_app()
+    # Request logs would be interleaved with the results on stdout
+    logger.remove()
+    session_factory = async_sessionmaker(engine, expire_on_commit=False)
+    app.state.db_engine = engine
+    app.state.db_session_factory = session_factory
+
+    async with AsyncClient(
+        transport=ASGITransport(app=app),  # type: ignore[arg-type]
+        base_url="http://test",
+    ) as client:
+        yield BenchApp(
+            app=app,
+            client=client,
+            engine=engine,
+            session_factory=session_factory,
+            city_ids=city_ids,
+            headers=bench_users[0].headers if bench_users else {},
+            users=bench_users,
+        )
+    await engine.dispose()
+
+
+class _StubServer(uvicorn.Server):
+    """Server of the stand-in, leaving signals to the benchmark."""
+
+    def install_signal_handlers(self) -> None:
+        """Keep the signal handlers of the process."""
+
+
+@asynccontextmanager
+async def serve_weather_stub(
+    faults: Faults = Faults(),
+    recording: Optional[Recording] = None,
+) -> AsyncIterator[OpenWeatherStub]:
+    """
+    Serve the OpenWeather stand-in locally and point the weather client at it.
+
+    The stand-in listens on a free port, the weather API is reached over HTTP
+    as in production, connection setup included.
+
+    :param faults: Latency, errors and rate limit the stand-in injects.
+    :param recording: Recorded readings to serve, synthetic ones if None.
+    :yield: The stand-in, which records the requests it served.
+
+    :raises RuntimeError: If the stand-in did not start.
+    """
+    stub_app = create_stub_app(faults=faults, recording=recording)
+    server = _StubServer(
+        uvicorn.Config(stub_app, host=STUB_HOST, port=0, log_level="warning"),
+    )
+    serving = asyncio.create_task(server.serve())
+    while not server.started:
+        if serving.done():
+            serving.result()
+            raise RuntimeError("The weather API stand-in did not start.")
+        await asyncio.sleep(STARTUP_POLL_SECONDS)
+    listening = server.servers[0].sockets[0]
+    port = listening.getsockname()[1]
+    weather_api = weather_client.weather_api
+    previous_url = weather_api.base_url
+    # The group endpoint URL is derived from it
+    weather_api.base_url = f"http://{STUB_HOST}:{port}/data/2.5/weather"
+    try:  # noqa: WPS501
+        yield stub_app.state.stub
+    finally:
+        weather_api.base_url = previous_url
+        server.should_exit = True
+        await serving
@@ -0,0 +1,486 @@
+"""
+Reproducible end-to-end load test.
+
+Boots the application against a database seeded with ``--cities`` cities and
+``--users`` users with ``--favorites`` favorite cities each, and serves the
+OpenWeather stand-in over HTTP with ``--upstream-latency-ms`` (drawn from
+``--upstream-latency-distribution``), ``--upstream-error-rate`` and
+``--upstream-rate-limit`` injected, replaying the readings of
+``--upstream-recording`` if given. ``--concurrency`` virtual users, each
+signed in as its own user, run ``--operations`` operations each, drawn from
+the ``--mix`` weights, while the refresh of every favorite city is replayed
+every ``--refresh-seconds`` as the hourly job would run it.
+
+Data, operations and injected errors come from generators seeded with
+``--seed``, so two commits run the same work and their results can be
+compared, e.g. to gate a change on regressions::
+
+    python -m benchmarks.loadtest --output baseline.json
+    git switch feature && python -m benchmarks.loadtest --output feature.json
+    python -m benchmarks.compare baseline.json feature.json
+
+Results are JSON: for every operation and for the whole run, p50/p95/p99
+latency, throughput, errors and SQL statements per request. The default
+database is a scratch SQLite file, pass ``--db-url`` of an empty PostgreSQL
+database for numbers closer to production.
+"""
+import argparse
+import asyncio
+import json
+import platform
+import random
+import subprocess  # noqa: S404
+import tempfile
+import time
+from datetime import datetime
+from functools import partial
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+from benchmarks.harness import BenchApp, BenchUser, bench_app, serve_weather_stub
+from benchmarks.utils import emit, percentiles
+from mdpi_api.db.query_inspector import inspect_engine, query_scope
+from mdpi_api.integrations.openweather_recording import Recording
+from mdpi_api.integrations.openweather_stub import LATENCY_DISTRIBUTIONS, Faults
+from mdpi_api.services.weather_service import WeatherService
+
+# Operation returning whether it succeeded
+Operation = Callable[[], Awaitable[bool]]
+
+PAGE_SIZE = 20
+MANY_CITIES = 5
+REFRESH = "hourly_refresh"
+OPERATIONS = (
+    "login",
+    "list_cities",
+    "weather",
+    "weather_many",
+    "favorites",
+    "toggle_favorite",
+)
+DEFAULT_MIX = (
+    "login=1,list_cities=4,weather=8,weather_many=2,favorites=3,toggle_favorite=2"
+)
+
+
+class OperationStats:
+    """Latency, SQL statements and errors of one kind of operation."""
+
+    def __init__(self) -> None:
+        self.samples: List[float] = []
+        self.statements: List[int] = []
+        self.errors = 0
+
+    def record(self, seconds: float, statements: int, succeeded: bool) -> None:
+        """
+        Record a finished operation.
+
+        :param seconds: Its duration.
+        :param statements: SQL statements it executed.
+        :param succeeded: Whether it succeeded.
+        """
+        self.samples.append(seconds)
+        self.statements.append(statements)
+        self.errors += not succeeded
+
+    def merge(self, other: "OperationStats") -> None:
+        """
+        Add the operations of another kind.
+
+        :param other: Stats of the other kind.
+        """
+        self.samples.extend(other.samples)
+        self.statements.extend(other.statements)
+        self.errors += other.errors
+
+    def summary(self, seconds: float) -> Dict[str, Any]:
+        """
+        Summarize the operations.
+
+        :param seconds: Duration of the run.
+        :return: Count, errors, throughput, latency percentiles in
+            milliseconds and mean SQL statements per operation.
+        """
+        count = len(self.samples)
+        return {
+            "count": count,
+            "errors": self.errors,
+            "throughput_per_sec": round(count / seconds, 2),
+            **percentiles(self.samples),
+            "queries_per_request": round(sum(self.statements) / max(count, 1), 2),
+        }
+
+
+class VirtualUser:
+    """One client, signed in as a seeded user, running the operations."""
+
+    def __init__(self, bench: BenchApp, user: BenchUser, seed: int) -> None:
+        self.bench = bench
+        self.user = user
+        self.rng = random.Random(seed)  # noqa: S311
+        self.favorite_ids = set(user.favorite_ids)
+        self.operations: Dict[str, Operation] = {
+            "login": self.login,
+            "list_cities": self.list_cities,
+            "weather": self.weather,
+            "weather_many": self.weather_many,
+            "favorites": self.favorites,
+            "toggle_favorite": self.toggle_favorite,
+        }
+
+    async def login(self) -> bool:
+        """
+        Get a token with the email and password of the user.
+
+        :return: Whether it succeeded.
+        """
+        credentials = {"email": self.user.email, "password": self.user.password}
+        return await self._get("/api/auth/token", credentials)
+
+    async def list_cities(self) -> bool:
+        """
+        Get a random page of cities.
+
+        :return: Whether it succeeded.
+        """
+        last_page_start = max(len(self.bench.city_ids) - PAGE_SIZE, 1)
+        offset = self.rng.randrange(last_page_start)
+        return await self._get("/api/cities/", {"limit": PAGE_SIZE, "offset": offset})
+
+    async def weather(self) -> bool:
+        """
+        Get the weather of a random city.
+
+        :return: Whether it succeeded.
+        """
+        city_id = self.rng.choice(self.bench.city_ids)
+        return await self._get("/api/cities/weather", {"city_id": city_id})
+
+    async def weather_many(self) -> bool:
+        """
+        Get the weather of several random cities at once.
+
+        :return: Whether it succeeded.
+        """
+        city_ids = self.rng.sample(self.bench.city_ids, MANY_CITIES)
+        query = {"city_ids": ",".join(map(str, city_ids))}
+        return await self._get("/api/cities/weather", query)
+
+    async def favorites(self) -> bool:
+        """
+        Get the favorite cities of the user.
+
+        :return: Whether it succeeded.
+        """
+        return await self._get("/api/favorites/", {})
+
+    async def toggle_favorite(self) -> bool:
+        """
+        Add a random city to the favorites, or remove it if it was one.
+
+        :return: Whether it succeeded.
+        """
+        city_id = self.rng.choice(self.bench.city_ids)
+        is_favorite = city_id in self.favorite_ids
+        response = await self.bench.client.request(
+            "DELETE" if is_favorite else "POST",
+            "/api/favorites/",
+            params={"city_id": city_id},
+            headers=self.user.headers,
+        )
+        if not response.is_success:
+            return False
+        self.favorite_ids.symmetric_difference_update({city_id})
+        return True
+
+    async def _get(self, url: str, params: Dict[str, Any]) -> bool:
+        response = await self.bench.client.get(
+            url,
+            params=params,
+            headers=self.user.headers,
+        )
+        return response.is_success
+
+
+async def timed(
+    name: str,
+    operation: Operation,
+    stats: Dict[str, OperationStats],
+) -> None:
+    """
+    Run an operation, recording its latency and SQL statements.
+
+    :param name: Name of the operation.
+    :param operation: The operation.
+    :param stats: Stats by operation name.
+    """
+    with query_scope(name) as scope:
+        started = time.perf_counter()
+        try:
+            succeeded = await operation()
+        except Exception:
+            succeeded = False
+        elapsed = time.perf_counter() - started
+        statements = scope.total
+    stats.setdefault(name, OperationStats()).record(elapsed, statements, succeeded)
+
+
+async def run_user(
+    virtual_user: VirtualUser,
+    mix: Dict[str, float],
+    operations: int,
+    stats: Dict[str, OperationStats],
+) -> None:
+    """
+    Run the operations of a virtual user.
+
+    :param virtual_user: The virtual user.
+    :param mix: Weight of every operation.
+    :param operations: Number of operations.
+    :param stats: Stats by operation name.
+    """
+    names = list(mix)
+    weights = list(mix.values())
+    for name in virtual_user.rng.choices(names, weights, k=operations):
+        await timed(name, virtual_user.operations[name], stats)
+
+
+async def replay_refreshes(
+    bench: BenchApp,
+    interval: float,
+    stats: Dict[str, OperationStats],
+) -> None:
+    """
+    Refresh the weather of every favorite city at a fixed interval.
+
+    :param bench: The benchmark application.
+    :param interval: Seconds between the start of two refreshes.
+    :param stats: Stats by operation name.
+    """
+    favorite_ids = {city_id for user in bench.users for city_id in user.favorite_ids}
+    refresh = partial(refresh_cities, bench, sorted(favorite_ids))
+    while True:  # noqa: WPS457
+        started = time.perf_counter()
+        await timed(REFRESH, refresh, stats)
+        elapsed = time.perf_counter() - started
+        await asyncio.sleep(max(interval - elapsed, 0))
+
+
+async def refresh_cities(bench: BenchApp, city_ids: List[int]) -> bool:
+    """
+    Refresh the weather of cities as the hourly job does.
+
+    :param bench: The benchmark application.
+    :param city_ids: IDs of the cities.
+    :return: True, failed refreshes are logged by the service.
+    """
+    async with bench.session_factory() as session:
+        await WeatherService(session, bench.session_factory).refresh_cities(city_ids)
+    return True
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    """
+    Run the load test.
+
+    :param args: Parsed command line arguments.
+    :return: Stats of every operation and of the run, with what was run.
+    """
+    mix = parse_mix(args.mix)
+    faults = Faults(
+        latency=args.upstream_latency_ms / 1000,
+        latency_distribution=args.upstream_latency_distribution,
+        error_rate=args.upstream_error_rate,
+        rate_limit=args.upstream_rate_limit,
+        seed=args.seed,
+    )
+    recording = None
+    if args.upstream_recording is not None:
+        recording = Recording.load(args.upstream_recording)
+    async with serve_weather_stub(faults, recording) as stub:
+        async with bench_app(
+            db_url=args.db_url or scratch_sqlite_url(),
+            cities=args.cities,
+            users=max(args.users, args.concurrency),
+            favorites=args.favorites,
+            hash_passwords="login" in mix,
+            seed=args.seed,
+        ) as bench:
+            inspect_engine(bench.engine)
+            stats, seconds = await drive(bench, mix, args)
+        upstream_requests = len(stub.requests)
+
+    total = OperationStats()
+    for operation in stats.keys() - {REFRESH}:
+        total.merge(stats[operation])
+    return {
+        "meta": run_meta(args),
+        "summary": {"seconds": round(seconds, 3), **total.summary(seconds)},
+        "operations": {
+            name: operation_stats.summary(seconds)
+            for name, operation_stats in sorted(stats.items())
+        },
+        "upstream_requests": upstream_requests,
+    }
+
+
+async def drive(
+    bench: BenchApp,
+    mix: Dict[str, float],
+    args: argparse.Namespace,
+) -> Tuple[Dict[str, OperationStats], float]:
+    """
+    Run the virtual users to completion, with the refresh in the background.
+
+    :param bench: The benchmark application.
+    :param mix: Weight of every operation.
+    :param args: Parsed command line arguments.
+    :return: Stats by operation name, and how long the virtual users ran.
+    """
+    stats: Dict[str, OperationStats] = {}
+    virtual_users = [
+        VirtualUser(bench, user, seed=args.seed + index)
+        for index, user in enumerate(bench.users[: args.concurrency])
+    ]
+    refreshes = asyncio.create_task(
+        replay_refreshes(bench, args.refresh_seconds, stats),
+    )
+    started = time.perf_counter()
+    await asyncio.gather(
+        *(
+            run_user(virtual_user, mix, args.operations, stats)
+            for virtual_user in virtual_users
+        ),
+    )
+    seconds = time.perf_counter() - started
+    refreshes.cancel()
+    await asyncio.gather(refreshes, return_exceptions=True)
+    return stats, seconds
+
+
+def parse_mix(mix: str) -> Dict[str, float]:
+    """
+    Parse operation weights.
+
+    :param mix: Comma separated ``name=weight`` pairs.
+    :return: Weight by operation name, operations weighing 0 left out.
+
+    :raises ValueError: If an operation is unknown.
+    """
+    known = set(OPERATIONS)
+    weights = {}
+    for pair in mix.split(","):
+        name, weight = pair.split("=")
+        if name not in known:
+            raise ValueError(f"Unknown operation {name}, expected one of {known}.")
+        if float(weight) > 0:
+            weights[name] = float(weight)
+    return weights
+
+
+def scratch_sqlite_url() -> str:
+    """
+    Get the URL of an empty SQLite database file.
+
+    A file, unlike an in-memory database, gives every session its own
+    connection, as a server database would.
+
+    :return: The database URL.
+    """
+    path = Path(tempfile.mkdtemp(prefix="mdpi_loadtest_")) / "loadtest.db"
+    return f"sqlite+aiosqlite:///{path}"
+
+
+def run_meta(args: argparse.Namespace) -> Dict[str, Any]:
+    """
+    Describe the run, to tell whether two results are comparable.
+
+    :param args: Parsed command line arguments.
+    :return: The arguments, the commit and the platform.
+    """
+    return {
+        "args": {
+            key: arg
+            for key, arg in vars(args).items()  # noqa: WPS421
+            if key != "output"
+        },
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "finished_at": datetime.utcnow().isoformat(),
+    }
+
+
+def git_commit() -> Optional[str]:
+    """
+    Get the commit of the working tree.
+
+    :return: The commit hash, suffixed with ``-dirty`` when the tree has
+        changes, None outside of a git repository.
+    """
+    try:
+        commit = _git("rev-parse", "HEAD")
+        changes = _git("status", "--porcelain", "--untracked-files=no")
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return f"{commit}-dirty" if changes else commit
+
+
+def _git(*args: str) -> str:
+    completed = subprocess.run(  # noqa: S603, S607
+        ["git", *args],
+        capture_output=True,
+        check=True,
+        text=True,
+    )
+    return completed.stdout.strip()
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    """
+    Entrypoint of the load test.
+
+    :param argv: Command line arguments, those of the process if None.
+    """
+    args = build_parser().parse_args(argv)
+    results = asyncio.run(run(args))
+    if args.output is not None:
+        args.output.write_text(json.dumps(results, indent=2, default=str))
+    emit(results)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """
+    Build the command line parser.
+
+    :return: The parser.
+    """
+    parser = argparse.ArgumentParser(description="End-to-end load test.")
+    parser.add_argument("--cities", type=int, default=200)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--favorites", type=int, default=5)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--operations", type=int, default=200)
+    parser.add_argument("--mix", default=DEFAULT_MIX)
+    parser.add_argument("--refresh-seconds", type=float, default=5)
+    _add_environment_arguments(parser)
+    return parser
+
+
+def _add_environment_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--db-url", default=None)
+    parser.add_argument("--upstream-latency-ms", type=float, default=50)
+    parser.add_argument(
+        "--upstream-latency-distribution",
+        choices=sorted(LATENCY_DISTRIBUTIONS),
+        default="fixed",
+    )
+    parser.add_argument("--upstream-error-rate", type=float, default=0)
+    parser.add_argument("--upstream-rate-limit", type=int, default=0)
+    parser.add_argument("--upstream-recording", type=Path, default=None)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", type=Path, default=None)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+import json
+import statistics
+import sys
+import time
+from typing import Any, Dict, List, Sequence
+
+
+def percentiles(samples: Sequence[float]) -> Dict[str, float]:
+    """
+    Summarize latency samples (in seconds) as milliseconds.
+
+    :param samples: Latency samples in seconds.
+    :return: Dictionary with p50, p95, p99, mean and max in milliseconds.
+    """
+    ordered = sorted(samples)
+    if not ordered:
+        return {"p50": 0, "p95": 0, "p99": 0, "mean": 0, "max": 0}
+    return {
+        "p50": _to_ms(_quantile(ordered, 0.5)),
+        "p95": _to_ms(_quantile(ordered, 0.95)),
+        "p99": _to_ms(_quantile(ordered, 0.99)),
+        "mean": _to_ms(statistics.fmean(ordered)),
+        "max": _to_ms(ordered[-1]),
+    }
+
+
+def _quantile(ordered: Sequence[float], quantile: float) -> float:
+    last = len(ordered) - 1
+    return ordered[min(last, round(quantile * last))]
+
+
+def _to_ms(seconds: float) -> float:
+    return round(seconds * 1000, 3)
+
+
+class Stopwatch:
+    """Collects wall-clock samples of a repeated operation."""
+
+    def __init__(self) -> None:
+        self.samples: List[float] = []
+        self._started = time.perf_counter()
+
+    def __enter__(self) -> "Stopwatch":
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.samples.append(time.perf_counter() - self._started)
+
+
+def emit(results: Dict[str, Any]) -> None:
+    """
+    Print benchmark results as JSON on stdout.
+
+    :param results: The results to print.
+    """
+    json.dump(results, sys.stdout, indent=2, default=str)
+    sys.stdout.write("\n")
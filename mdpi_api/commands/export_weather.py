@@ -0,0 +1,68 @@
+"""
+Export stored weather readings to a file.
+
+Usage::
+
+    python -m mdpi_api.commands.export_weather --format parquet \
+        --city-id 792680 --from 2024-01-01 --to 2024-02-01 -o weather.parquet
+"""
+import argparse
+import asyncio
+import sys
+from datetime import datetime
+from typing import BinaryIO
+
+from mdpi_api.services.export_service import ExportFormatEnum, WeatherExportService
+from mdpi_api.settings import settings
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+
+async def export_weather(args: argparse.Namespace, output: BinaryIO) -> None:
+    """
+    Stream the weather export into the output file.
+
+    :param args: Parsed command line arguments.
+    :param output: Binary file to write to.
+    """
+    engine = create_async_engine(str(settings.db.db_url))
+    export_service = WeatherExportService(
+        async_sessionmaker(engine, expire_on_commit=False),
+        chunk_size=args.chunk_size,
+    )
+    exported = export_service.export(
+        ExportFormatEnum(args.format),
+        city_ids=args.city_ids,
+        start=args.start,
+        end=args.end,
+    )
+    try:  # noqa: WPS501
+        async for data in exported:
+            output.write(data)
+    finally:
+        await engine.dispose()
+
+
+def main() -> None:
+    """Entrypoint of the command."""
+    parser = argparse.ArgumentParser(description="Export stored weather readings.")
+    parser.add_argument(
+        "--format",
+        choices=[export_format.value for export_format in ExportFormatEnum],
+        default=ExportFormatEnum.NDJSON.value,
+    )
+    parser.add_argument("--city-id", dest="city_ids", type=int, action="append")
+    parser.add_argument("--from", dest="start", type=datetime.fromisoformat)
+    parser.add_argument("--to", dest="end", type=datetime.fromisoformat)
+    parser.add_argument("--chunk-size", type=int, default=settings.export.chunk_size)
+    parser.add_argument("-o", "--output", default="-", help="File path, - for stdout.")
+    args = parser.parse_args()
+
+    if args.output == "-":
+        asyncio.run(export_weather(args, sys.stdout.buffer))
+        return
+    with open(args.output, "wb") as output:
+        asyncio.run(export_weather(args, output))
+
+
+if __name__ == "__main__":
+    main()
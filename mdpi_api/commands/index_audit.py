@@ -0,0 +1,415 @@
+"""
+Audit the indexes of the schema.
+
+Every index slows down every insert into its table, so an index has to serve
+a query. The indexes declared by the models are checked against each other
+and against the shapes of the DAO queries, and with ``--database`` against
+the indexes of the database and how often PostgreSQL used them since its
+statistics were reset (``pg_stat_user_indexes``). Findings:
+
+* ``duplicates_primary_key``: an index on the primary key columns;
+* ``redundant_prefix``: an index on the leading columns of another index or
+  unique constraint, which serves the same lookups;
+* ``unindexed_foreign_key``: a foreign key without an index, so deleting a
+  referenced row scans the table;
+* ``unserved_query``: a DAO query shape without an index leading with its
+  equality columns and then its range column;
+* ``unused``: an index never scanned, with its size;
+* ``missing`` and ``undeclared``: an index of the models not in the
+  database, or the other way round.
+
+Exits with 1 when anything is found::
+
+    python -m mdpi_api.commands.index_audit
+    python -m mdpi_api.commands.index_audit --database
+"""
+import argparse
+import asyncio
+import sys
+from typing import Any, List, NamedTuple, Optional, Sequence, Set, Tuple
+
+from mdpi_api.db.meta import meta
+from mdpi_api.db.models import load_all_models
+from mdpi_api.settings import settings
+from sqlalchemy import Index, MetaData, Table, UniqueConstraint, func, select
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlalchemy.sql import column, table
+
+index_stats = table(
+    "pg_stat_user_indexes",
+    column("schemaname"),
+    column("relname"),
+    column("indexrelname"),
+    column("indexrelid"),
+    column("idx_scan"),
+)
+pg_index = table("pg_index", column("indexrelid"), column("indisunique"))
+# Indexes of the tables of the current schema, with their use
+INDEX_STATISTICS = (
+    select(
+        index_stats.c.relname.label("table_name"),
+        index_stats.c.indexrelname.label("index_name"),
+        index_stats.c.idx_scan.label("scans"),
+        func.pg_relation_size(index_stats.c.indexrelid).label("size_bytes"),
+        pg_index.c.indisunique.label("is_unique"),
+    )
+    .join_from(
+        index_stats,
+        pg_index,
+        index_stats.c.indexrelid == pg_index.c.indexrelid,
+    )
+    .where(index_stats.c.schemaname == func.current_schema())
+)
+
+
+class QueryShape(NamedTuple):
+    """Columns a DAO query finds rows by."""
+
+    table: str
+    # Columns compared for equality, in any order
+    equality: Tuple[str, ...]
+    # Column compared with a range or sorted on, after the equality columns
+    range_column: Optional[str]
+    used_by: str
+
+
+class Finding(NamedTuple):
+    """A problem with an index."""
+
+    kind: str
+    table: str
+    # Name of the index, empty for findings about missing indexes
+    name: str
+    detail: str
+
+
+class TableIndex(NamedTuple):
+    """An index, unique constraint or primary key of a table."""
+
+    name: str
+    columns: Tuple[str, ...]
+    unique: bool
+    # Declared as an Index, not as a constraint
+    is_index: bool
+
+
+QUERY_SHAPES = (
+    QueryShape("weather", ("city_id",), "created_at", "WeatherDAO lookups"),
+    QueryShape("favorite_cities", ("user_id",), None, "get_favorite_cities"),
+    QueryShape("favorite_cities", ("user_id", "city_id"), None, "remove_favorite_city"),
+    QueryShape("favorite_cities", ("city_id",), None, "get_notification_subscribers"),
+    QueryShape("cities", ("id",), None, "CityDAO.get_by_id, get_by_ids"),
+    QueryShape("cities", ("name",), None, "seed_data"),
+    QueryShape("users", ("id",), None, "UserDAO.get_by_id"),
+    QueryShape("users", ("email",), None, "UserDAO.get_by_email"),
+    QueryShape("scheduler_runs", ("job_id", "slot"), None, "SchedulerRunDAO"),
+)
+
+
+def table_indexes(table: Table) -> List[TableIndex]:  # noqa: WPS442
+    """
+    Get the indexes of a table, the ones backing constraints included.
+
+    :param table: The table.
+    :return: Its primary key first, then its unique constraints and indexes.
+    """
+    primary_key = table.primary_key
+    primary_key_name = primary_key.name or f"{table.name}_pkey"
+    indexes = [
+        TableIndex(
+            str(primary_key_name),
+            _column_names(primary_key.columns),
+            unique=True,
+            is_index=False,
+        ),
+    ]
+    for constraint in table.constraints:
+        if isinstance(constraint, UniqueConstraint):
+            indexes.append(
+                TableIndex(
+                    str(constraint.name),
+                    _column_names(constraint.columns),
+                    unique=True,
+                    is_index=False,
+                ),
+            )
+    for index in sorted(table.indexes, key=_index_name):
+        indexes.append(
+            TableIndex(
+                _index_name(index),
+                _column_names(index.columns),
+                unique=bool(index.unique),
+                is_index=True,
+            ),
+        )
+    return indexes
+
+
+def audit_table(table: Table) -> List[Finding]:  # noqa: WPS442
+    """
+    Find the redundant indexes and unindexed foreign keys of a table.
+
+    :param table: The table.
+    :return: The findings.
+    """
+    indexes = table_indexes(table)
+    return [
+        *_redundant_indexes(table.name, indexes),
+        *_unindexed_foreign_keys(table, indexes),
+    ]
+
+
+def audit_query_shapes(
+    metadata: MetaData,
+    shapes: Sequence[QueryShape] = QUERY_SHAPES,
+) -> List[Finding]:
+    """
+    Find the query shapes no index serves.
+
+    :param metadata: The models.
+    :param shapes: The query shapes of the DAOs.
+    :return: The findings.
+    """
+    findings = []
+    for shape in shapes:
+        shape_table = metadata.tables.get(shape.table)
+        indexes = table_indexes(shape_table) if shape_table is not None else []
+        if not any(_serves(index, shape) for index in indexes):
+            lookup = _describe_shape(shape)
+            detail = f"{lookup} of {shape.used_by}"
+            findings.append(Finding("unserved_query", shape.table, "", detail))
+    return findings
+
+
+def audit_metadata(
+    metadata: MetaData,
+    shapes: Sequence[QueryShape] = QUERY_SHAPES,
+) -> List[Finding]:
+    """
+    Audit the indexes declared by the models.
+
+    :param metadata: The models.
+    :param shapes: The query shapes of the DAOs.
+    :return: The findings.
+    """
+    findings = []
+    for model_table in metadata.sorted_tables:
+        findings.extend(audit_table(model_table))
+    findings.extend(audit_query_shapes(metadata, shapes))
+    return findings
+
+
+async def audit_database(engine: AsyncEngine, metadata: MetaData) -> List[Finding]:
+    """
+    Audit the indexes of a PostgreSQL database against the models.
+
+    :param engine: Engine of the database.
+    :param metadata: The models.
+    :return: The findings.
+    """
+    async with engine.connect() as connection:
+        rows = (await connection.execute(INDEX_STATISTICS)).all()
+    rows = [row for row in rows if row.table_name in metadata.tables]
+    findings = [_audit_statistics(row, metadata) for row in rows]
+    in_database = {(row.table_name, row.index_name) for row in rows}
+    return [
+        *(finding for finding in findings if finding is not None),
+        *_missing_indexes(metadata, in_database),
+    ]
+
+
+async def audit(args: argparse.Namespace) -> List[Finding]:
+    """
+    Audit the models, and the database if asked to.
+
+    :param args: Parsed command line arguments.
+    :return: The findings.
+    """
+    load_all_models()
+    findings = audit_metadata(meta)
+    if args.database:
+        engine = create_async_engine(str(settings.db.db_url))
+        try:  # noqa: WPS501
+            findings.extend(await audit_database(engine, meta))
+        finally:
+            await engine.dispose()
+    return findings
+
+
+def main() -> None:
+    """Entrypoint of the command."""
+    parser = argparse.ArgumentParser(description="Audit the indexes of the schema.")
+    parser.add_argument(
+        "--database",
+        action="store_true",
+        help="Also check the indexes and index statistics of the database.",
+    )
+    findings = asyncio.run(audit(parser.parse_args()))
+    sys.stdout.writelines(_format_finding(finding) for finding in findings)
+    if findings:
+        sys.exit(1)
+    sys.stdout.write("No index findings.\n")
+
+
+def _redundant_indexes(
+    table_name: str,
+    indexes: Sequence[TableIndex],
+) -> List[Finding]:
+    """
+    Find the indexes serving no lookup another index does not serve.
+
+    :param table_name: Name of the table.
+    :param indexes: All indexes of the table, its primary key first.
+    :return: The findings.
+    """
+    findings = []
+    primary_key = indexes[0]
+    for index in indexes:
+        if not index.is_index or index.unique:
+            continue
+        covering = _covering_index(index, indexes)
+        if index.columns == primary_key.columns:
+            described = _describe_columns(index.columns)
+            detail = f"on {described}"
+            findings.append(
+                Finding("duplicates_primary_key", table_name, index.name, detail),
+            )
+        elif covering is not None:
+            detail = f"leading columns of {covering.name}"
+            findings.append(
+                Finding("redundant_prefix", table_name, index.name, detail),
+            )
+    return findings
+
+
+def _unindexed_foreign_keys(
+    model_table: Table,
+    indexes: Sequence[TableIndex],
+) -> List[Finding]:
+    """
+    Find the foreign keys no index leads with.
+
+    :param model_table: The table.
+    :param indexes: All indexes of the table.
+    :return: The findings.
+    """
+    findings = []
+    for foreign_key in model_table.foreign_key_constraints:
+        columns = _column_names(foreign_key.columns)
+        leading = [index.columns[: len(columns)] for index in indexes]
+        if columns not in leading:
+            referred = foreign_key.referred_table.name
+            described = _describe_columns(columns)
+            detail = f"{described} references {referred}"
+            findings.append(
+                Finding("unindexed_foreign_key", model_table.name, "", detail),
+            )
+    return findings
+
+
+def _audit_statistics(row: Any, metadata: MetaData) -> Optional[Finding]:
+    """
+    Check an index of the database.
+
+    :param row: The index and its statistics, from ``INDEX_STATISTICS``.
+    :param metadata: The models.
+    :return: The finding, None if the index is fine.
+    """
+    declared = table_indexes(metadata.tables[row.table_name])
+    if row.index_name not in {index.name for index in declared}:
+        return Finding("undeclared", row.table_name, row.index_name, "not in models")
+    if row.scans == 0 and not row.is_unique:
+        detail = f"never scanned, {row.size_bytes} bytes"
+        return Finding("unused", row.table_name, row.index_name, detail)
+    return None
+
+
+def _missing_indexes(
+    metadata: MetaData,
+    in_database: Set[Tuple[str, str]],
+) -> List[Finding]:
+    """
+    Find the indexes of the models not in the database.
+
+    :param metadata: The models.
+    :param in_database: Table and name of every index of the database.
+    :return: The findings.
+    """
+    findings = []
+    for model_table in metadata.sorted_tables:
+        for index in table_indexes(model_table):
+            if index.is_index and (model_table.name, index.name) not in in_database:
+                findings.append(
+                    Finding("missing", model_table.name, index.name, "not in database"),
+                )
+    return findings
+
+
+def _covering_index(
+    index: TableIndex,
+    indexes: Sequence[TableIndex],
+) -> Optional[TableIndex]:
+    """
+    Find another index whose leading columns are the columns of an index.
+
+    Of two indexes on the same columns, the second one by name is redundant.
+
+    :param index: The index.
+    :param indexes: All indexes of its table.
+    :return: The other index, None if there is none.
+    """
+    width = len(index.columns)
+    for other in indexes:
+        if other is index or other.columns[:width] != index.columns:
+            continue
+        if len(other.columns) > width or other.name < index.name:
+            return other
+    return None
+
+
+def _serves(index: TableIndex, shape: QueryShape) -> bool:
+    """
+    Check whether an index serves a query shape.
+
+    :param index: The index.
+    :param shape: The query shape.
+    :return: True if the index leads with the equality columns, then the
+        range column.
+    """
+    equality_count = len(shape.equality)
+    if set(index.columns[:equality_count]) != set(shape.equality):
+        return False
+    if shape.range_column is None:
+        return True
+    next_columns = index.columns[equality_count : equality_count + 1]
+    return next_columns == (shape.range_column,)
+
+
+def _column_names(columns: Any) -> Tuple[str, ...]:
+    return tuple(column.name for column in columns)
+
+
+def _index_name(index: Index) -> str:
+    return str(index.name)
+
+
+def _format_finding(finding: Finding) -> str:
+    location = ".".join(part for part in (finding.table, finding.name) if part)
+    kind = finding.kind.ljust(24)
+    return f"{kind} {location}: {finding.detail}\n"
+
+
+def _describe_columns(columns: Tuple[str, ...]) -> str:
+    names = ", ".join(columns)
+    return f"({names})"
+
+
+def _describe_shape(shape: QueryShape) -> str:
+    lookup = " and ".join(f"{column_name} =" for column_name in shape.equality)
+    if shape.range_column:
+        return f"{lookup} and {shape.range_column} range"
+    return lookup
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,15 @@
-from typing import Any, AsyncGenerator
+import uuid
+from contextlib import contextmanager
+from typing import Any, AsyncGenerator, Callable, ContextManager, Dict, Iterator
 
 import pytest
 from fastapi import FastAPI
 from httpx import AsyncClient
-from mdpi_api.db.dependencies import get_db_session
+from mdpi_api.db.dependencies import get_db_session, get_db_session_factory
+from mdpi_api.db.instrumentation import instrument_engine
+from mdpi_api.db.models.user_model import UserModel
+from mdpi_api.db.query_inspector import QueryScope, inspect_engine, query_scope
+from mdpi_api.services.jwt_service import JWTService
 from mdpi_api.web.application import get_app
 from sqlalchemy.ext.asyncio import (
     AsyncEngine,
@@ -12,6 +18,9 @@ from sqlalchemy.ext.asyncio import (
     create_async_engine,
 )
 
+# Tests sign in with tokens, the password is never checked
+PASSWORD_HASH = "not-a-bcrypt-hash"  # noqa: S105
+
 
 @pytest.fixture(scope="session")
 def anyio_backend() -> str:
@@ -38,6 +47,8 @@ async def _engine() -> AsyncGenerator[AsyncEngine, None]:
     # Use SQLite for test environment
     test_db_url = "sqlite+aiosqlite:///:memory:"
     engine = create_async_engine(test_db_url)
+    instrument_engine(engine)
+    inspect_engine(engine)
     async with engine.begin() as conn:
         await conn.run_sync(meta.create_all)
     try:
@@ -87,6 +98,13 @@ def fastapi_app(
     """
     application = get_app()
     application.dependency_overrides[get_db_session] = lambda: dbsession
+    application.dependency_overrides[get_db_session_factory] = lambda: (
+        async_sessionmaker(
+            dbsession.bind,
+            expire_on_commit=False,
+            join_transaction_mode="create_savepoint",
+        )
+    )
     return application  # noqa: WPS331
 
 
@@ -104,3 +122,54 @@ async def client(
     """
     async with AsyncClient(app=fastapi_app, base_url="http://test") as ac:
         yield ac
+
+
+@pytest.fixture
+async def user(dbsession: AsyncSession) -> UserModel:
+    """
+    Create a user.
+
+    :param dbsession: session to the database.
+    :return: the user.
+    """
+    test_user = UserModel(
+        id=uuid.uuid4(),
+        email="user@test.com",
+        password=PASSWORD_HASH,
+    )
+    dbsession.add(test_user)
+    await dbsession.flush()
+    return test_user
+
+
+@pytest.fixture
+def auth_headers(user: UserModel) -> Dict[str, str]:
+    """
+    Headers authenticating requests as the ``user``.
+
+    :param user: the user.
+    :return: the headers.
+    """
+    return {"Authorization": f"Bearer {JWTService.sign_jwt(user_id=user.id)}"}
+
+
+QueryBudget = Callable[[int], ContextManager[QueryScope]]
+
+
+@pytest.fixture
+def query_budget() -> QueryBudget:
+    """
+    Fixture failing a test when a block runs more statements than expected.
+
+    Usage: ``with query_budget(3): ...``.
+
+    :return: a context manager taking the statement budget of the block.
+    """
+
+    @contextmanager
+    def budget(statements: int) -> Iterator[QueryScope]:  # noqa: WPS430
+        with query_scope("test") as scope:
+            yield scope
+            assert scope.total <= statements, scope.summary()
+
+    return budget
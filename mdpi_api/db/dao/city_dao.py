@@ -1,4 +1,4 @@
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, Iterable, List, Optional, Set
 
 from fastapi import Depends
 from loguru import logger
@@ -10,7 +10,7 @@ from mdpi_api.web.api.errors.city import (
     FavoriteCityNotFoundError,
 )
 from pydantic import UUID4
-from sqlalchemy import and_, delete, insert, select, update
+from sqlalchemy import and_, delete, func, insert, select, update
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 
@@ -39,6 +39,24 @@ class CityDAO:
             logger.error(f"Failed to get city by ID: {exception}")
             raise exception
 
+    async def get_by_ids(self, city_ids: Iterable[int]) -> List[CityModel]:
+        """
+        Get cities by their IDs.
+
+        :param city_ids: The IDs of the cities.
+        :return: The cities that exist, in no particular order.
+
+        :raises Exception: If there is an error during city retrieval.
+        """
+        try:
+            result = await self.session.execute(
+                select(CityModel).where(CityModel.id.in_(list(city_ids))),
+            )
+            return list(result.scalars().all())
+        except Exception as exception:
+            logger.error(f"Failed to get cities by IDs: {exception}")
+            raise exception
+
     async def get_all(self, *, limit: int, offset: int) -> List[CityModel]:
         """
         Get all cities.
@@ -59,6 +77,26 @@ class CityDAO:
             logger.error(f"Failed to get cities: {exception}")
             raise exception
 
+    async def get_catalog_version(self) -> str:
+        """
+        Get a version string of the cities catalog.
+
+        The version changes whenever a city is added, removed or updated.
+
+        :return: Catalog version.
+
+        :raises Exception: If there is an error during city retrieval.
+        """
+        try:
+            result = await self.session.execute(
+                select(func.count(CityModel.id), func.max(CityModel.updated_at)),
+            )
+            count, last_updated = result.one()
+            return f"{count}:{last_updated}"
+        except Exception as exception:
+            logger.error(f"Failed to get cities catalog version: {exception}")
+            raise exception
+
     async def get_all_favorite_cities(self) -> List[CityModel]:
         """
         Get all favorite cities.
@@ -80,6 +118,57 @@ class CityDAO:
             logger.error(f"Failed to get all favorite cities: {exception}")
             raise exception
 
+    async def get_notification_subscribers(
+        self,
+        city_ids: Iterable[int],
+    ) -> List[Dict[str, Any]]:
+        """
+        Get the users with notifications allowed for some cities.
+
+        :param city_ids: The IDs of the cities.
+        :return: User ID, city ID and city name of every subscription.
+
+        :raises Exception: If there is an error during subscriber retrieval.
+        """
+        try:
+            result = await self.session.execute(
+                select(
+                    FavoriteCityModel.user_id,
+                    FavoriteCityModel.city_id,
+                    CityModel.name.label("city_name"),
+                )
+                .join(CityModel, CityModel.id == FavoriteCityModel.city_id)
+                .where(
+                    and_(
+                        FavoriteCityModel.city_id.in_(list(city_ids)),
+                        FavoriteCityModel.allow_notifications.is_(True),
+                    ),
+                ),
+            )
+            return [dict(subscriber) for subscriber in result.mappings().all()]
+        except Exception as exception:
+            logger.error(f"Failed to get notification subscribers: {exception}")
+            raise exception
+
+    async def get_notified_city_ids(self) -> Set[int]:
+        """
+        Get the cities somebody allowed notifications for.
+
+        :return: IDs of the cities.
+
+        :raises Exception: If there is an error during city retrieval.
+        """
+        try:
+            result = await self.session.execute(
+                select(FavoriteCityModel.city_id)
+                .where(FavoriteCityModel.allow_notifications.is_(True))
+                .distinct(),
+            )
+            return set(result.scalars().all())
+        except Exception as exception:
+            logger.error(f"Failed to get notified cities: {exception}")
+            raise exception
+
     async def get_favorite_cities(self, user_id: UUID4) -> List[Dict[str, Any]]:
         """
         Get all favorite cities for a user.
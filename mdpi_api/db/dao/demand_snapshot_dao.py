@@ -0,0 +1,72 @@
+from datetime import datetime
+from typing import List
+
+from fastapi import Depends
+from loguru import logger
+from mdpi_api.db.dependencies import get_db_session
+from mdpi_api.db.models.demand_snapshot_model import DemandSnapshotModel
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+class DemandSnapshotDAO:
+    """Class for accessing demand_snapshots table."""
+
+    def __init__(self, session: AsyncSession = Depends(get_db_session)):
+        self.session = session
+
+    async def save(self, snapshot: DemandSnapshotModel) -> None:
+        """
+        Save the demand snapshot of a worker, replacing its previous one.
+
+        :param snapshot: The snapshot.
+
+        :raises Exception: If there is an error during the save.
+        """
+        try:
+            await self.session.merge(snapshot)
+            await self.session.commit()
+        except Exception as exception:
+            logger.error(
+                f"Failed to save demand snapshot of {snapshot.worker_id}: {exception}",
+            )
+            raise exception
+
+    async def get_since(self, since: datetime) -> List[DemandSnapshotModel]:
+        """
+        Get the snapshots published since a moment.
+
+        :param since: Snapshots published earlier are left out.
+        :return: The snapshots.
+
+        :raises Exception: If there is an error during snapshot retrieval.
+        """
+        try:
+            result = await self.session.execute(
+                select(DemandSnapshotModel).where(
+                    DemandSnapshotModel.published_at >= since,
+                ),
+            )
+            return list(result.scalars().all())
+        except Exception as exception:
+            logger.error(f"Failed to get demand snapshots: {exception}")
+            raise exception
+
+    async def delete_before(self, before: datetime) -> None:
+        """
+        Delete the snapshots published before a moment.
+
+        :param before: Snapshots published earlier are deleted.
+
+        :raises Exception: If there is an error during the deletion.
+        """
+        try:
+            await self.session.execute(
+                delete(DemandSnapshotModel).where(
+                    DemandSnapshotModel.published_at < before,
+                ),
+            )
+            await self.session.commit()
+        except Exception as exception:
+            logger.error(f"Failed to delete demand snapshots: {exception}")
+            raise exception
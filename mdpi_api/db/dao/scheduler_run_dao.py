@@ -0,0 +1,97 @@
+from datetime import datetime, timezone
+
+from fastapi import Depends
+from loguru import logger
+from mdpi_api.db.dependencies import get_db_session
+from mdpi_api.db.models.scheduler_run_model import SchedulerRunModel
+from sqlalchemy import and_, delete, insert, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+class SchedulerRunDAO:
+    """Class for accessing scheduler_runs table."""
+
+    def __init__(self, session: AsyncSession = Depends(get_db_session)):
+        self.session = session
+
+    async def claim_run(self, job_id: str, slot: datetime, owner: str) -> bool:
+        """
+        Claim the run of a job for a slot.
+
+        The (job_id, slot) pair is unique, so only one worker in the cluster
+        can claim a slot, however many try.
+
+        :param job_id: The ID of the job.
+        :param slot: Start of the period the run is for.
+        :param owner: Identifier of the claiming worker.
+        :return: True if the run was claimed, False if it was claimed before.
+
+        :raises Exception: If there is an error during the claim.
+        """
+        try:
+            await self.session.execute(
+                insert(SchedulerRunModel).values(
+                    job_id=job_id,
+                    slot=slot,
+                    owner=owner,
+                    status="running",
+                ),
+            )
+            await self.session.commit()
+            return True
+        except IntegrityError:
+            await self.session.rollback()
+            return False
+        except Exception as exception:
+            logger.error(f"Failed to claim run of job {job_id}: {exception}")
+            raise exception
+
+    async def finish_run(self, job_id: str, slot: datetime, status: str) -> None:
+        """
+        Record the outcome of a claimed run.
+
+        :param job_id: The ID of the job.
+        :param slot: Start of the period the run is for.
+        :param status: Outcome of the run.
+
+        :raises Exception: If there is an error during the update.
+        """
+        try:
+            await self.session.execute(
+                update(SchedulerRunModel)
+                .where(
+                    and_(
+                        SchedulerRunModel.job_id == job_id,
+                        SchedulerRunModel.slot == slot,
+                    ),
+                )
+                .values(status=status, finished_at=datetime.now(timezone.utc)),
+            )
+            await self.session.commit()
+        except Exception as exception:
+            logger.error(f"Failed to finish run of job {job_id}: {exception}")
+            raise exception
+
+    async def delete_runs_before(self, job_id: str, before: datetime) -> None:
+        """
+        Delete the runs of a job for slots before a moment.
+
+        :param job_id: The ID of the job.
+        :param before: Runs for earlier slots are deleted.
+
+        :raises Exception: If there is an error during the deletion.
+        """
+        try:
+            await self.session.execute(
+                delete(SchedulerRunModel).where(
+                    and_(
+                        SchedulerRunModel.job_id == job_id,
+                        SchedulerRunModel.slot < before,
+                    ),
+                ),
+            )
+            await self.session.commit()
+        except Exception as exception:
+            logger.error(f"Failed to delete runs of job {job_id}: {exception}")
+            raise exception
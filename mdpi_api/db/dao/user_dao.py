@@ -29,7 +29,7 @@ class UserDAO:
                 select(UserModel).where(and_(UserModel.email == email)),
             )
             user = result.scalar()
-            logger.info(f"User: {result}")
+            logger.debug("User by email: {0}", user)
             return user
         except Exception as exception:
             logger.error(f"Failed to retrieve user: {exception}")
@@ -1,14 +1,38 @@
-from datetime import datetime
-from typing import Any, Dict, Optional
+from datetime import datetime, timedelta
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    AsyncIterator,
+    Dict,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+)
 
 from fastapi import Depends
 from loguru import logger
 from mdpi_api.db.dependencies import get_db_session
 from mdpi_api.db.models.city_model import CityModel
 from mdpi_api.db.models.weather_model import WeatherModel
-from sqlalchemy import and_, join, select
+from mdpi_api.lazy_imports import LazyModule
+from mdpi_api.settings import settings
+from sqlalchemy import ColumnElement, Row, and_, func, join, literal, select, true
 from sqlalchemy.ext.asyncio import AsyncSession
 
+if TYPE_CHECKING:
+    import polars as pl
+else:
+    pl = LazyModule("polars")  # noqa: WPS440
+
+WeatherRows = Sequence[Row[Any]]
+
+# Polars truncation of the ``date_trunc`` units history is aggregated by
+POLARS_TRUNCATE_EVERY = {
+    "hour": "1h",
+    "day": "1d",
+}
+
 
 class WeatherDAO:
     """Class for accessing weather table."""
@@ -25,9 +49,7 @@ class WeatherDAO:
 
         :raises Exception: If there is an error during weather retrieval.
         """
-        # Get the start time of the current hour, we only want the latest weather data
-        current_time = datetime.utcnow()
-        hour_start = current_time.replace(minute=0, second=0, microsecond=0)
+        hour_start, current_time = self.current_hour_window()
         try:
             stmt = (
                 select(
@@ -46,6 +68,8 @@ class WeatherDAO:
                         WeatherModel.created_at < current_time,
                     ),
                 )
+                .order_by(WeatherModel.id.desc())
+                .limit(1)
             )
 
             result = await self.session.execute(stmt)
@@ -57,13 +81,236 @@ class WeatherDAO:
                     "city_name": row.city_name,
                     "data": row.data,
                 }
-                logger.info(f"Got weather by city ID {city_id}: {weather_data}")
+                logger.debug("Got weather by city ID {0}: {1}", city_id, weather_data)
                 return weather_data
             return None
         except Exception as exception:
             logger.error(f"Failed to get weather by city ID: {exception}")
             raise exception
 
+    async def get_latest_weather(
+        self,
+        city_id: int,
+        since: datetime,
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Get the most recent weather data for a city, however old it is.
+
+        :param city_id: The ID of the city.
+        :param since: Only consider rows stored since then (naive UTC).
+        :return: Weather data with the time it was stored, None if not found.
+
+        :raises Exception: If there is an error during weather retrieval.
+        """
+        try:
+            result = await self.session.execute(
+                select(
+                    WeatherModel.city_id,
+                    CityModel.name.label("city_name"),
+                    WeatherModel.data,
+                    WeatherModel.created_at,
+                )
+                .select_from(
+                    join(WeatherModel, CityModel, WeatherModel.city_id == CityModel.id),
+                )
+                .where(
+                    and_(
+                        WeatherModel.city_id == city_id,
+                        WeatherModel.created_at >= since,
+                    ),
+                )
+                .order_by(WeatherModel.id.desc())
+                .limit(1),
+            )
+            row = result.first()
+            if row is None:
+                return None
+            return {
+                "city_id": row.city_id,
+                "city_name": row.city_name,
+                "data": row.data,
+                "created_at": row.created_at,
+            }
+        except Exception as exception:
+            logger.error(f"Failed to get latest weather by city ID: {exception}")
+            raise exception
+
+    async def get_latest_weathers(
+        self,
+        city_ids: Sequence[int],
+        since: datetime,
+        before: Optional[datetime] = None,
+    ) -> Dict[int, Dict[str, Any]]:
+        """
+        Get the most recent weather data of several cities in one query.
+
+        :param city_ids: The IDs of the cities.
+        :param since: Only consider rows stored since then (naive UTC).
+        :param before: Only consider rows stored before then (naive UTC).
+        :return: Weather data with its ID and the time it was stored, by
+            city ID. Cities without weather are missing.
+
+        :raises Exception: If there is an error during weather retrieval.
+        """
+        conditions = [
+            WeatherModel.city_id.in_(city_ids),
+            WeatherModel.created_at >= since,
+        ]
+        if before is not None:
+            conditions.append(WeatherModel.created_at < before)
+        latest_ids = (
+            select(func.max(WeatherModel.id))
+            .where(and_(*conditions))
+            .group_by(WeatherModel.city_id)
+        )
+        try:
+            result = await self.session.execute(
+                select(
+                    WeatherModel.id,
+                    WeatherModel.city_id,
+                    CityModel.name.label("city_name"),
+                    WeatherModel.data,
+                    WeatherModel.created_at,
+                )
+                .select_from(
+                    join(WeatherModel, CityModel, WeatherModel.city_id == CityModel.id),
+                )
+                .where(WeatherModel.id.in_(latest_ids)),
+            )
+            return {
+                row.city_id: {
+                    "id": row.id,
+                    "city_id": row.city_id,
+                    "city_name": row.city_name,
+                    "data": row.data,
+                    "created_at": row.created_at,
+                }
+                for row in result
+            }
+        except Exception as exception:
+            logger.error(f"Failed to get latest weather by city IDs: {exception}")
+            raise exception
+
+    async def get_current_weathers(self, limit: int) -> List[Dict[str, Any]]:
+        """
+        Get the weather of the current hour of the cities refreshed last.
+
+        :param limit: Most cities to get.
+        :return: Latest weather data of the current hour with its ID, of every
+            city, the most recently stored first.
+
+        :raises Exception: If there is an error during weather retrieval.
+        """
+        hour_start, current_time = self.current_hour_window()
+        # Looked up city by city, on the index of weather by city and time
+        latest_ids = (
+            select(func.max(WeatherModel.id))
+            .where(
+                and_(
+                    WeatherModel.city_id.in_(select(CityModel.id)),
+                    WeatherModel.created_at >= hour_start,
+                    WeatherModel.created_at < current_time,
+                ),
+            )
+            .group_by(WeatherModel.city_id)
+        )
+        try:
+            result = await self.session.execute(
+                select(
+                    WeatherModel.id,
+                    WeatherModel.city_id,
+                    CityModel.name.label("city_name"),
+                    WeatherModel.data,
+                )
+                .select_from(
+                    join(WeatherModel, CityModel, WeatherModel.city_id == CityModel.id),
+                )
+                .where(WeatherModel.id.in_(latest_ids))
+                .order_by(WeatherModel.id.desc())
+                .limit(limit),
+            )
+            return [
+                {
+                    "id": row.id,
+                    "city_id": row.city_id,
+                    "city_name": row.city_name,
+                    "data": row.data,
+                }
+                for row in result
+            ]
+        except Exception as exception:
+            logger.error(f"Failed to get current weather of cities: {exception}")
+            raise exception
+
+    async def get_current_weather_id(
+        self,
+        city_id: int,
+        since: Optional[datetime] = None,
+    ) -> Optional[int]:
+        """
+        Get the ID of the current hour's weather row for a city.
+
+        The ID identifies the stored weather version without loading its data.
+
+        :param city_id: The ID of the city.
+        :param since: Only consider rows stored since then (naive UTC),
+            defaults to the start of the current hour window.
+        :return: Weather ID if found, None otherwise.
+
+        :raises Exception: If there is an error during weather retrieval.
+        """
+        hour_start, current_time = self.current_hour_window()
+        if since is not None:
+            hour_start = since
+        try:
+            result = await self.session.execute(
+                select(WeatherModel.id)
+                .where(
+                    and_(
+                        WeatherModel.city_id == city_id,
+                        WeatherModel.created_at >= hour_start,
+                        WeatherModel.created_at < current_time,
+                    ),
+                )
+                .order_by(WeatherModel.id.desc())
+                .limit(1),
+            )
+            return result.scalar()
+        except Exception as exception:
+            logger.error(f"Failed to get weather ID by city ID: {exception}")
+            raise exception
+
+    async def get_last_stored_at(
+        self,
+        city_ids: Sequence[int],
+        since: datetime,
+    ) -> Dict[int, datetime]:
+        """
+        Get when the weather of several cities was last stored, in one query.
+
+        :param city_ids: The IDs of the cities.
+        :param since: Only consider rows stored since then (naive UTC).
+        :return: Time of the latest row by city ID, cities without rows
+            since ``since`` are missing.
+
+        :raises Exception: If there is an error during weather retrieval.
+        """
+        try:
+            result = await self.session.execute(
+                select(WeatherModel.city_id, func.max(WeatherModel.created_at))
+                .where(
+                    and_(
+                        WeatherModel.city_id.in_(city_ids),
+                        WeatherModel.created_at >= since,
+                    ),
+                )
+                .group_by(WeatherModel.city_id),
+            )
+            return dict(result.tuples().all())
+        except Exception as exception:
+            logger.error(f"Failed to get last weather times by city IDs: {exception}")
+            raise exception
+
     async def add_weather(self, weather: WeatherModel) -> None:
         """
         Insert weather data.
@@ -77,8 +324,238 @@ class WeatherDAO:
             await self.session.flush()
             await self.session.refresh(weather)
             await self.session.commit()
-            logger.info(f"Inserted weather: {weather}")
+            logger.info("Inserted weather of city ID {0}.", weather.city_id)
         except Exception as exception:
             await self.session.rollback()
             logger.error(f"Failed to insert weather: {exception}")
             raise exception
+
+    async def add_weathers(self, weathers: Sequence[WeatherModel]) -> None:
+        """
+        Insert weather data of many cities in one transaction.
+
+        :param weathers: The weather models.
+
+        :raises Exception: If there is an error during weather insertion.
+        """
+        try:
+            self.session.add_all(weathers)
+            await self.session.commit()
+            logger.info("Inserted weather of {0} cities.", len(weathers))
+        except Exception as exception:
+            await self.session.rollback()
+            logger.error(f"Failed to insert weathers: {exception}")
+            raise exception
+
+    async def get_weather_history(
+        self,
+        city_id: int,
+        start: datetime,
+        end: datetime,
+        bucket: str,
+    ) -> List[Dict[str, Any]]:
+        """
+        Get weather history for a city aggregated into time buckets.
+
+        PostgreSQL aggregates the rows with ``date_trunc`` so only one row per
+        bucket leaves the database. Other dialects (SQLite in tests) fetch the
+        extracted numeric columns and aggregate them with a Polars group-by.
+
+        :param city_id: The ID of the city.
+        :param start: Start of the range (inclusive).
+        :param end: End of the range (exclusive).
+        :param bucket: The bucket size, ``hour`` or ``day``.
+        :return: List of aggregated buckets ordered by bucket start.
+
+        :raises Exception: If there is an error during weather retrieval.
+        """
+        try:
+            if self.session.bind.dialect.name == "postgresql":
+                return await self._aggregate_history_in_db(city_id, start, end, bucket)
+            return await self._aggregate_history_in_polars(
+                city_id,
+                start,
+                end,
+                bucket,
+            )
+        except Exception as exception:
+            logger.error(f"Failed to get weather history: {exception}")
+            raise exception
+
+    async def stream_weather(
+        self,
+        *,
+        city_ids: Optional[Sequence[int]],
+        start: Optional[datetime],
+        end: Optional[datetime],
+        chunk_size: int,
+    ) -> AsyncIterator[WeatherRows]:
+        """
+        Stream raw weather rows in chunks through a server side cursor.
+
+        Only ``chunk_size`` rows are held in memory at a time, no matter how
+        many rows match.
+
+        :param city_ids: Only export these cities, all cities if None.
+        :param start: Start of the range (inclusive), unbounded if None.
+        :param end: End of the range (exclusive), unbounded if None.
+        :param chunk_size: Number of rows fetched per round trip.
+        :yield: Chunks of rows with id, city_id, created_at and data.
+        """
+        filters: List[ColumnElement[bool]] = []
+        if city_ids:
+            filters.append(WeatherModel.city_id.in_(city_ids))
+        if start is not None:
+            filters.append(WeatherModel.created_at >= start)
+        if end is not None:
+            filters.append(WeatherModel.created_at < end)
+        stmt = (
+            select(
+                WeatherModel.id,
+                WeatherModel.city_id,
+                WeatherModel.created_at,
+                WeatherModel.data,
+            )
+            .where(and_(true(), *filters))
+            .order_by(WeatherModel.id)
+            .execution_options(yield_per=chunk_size)
+        )
+        result = await self.session.stream(stmt)
+        async for partition in result.partitions():
+            yield partition
+
+    @staticmethod
+    def current_hour_window() -> Tuple[datetime, datetime]:
+        """
+        Get the start of the current hour window and the current time.
+
+        We only want the latest weather data, stored within the current hour.
+        The scheduled refresh stores it in the last minutes before the hour,
+        so the window opens that much earlier.
+
+        :return: Start of the current hour window and the current time (UTC).
+        """
+        current_time = datetime.utcnow()
+        hour_start = current_time.replace(minute=0, second=0, microsecond=0)
+        refresh_lead = timedelta(minutes=settings.weather_refresh.window_minutes)
+        return hour_start - refresh_lead, current_time
+
+    async def _aggregate_history_in_db(
+        self,
+        city_id: int,
+        start: datetime,
+        end: datetime,
+        bucket: str,
+    ) -> List[Dict[str, Any]]:
+        """
+        Aggregate weather history with ``date_trunc``.
+
+        :param city_id: The ID of the city.
+        :param start: Start of the range (inclusive).
+        :param end: End of the range (exclusive).
+        :param bucket: The bucket size, ``hour`` or ``day``.
+        :return: List of aggregated buckets.
+        """
+        # The unit is rendered inline so the SELECT and GROUP BY expressions
+        # are identical for the server and not two different bind parameters.
+        bucket_start = func.date_trunc(
+            literal(bucket, literal_execute=True),
+            WeatherModel.created_at,
+        )
+        stmt = (
+            select(
+                bucket_start.label("bucket_start"),
+                func.count(WeatherModel.id).label("samples"),
+                func.avg(WeatherModel.data["temp"].as_float()).label("temp_avg"),
+                func.min(WeatherModel.data["temp_min"].as_float()).label("temp_min"),
+                func.max(WeatherModel.data["temp_max"].as_float()).label("temp_max"),
+                func.avg(WeatherModel.data["humidity"].as_float()).label(
+                    "humidity_avg",
+                ),
+                func.avg(WeatherModel.data["pressure"].as_float()).label(
+                    "pressure_avg",
+                ),
+            )
+            .where(self._history_filter(city_id, start, end))
+            .group_by(bucket_start)
+            .order_by(bucket_start)
+        )
+        result = await self.session.execute(stmt)
+        return [dict(row) for row in result.mappings().all()]
+
+    async def _aggregate_history_in_polars(
+        self,
+        city_id: int,
+        start: datetime,
+        end: datetime,
+        bucket: str,
+    ) -> List[Dict[str, Any]]:
+        """
+        Aggregate weather history with a vectorized Polars group-by.
+
+        :param city_id: The ID of the city.
+        :param start: Start of the range (inclusive).
+        :param end: End of the range (exclusive).
+        :param bucket: The bucket size, ``hour`` or ``day``.
+        :return: List of aggregated buckets.
+        """
+        stmt = select(
+            WeatherModel.id,
+            WeatherModel.created_at,
+            WeatherModel.data["temp"].as_float().label("temp"),
+            WeatherModel.data["temp_min"].as_float().label("temp_min"),
+            WeatherModel.data["temp_max"].as_float().label("temp_max"),
+            WeatherModel.data["humidity"].as_float().label("humidity"),
+            WeatherModel.data["pressure"].as_float().label("pressure"),
+        ).where(self._history_filter(city_id, start, end))
+        result = await self.session.execute(stmt)
+        rows = result.all()
+        if not rows:
+            return []
+
+        df = pl.DataFrame(
+            rows,
+            schema=[
+                ("id", pl.Int64),
+                ("created_at", pl.Datetime),
+                ("temp", pl.Float64),
+                ("temp_min", pl.Float64),
+                ("temp_max", pl.Float64),
+                ("humidity", pl.Float64),
+                ("pressure", pl.Float64),
+            ],
+            orient="row",
+        )
+        aggregated = (
+            df.group_by(
+                pl.col("created_at")
+                .dt.truncate(POLARS_TRUNCATE_EVERY[bucket])
+                .alias("bucket_start"),
+            )
+            .agg(
+                pl.col("id").count().alias("samples"),
+                pl.col("temp").mean().alias("temp_avg"),
+                pl.col("temp_min").min(),
+                pl.col("temp_max").max(),
+                pl.col("humidity").mean().alias("humidity_avg"),
+                pl.col("pressure").mean().alias("pressure_avg"),
+            )
+            .sort("bucket_start")
+        )
+        return aggregated.to_dicts()
+
+    @staticmethod
+    def _history_filter(city_id: int, start: datetime, end: datetime) -> Any:
+        """
+        Build the WHERE clause shared by the history queries.
+
+        :param city_id: The ID of the city.
+        :param start: Start of the range (inclusive).
+        :param end: End of the range (exclusive).
+        :return: SQLAlchemy boolean clause.
+        """
+        return and_(
+            WeatherModel.city_id == city_id,
+            WeatherModel.created_at >= start,
+            WeatherModel.created_at < end,
+        )
@@ -1,6 +1,6 @@
 from typing import AsyncGenerator
 
-from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 from starlette.requests import Request
 
 
@@ -18,3 +18,16 @@ async def get_db_session(request: Request) -> AsyncGenerator[AsyncSession, None]
     finally:
         await session.commit()
         await session.close()
+
+
+def get_db_session_factory(request: Request) -> async_sessionmaker[AsyncSession]:
+    """
+    Get the database session factory.
+
+    Used by responses that outlive the request scoped session,
+    such as streamed exports.
+
+    :param request: current request.
+    :return: database session factory.
+    """
+    return request.app.state.db_session_factory
@@ -0,0 +1,128 @@
+"""
+SQL statement metrics.
+
+Engine events time every statement. Statements run while handling a request
+are also added to the ``RequestDBStats`` of the request, which the metrics
+middleware reports per route. Other tools, like the query inspector, observe
+the timed statements through ``observe_statements`` instead of listening to
+the engine themselves.
+"""
+import time
+from contextvars import ContextVar
+from typing import Any, Callable, List, Optional
+from weakref import WeakKeyDictionary
+
+from mdpi_api.metrics import Counter, Histogram
+from sqlalchemy import event
+from sqlalchemy.engine import Connection, Engine, ExceptionContext
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+STATEMENT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+STARTED_KEY = "statement_started"
+
+db_statements = Counter(
+    "db_statements_total",
+    "SQL statements executed.",
+)
+db_statement_seconds = Histogram(
+    "db_statement_seconds",
+    "Duration of SQL statements.",
+    buckets=STATEMENT_BUCKETS,
+)
+
+
+class RequestDBStats:
+    """SQL statements executed while handling a request."""
+
+    def __init__(self) -> None:
+        self.statements = 0
+        self.seconds: float = 0
+
+
+request_db_stats: ContextVar[Optional[RequestDBStats]] = ContextVar(
+    "request_db_stats",
+    default=None,
+)
+
+# Called with the connection, SQL, parameters and duration of every statement
+StatementObserver = Callable[[Connection, str, Any, float], None]
+statement_observers: "WeakKeyDictionary[Engine, List[StatementObserver]]" = (
+    WeakKeyDictionary()
+)
+
+
+def instrument_engine(engine: AsyncEngine) -> None:
+    """
+    Time the statements of an engine.
+
+    :param engine: The engine.
+    """
+    sync_engine = engine.sync_engine
+    if sync_engine in statement_observers:
+        return
+    statement_observers[sync_engine] = []
+    event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(sync_engine, "handle_error", _handle_error)
+
+
+def observe_statements(engine: AsyncEngine, observer: StatementObserver) -> None:
+    """
+    Call an observer after every statement of an engine.
+
+    The engine is instrumented if it is not yet.
+
+    :param engine: The engine.
+    :param observer: Called with the connection, SQL, parameters and duration.
+    """
+    instrument_engine(engine)
+    statement_observers[engine.sync_engine].append(observer)
+
+
+def _before_cursor_execute(connection: Connection, *args: Any) -> None:
+    """
+    Note when a statement starts.
+
+    :param connection: The connection executing the statement.
+    :param args: The cursor, statement, parameters, context and executemany.
+    """
+    connection.info.setdefault(STARTED_KEY, []).append(time.perf_counter())
+
+
+def _after_cursor_execute(
+    connection: Connection,
+    cursor: Any,
+    statement: str,
+    parameters: Any,
+    *args: Any,
+) -> None:
+    """
+    Record a finished statement and pass it to the observers.
+
+    :param connection: The connection executing the statement.
+    :param cursor: The DBAPI cursor.
+    :param statement: The SQL.
+    :param parameters: The bound parameters.
+    :param args: The context and executemany.
+    """
+    elapsed = time.perf_counter() - connection.info[STARTED_KEY].pop()
+    db_statements.inc()
+    db_statement_seconds.observe(elapsed)
+    stats = request_db_stats.get()
+    if stats is not None:
+        stats.statements += 1
+        stats.seconds += elapsed
+    for observer in statement_observers.get(connection.engine, ()):
+        observer(connection, statement, parameters, elapsed)
+
+
+def _handle_error(context: ExceptionContext) -> None:
+    """
+    Forget the start of a failed statement.
+
+    :param context: The exception context.
+    """
+    connection = context.connection
+    started = None if connection is None else connection.info.get(STARTED_KEY)
+    if started:
+        started.pop()
@@ -0,0 +1,73 @@
+"""Drop redundant indexes, index weather by city and time
+
+Revision ID: 22fc87f97b6f
+Revises: 251d94c9a894
+Create Date: 2026-10-19 14:10:37.204519
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "22fc87f97b6f"
+down_revision = "251d94c9a894"
+branch_labels = None
+depends_on = None
+
+# Secondary indexes duplicating a primary key or the leading column of
+# unique_user_city, by table
+REDUNDANT_INDEXES = (
+    ("cities", "ix_cities_id", "id"),
+    ("users", "ix_users_id", "id"),
+    ("favorite_cities", "ix_favorite_cities_id", "id"),
+    ("favorite_cities", "ix_favorite_cities_user_id", "user_id"),
+)
+
+
+def upgrade() -> None:
+    for table, index, _ in REDUNDANT_INDEXES:
+        op.drop_index(index, table_name=table)
+    # Built without locking writes, the weather table is the large one
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_weather_city_id_created_at",
+            "weather",
+            ["city_id", "created_at"],
+            unique=False,
+            postgresql_include=["id"],
+            postgresql_concurrently=True,
+        )
+        op.drop_index(
+            "ix_weather_city_id",
+            table_name="weather",
+            postgresql_concurrently=True,
+        )
+        op.drop_index(
+            "ix_weather_id",
+            table_name="weather",
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_weather_id",
+            "weather",
+            ["id"],
+            unique=False,
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            "ix_weather_city_id",
+            "weather",
+            ["city_id"],
+            unique=False,
+            postgresql_concurrently=True,
+        )
+        op.drop_index(
+            "ix_weather_city_id_created_at",
+            table_name="weather",
+            postgresql_concurrently=True,
+        )
+    for table, index, column in REDUNDANT_INDEXES:
+        op.create_index(index, table, [column], unique=False)
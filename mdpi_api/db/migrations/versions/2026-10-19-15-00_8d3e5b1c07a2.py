@@ -0,0 +1,54 @@
+"""Flatten weather data stored as a DTO dump
+
+Revision ID: 8d3e5b1c07a2
+Revises: 22fc87f97b6f
+Create Date: 2026-10-19 15:00:12.648203
+
+"""
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "8d3e5b1c07a2"
+down_revision = "22fc87f97b6f"
+branch_labels = None
+depends_on = None
+
+# Rows updated per transaction, so the weather table is never locked long
+BATCH_SIZE = 50000
+MAX_ID = 2**63 - 1
+# Weather was stored as {"city_id", "city_name", "data": {...}} until the
+# weather data of the API was stored as is
+FLATTEN = sa.text(
+    "UPDATE weather SET data = data -> 'data' "
+    "WHERE id > :low AND id <= :high "
+    "AND json_typeof(data -> 'data') = 'object' "
+    "AND data ->> 'city_name' IS NOT NULL",
+)
+NEST = sa.text(
+    "UPDATE weather SET data = json_build_object("
+    "'city_id', city_id, 'city_name', data -> 'name', 'data', data) "
+    "WHERE id > :low AND id <= :high "
+    "AND data ->> 'city_name' IS NULL",
+)
+
+
+def upgrade() -> None:
+    _update_in_batches(FLATTEN)
+
+
+def downgrade() -> None:
+    _update_in_batches(NEST)
+
+
+def _update_in_batches(statement: sa.TextClause) -> None:
+    context = op.get_context()
+    if context.as_sql:
+        # Rows cannot be counted offline, the script updates them at once
+        op.execute(statement.bindparams(low=0, high=MAX_ID))
+        return
+    connection = op.get_bind()
+    with context.autocommit_block():
+        last_id = connection.execute(sa.text("SELECT max(id) FROM weather")).scalar()
+        for low in range(0, last_id or 0, BATCH_SIZE):
+            connection.execute(statement, {"low": low, "high": low + BATCH_SIZE})
@@ -14,7 +14,6 @@ class CityModel(Base):
         autoincrement=True,
         primary_key=True,
         nullable=False,
-        index=True,
     )
     name: Mapped[str] = mapped_column(String(), nullable=False, index=True)
 
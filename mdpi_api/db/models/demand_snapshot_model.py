@@ -0,0 +1,33 @@
+from datetime import datetime
+from typing import Dict, List
+
+from mdpi_api.db.base import Base
+from sqlalchemy import DateTime, LargeBinary, String
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy.sql.sqltypes import JSON
+
+
+class DemandSnapshotModel(Base):
+    """Model for demand_snapshots table object."""
+
+    __tablename__ = "demand_snapshots"
+
+    # Host and process of the worker, every worker keeps one snapshot
+    worker_id: Mapped[str] = mapped_column(String(), primary_key=True)
+    # Cells of the worker's count-min sketch
+    sketch: Mapped[bytes] = mapped_column(LargeBinary(), nullable=False)
+    city_ids: Mapped[List[int]] = mapped_column(JSON(), nullable=False)
+    # Stream subscriptions per city ID
+    subscriptions: Mapped[Dict[str, int]] = mapped_column(JSON(), nullable=False)
+    published_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        nullable=False,
+    )
+
+    def __str__(self) -> str:
+        """
+        Return string representation of the demand snapshot model.
+
+        :return: String representation of the demand snapshot model.
+        """
+        return f"<DemandSnapshotModel {self.worker_id} {self.published_at}>"
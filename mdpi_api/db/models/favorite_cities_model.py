@@ -15,13 +15,11 @@ class FavoriteCityModel(Base):
         autoincrement=True,
         primary_key=True,
         nullable=False,
-        index=True,
     )
     user_id: Mapped[uuid.UUID] = mapped_column(
         UUID(),
         ForeignKey("users.id", ondelete="CASCADE"),
         nullable=False,
-        index=True,
     )
     city_id: Mapped[int] = mapped_column(
         BigInteger(),
@@ -35,6 +33,7 @@ class FavoriteCityModel(Base):
         default=False,
     )
 
+    # Also the index of the favorite cities of a user
     __table_args__ = (UniqueConstraint("user_id", "city_id", name="unique_user_city"),)
 
     # Relationships
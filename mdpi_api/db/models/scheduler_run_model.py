@@ -0,0 +1,38 @@
+from datetime import datetime
+from typing import Optional
+
+from mdpi_api.db.base import Base
+from sqlalchemy import DateTime, Integer, String, UniqueConstraint
+from sqlalchemy.orm import Mapped, mapped_column
+
+
+class SchedulerRunModel(Base):
+    """Model for scheduler_runs table object."""
+
+    __tablename__ = "scheduler_runs"
+
+    id: Mapped[int] = mapped_column(
+        Integer(),
+        autoincrement=True,
+        primary_key=True,
+        nullable=False,
+    )
+    job_id: Mapped[str] = mapped_column(String(), nullable=False)
+    # Start of the period the run is for, e.g. the hour of an hourly job
+    slot: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+    owner: Mapped[str] = mapped_column(String(), nullable=False)
+    status: Mapped[str] = mapped_column(String(), nullable=False)
+    finished_at: Mapped[Optional[datetime]] = mapped_column(
+        DateTime(timezone=True),
+        nullable=True,
+    )
+
+    __table_args__ = (UniqueConstraint("job_id", "slot", name="unique_job_slot"),)
+
+    def __str__(self) -> str:
+        """
+        Return string representation of the scheduler run model.
+
+        :return: String representation of the scheduler run model.
+        """
+        return f"<SchedulerRunModel {self.job_id} {self.slot}>"
@@ -1,7 +1,6 @@
 import uuid as uuid_lib
 
 from mdpi_api.db.base import Base
-from passlib.hash import bcrypt
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from sqlalchemy.sql.sqltypes import UUID, String
 
@@ -16,7 +15,6 @@ class UserModel(Base):
         insert_default=uuid_lib.uuid4,
         primary_key=True,
         nullable=False,
-        index=True,
     )
     email: Mapped[str] = mapped_column(
         String(),
@@ -36,6 +34,9 @@ class UserModel(Base):
         :param password: Password to verify.
         :return: True if the password is verified, False otherwise.
         """
+        # Imported on first login, passlib loads all of its hash handlers
+        from passlib.hash import bcrypt  # noqa: WPS433
+
         return bcrypt.verify(password, self.password)
 
     def __str__(self) -> str:
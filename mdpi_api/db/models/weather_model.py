@@ -1,5 +1,5 @@
 from mdpi_api.db.base import Base
-from sqlalchemy import BigInteger, ForeignKey
+from sqlalchemy import BigInteger, ForeignKey, Index, Integer
 from sqlalchemy.ext.mutable import MutableDict
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from sqlalchemy.sql.sqltypes import JSON
@@ -11,23 +11,33 @@ class WeatherModel(Base):
     __tablename__ = "weather"
 
     id: Mapped[int] = mapped_column(
-        BigInteger(),
+        # SQLite only autoincrements INTEGER primary keys
+        BigInteger().with_variant(Integer(), "sqlite"),
         autoincrement=True,
         primary_key=True,
         nullable=False,
-        index=True,
     )
     city_id: Mapped[int] = mapped_column(
         BigInteger(),
         ForeignKey("cities.id"),
         nullable=False,
-        index=True,
     )
     data: Mapped[MutableDict[str, str]] = mapped_column(
         MutableDict.as_mutable(JSON()),
         nullable=False,
     )
 
+    __table_args__ = (
+        # Weather of a city over a time range; the ID is included so the
+        # latest reading of every city is found from the index alone
+        Index(
+            "ix_weather_city_id_created_at",
+            "city_id",
+            "created_at",
+            postgresql_include=["id"],
+        ),
+    )
+
     # Relationships
     city = relationship("CityModel", back_populates="weather")
 
@@ -0,0 +1,236 @@
+"""
+N+1 and slow query detection, for debugging and CI.
+
+When enabled, every statement timed by ``instrumentation`` is recorded into
+the query scopes active in the current context: one per request
+(``QueryInspectionMiddleware``), per leader job and per seeding run, or opened
+by tests through the ``query_budget`` fixture. Statements are grouped by their
+normalized SQL, literals and parameter lists replaced by ``?``, so the same
+query with other values counts as a repeat. When a scope ends, statements
+repeated at least ``repeat_threshold`` times are logged as likely N+1 queries.
+Statements slower than ``slow_query_ms`` are logged right away, with their
+``EXPLAIN`` plan.
+"""
+import re
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from loguru import logger
+from mdpi_api.db.instrumentation import observe_statements
+from mdpi_api.settings import settings
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+inspection_settings = settings.query_inspection
+
+PLACEHOLDER = "?"
+# Bound parameters in the pyformat, asyncpg and qmark styles
+PARAMETERS = re.compile(r"%\(\w+\)s|%s|\$\d+|\?")  # noqa: WPS323
+# String and number literals, then lists of placeholders as in IN (...)
+LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+PARAMETER_LISTS = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+WHITESPACE = re.compile(r"\s+")
+EXPLAIN_PREFIXES = {"sqlite": "EXPLAIN QUERY PLAN "}
+EXPLAIN_SAVEPOINT = "query_inspector_explain"
+
+
+class StatementStats(NamedTuple):
+    """Executions of one normalized statement."""
+
+    executions: int
+    seconds: float
+
+
+class QueryScope:
+    """Statements executed within a request, job or test."""
+
+    def __init__(self, name: str, parent: Optional["QueryScope"] = None) -> None:
+        self.name = name
+        self.parent = parent
+        self.statements: Dict[str, StatementStats] = {}
+
+    @property
+    def total(self) -> int:
+        """
+        Number of statements executed.
+
+        :return: The statement count.
+        """
+        return sum(stats.executions for stats in self.statements.values())
+
+    def record(self, statement: str, seconds: float) -> None:
+        """
+        Record a statement here and in the enclosing scopes.
+
+        :param statement: The normalized SQL.
+        :param seconds: Duration of the statement.
+        """
+        scope: Optional[QueryScope] = self
+        while scope is not None:
+            executions, total_seconds = scope.statements.get(statement, (0, 0))
+            scope.statements[statement] = StatementStats(
+                executions + 1,
+                total_seconds + seconds,
+            )
+            scope = scope.parent
+
+    def repeated(self, threshold: int) -> List[Tuple[str, StatementStats]]:
+        """
+        Get the statements executed at least ``threshold`` times.
+
+        :param threshold: Smallest count reported.
+        :return: Normalized SQL and stats, most executed first.
+        """
+        repeated = [
+            (statement, stats)
+            for statement, stats in self.statements.items()
+            if stats.executions >= threshold
+        ]
+        return sorted(repeated, key=lambda item: item[1].executions, reverse=True)
+
+    def summary(self) -> str:
+        """
+        Describe the statements, e.g. for a failed budget.
+
+        :return: One line per normalized statement, most executed first.
+        """
+        lines = [f"{self.total} statements in {self.name}:"]
+        for statement, stats in self.repeated(threshold=1):
+            lines.append(f"  {stats.executions} x {statement}")
+        return "\n".join(lines)
+
+
+current_scope: ContextVar[Optional[QueryScope]] = ContextVar(
+    "query_scope",
+    default=None,
+)
+
+
+@contextmanager
+def query_scope(name: str) -> Iterator[QueryScope]:
+    """
+    Collect the statements executed in a block, and report repeated ones.
+
+    :param name: What runs in the block, e.g. a route or job.
+    :yield: The scope, which may be renamed before it ends.
+    """
+    scope = QueryScope(name, parent=current_scope.get())
+    token = current_scope.set(scope)
+    try:  # noqa: WPS501
+        yield scope
+    finally:
+        current_scope.reset(token)
+        report_repeated(scope, inspection_settings.repeat_threshold)
+
+
+def report_repeated(scope: QueryScope, threshold: int) -> None:
+    """
+    Log statements repeated within a scope, likely N+1 queries.
+
+    :param scope: The scope.
+    :param threshold: Smallest count reported.
+    """
+    for statement, stats in scope.repeated(threshold):
+        executions = stats.executions
+        logger.warning(
+            f"Possible N+1 in {scope.name}: {executions} x {statement} "
+            f"({stats.seconds:.3f}s)",
+        )
+
+
+def normalize_sql(statement: str) -> str:
+    """
+    Normalize a statement so executions with other values are alike.
+
+    :param statement: The SQL.
+    :return: The SQL with single spaces and ``?`` for every value.
+    """
+    normalized = PARAMETERS.sub(PLACEHOLDER, statement)
+    normalized = LITERALS.sub(PLACEHOLDER, normalized)
+    normalized = WHITESPACE.sub(" ", normalized).strip()
+    return PARAMETER_LISTS.sub("(...)", normalized)
+
+
+def inspect_engine(engine: AsyncEngine) -> None:
+    """
+    Record the statements of an engine into the active query scopes.
+
+    :param engine: The engine.
+    """
+    observe_statements(engine, _record_statement)
+
+
+def _record_statement(
+    connection: Connection,
+    statement: str,
+    parameters: Any,
+    elapsed: float,
+) -> None:
+    """
+    Record a finished statement, and explain it if it was slow.
+
+    :param connection: The connection executing the statement.
+    :param statement: The SQL.
+    :param parameters: The bound parameters.
+    :param elapsed: Duration of the statement.
+    """
+    scope = current_scope.get()
+    if scope is not None:
+        scope.record(normalize_sql(statement), elapsed)
+    if elapsed * 1000 >= inspection_settings.slow_query_ms:
+        scope_name = "no scope" if scope is None else scope.name
+        plan = _explain(connection, statement, parameters)
+        message = f"Slow query in {scope_name} ({elapsed:.3f}s): {statement}"
+        logger.warning(f"{message}\n{plan}")
+
+
+def _explain(connection: Connection, statement: str, parameters: Any) -> str:
+    """
+    Get the plan of a query.
+
+    :param connection: The connection the query ran on.
+    :param statement: The SQL.
+    :param parameters: The bound parameters.
+    :return: The plan, or why there is none.
+    """
+    if not inspection_settings.explain:
+        return "EXPLAIN disabled."
+    if not statement.lstrip().upper().startswith("SELECT"):
+        return "Only SELECT statements are explained."
+    prefix = EXPLAIN_PREFIXES.get(connection.dialect.name, "EXPLAIN ")
+    cursor = connection.connection.cursor()
+    try:
+        plan_rows = _explain_in_savepoint(cursor, f"{prefix}{statement}", parameters)
+    except Exception as ex:
+        return f"EXPLAIN failed: {ex!r}"
+    finally:
+        cursor.close()
+    return "\n".join(" ".join(map(str, plan_row)) for plan_row in plan_rows)
+
+
+def _explain_in_savepoint(cursor: Any, explain: str, parameters: Any) -> List[Any]:
+    """
+    Run an EXPLAIN within a savepoint of the current transaction.
+
+    The EXPLAIN runs on the connection of the statement, and a failed
+    statement aborts the whole transaction on PostgreSQL. Rolling back to
+    the savepoint keeps the transaction usable for the rest of the request.
+
+    :param cursor: A DBAPI cursor of the connection.
+    :param explain: The EXPLAIN statement.
+    :param parameters: The bound parameters.
+    :return: The plan rows.
+
+    :raises Exception: If the EXPLAIN fails.
+    """
+    cursor.execute(f"SAVEPOINT {EXPLAIN_SAVEPOINT}")
+    try:
+        cursor.execute(explain, parameters)
+        plan_rows = cursor.fetchall()
+    except Exception:
+        cursor.execute(f"ROLLBACK TO SAVEPOINT {EXPLAIN_SAVEPOINT}")
+        raise
+    finally:
+        cursor.execute(f"RELEASE SAVEPOINT {EXPLAIN_SAVEPOINT}")
+    return plan_rows
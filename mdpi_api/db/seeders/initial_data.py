@@ -1,18 +1,16 @@
 import uuid
-from typing import Any, Dict, Type
+from typing import Any, Dict, List, Type
 
 from loguru import logger
 from mdpi_api.db.base import Base
 from mdpi_api.db.models.city_model import CityModel
 from mdpi_api.db.models.user_model import UserModel
+from mdpi_api.db.query_inspector import query_scope
 from mdpi_api.db.seeders.data import cities, users
-from mdpi_api.settings import Settings
-from sqlalchemy import and_, select
+from sqlalchemy import select
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 
-settings = Settings()
-
 
 async def seed_data(session: AsyncSession) -> None:
     """
@@ -20,8 +18,9 @@ async def seed_data(session: AsyncSession) -> None:
 
     :param session: The database session.
     """
-    await seed_users(session)
-    await seed_cities(session)
+    with query_scope("seed_data"):
+        await seed_users(session)
+        await seed_cities(session)
 
     try:
         await session.commit()
@@ -37,13 +36,11 @@ async def seed_users(session: AsyncSession) -> None:
 
     :param session: The database session.
     """
-    for user in users:
-        user_data = {
-            "id": uuid.uuid4(),
-            "email": user["email"],
-            "password": user["password"],
-        }
-        await insert_if_not_exists(session, UserModel, user_data, "email")
+    users_data = [
+        {"id": uuid.uuid4(), "email": user["email"], "password": user["password"]}
+        for user in users
+    ]
+    await insert_missing(session, UserModel, users_data, "email")
 
 
 async def seed_cities(session: AsyncSession) -> None:
@@ -52,38 +49,38 @@ async def seed_cities(session: AsyncSession) -> None:
 
     :param session: The database session.
     """
-    for city in cities:
-        city_data = {
-            "id": city["id"],
-            "name": city["name"],
-        }
-        await insert_if_not_exists(session, CityModel, city_data, "name")
+    cities_data = [{"id": city["id"], "name": city["name"]} for city in cities]
+    await insert_missing(session, CityModel, cities_data, "name")
 
 
-async def insert_if_not_exists(
+async def insert_missing(
     session: AsyncSession,
     model: Type[Base],
-    data: Dict[str, Any],
+    rows: List[Dict[str, Any]],
     unique_field: str,
 ) -> None:
     """
-    Insert data into the specified model if it doesn't already exist.
+    Insert the rows of the specified model that don't already exist.
+
+    Existing rows are found with one query for all the rows.
 
     :param session: The database session.
     :param model: The SQLAlchemy model.
-    :param data: Data to insert.
+    :param rows: Data of every row to insert.
     :param unique_field: The field name to check for uniqueness.
     """
     try:
-        unique_value = data[unique_field]
-        filter_condition = getattr(model, unique_field) == unique_value
-        result = await session.execute(select(model).where(and_(filter_condition)))
-        existing_record = result.scalars().first()
-
-        if not existing_record:
-            new_record = model(**data)
-            session.add(new_record)
-            logger.info(f"Inserting {model.__name__}: {data[unique_field]}")
+        unique_column = getattr(model, unique_field)
+        result = await session.execute(
+            select(unique_column).where(
+                unique_column.in_([row[unique_field] for row in rows]),
+            ),
+        )
+        existing = set(result.scalars().all())
+        missing = [row for row in rows if row[unique_field] not in existing]
+        session.add_all([model(**row) for row in missing])
+        for row in missing:
+            logger.info("Inserting {0}: {1}", model.__name__, row[unique_field])
     except IntegrityError as ie:
         await session.rollback()
         logger.error(f"Integrity error during seeding {model.__name__}: {ie}")
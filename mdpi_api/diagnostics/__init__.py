@@ -0,0 +1 @@
+"""Runtime diagnostics of the workers."""
@@ -0,0 +1,219 @@
+"""
+Event loop lag and blocking call watchdog.
+
+Synchronous work on the event loop (password hashing, dataframes, file
+writes) stalls every request of the worker. A heartbeat task sleeps
+``interval_seconds`` in a loop and exports how late it wakes up as the
+``event_loop_lag_seconds`` histogram. A sampler thread watches the heartbeat:
+when the loop has not run it for ``block_threshold_ms``, the loop is blocked
+and the thread captures the stack of the loop thread, which shows the call
+blocking it. With ``slow_callbacks`` on, the asyncio debug mode reports every
+callback slower than the threshold too.
+
+Reports are logged at most once per ``report_interval_seconds``, the others
+are only counted, so the watchdog is safe to run in production.
+"""
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from contextlib import suppress
+from typing import Optional
+
+from loguru import logger
+from mdpi_api.metrics import Counter, Histogram
+from mdpi_api.settings import settings
+
+watchdog_settings = settings.loop_watchdog
+
+# Message asyncio logs in debug mode for callbacks slower than the threshold
+SLOW_CALLBACK_MESSAGE = "Executing %s took %.3f seconds"  # noqa: WPS323
+BLOCK_REPORT = (
+    "Event loop blocked for {0:.0f} ms in task {1} ({2} reports held back):\n{3}"
+)
+LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+
+loop_lag = Histogram(
+    "event_loop_lag_seconds",
+    "How late the event loop ran a task scheduled on time.",
+    buckets=LAG_BUCKETS,
+)
+loop_blocks = Counter(
+    "event_loop_blocked_total",
+    "Times the event loop was blocked beyond the threshold.",
+)
+slow_callbacks = Counter(
+    "event_loop_slow_callbacks_total",
+    "Callbacks slower than the threshold, in asyncio debug mode.",
+)
+suppressed_reports = Counter(
+    "event_loop_reports_suppressed_total",
+    "Blocked loop and slow callback reports not logged by the rate limit.",
+)
+
+
+class ReportLimiter:
+    """Lets one report through per interval, counting the ones held back."""
+
+    def __init__(self, interval: float) -> None:
+        self.interval = interval
+        self._last_report = -interval
+        self._held_back = 0
+        self._lock = threading.Lock()
+
+    def acquire(self) -> Optional[int]:
+        """
+        Ask to report.
+
+        :return: Reports held back since the last one, None if this one must
+            be held back too.
+        """
+        now = time.monotonic()
+        with self._lock:
+            if now - self._last_report < self.interval:
+                self._held_back += 1
+                suppressed_reports.inc()
+                return None
+            self._last_report = now
+            held_back = self._held_back
+            self._held_back = 0
+        return held_back
+
+
+class SlowCallbackFilter(logging.Filter):
+    """Counts the slow callbacks asyncio reports, and rate limits the reports."""
+
+    def __init__(self, limiter: ReportLimiter) -> None:
+        super().__init__()
+        self.limiter = limiter
+
+    def filter(self, record: logging.LogRecord) -> bool:  # noqa: WPS125
+        """
+        Report a slow callback through the rate limit.
+
+        :param record: A record of the asyncio logger.
+        :return: False for slow callbacks, reported here, True otherwise.
+        """
+        if record.msg != SLOW_CALLBACK_MESSAGE:
+            return True
+        slow_callbacks.inc()
+        held_back = self.limiter.acquire()
+        if held_back is not None:
+            callback, seconds = record.args  # type: ignore
+            logger.warning(
+                "Slow callback took {0:.3f} s ({1} reports held back): {2}",
+                seconds,
+                held_back,
+                callback,
+            )
+        return False
+
+
+class LoopWatchdog:
+    """
+    Measures the lag of the event loop and reports what blocks it.
+
+    Started on the running loop of the worker and stopped with it.
+    """
+
+    def __init__(
+        self,
+        interval: float = watchdog_settings.interval_seconds,
+        block_threshold: float = watchdog_settings.block_threshold_ms / 1000,
+        report_interval: float = watchdog_settings.report_interval_seconds,
+    ) -> None:
+        self.interval = interval
+        self.block_threshold = block_threshold
+        self.limiter = ReportLimiter(report_interval)
+        self._task: Optional["asyncio.Task[None]"] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id = 0
+        # Monotonic time and number of the last heartbeat
+        self._last_beat: float = 0
+        self._beats = 0
+        self._callback_filter = SlowCallbackFilter(self.limiter)
+
+    def start(self, debug_slow_callbacks: bool = False) -> None:
+        """
+        Start watching the running loop.
+
+        :param debug_slow_callbacks: Also report slow callbacks through the
+            asyncio debug mode, which slows the loop down.
+        """
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._stopping.clear()
+        self._task = asyncio.create_task(self._beat())
+        self._thread = threading.Thread(
+            target=self._watch,
+            name="loop-watchdog",
+            daemon=True,
+        )
+        self._thread.start()
+        if debug_slow_callbacks:
+            self._loop.slow_callback_duration = self.block_threshold
+            self._loop.set_debug(True)
+            logging.getLogger("asyncio").addFilter(self._callback_filter)
+
+    async def stop(self) -> None:
+        """Stop watching the loop."""
+        if self._task is None:
+            return
+        self._stopping.set()
+        self._task.cancel()
+        with suppress(asyncio.CancelledError):
+            await self._task
+        self._task = None
+        if self._thread is not None:
+            await asyncio.to_thread(self._thread.join)
+        logging.getLogger("asyncio").removeFilter(self._callback_filter)
+
+    async def _beat(self) -> None:
+        """Sleep on the loop and measure how late it wakes up."""
+        while True:  # noqa: WPS457
+            scheduled = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            loop_lag.observe(max(now - scheduled, 0))
+            self._last_beat = now
+            self._beats += 1
+
+    def _watch(self) -> None:
+        """Check the heartbeat from a thread and report a blocked loop once."""
+        reported_beat = -1
+        while not self._stopping.wait(self.interval):
+            stalled = time.monotonic() - self._last_beat - self.interval
+            if stalled < self.block_threshold or self._beats == reported_beat:
+                continue
+            reported_beat = self._beats
+            loop_blocks.inc()
+            held_back = self.limiter.acquire()
+            if held_back is not None:
+                self._report_block(stalled, held_back)
+
+    def _report_block(self, stalled: float, held_back: int) -> None:
+        """
+        Log the stack of the blocked loop thread.
+
+        :param stalled: Seconds the loop has been blocked so far.
+        :param held_back: Reports held back since the last one.
+        """
+        frame = sys._current_frames().get(self._loop_thread_id)  # noqa: WPS437
+        stack = "".join(traceback.format_stack(frame)) if frame else "unknown\n"
+        task = asyncio.current_task(self._loop) if self._loop else None
+        task_name = task.get_name() if task else "none"
+        logger.warning(
+            BLOCK_REPORT,
+            stalled * 1000,
+            task_name,
+            held_back,
+            stack,
+        )
+
+
+loop_watchdog = LoopWatchdog()
@@ -0,0 +1,319 @@
+"""
+On-demand sampling profiler of a live worker.
+
+A timer signal samples the stack of the event loop every ``interval_ms`` of
+CPU time for the requested number of seconds, so a worker can be profiled
+while it serves traffic, without restarting it under a profiler. Samples are
+rooted at the asyncio task that was running, so the time of every request
+shows under its own task. In ``wall`` mode the loop is sampled every interval of real
+time, idle included, and the tasks waiting on the loop are sampled too, down
+to what they await, which shows where requests wait on the database or the
+weather API rather than use the CPU.
+
+Samples are taken on the loop and so stall it. The cost of every sample is
+measured, and the sampler samples less often rather than use more than
+``max_overhead`` of the time. One profile runs at a time per worker.
+
+Profiles are returned in the collapsed stack format of ``flamegraph.pl`` and
+speedscope, weights in microseconds, or as a speedscope file.
+"""
+import asyncio
+import os
+import signal
+import threading
+import time
+from collections import defaultdict
+from types import FrameType
+from typing import Any, DefaultDict, Dict, List, NamedTuple, Optional, Tuple
+
+from mdpi_api.settings import settings
+
+profiler_settings = settings.profiler
+
+CPU = "cpu"
+WALL = "wall"
+SPEEDSCOPE_SCHEMA = "https://www.speedscope.app/file-format-schema.json"
+MICROSECONDS = 1e6
+# The timer is set again when the sampling interval changes by this factor
+RETIME_FACTOR = 1.5
+
+
+class Timer(NamedTuple):
+    """An interval timer and the signal it sends."""
+
+    which: int
+    signum: int
+
+
+TIMERS = {
+    CPU: Timer(signal.ITIMER_PROF, signal.SIGPROF),
+    WALL: Timer(signal.ITIMER_REAL, signal.SIGALRM),
+}
+
+
+class Frame(NamedTuple):
+    """A function in a sampled stack."""
+
+    name: str
+    file: str = ""
+
+
+# Frames of a sampled stack, outermost first
+Stack = Tuple[Frame, ...]
+
+
+def frame_of(frame: FrameType) -> Frame:
+    """
+    Describe a frame by its module and qualified function name.
+
+    :param frame: The frame.
+    :return: The function, e.g. ``mdpi_api.db.dao.user_dao:UserDAO.get_by_id``.
+    """
+    code = frame.f_code
+    function = getattr(code, "co_qualname", code.co_name)
+    module = frame.f_globals.get("__name__", "?")
+    return Frame(f"{module}:{function}", code.co_filename)
+
+
+def thread_stack(frame: Optional[FrameType]) -> List[Frame]:
+    """
+    Get the stack of a thread from its innermost frame.
+
+    :param frame: The innermost frame.
+    :return: The frames, outermost first.
+    """
+    frames = []
+    while frame is not None:
+        frames.append(frame_of(frame))
+        frame = frame.f_back
+    frames.reverse()
+    return frames
+
+
+def await_stack(task: "asyncio.Task[Any]") -> List[Frame]:
+    """
+    Get the stack of a suspended task, down to what it awaits.
+
+    :param task: The task.
+    :return: The frames of its coroutines, outermost first, and the awaitable.
+    """
+    frames = []
+    awaitable: Any = task.get_coro()
+    while awaitable is not None:
+        frame = getattr(awaitable, "cr_frame", None) or getattr(
+            awaitable,
+            "gi_frame",
+            None,
+        )
+        if frame is None:
+            break
+        frames.append(frame_of(frame))
+        awaitable = getattr(awaitable, "cr_await", None) or getattr(
+            awaitable,
+            "gi_yieldfrom",
+            None,
+        )
+    awaited = type(awaitable).__name__ if awaitable is not None else "nothing"
+    frames.append(Frame(f"await {awaited}"))
+    return frames
+
+
+def task_frame(task: "asyncio.Task[Any]") -> Frame:
+    """
+    Describe a task, as the root of its stacks.
+
+    :param task: The task.
+    :return: A frame naming the task.
+    """
+    return Frame(f"task {task.get_name()}")
+
+
+class Profile:
+    """Stacks sampled from a worker, with the time spent in each."""
+
+    def __init__(self, mode: str, interval: float) -> None:
+        self.mode = mode
+        self.interval = interval
+        self.weights: DefaultDict[Stack, float] = defaultdict(float)
+        self.samples = 0
+        self.seconds: float = 0
+        # Share of the time the sampler held the interpreter
+        self.overhead: float = 0
+
+    def add(self, stack: Stack, weight: float) -> None:
+        """
+        Count a sampled stack.
+
+        :param stack: The frames, outermost first.
+        :param weight: Seconds since the previous sample.
+        """
+        self.weights[stack] += weight
+
+    def collapsed(self) -> str:
+        """
+        Render the profile in the collapsed stack format.
+
+        :return: A line per stack, frames separated by semicolons, followed
+            by its weight in microseconds.
+        """
+        lines = []
+        for stack, weight in sorted(self.weights.items()):
+            frames = ";".join(frame.name for frame in stack)
+            microseconds = round(weight * MICROSECONDS)
+            lines.append(f"{frames} {microseconds}\n")
+        return "".join(lines)
+
+    def speedscope(self) -> Dict[str, Any]:
+        """
+        Render the profile as a speedscope file.
+
+        :return: The speedscope document.
+        """
+        frame_index: Dict[Frame, int] = {}
+        samples = []
+        for stack in self.weights:
+            samples.append(
+                [frame_index.setdefault(frame, len(frame_index)) for frame in stack],
+            )
+        weights = list(self.weights.values())
+        return {
+            "$schema": SPEEDSCOPE_SCHEMA,
+            "shared": {
+                "frames": [frame._asdict() for frame in frame_index],
+            },
+            "profiles": [
+                {
+                    "type": "sampled",
+                    "name": f"mdpi_api worker {os.getpid()} ({self.mode})",
+                    "unit": "seconds",
+                    "startValue": 0,
+                    "endValue": sum(weights),
+                    "samples": samples,
+                    "weights": weights,
+                },
+            ],
+            "name": f"mdpi_api worker {os.getpid()}",
+            "exporter": "mdpi_api",
+        }
+
+
+class SamplingProfiler:
+    """Samples the event loop of the worker on demand, one run at a time."""
+
+    def __init__(
+        self,
+        interval: float = profiler_settings.interval_ms / 1000,
+        max_overhead: float = profiler_settings.max_overhead,
+    ) -> None:
+        self.interval = interval
+        self.max_overhead = max_overhead
+        self._lock = threading.Lock()
+
+    @property
+    def is_running(self) -> bool:
+        """
+        Whether a profile is being taken.
+
+        :return: True while sampling.
+        """
+        return self._lock.locked()
+
+    async def profile(self, seconds: float, mode: str = CPU) -> Profile:
+        """
+        Sample the running event loop for a while.
+
+        :param seconds: How long to sample.
+        :param mode: ``cpu`` for the running task only, ``wall`` for the
+            waiting tasks too.
+        :return: The profile.
+
+        :raises RuntimeError: If a profile is already being taken, or the
+            loop does not run in the main thread.
+        """
+        if threading.current_thread() is not threading.main_thread():
+            raise RuntimeError("Only an event loop in the main thread is sampled.")
+        if not self._lock.acquire(blocking=False):
+            raise RuntimeError("A profile is already being taken.")
+        sampler = _Sampler(
+            Profile(mode, self.interval),
+            asyncio.get_running_loop(),
+            self.max_overhead,
+        )
+        sampler.start()
+        try:  # noqa: WPS501
+            await asyncio.sleep(seconds)
+        finally:
+            sampler.stop()
+            self._lock.release()
+        return sampler.profile
+
+
+class _Sampler:
+    """
+    Takes the samples of one profile from a timer signal.
+
+    The kernel sends the signal every interval of CPU time of the process
+    (``cpu``) or of real time (``wall``), and the handler runs in the loop
+    thread at the next bytecode. The frame it gets is what the loop was
+    running, where a thread reading the stack of the loop would only get the
+    interpreter at the points the loop releases it, e.g. when it polls.
+    """
+
+    def __init__(
+        self,
+        profile: Profile,
+        loop: asyncio.AbstractEventLoop,
+        max_overhead: float,
+    ) -> None:
+        self.profile = profile
+        self.loop = loop
+        self.max_overhead = max_overhead
+        self.interval = profile.interval
+        self._timer = TIMERS[profile.mode]
+        self._previous_handler: Any = None
+        self._started: float = 0
+        self._busy: float = 0
+
+    def start(self) -> None:
+        """Install the handler and start the timer."""
+        self._previous_handler = signal.signal(self._timer.signum, self._sample)
+        self._started = time.perf_counter()
+        signal.setitimer(self._timer.which, self.interval, self.interval)
+
+    def stop(self) -> None:
+        """Stop the timer and restore the previous handler."""
+        signal.setitimer(self._timer.which, 0)
+        signal.signal(self._timer.signum, self._previous_handler)
+        self.profile.seconds = time.perf_counter() - self._started
+        self.profile.overhead = self._busy / self.profile.seconds
+
+    def _sample(self, signum: int, frame: Optional[FrameType]) -> None:
+        """
+        Sample the stacks of the loop, within the overhead budget.
+
+        :param signum: The timer signal.
+        :param frame: The frame the loop was running.
+        """
+        sampled_at = time.perf_counter()
+        profile = self.profile
+        profile.samples += 1
+        running = asyncio.current_task(self.loop)
+        stack = thread_stack(frame)
+        if running is not None:
+            stack.insert(0, task_frame(running))
+        profile.add(tuple(stack), self.interval)
+        if profile.mode == WALL:
+            for task in asyncio.all_tasks(self.loop):
+                if task is not running:
+                    profile.add((task_frame(task), *await_stack(task)), self.interval)
+        cost = time.perf_counter() - sampled_at
+        self._busy += cost
+        # Sample less often rather than go over the overhead budget
+        interval = max(profile.interval, cost / self.max_overhead)
+        change = max(interval / self.interval, self.interval / interval)
+        if change >= RETIME_FACTOR:
+            self.interval = interval
+            signal.setitimer(self._timer.which, interval, interval)
+
+
+sampling_profiler = SamplingProfiler()
@@ -0,0 +1,165 @@
+import asyncio
+import enum
+import threading
+import time
+from typing import Awaitable, Callable, Optional, TypeVar
+
+from loguru import logger
+from mdpi_api.metrics import Counter, Gauge
+
+ResultT = TypeVar("ResultT")
+
+circuit_state = Gauge(
+    "circuit_breaker_state",
+    "State of a circuit breaker: 0 closed, 1 half open, 2 open.",
+    labelnames=("circuit",),
+    aggregation="max",
+)
+circuit_rejections = Counter(
+    "circuit_breaker_rejections_total",
+    "Calls rejected by an open circuit breaker.",
+    labelnames=("circuit",),
+)
+
+
+class CircuitState(enum.IntEnum):
+    """State of a circuit breaker."""
+
+    CLOSED = 0
+    HALF_OPEN = 1
+    OPEN = 2
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a dependency whose circuit is open."""
+
+
+class CircuitBreaker:
+    """
+    Stops calling a failing dependency for a while.
+
+    After ``failure_threshold`` consecutive failures the circuit opens and
+    calls fail fast with ``CircuitOpenError``. Once ``reset_timeout`` seconds
+    passed the circuit is half open: a single trial call goes through, and
+    closes the circuit if it succeeds or opens it again if it fails. Every
+    call is bounded by a deadline, a call that times out counts as failed.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int,
+        reset_timeout: float,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CircuitState.CLOSED
+        self._clock = clock
+        self._failures = 0
+        self._opened_at: float = 0
+        self._trial_running = False
+        self._lock = threading.Lock()
+        circuit_state.set(self.state, circuit=name)
+
+    async def call(
+        self,
+        operation: Callable[[], Awaitable[ResultT]],
+        timeout: Optional[float] = None,
+    ) -> ResultT:
+        """
+        Call the dependency through the breaker.
+
+        :param operation: Function starting the call.
+        :param timeout: Deadline of the call in seconds, no deadline if None.
+        :return: The result of the call.
+
+        :raises CircuitOpenError: If the circuit is open.
+        :raises Exception: Whatever the call raised, including
+            ``asyncio.TimeoutError`` when it missed its deadline.
+        """
+        is_trial = self._allow_call()
+        if is_trial is None:
+            circuit_rejections.inc(circuit=self.name)
+            raise CircuitOpenError(f"Circuit {self.name} is open.")
+        try:
+            call_result = await asyncio.wait_for(operation(), timeout)
+        except Exception as exception:
+            self._record_failure(exception, is_trial)
+            raise
+        finally:
+            # Also after a cancellation, which says nothing about the dependency
+            if is_trial:
+                self._end_trial()
+        self._record_success(is_trial)
+        return call_result
+
+    def _allow_call(self) -> Optional[bool]:
+        """
+        Decide whether a call may go through.
+
+        :return: None if the circuit is open, or half open with the trial
+            call still running; otherwise whether the call is the trial call.
+        """
+        with self._lock:
+            if self.state == CircuitState.OPEN:
+                if self._clock() - self._opened_at < self.reset_timeout:
+                    return None
+                self._set_state(CircuitState.HALF_OPEN)
+            if self.state == CircuitState.CLOSED:
+                return False
+            if self._trial_running:
+                return None
+            self._trial_running = True
+            return True
+
+    def _end_trial(self) -> None:
+        """Let the next call in a half open circuit be the trial."""
+        with self._lock:
+            self._trial_running = False
+
+    def _record_success(self, is_trial: bool) -> None:
+        """
+        Close the circuit after a successful trial call.
+
+        Calls started before the circuit opened say nothing about whether
+        the dependency recovered.
+
+        :param is_trial: Whether the call was the trial call.
+        """
+        with self._lock:
+            if self.state == CircuitState.CLOSED:
+                self._failures = 0
+            elif is_trial and self.state == CircuitState.HALF_OPEN:
+                logger.info("Circuit {0} closed.", self.name)
+                self._failures = 0
+                self._set_state(CircuitState.CLOSED)
+
+    def _record_failure(self, exception: BaseException, is_trial: bool) -> None:
+        """
+        Count a failed call and open the circuit if needed.
+
+        :param exception: The error of the call.
+        :param is_trial: Whether the call was the trial call.
+        """
+        with self._lock:
+            if self.state == CircuitState.CLOSED:
+                self._failures += 1
+                if self._failures < self.failure_threshold:
+                    return
+            elif not is_trial:
+                return
+            if self.state != CircuitState.OPEN:
+                logger.warning(f"Circuit {self.name} opened after {exception!r}.")
+            self._opened_at = self._clock()
+            self._set_state(CircuitState.OPEN)
+
+    def _set_state(self, state: CircuitState) -> None:
+        """
+        Change the state and publish it.
+
+        :param state: The new state.
+        """
+        self.state = state
+        circuit_state.set(state, circuit=self.name)
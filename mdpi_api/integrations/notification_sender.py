@@ -0,0 +1,104 @@
+import abc
+from collections import deque
+from typing import Deque, List, Optional, Sequence
+
+import httpx
+import orjson
+from loguru import logger
+from mdpi_api.web.api.schemas.notification import NotificationDTO
+
+
+class NotificationDeliveryError(Exception):
+    """Raised when a batch of notifications was not delivered."""
+
+
+class NotificationSender(abc.ABC):
+    """Delivers batches of notifications."""
+
+    @abc.abstractmethod
+    async def send(self, batch: Sequence[NotificationDTO]) -> None:
+        """
+        Deliver a batch of notifications.
+
+        :param batch: The notifications.
+        """
+
+    @abc.abstractmethod
+    async def close(self) -> None:
+        """Release the resources of the sender."""
+
+
+class WebhookSender(NotificationSender):
+    """POSTs batches of notifications as JSON to a webhook."""
+
+    def __init__(
+        self,
+        url: str,
+        pool_size: int,
+        timeout: float,
+        http_client: Optional[httpx.AsyncClient] = None,
+    ) -> None:
+        self.url = url
+        self.http_client = http_client or httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=pool_size),
+            timeout=timeout,
+        )
+
+    async def send(self, batch: Sequence[NotificationDTO]) -> None:
+        """
+        Deliver a batch of notifications.
+
+        :param batch: The notifications.
+
+        :raises NotificationDeliveryError: If the webhook could not be reached
+            or did not accept the batch.
+        """
+        body = orjson.dumps(
+            {"notifications": [notification.model_dump() for notification in batch]},
+        )
+        try:
+            response = await self.http_client.post(
+                self.url,
+                content=body,
+                headers={"Content-Type": "application/json"},
+            )
+        except httpx.HTTPError as ex:
+            raise NotificationDeliveryError(f"Webhook unreachable: {ex!r}") from ex
+        if not response.is_success:
+            raise NotificationDeliveryError(
+                f"Webhook answered with status {response.status_code}.",
+            )
+
+    async def close(self) -> None:
+        """Close the connection pool."""
+        await self.http_client.aclose()
+
+
+class LocalSender(NotificationSender):
+    """
+    Stand-in logging the delivered batches and keeping the latest ones.
+
+    Used when no webhook is configured, and in tests. The first ``failures``
+    sends fail, as an unreachable webhook would.
+    """
+
+    def __init__(self, failures: int = 0, kept_batches: int = 100) -> None:
+        self.failures = failures
+        self.batches: Deque[List[NotificationDTO]] = deque(maxlen=kept_batches)
+
+    async def send(self, batch: Sequence[NotificationDTO]) -> None:
+        """
+        Deliver a batch of notifications.
+
+        :param batch: The notifications.
+
+        :raises NotificationDeliveryError: While failures are left.
+        """
+        if self.failures > 0:
+            self.failures -= 1
+            raise NotificationDeliveryError("Local sender failed on purpose.")
+        logger.info("Delivered {0} notifications locally.", len(batch))
+        self.batches.append(list(batch))
+
+    async def close(self) -> None:
+        """Nothing to release."""
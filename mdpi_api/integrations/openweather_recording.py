@@ -0,0 +1,81 @@
+"""
+Readings of the OpenWeather API recorded to disk.
+
+The OpenWeather stand-in records the readings the real API returns into a
+JSON file, by city ID along with the city names they were requested by, and
+serves them back on later runs. The API key is never written.
+"""
+import json
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+# A reading of one city in the OpenWeather format
+Reading = Dict[str, Any]
+
+
+class Recording:
+    """Recorded readings by city ID, and city IDs by requested name."""
+
+    def __init__(self, path: Optional[Path] = None) -> None:
+        """
+        Initialize an empty recording.
+
+        :param path: File the recording is saved to, kept in memory if None.
+        """
+        self.path = path
+        self.readings: Dict[int, Reading] = {}
+        self.names: Dict[str, int] = {}
+
+    @classmethod
+    def load(cls, path: Path) -> "Recording":
+        """
+        Load a recording, empty if the file does not exist yet.
+
+        :param path: The file of the recording.
+        :return: The recording.
+        """
+        recording = cls(path)
+        if path.exists():
+            document = json.loads(path.read_text())
+            recording.readings = {
+                int(city_id): reading
+                for city_id, reading in document["readings"].items()
+            }
+            recording.names = document["names"]
+        return recording
+
+    def add(self, reading: Reading, name: Optional[str] = None) -> None:
+        """
+        Record the reading of a city.
+
+        :param reading: The reading, as returned by the API.
+        :param name: The city name the reading was requested by, if any.
+        """
+        self.readings[reading["id"]] = reading
+        if name is not None:
+            self.names[name.casefold()] = reading["id"]
+
+    def find(self, name: str) -> Optional[int]:
+        """
+        Find a city by the name it was requested by.
+
+        :param name: The city name.
+        :return: The city ID, None if the name was never recorded.
+        """
+        return self.names.get(name.casefold())
+
+    def save(self) -> None:
+        """Write the recording to its file, if it has one."""
+        if self.path is None:
+            return
+        document = {
+            "readings": {
+                str(city_id): reading
+                for city_id, reading in sorted(self.readings.items())
+            },
+            "names": dict(sorted(self.names.items())),
+        }
+        # Replaced whole so an interrupted run never leaves a truncated file
+        partial = self.path.with_suffix(".partial")
+        partial.write_text(json.dumps(document, indent=2, ensure_ascii=False))
+        partial.replace(self.path)
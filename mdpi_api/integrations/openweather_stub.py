@@ -0,0 +1,360 @@
+"""
+Local stand-in for the OpenWeather current weather API.
+
+Serves the single city (``/data/2.5/weather``) and group (``/data/2.5/group``)
+endpoints and enforces the provider's group limit. Readings are synthetic and
+deterministic by city ID, or replayed from a recording of the real API made
+by running the stand-in in record mode. Latency, server errors and rate
+limiting can be injected to see how the API copes with a slow, failing or
+throttling provider. Tests mount it with ``httpx.ASGITransport``, it can also
+be served for local runs, the application is pointed at it by its base URL::
+
+    # Record the real readings the application fetches through the stand-in
+    python -m mdpi_api.integrations.openweather_stub --recording weather.json
+        --record https://api.openweathermap.org/data/2.5
+    # Replay them offline, slow and throttled
+    python -m mdpi_api.integrations.openweather_stub --recording weather.json
+        --latency-ms 200 --latency-distribution lognormal --rate-limit 50
+    MDPI_API_WEATHER_API__BASE_URL=http://127.0.0.1:8081/data/2.5/weather
+"""
+import argparse
+import asyncio
+import math
+import random
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple, Union
+
+import httpx
+import uvicorn
+from mdpi_api.integrations.openweather_recording import Reading, Recording
+from starlette import status
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+GROUP_LIMIT = 20
+BASE_KELVIN = 270
+TEMPERATURE_RANGE = 30
+HUMIDITY_RANGE = 100
+BASE_PRESSURE = 1000
+PRESSURE_RANGE = 40
+DEFAULT_PORT = 8081
+UPSTREAM_TIMEOUT = 10
+# Spread of the lognormal latency, a long tail of a few slow calls
+LOGNORMAL_SIGMA = 0.8
+# Message of the real API when the calls of a key exceed its plan
+RATE_LIMITED = (
+    "Your account is temporary blocked due to exceeding of "
+    "requests limitation of your subscription type."
+)
+
+# (endpoint, city IDs)
+ServedRequest = Tuple[str, List[int]]
+# Draws a latency in seconds from a generator and the mean latency
+LatencyDistribution = Callable[[random.Random, float], float]
+
+LATENCY_DISTRIBUTIONS: Dict[str, LatencyDistribution] = {
+    "fixed": lambda rng, mean: mean,
+    "uniform": lambda rng, mean: rng.uniform(0, mean * 2),
+    "exponential": lambda rng, mean: rng.expovariate(1 / mean),
+    "lognormal": lambda rng, mean: rng.lognormvariate(
+        math.log(mean) - LOGNORMAL_SIGMA**2 / 2,
+        LOGNORMAL_SIGMA,
+    ),
+}
+
+
+class Faults(NamedTuple):
+    """
+    Faults the stand-in injects.
+
+    Every request waits a latency drawn from the distribution with mean
+    ``latency`` seconds, requests beyond ``rate_limit`` per second (none if
+    0) are refused with ``429 Too Many Requests`` and a share ``error_rate``
+    of the others fails with ``503 Service Unavailable``. Draws come from a
+    generator seeded with ``seed`` so runs are repeatable.
+    """
+
+    latency: float = 0
+    latency_distribution: str = "fixed"
+    error_rate: float = 0
+    rate_limit: int = 0
+    seed: Optional[int] = None
+
+
+def stub_reading(city_id: int) -> Dict[str, Any]:
+    """
+    Build the reading the stand-in serves for a city.
+
+    :param city_id: The ID of the city.
+    :return: A reading in the OpenWeather format, temperatures in Kelvin.
+    """
+    temp = BASE_KELVIN + city_id % TEMPERATURE_RANGE
+    return {
+        "id": city_id,
+        "name": f"City {city_id}",
+        "weather": [{"id": 800, "main": "Clear", "description": "clear sky"}],
+        "main": {
+            "temp": temp,
+            "feels_like": temp - 1,
+            "temp_min": temp - 2,
+            "temp_max": temp + 2,
+            "pressure": BASE_PRESSURE + city_id % PRESSURE_RANGE,
+            "humidity": city_id % HUMIDITY_RANGE,
+        },
+    }
+
+
+class OpenWeatherStub:
+    """
+    The stand-in endpoints.
+
+    Readings are served from ``recording``, synthetic for cities it lacks.
+    With an ``upstream`` client, requests are forwarded to the real API
+    instead and the readings it returns are added to the recording.
+    Every served request is recorded in ``requests`` as (endpoint, city IDs).
+    """
+
+    def __init__(
+        self,
+        group_limit: int = GROUP_LIMIT,
+        faults: Faults = Faults(),
+        recording: Optional[Recording] = None,
+        upstream: Optional[httpx.AsyncClient] = None,
+    ) -> None:
+        self.group_limit = group_limit
+        self.faults = faults
+        self.recording = recording or Recording()
+        self.upstream = upstream
+        self.requests: List[ServedRequest] = []
+        self._rng = random.Random(faults.seed)  # noqa: S311
+        self._draw_latency = LATENCY_DISTRIBUTIONS[faults.latency_distribution]
+        self._window_started: float = 0
+        self._window_requests = 0
+
+    async def weather(self, request: Request) -> JSONResponse:
+        """
+        Serve the reading of one city, by ID or by recorded name.
+
+        :param request: The request.
+        :return: The reading.
+        """
+        refusal = await self._admit(request)
+        if refusal is not None:
+            return refusal
+        if self.upstream is not None:
+            return await self._forward("weather", request)
+        city_ids = self._city_ids(request)
+        if isinstance(city_ids, JSONResponse):
+            return city_ids
+        if len(city_ids) != 1:
+            return _error(status.HTTP_400_BAD_REQUEST, "Expected one city ID.")
+        self.requests.append(("weather", city_ids))
+        return JSONResponse(self._reading(city_ids[0]))
+
+    async def group(self, request: Request) -> JSONResponse:
+        """
+        Serve the readings of several cities.
+
+        :param request: The request.
+        :return: The readings.
+        """
+        refusal = await self._admit(request)
+        if refusal is not None:
+            return refusal
+        if self.upstream is not None:
+            return await self._forward("group", request)
+        city_ids = self._city_ids(request)
+        if isinstance(city_ids, JSONResponse):
+            return city_ids
+        if len(city_ids) > self.group_limit:
+            message = f"No more than {self.group_limit} city IDs per request."
+            return _error(status.HTTP_400_BAD_REQUEST, message)
+        self.requests.append(("group", city_ids))
+        readings = [self._reading(city_id) for city_id in city_ids]
+        return JSONResponse({"cnt": len(readings), "list": readings})
+
+    async def _admit(self, request: Request) -> Optional[JSONResponse]:
+        """
+        Wait the injected latency and decide whether a request is served.
+
+        :param request: The request.
+        :return: The error response of a refused request, None if served.
+        """
+        faults = self.faults
+        if faults.latency:
+            await asyncio.sleep(self._draw_latency(self._rng, faults.latency))
+        if faults.rate_limit and self._over_rate_limit():
+            return _error(status.HTTP_429_TOO_MANY_REQUESTS, RATE_LIMITED)
+        if faults.error_rate and self._rng.random() < faults.error_rate:
+            return _error(status.HTTP_503_SERVICE_UNAVAILABLE, "Injected error.")
+        if not request.query_params.get("appid"):
+            return _error(status.HTTP_401_UNAUTHORIZED, "Invalid API key.")
+        return None
+
+    def _over_rate_limit(self) -> bool:
+        """
+        Count a request against the rate limit, in windows of a second.
+
+        :return: True if the request exceeds the limit.
+        """
+        now = time.monotonic()
+        if now - self._window_started >= 1:
+            self._window_started = now
+            self._window_requests = 0
+        self._window_requests += 1
+        return self._window_requests > self.faults.rate_limit
+
+    def _city_ids(self, request: Request) -> Union[List[int], JSONResponse]:
+        """
+        Parse the city IDs of a request, or find the city of a recorded name.
+
+        :param request: The request.
+        :return: The city IDs, or the error response of an invalid request.
+        """
+        city_name = request.query_params.get("q")
+        if city_name is not None:
+            city_id = self.recording.find(city_name)
+            if city_id is None:
+                return _error(status.HTTP_404_NOT_FOUND, "city not found")
+            return [city_id]
+        raw_ids = request.query_params.get("id", "").split(",")
+        if not all(raw_id.isdigit() for raw_id in raw_ids):
+            return _error(status.HTTP_400_BAD_REQUEST, "Only city IDs are supported.")
+        return [int(raw_id) for raw_id in raw_ids]
+
+    def _reading(self, city_id: int) -> Reading:
+        """
+        Get the reading of a city, recorded or synthetic.
+
+        :param city_id: The ID of the city.
+        :return: The reading.
+        """
+        return self.recording.readings.get(city_id) or stub_reading(city_id)
+
+    async def _forward(self, endpoint: str, request: Request) -> JSONResponse:
+        """
+        Forward a request to the real API and record the readings it returns.
+
+        :param endpoint: The endpoint, relative to the API root.
+        :param request: The request.
+        :return: The response of the real API.
+        """
+        upstream = self.upstream
+        assert upstream is not None  # noqa: S101
+        response = await upstream.get(endpoint, params=request.query_params)
+        document = response.json()
+        if response.status_code != status.HTTP_200_OK:
+            return JSONResponse(document, response.status_code)
+        if endpoint == "group":
+            readings = document.get("list", [])
+        else:
+            readings = [document]
+        city_name = request.query_params.get("q")
+        for reading in readings:
+            self.recording.add(reading, city_name)
+        self.recording.save()
+        city_ids = [recorded["id"] for recorded in readings]
+        self.requests.append((endpoint, city_ids))
+        return JSONResponse(document)
+
+
+def create_stub_app(
+    group_limit: int = GROUP_LIMIT,
+    faults: Faults = Faults(),
+    recording: Optional[Recording] = None,
+    upstream: Optional[httpx.AsyncClient] = None,
+) -> Starlette:
+    """
+    Create the stand-in application.
+
+    The endpoints are available as ``app.state.stub``.
+
+    :param group_limit: Maximum number of city IDs per group request.
+    :param faults: Latency, errors and rate limit to inject.
+    :param recording: Readings to replay, and to add to in record mode.
+    :param upstream: Client of the real API root to record from, e.g.
+        ``https://api.openweathermap.org/data/2.5``, None to replay.
+    :return: The application.
+    """
+    stub = OpenWeatherStub(group_limit, faults, recording, upstream)
+    app = Starlette(
+        routes=[
+            Route("/data/2.5/weather", stub.weather),
+            Route("/data/2.5/group", stub.group),
+        ],
+        on_shutdown=[upstream.aclose] if upstream is not None else [],
+    )
+    app.state.stub = stub
+    return app
+
+
+def _error(status_code: int, message: str) -> JSONResponse:
+    """
+    Build an error response in the OpenWeather format.
+
+    :param status_code: The HTTP status code.
+    :param message: The error message.
+    :return: The response.
+    """
+    return JSONResponse({"cod": str(status_code), "message": message}, status_code)
+
+
+def main() -> None:
+    """Serve the stand-in."""
+    parser = build_parser()
+    args = parser.parse_args()
+    if args.record is not None and args.recording is None:
+        parser.error("--record needs a --recording file to write to.")
+    recording = Recording.load(args.recording) if args.recording else None
+    upstream = None
+    if args.record is not None:
+        # Relative endpoints resolve under the API root
+        api_root = args.record.rstrip("/")
+        upstream = httpx.AsyncClient(
+            base_url=f"{api_root}/",
+            timeout=UPSTREAM_TIMEOUT,
+        )
+    faults = Faults(
+        latency=args.latency_ms / 1000,
+        latency_distribution=args.latency_distribution,
+        error_rate=args.error_rate,
+        rate_limit=args.rate_limit,
+        seed=args.seed,
+    )
+    stub_app = create_stub_app(args.group_limit, faults, recording, upstream)
+    uvicorn.run(stub_app, host=args.host, port=args.port)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """
+    Build the command line parser.
+
+    :return: The parser.
+    """
+    parser = argparse.ArgumentParser(description="OpenWeather stand-in server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--group-limit", type=int, default=GROUP_LIMIT)
+    parser.add_argument("--recording", type=Path, default=None)
+    parser.add_argument("--record", metavar="API_ROOT", default=None)
+    _add_fault_arguments(parser)
+    return parser
+
+
+def _add_fault_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--latency-ms", type=float, default=0)
+    parser.add_argument(
+        "--latency-distribution",
+        choices=sorted(LATENCY_DISTRIBUTIONS),
+        default="fixed",
+    )
+    parser.add_argument("--error-rate", type=float, default=0)
+    parser.add_argument("--rate-limit", type=int, default=0)
+    parser.add_argument("--seed", type=int, default=None)
+
+
+if __name__ == "__main__":
+    main()
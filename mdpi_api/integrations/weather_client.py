@@ -1,44 +1,196 @@
-from typing import Any, Dict
+import asyncio
+import time
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Sequence
 
 import httpx
-import polars as pl
 from fastapi import status
 from loguru import logger
-from mdpi_api.settings import Settings
+from mdpi_api.integrations.circuit_breaker import CircuitBreaker, CircuitOpenError
+from mdpi_api.lazy_imports import LazyModule
+from mdpi_api.metrics import Counter, Histogram
+from mdpi_api.settings import settings
 from mdpi_api.web.api.errors.weather import WeatherAPIError
 from mdpi_api.web.api.schemas.weather import WeatherDTO
 
-weather_api = Settings().weather_api
+if TYPE_CHECKING:
+    import polars as pl
+else:
+    pl = LazyModule("polars")  # noqa: WPS440
+
+weather_api = settings.weather_api
 
 KELVIN_TO_CELSIUS = 273.15
+KELVIN_COLUMNS = ("temp", "temp_min", "temp_max", "feels_like")
+
+weather_breaker = CircuitBreaker(
+    "weather_api",
+    failure_threshold=weather_api.breaker_failure_threshold,
+    reset_timeout=weather_api.breaker_reset_seconds,
+)
+upstream_requests = Counter(
+    "weather_api_requests_total",
+    "Requests sent to the weather API, by endpoint.",
+    labelnames=("endpoint",),
+)
+upstream_responses = Counter(
+    "weather_api_responses_total",
+    "Responses of the weather API, by endpoint and status, error if none.",
+    labelnames=("endpoint", "status"),
+)
+upstream_seconds = Histogram(
+    "weather_api_request_seconds",
+    "Duration of requests to the weather API, by endpoint.",
+    labelnames=("endpoint",),
+)
 
 
 class WeatherAPIClient:
     """Client for interacting with the weather API."""
 
-    def __init__(self) -> None:
+    def __init__(self, http_client: Optional[httpx.AsyncClient] = None) -> None:
+        """
+        Initialize the client.
+
+        :param http_client: HTTP client to send requests with, e.g. one mounted
+            on a stand-in server. The client of the worker is used if None,
+            or a new client per request before it is open.
+        """
         self.base_url = weather_api.base_url
+        self.group_url = weather_api.group_url
+        self.group_limit = weather_api.group_limit
         self.api_key = weather_api.api_key
+        self.http_client = http_client
 
     async def get_weather_for_city(self, *, city_name: str) -> WeatherDTO:
         """
         Fetch weather data for a city by its name.
 
+        City names are ambiguous, prefer ``get_weather_for_city_id``.
+
         :param city_name: The name of the city.
-        :return: WeatherDTO if found, None otherwise.
+        :return: WeatherDTO.
+        """
+        data = await self._request(self.base_url, {"q": city_name}, "weather")
+        return self._manipulate_data(data)
+
+    async def get_weather_for_city_id(self, city_id: int) -> WeatherDTO:
+        """
+        Fetch weather data for a city by its OpenWeather city ID.
+
+        :param city_id: The ID of the city.
+        :return: WeatherDTO.
+        """
+        data = await self._request(self.base_url, {"id": city_id}, "weather")
+        return self._manipulate_data(data)
+
+    async def get_weather_for_city_ids(
+        self,
+        city_ids: Sequence[int],
+    ) -> List[WeatherDTO]:
+        """
+        Fetch weather data for many cities by their OpenWeather city IDs.
+
+        Cities are fetched through the group endpoint, ``group_limit`` cities
+        per request, the requests are sent concurrently. Cities unknown to
+        the provider are missing from the result.
+
+        :param city_ids: The IDs of the cities.
+        :return: List of WeatherDTO.
+        """
+        responses = await asyncio.gather(
+            *(
+                self._request(
+                    self.group_url,
+                    {"id": ",".join(str(city_id) for city_id in chunk)},
+                    "group",
+                )
+                for chunk in _chunks(city_ids, self.group_limit)
+            ),
+        )
+        return [
+            weather
+            for response in responses
+            for weather in self._manipulate_many(response.get("list", []))
+        ]
+
+    async def _request(
+        self,
+        url: str,
+        query: Dict[str, Any],
+        endpoint: str,
+    ) -> Dict[str, Any]:
+        """
+        Send a request to the weather API.
+
+        :param url: The endpoint URL.
+        :param query: The query parameters, without the API key.
+        :param endpoint: Name of the endpoint, for logs and metrics.
+        :return: The decoded response.
 
         :raises WeatherAPIError: If there is an error during weather retrieval.
         """
-        url = f"{self.base_url}?q={city_name}&appid={self.api_key}"
+        params = {**query, "appid": self.api_key}
+        try:
+            response = await weather_breaker.call(
+                lambda: self._send(url, params, endpoint),
+                timeout=weather_api.deadline_seconds,
+            )
+        except (CircuitOpenError, asyncio.TimeoutError, httpx.HTTPError) as error:
+            logger.error(f"Weather API unavailable for {query}: {error!r}")
+            raise WeatherAPIError(
+                detail="Weather API unavailable.",
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            )
 
-        async with httpx.AsyncClient() as client:
-            response = await client.get(url)
+        if response.status_code == status.HTTP_200_OK:
+            return response.json()
+        logger.error(f"Failed to fetch weather for {query}: {response.text}")
+        raise WeatherAPIError(detail="Failed to fetch weather data.")
 
-            if response.status_code == status.HTTP_200_OK:
-                data = response.json()
-                return self._manipulate_data(data)
-            logger.error(f"Failed to fetch weather for {city_name}: {response.text}")
-            raise WeatherAPIError(detail="Failed to fetch weather data.")
+    async def _send(
+        self,
+        url: str,
+        params: Dict[str, Any],
+        endpoint: str,
+    ) -> httpx.Response:
+        """
+        Send a request, failing on responses that mean the API is unhealthy.
+
+        Client errors such as an unknown city are returned, they do not count
+        against the circuit breaker.
+
+        :param url: The endpoint URL.
+        :param params: The query parameters.
+        :param endpoint: Name of the endpoint, for metrics.
+        :return: The response.
+        """
+        upstream_requests.inc(endpoint=endpoint)
+        started = time.perf_counter()
+        response_status = "error"
+        try:  # noqa: WPS501
+            response = await self._get(url, params)
+            response_status = str(response.status_code)
+        finally:
+            upstream_seconds.observe(time.perf_counter() - started, endpoint=endpoint)
+            upstream_responses.inc(endpoint=endpoint, status=response_status)
+        is_throttled = response.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+        if is_throttled or response.is_server_error:
+            response.raise_for_status()
+        return response
+
+    async def _get(self, url: str, params: Dict[str, Any]) -> httpx.Response:
+        """
+        Send a GET request.
+
+        :param url: The endpoint URL.
+        :param params: The query parameters.
+        :return: The response.
+        """
+        http_client = self.http_client or weather_http.client
+        if http_client is not None:
+            return await http_client.get(url, params=params)
+        async with httpx.AsyncClient(timeout=weather_api.timeout) as client:
+            return await client.get(url, params=params)
 
     @staticmethod
     def _manipulate_data(data: Dict[str, Any]) -> WeatherDTO:
@@ -48,26 +200,79 @@ class WeatherAPIClient:
         :param data: The weather data.
         :return: Manipulated weather data.
         """
-        main_data = data.pop("main", {})
-        df_main = pl.DataFrame([main_data])
+        return WeatherAPIClient._manipulate_many([data])[0]
+
+    @staticmethod
+    def _manipulate_many(items: List[Dict[str, Any]]) -> List[WeatherDTO]:
+        """
+        Manipulate the data of many cities from the weather API.
+
+        The temperatures of all cities are converted in one columnar pass.
+
+        :param items: The weather data of every city.
+        :return: Manipulated weather data.
+        """
+        if not items:
+            return []
+        df_main = pl.DataFrame([item.get("main", {}) for item in items])
         # Convert temperature from Kelvin to Celsius
         df_main = df_main.with_columns(
             [
-                (pl.col("temp") - KELVIN_TO_CELSIUS).round(0).alias("temp"),
-                (pl.col("temp_min") - KELVIN_TO_CELSIUS).round(0).alias("temp_min"),
-                (pl.col("temp_max") - KELVIN_TO_CELSIUS).round(0).alias("temp_max"),
-                (pl.col("feels_like") - KELVIN_TO_CELSIUS).round(0).alias("feels_like"),
+                (pl.col(column) - KELVIN_TO_CELSIUS).round(0).alias(column)
+                for column in KELVIN_COLUMNS
+                if column in df_main.columns
             ],
         )
-        df_other = pl.DataFrame([data])
-        # Combine the two dataframes
-        df = df_other.hstack(df_main)
+        main_rows = df_main.to_dicts() if df_main.width else [{} for _ in items]
 
-        manipulated_data = {col: df[col].to_list()[0] for col in df.columns}
-        logger.info(f"Manipulated weather data: {manipulated_data}")
+        weather = []
+        for item, main_data in zip(items, main_rows):
+            manipulated_data = {
+                key: item_value for key, item_value in item.items() if key != "main"
+            }
+            manipulated_data.update(main_data)
+            weather.append(
+                WeatherDTO(
+                    city_id=manipulated_data["id"],
+                    city_name=manipulated_data["name"],
+                    data=manipulated_data,
+                ),
+            )
+        logger.info("Manipulated weather data of {0} cities.", len(weather))
+        return weather
 
-        return WeatherDTO(
-            city_id=manipulated_data["id"],
-            city_name=manipulated_data["name"],
-            data=manipulated_data,
-        )
+
+class WorkerHTTPClient:
+    """The HTTP client of the worker, its connections reused by every request."""
+
+    def __init__(self) -> None:
+        self.client: Optional[httpx.AsyncClient] = None
+
+    async def open(self) -> None:
+        """Create the client, loading the CA certificates in a thread."""
+        if self.client is None:
+            self.client = await asyncio.to_thread(
+                httpx.AsyncClient,
+                timeout=weather_api.timeout,
+            )
+
+    async def close(self) -> None:
+        """Close the connections of the client."""
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
+
+
+def _chunks(city_ids: Sequence[int], size: int) -> List[Sequence[int]]:
+    """
+    Split city IDs into chunks.
+
+    :param city_ids: The IDs of the cities.
+    :param size: Maximum chunk size.
+    :return: The chunks.
+    """
+    starts = range(0, len(city_ids), size)
+    return [city_ids[start : start + size] for start in starts]
+
+
+weather_http = WorkerHTTPClient()
@@ -0,0 +1,47 @@
+"""
+Lazy imports of heavy dependencies.
+
+Polars takes a tenth of the import of the application, and most workers
+only need it once a history, an export or a refresh runs. A module imported
+through ``LazyModule`` is only imported on the first access to one of its
+attributes, so workers boot without it::
+
+    if TYPE_CHECKING:
+        import polars as pl
+    else:
+        pl = LazyModule("polars")
+
+Annotations using the module are quoted, so that defining a function does
+not import it.
+"""
+import importlib
+from types import ModuleType
+from typing import Any, Optional
+
+
+class LazyModule:
+    """A module imported on first use."""
+
+    def __init__(self, name: str) -> None:
+        self._name = name
+        self._module: Optional[ModuleType] = None
+
+    def __getattr__(self, attribute: str) -> Any:
+        """
+        Import the module if needed and get one of its attributes.
+
+        :param attribute: The attribute.
+        :return: The attribute of the module.
+        """
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return getattr(self._module, attribute)
+
+    def __repr__(self) -> str:
+        """
+        Describe the module and whether it was imported.
+
+        :return: The description.
+        """
+        state = "imported" if self._module is not None else "not imported"
+        return f"<lazy module {self._name!r} ({state})>"
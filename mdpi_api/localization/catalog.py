@@ -0,0 +1,131 @@
+import importlib
+import pkgutil
+import string
+import threading
+from types import MappingProxyType
+from typing import Any, Dict, FrozenSet, Mapping, NamedTuple, Optional, Tuple
+
+from loguru import logger
+from mdpi_api.localization.i18n_middleware import LocaleEnum
+
+LOCALIZATION_PACKAGE = "mdpi_api.localization"
+
+CatalogKey = Tuple[str, str]
+
+
+class CompiledMessage(NamedTuple):
+    """A translation with its format fields parsed ahead of time."""
+
+    template: str
+    fields: FrozenSet[str]
+
+    def render(self, kwargs: Dict[str, Any]) -> str:
+        """
+        Format the message.
+
+        Messages are only formatted when values are given, so a message with
+        fields is returned as it is when the caller passes none. Messages
+        without fields never go through ``str.format``.
+
+        :param kwargs: Values of the format fields.
+        :return: The formatted message.
+        """
+        if not kwargs or not self.fields:
+            return self.template
+        return self.template.format_map(kwargs)
+
+
+class MessageCatalog:
+    """
+    Flat, read only table of every translation.
+
+    The locale modules are imported once and their (possibly nested)
+    dictionaries are flattened into ``(locale, "file.key")`` entries. The
+    table is built under a lock and published as a read only mapping, so
+    lookups never take the lock.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._messages: Optional[Mapping[CatalogKey, CompiledMessage]] = None
+
+    def get(self, locale: str, key: str) -> Optional[CompiledMessage]:
+        """
+        Get a translation, loading the catalog on first use.
+
+        :param locale: The locale.
+        :param key: The full translation key, e.g. ``response_messages.Success``.
+        :return: The compiled translation or None if there is none.
+        """
+        messages = self._messages
+        if messages is None:
+            messages = self.load()
+        return messages.get((locale, key))
+
+    def load(self) -> Mapping[CatalogKey, CompiledMessage]:
+        """
+        Load every locale module into the catalog, once.
+
+        :return: The catalog table.
+        """
+        with self._lock:
+            if self._messages is None:
+                messages: Dict[CatalogKey, CompiledMessage] = {}
+                for locale in LocaleEnum:
+                    _load_locale(locale.value, messages)
+                self._messages = MappingProxyType(messages)
+                logger.info("Loaded {0} translations.", len(messages))
+            return self._messages
+
+
+def compile_message(template: str) -> CompiledMessage:
+    """
+    Parse the format fields of a translation.
+
+    :param template: The translation.
+    :return: The compiled translation.
+    """
+    fields = frozenset(
+        field_name
+        for _, field_name, _, _ in string.Formatter().parse(template)  # noqa: WPS361
+        if field_name
+    )
+    return CompiledMessage(template=template, fields=fields)
+
+
+def _load_locale(locale: str, messages: Dict[CatalogKey, CompiledMessage]) -> None:
+    """
+    Add every module of a locale package to the catalog.
+
+    :param locale: The locale.
+    :param messages: The catalog being built.
+    """
+    package = importlib.import_module(f"{LOCALIZATION_PACKAGE}.{locale}")
+    for module_info in pkgutil.iter_modules(package.__path__):
+        module = importlib.import_module(f"{package.__name__}.{module_info.name}")
+        _flatten(locale, module_info.name, module.locale, messages)
+
+
+def _flatten(
+    locale: str,
+    prefix: str,
+    translations: Mapping[str, Any],
+    messages: Dict[CatalogKey, CompiledMessage],
+) -> None:
+    """
+    Add a (nested) translation dictionary to the catalog.
+
+    :param locale: The locale.
+    :param prefix: Key prefix of the dictionary.
+    :param translations: The translation dictionary.
+    :param messages: The catalog being built.
+    """
+    for key, translation in translations.items():
+        full_key = f"{prefix}.{key}"
+        if isinstance(translation, Mapping):
+            _flatten(locale, full_key, translation, messages)
+        else:
+            messages[(locale, full_key)] = compile_message(translation)
+
+
+catalog = MessageCatalog()
@@ -1,7 +1,7 @@
-import importlib
 from typing import Any, Dict, Optional
 
 from loguru import logger
+from mdpi_api.localization.catalog import catalog
 from mdpi_api.localization.i18n_middleware import get_locale
 
 
@@ -26,7 +26,7 @@ class Translator:
             lang = get_locale()
         self.lang = lang
 
-    def t(  # noqa: WPS111, WPS231
+    def t(  # noqa: WPS111
         self,
         key: str,
         **kwargs: Any,
@@ -34,36 +34,18 @@ class Translator:
         """
         Translate a string.
 
+        Translations are looked up in the preloaded message catalog.
+
         :param key: Key to be translated.
         :param kwargs: Keyword arguments to be used for string formatting.
-        :return: Translated string.
-
-        :raises KeyError: If the key is not found in the locale file.
+        :return: Translated string or None if there is no translation.
         """
+        message = catalog.get(self.lang, key)
+        if message is None:
+            logger.debug("Key {0} not found in {1} locale", key, self.lang)
+            return None
         try:
-            file_key, *translation_keys = key.split(".")
-
-            # Construct the module path
-            locale_module_path = f"mdpi_api.localization.{self.lang}.{file_key}"
-
-            # Import the module
-            locale_module = importlib.import_module(locale_module_path)
-
-            # Get the initial translation
-            translation = locale_module.locale
-
-            # Traverse the translation dictionary based on the keys
-            for translation_key in translation_keys:
-                translation = translation.get(translation_key, None)
-                if translation is None:
-                    raise KeyError(f"Key {key} not found in {self.lang} locale")
-
-            # Format the translation with kwargs if any
-            if kwargs.keys():
-                translation = translation.format(**kwargs)
-
-            return translation
-
-        except Exception as exception:
-            logger.debug(f"Error while translating key {key}: {exception}")
+            return message.render(kwargs)
+        except (KeyError, IndexError, ValueError) as exception:
+            logger.debug("Error while translating key {0}: {1}", key, exception)
             return None
@@ -1,12 +1,50 @@
+"""
+Logging setup.
+
+Records go through a console sink and a JSON file sink rotated as set in
+``LogSettings``. Both sinks are enqueued: callers only put the formatted
+record on a queue, a background thread serializes and writes it. Every
+record carries the correlation ID of the request it was logged for, and the
+info and debug records of a request are kept for a sample of requests only
+(``info_sample_rate``), warnings and errors always.
+"""
+import asyncio
+import copy
 import logging
+import queue
 import sys
-from typing import Union
+import threading
+import traceback
+from contextvars import ContextVar
+from pathlib import Path
+from typing import TYPE_CHECKING, Optional, Protocol, TextIO, Union
 
+import orjson
 from loguru import logger
+from mdpi_api.metrics import Counter
 from mdpi_api.settings import settings
 
+if TYPE_CHECKING:
+    from loguru import Message, Record
+
 log_settings = settings.logging
 
+NO_CORRELATION_ID = "-"
+WARNING_LEVEL = logger.level("WARNING").no
+
+correlation_id: ContextVar[str] = ContextVar(
+    "correlation_id",
+    default=NO_CORRELATION_ID,
+)
+# Whether the info and debug records of the current request are kept
+log_sampled: ContextVar[bool] = ContextVar("log_sampled", default=True)
+
+dropped_records = Counter(
+    "log_records_dropped_total",
+    "Log records dropped because the queue of their sink was full, by level.",
+    labelnames=("level",),
+)
+
 
 class InterceptHandler(logging.Handler):
     """
@@ -58,7 +96,223 @@ def configure_logging() -> None:  # pragma: no cover
 
     # set logs output, level and format
     logger.remove()
+    logger.configure(patcher=add_correlation_id)
+    add_sinks()
+
+
+def add_sinks(stream: Optional[TextIO] = None, path: Optional[Path] = None) -> None:
+    """
+    Add the console and JSON file sinks, enqueued unless disabled.
+
+    The logger must have no sinks yet, see ``JsonFileWriter``.
+
+    :param stream: Stream of the console sink, stdout by default.
+    :param path: Path of the file sink, may contain a ``{time}`` field.
+    """
+    console = stream or sys.stdout
+    file_writer = None
+    if log_settings.to_file:
+        file_writer = JsonFileWriter(
+            path or log_settings.path,
+            rotation=log_settings.rotation,
+            retention=log_settings.retention,
+        )
+    level = log_settings.level.value
     logger.add(
-        sys.stdout,
-        level=log_settings.level.value,
+        _queued(StreamWriter(console)),
+        level=level,
+        format=log_settings.format,
+        filter=is_sampled,
+        colorize=console.isatty(),
     )
+    if file_writer is not None:
+        logger.add(
+            _queued(file_writer),
+            level=level,
+            format="{message}",
+            filter=is_sampled,
+        )
+
+
+class LogWriter(Protocol):
+    """Writes formatted records, stream-like as loguru expects of sinks."""
+
+    def write(self, message: "Message") -> None:
+        """
+        Write a record.
+
+        :param message: The record formatted by the sink.
+        """
+
+    def stop(self) -> None:
+        """Release the resources of the writer."""
+
+
+class StreamWriter:
+    """Writes formatted records to a stream."""
+
+    def __init__(self, stream: TextIO) -> None:
+        self.stream = stream
+
+    def write(self, message: "Message") -> None:
+        """
+        Write a record.
+
+        :param message: The record formatted by the sink.
+        """
+        self.stream.write(message)
+        self.stream.flush()
+
+    def stop(self) -> None:
+        """Nothing to release, the stream belongs to the caller."""
+
+
+class JsonFileWriter:
+    """
+    Writes records as JSON lines to a file rotated as loguru does.
+
+    The lines go through a file sink of a copy of the logger, which only
+    this writer feeds. Loguru copies loggers without sinks only.
+    """
+
+    def __init__(self, path: Path, rotation: str, retention: str) -> None:
+        self.file_logger = copy.deepcopy(logger)
+        self.file_logger.add(
+            path,
+            format="{message}",
+            rotation=rotation,
+            retention=retention,
+        )
+
+    def write(self, message: "Message") -> None:
+        """
+        Write a record.
+
+        :param message: The record, with its ``record`` attribute.
+        """
+        self.file_logger.info(to_json(message.record))
+
+    def stop(self) -> None:
+        """Close the file."""
+        self.file_logger.remove()
+
+
+class QueuedSink:
+    """
+    Sink handing records to a writer thread.
+
+    The caller only puts the formatted record on an in-process queue. Loguru's
+    own ``enqueue`` pickles every record through a multiprocessing queue,
+    which costs the caller more than writing to a file. The queue is bounded:
+    when the writer falls behind, info and debug records are dropped and
+    counted, warnings and errors wait for room.
+    """
+
+    def __init__(
+        self,
+        writer: LogWriter,
+        queue_size: int = log_settings.queue_size,
+    ) -> None:
+        self.writer = writer
+        self._queue: "queue.Queue[Optional[Message]]" = queue.Queue(queue_size)
+        self._thread = threading.Thread(
+            target=self._run,
+            name="log-writer",
+            daemon=True,
+        )
+        self._thread.start()
+
+    def write(self, message: "Message") -> None:
+        """
+        Queue a record.
+
+        :param message: The record formatted by the sink.
+        """
+        level = message.record["level"]
+        if level.no >= WARNING_LEVEL:
+            self._queue.put(message)
+            return
+        try:
+            self._queue.put_nowait(message)
+        except queue.Full:
+            dropped_records.inc(level=level.name)
+
+    def stop(self) -> None:
+        """Write the queued records and stop the writer."""
+        self._queue.put(None)
+        self._thread.join()
+        self.writer.stop()
+
+    async def complete(self) -> None:
+        """Wait for the queued records to be written."""
+        await asyncio.to_thread(self._queue.join)
+
+    def _run(self) -> None:
+        while True:  # noqa: WPS457
+            message = self._queue.get()
+            try:
+                if message is None:
+                    return
+                self.writer.write(message)
+            except Exception as ex:
+                sys.stderr.write(f"Failed to write a log record: {ex!r}\n")
+            finally:
+                self._queue.task_done()
+
+
+def to_json(record: "Record") -> str:
+    """
+    Serialize a record.
+
+    :param record: The record.
+    :return: A JSON object with the time, level, message, origin, correlation
+        ID and extra fields of the record, and its traceback if any.
+    """
+    extra = dict(record["extra"])
+    document = {
+        "time": record["time"].isoformat(),
+        "level": record["level"].name,
+        "message": record["message"],
+        "correlation_id": extra.pop("correlation_id", NO_CORRELATION_ID),
+        "name": record["name"],
+        "function": record["function"],
+        "line": record["line"],
+        "process": record["process"].id,
+        "extra": extra,
+    }
+    exception = record["exception"]
+    if exception is not None:
+        document["exception"] = "".join(traceback.format_exception(*exception))
+    return orjson.dumps(document, default=str).decode()
+
+
+def _queued(writer: LogWriter) -> LogWriter:
+    """
+    Enqueue a writer, unless disabled.
+
+    :param writer: The writer.
+    :return: The sink writing through ``writer``.
+    """
+    if log_settings.enqueue:
+        return QueuedSink(writer)
+    return writer
+
+
+def add_correlation_id(record: "Record") -> None:
+    """
+    Tag a record with the correlation ID of the current request.
+
+    :param record: The record.
+    """
+    record["extra"]["correlation_id"] = correlation_id.get()
+
+
+def is_sampled(record: "Record") -> bool:
+    """
+    Check whether a record is kept.
+
+    :param record: The record.
+    :return: True for warnings and errors, and for the records of sampled
+        requests.
+    """
+    return record["level"].no >= WARNING_LEVEL or log_sampled.get()
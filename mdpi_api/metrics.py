@@ -0,0 +1,478 @@
+"""
+Application metrics.
+
+A minimal, thread-safe registry of counters, gauges and histograms, rendered
+in the Prometheus text exposition format.
+
+Every worker process has its own registry. To report the whole host from any
+worker, each worker writes a snapshot of its registry to a shared directory
+every few seconds (``MetricsSnapshots``) and ``/metrics`` merges the
+snapshots of the other workers into its own live values: counters and
+histograms are summed, gauges are summed or maxed as they declare. Gauges of
+workers that exited are left out, their counters stay until a new worker
+starts, so counters only drop when a worker is replaced.
+"""
+import bisect
+import os
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import orjson
+from loguru import logger
+
+LabelValues = Tuple[str, ...]
+Sample = Tuple[LabelValues, float]
+# Samples of every metric by name, as written by one worker
+Snapshot = Dict[str, List[Sample]]
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SNAPSHOT_PREFIX = "metrics-"
+
+
+class Metric:
+    """A named family of samples, one per combination of label values."""
+
+    kind = "untyped"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+    ) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[LabelValues, float] = {}
+        self._lock = threading.Lock()
+        registry.register(self)
+
+    def samples(self) -> List[Sample]:
+        """
+        Get a snapshot of the samples.
+
+        :return: Label values and value of every sample.
+        """
+        with self._lock:
+            return sorted(self._values.items())
+
+    def merge(self, sample_lists: Iterable[Iterable[Sample]]) -> List[Sample]:
+        """
+        Merge the samples of several processes, by summing them.
+
+        :param sample_lists: Samples of every process.
+        :return: The merged samples.
+        """
+        merged: Dict[LabelValues, float] = {}
+        for samples in sample_lists:
+            for label_values, sample_value in samples:
+                merged[label_values] = merged.get(label_values, 0) + sample_value
+        return sorted(merged.items())
+
+    def render(self, samples: Optional[List[Sample]] = None) -> str:
+        """
+        Render the metric in the Prometheus text format.
+
+        :param samples: Samples to render, the samples of this process if None.
+        :return: The rendered metric.
+        """
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+        ]
+        if samples is None:
+            samples = self.samples()
+        lines.extend(self._render_samples(samples))
+        return "\n".join(lines)
+
+    def _render_samples(self, samples: List[Sample]) -> List[str]:
+        """
+        Render the sample lines.
+
+        :param samples: The samples.
+        :return: One line per sample.
+        """
+        lines = []
+        for label_values, sample_value in samples:
+            label_set = self._format_labels(label_values)
+            lines.append(f"{self.name}{label_set} {sample_value}")
+        return lines
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        """
+        Get the sample key of a set of labels.
+
+        :param labels: The labels.
+        :return: The label values in the order of the label names.
+        """
+        return tuple(str(labels[labelname]) for labelname in self.labelnames)
+
+    def _format_labels(
+        self,
+        label_values: LabelValues,
+        labelnames: Optional[Sequence[str]] = None,
+    ) -> str:
+        """
+        Format label values as a Prometheus label set.
+
+        :param label_values: The label values.
+        :param labelnames: The label names, those of the metric if None.
+        :return: The label set, empty for metrics without labels.
+        """
+        names = self.labelnames if labelnames is None else labelnames
+        if not names:
+            return ""
+        pairs = ",".join(
+            f'{labelname}="{label_value}"'
+            for labelname, label_value in zip(names, label_values)
+        )
+        return f"{{{pairs}}}"
+
+
+class Counter(Metric):
+    """A value that only goes up."""
+
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        """
+        Increment the counter.
+
+        :param amount: The increment.
+        :param labels: The labels of the sample.
+        """
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    """
+    A value that can go up and down.
+
+    Gauges of several processes are summed, e.g. queue depths, or with
+    ``aggregation="max"`` the highest value is reported, e.g. states.
+    """
+
+    kind = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        aggregation: str = "sum",
+    ) -> None:
+        self.aggregation = aggregation
+        super().__init__(name, documentation, labelnames)
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        """
+        Increment the gauge, decrement with a negative amount.
+
+        :param amount: The increment.
+        :param labels: The labels of the sample.
+        """
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def merge(self, sample_lists: Iterable[Iterable[Sample]]) -> List[Sample]:
+        """
+        Merge the samples of several processes.
+
+        :param sample_lists: Samples of every process.
+        :return: The merged samples.
+        """
+        if self.aggregation == "sum":
+            return super().merge(sample_lists)
+        merged: Dict[LabelValues, float] = {}
+        for samples in sample_lists:
+            for label_values, sample_value in samples:
+                merged[label_values] = max(
+                    merged.get(label_values, sample_value),
+                    sample_value,
+                )
+        return sorted(merged.items())
+
+    def set(self, metric_value: float, **labels: str) -> None:  # noqa: WPS125
+        """
+        Set the gauge.
+
+        :param metric_value: The new value.
+        :param labels: The labels of the sample.
+        """
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = metric_value
+
+
+class Histogram(Metric):
+    """
+    Distribution of observed values in cumulative buckets.
+
+    Observing is a bisect and two additions. Samples are flattened to one
+    per bucket and one for the sum, keyed by the label values followed by
+    the upper bound of the bucket or ``sum``, so they merge like counters.
+    """
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> None:
+        self.buckets = tuple(sorted(buckets))
+        self._bounds = (*map(str, self.buckets), "+Inf")
+        # Observations per bucket, not cumulative, and their sum last
+        self._counts: Dict[LabelValues, List[float]] = {}
+        super().__init__(name, documentation, labelnames)
+
+    def observe(self, amount: float, **labels: str) -> None:
+        """
+        Observe a value.
+
+        :param amount: The value.
+        :param labels: The labels of the sample.
+        """
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, amount)
+        with self._lock:
+            counts = self._counts.get(key)
+            if counts is None:
+                counts = [0 for _ in range(len(self._bounds) + 1)]
+                self._counts[key] = counts
+            counts[index] += 1
+            counts[-1] += amount
+
+    def samples(self) -> List[Sample]:
+        """
+        Get a snapshot of the samples.
+
+        :return: Label values, with the bucket bound or ``sum`` appended, and
+            value of every sample.
+        """
+        with self._lock:
+            counts = {
+                key: list(bucket_counts) for key, bucket_counts in self._counts.items()
+            }
+        samples = []
+        for label_values, bucket_counts in sorted(counts.items()):
+            for bound, count in zip(self._bounds, bucket_counts):
+                samples.append((label_values + (bound,), count))
+            samples.append((label_values + ("sum",), bucket_counts[-1]))
+        return samples
+
+    def _render_samples(self, samples: List[Sample]) -> List[str]:
+        """
+        Render the cumulative bucket, sum and count lines.
+
+        :param samples: The samples.
+        :return: The lines of every label set.
+        """
+        by_labels: Dict[LabelValues, Dict[str, float]] = {}
+        for sample_key, sample_value in samples:
+            label_samples = by_labels.setdefault(sample_key[:-1], {})
+            label_samples[sample_key[-1]] = sample_value
+        bucket_labelnames = self.labelnames + ("le",)
+        lines = []
+        for label_values, sample_values in sorted(by_labels.items()):
+            cumulative: float = 0
+            for bound in self._bounds:
+                cumulative += sample_values.get(bound, 0)
+                bucket_label_values = (*label_values, bound)
+                label_set = self._format_labels(bucket_label_values, bucket_labelnames)
+                lines.append(f"{self.name}_bucket{label_set} {cumulative}")
+            label_set = self._format_labels(label_values)
+            total = sample_values.get("sum", 0)
+            lines.append(f"{self.name}_sum{label_set} {total}")
+            lines.append(f"{self.name}_count{label_set} {cumulative}")
+        return lines
+
+
+class Registry:
+    """Collection of all metrics of the process."""
+
+    def __init__(self) -> None:
+        self._metrics: Dict[str, Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: Metric) -> None:
+        """
+        Add a metric to the registry.
+
+        :param metric: The metric.
+
+        :raises ValueError: If a metric with the same name is registered.
+        """
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} is already registered.")
+            self._metrics[metric.name] = metric
+
+    def snapshot(self) -> Snapshot:
+        """
+        Get the samples of all metrics.
+
+        :return: Samples by metric name.
+        """
+        return {metric.name: metric.samples() for metric in self._list()}
+
+    def render(self, snapshots: Sequence[Snapshot] = ()) -> str:
+        """
+        Render all metrics in the Prometheus text format.
+
+        :param snapshots: Snapshots of other processes, merged into the
+            samples of this one.
+        :return: The rendered metrics.
+        """
+        rendered = []
+        for metric in self._list():
+            samples = metric.samples()
+            if snapshots:
+                other_samples = [
+                    snapshot.get(metric.name, []) for snapshot in snapshots
+                ]
+                samples = metric.merge([samples, *other_samples])
+            metric_text = metric.render(samples)
+            rendered.append(f"{metric_text}\n")
+        return "".join(rendered)
+
+    def kind_of(self, name: str) -> Optional[str]:
+        """
+        Get the kind of a registered metric.
+
+        :param name: The name of the metric.
+        :return: The kind, None if no such metric is registered.
+        """
+        metric = self._metrics.get(name)
+        return None if metric is None else metric.kind
+
+    def _list(self) -> List[Metric]:
+        """
+        List the registered metrics.
+
+        :return: The metrics, in registration order.
+        """
+        with self._lock:
+            return list(self._metrics.values())
+
+
+class MetricsSnapshots:
+    """
+    Snapshots of the registries of all workers in a shared directory.
+
+    Reading is only enabled once this worker writes its own snapshots, so a
+    single process (e.g. in tests) reports its own metrics only.
+    """
+
+    def __init__(self, metrics_registry: "Registry", pid: Optional[int] = None) -> None:
+        self.registry = metrics_registry
+        self.pid = os.getpid() if pid is None else pid
+        self.directory: Optional[Path] = None
+
+    def enable(self, directory: Path) -> None:
+        """
+        Start sharing snapshots in a directory.
+
+        Snapshots of workers that exited are removed.
+
+        :param directory: The shared directory.
+        """
+        directory.mkdir(parents=True, exist_ok=True)
+        for path in directory.glob(f"{SNAPSHOT_PREFIX}*.json"):
+            if not _is_alive(_snapshot_pid(path)):
+                path.unlink(missing_ok=True)
+        self.directory = directory
+        self.write()
+
+    def disable(self) -> None:
+        """Write a last snapshot and stop sharing snapshots."""
+        if self.directory is not None:
+            self.write()
+        self.directory = None
+
+    def write(self) -> None:
+        """Write the snapshot of this worker, readers never see half of it."""
+        if self.directory is None:
+            return
+        path = self.directory / f"{SNAPSHOT_PREFIX}{self.pid}.json"
+        temporary_path = path.with_suffix(".tmp")
+        temporary_path.write_bytes(orjson.dumps(self.registry.snapshot()))
+        os.replace(temporary_path, path)
+
+    def read_others(self) -> List[Snapshot]:
+        """
+        Read the snapshots of the other workers.
+
+        :return: The snapshots, without the gauges of workers that exited.
+        """
+        if self.directory is None:
+            return []
+        snapshots = []
+        for path in self.directory.glob(f"{SNAPSHOT_PREFIX}*.json"):
+            pid = _snapshot_pid(path)
+            if pid == self.pid:
+                continue
+            try:
+                raw_snapshot = orjson.loads(path.read_bytes())
+            except (OSError, orjson.JSONDecodeError) as ex:
+                logger.warning(f"Skipping metrics snapshot {path}: {ex}")
+                continue
+            snapshots.append(self._parse(raw_snapshot, alive=_is_alive(pid)))
+        return snapshots
+
+    def _parse(self, raw_snapshot: Dict[str, Any], alive: bool) -> Snapshot:
+        """
+        Parse a snapshot read from a file.
+
+        :param raw_snapshot: The decoded JSON.
+        :param alive: Whether the worker that wrote it still runs.
+        :return: The snapshot.
+        """
+        snapshot: Snapshot = {}
+        for name, samples in raw_snapshot.items():
+            if not alive and self.registry.kind_of(name) == Gauge.kind:
+                continue
+            snapshot[name] = [
+                (tuple(label_values), sample_value)
+                for label_values, sample_value in samples
+            ]
+        return snapshot
+
+
+def _snapshot_pid(path: Path) -> int:
+    """
+    Get the PID of the worker that wrote a snapshot.
+
+    :param path: Path of the snapshot.
+    :return: The PID, 0 if the name has none.
+    """
+    pid = path.stem.removeprefix(SNAPSHOT_PREFIX)
+    return int(pid) if pid.isdigit() else 0
+
+
+def _is_alive(pid: int) -> bool:
+    """
+    Check whether a process runs.
+
+    :param pid: The PID.
+    :return: True if the process exists.
+    """
+    if pid <= 0:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+registry = Registry()
+metrics_snapshots = MetricsSnapshots(registry)
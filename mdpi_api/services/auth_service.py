@@ -35,7 +35,7 @@ class AuthService:
 
         user_dao = UserDAO(self.session)
         current_user = await user_dao.get_by_id(uuid.UUID(user_id))
-        logger.info(f"current_user: {current_user}")
+        logger.debug("current_user: {0}", current_user)
 
         if current_user is not None:
             request.session["user_id"] = str(current_user.id)
@@ -37,6 +37,14 @@ class CityService:
             logger.error(f"Failed to get cities: {exception}")
             raise exception
 
+    async def get_catalog_version(self) -> str:
+        """
+        Get the version of the cities catalog.
+
+        :return: Catalog version.
+        """
+        return await self.city_dao.get_catalog_version()
+
     async def get_favorite_cities(self, user_id: str) -> List[FavoriteCityDTO]:
         """
         Get all favorite cities for a user.
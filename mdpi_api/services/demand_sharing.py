@@ -0,0 +1,249 @@
+"""
+Demand of the whole cluster for the refresh plan.
+
+Every worker counts the weather requests it serves in its demand tracker.
+The ``DemandPublisher`` of every worker saves a snapshot of that demand,
+with the worker's stream subscriptions, to the ``demand_snapshots`` table,
+and the leader merges the snapshots of all workers before it plans the
+refreshes. Snapshots outlive the workers that published them, so the demand
+survives restarts and leader changes until it decays.
+"""
+import asyncio
+import os
+import socket
+from contextlib import suppress
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, Optional, Set
+
+from loguru import logger
+from mdpi_api.db.dao.city_dao import CityDAO
+from mdpi_api.db.dao.demand_snapshot_dao import DemandSnapshotDAO
+from mdpi_api.db.models.demand_snapshot_model import DemandSnapshotModel
+from mdpi_api.services.demand_tracker import (
+    DemandSnapshot,
+    DemandTracker,
+    demand_tracker,
+)
+from mdpi_api.services.weather_hub import WeatherHub, weather_hub
+from mdpi_api.settings import settings
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+refresh_settings = settings.weather_refresh
+
+# Snapshots are kept until their counts decayed to 1/16
+RETENTION_HALF_LIVES = 4
+# Subscriptions are live, they count while their worker keeps publishing
+LIVE_PUBLISH_INTERVALS = 3
+
+
+class ClusterDemand:
+    """
+    The demand of all workers, as the refresh plan sees it.
+
+    Every stream subscription counts as a request, and cities somebody
+    allowed notifications for are never cold, so their changes are noticed.
+    """
+
+    def __init__(
+        self,
+        tracker: DemandTracker,
+        subscriptions: Dict[int, int],
+        notified: Set[int],
+    ) -> None:
+        self.tracker = tracker
+        self.subscriptions = subscriptions
+        self.notified = notified
+
+    def city_ids(self) -> Set[int]:
+        """
+        Get the cities in demand.
+
+        :return: IDs of the cities.
+        """
+        requested = self.tracker.snapshot().city_ids
+        return set(requested) | set(self.subscriptions) | self.notified
+
+    def estimate(self, city_id: int) -> float:
+        """
+        Estimate the demand of a city.
+
+        :param city_id: The ID of the city.
+        :return: The estimated demand.
+        """
+        demand = self.tracker.estimate(city_id) + self.subscriptions.get(city_id, 0)
+        if city_id in self.notified:
+            return max(demand, refresh_settings.cold_demand)
+        return demand
+
+
+class DemandPublisher:
+    """Publishes the demand of the worker periodically."""
+
+    def __init__(
+        self,
+        interval: float = refresh_settings.demand_publish_seconds,
+    ) -> None:
+        self.interval = interval
+        self._session_factory: Optional[async_sessionmaker[AsyncSession]] = None
+        self._task: Optional["asyncio.Task[None]"] = None
+
+    def start(self, session_factory: async_sessionmaker[AsyncSession]) -> None:
+        """
+        Start publishing in the background.
+
+        :param session_factory: The database session factory.
+        """
+        self._session_factory = session_factory
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop publishing, after a last snapshot for the next leader."""
+        if self._task is None:
+            return
+        self._task.cancel()
+        with suppress(asyncio.CancelledError):
+            await self._task
+        self._task = None
+        await self._publish()
+
+    async def _run(self) -> None:
+        """Publish the demand every interval."""
+        while True:  # noqa: WPS457
+            await asyncio.sleep(self.interval)
+            await self._publish()
+
+    async def _publish(self) -> None:
+        """Publish the demand, a failure waits for the next interval."""
+        if self._session_factory is None:
+            return
+        try:
+            async with self._session_factory() as session:
+                await publish_demand(session, worker_id())
+        except Exception as exception:
+            logger.warning(f"Failed to publish demand: {exception}")
+
+
+def worker_id() -> str:
+    """
+    Identify the worker in the cluster.
+
+    :return: Host name and process ID.
+    """
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+async def publish_demand(
+    session: AsyncSession,
+    worker: str,
+    tracker: DemandTracker = demand_tracker,
+    hub: WeatherHub = weather_hub,
+) -> None:
+    """
+    Save the demand of a worker for the leader.
+
+    :param session: The database session.
+    :param worker: The ID of the worker.
+    :param tracker: The demand tracker of the worker.
+    :param hub: The weather hub with the worker's stream subscriptions.
+    """
+    snapshot = tracker.snapshot()
+    subscriptions = hub.subscribed_cities()
+    await DemandSnapshotDAO(session).save(
+        DemandSnapshotModel(
+            worker_id=worker,
+            sketch=snapshot.sketch,
+            city_ids=snapshot.city_ids,
+            subscriptions={
+                str(city_id): count for city_id, count in subscriptions.items()
+            },
+            published_at=datetime.now(timezone.utc),
+        ),
+    )
+
+
+async def load_cluster_demand(
+    session: AsyncSession,
+    tracker: DemandTracker = demand_tracker,
+    hub: WeatherHub = weather_hub,
+) -> ClusterDemand:
+    """
+    Merge the demand of all workers.
+
+    The worker's own demand is taken from its tracker and hub, those of the
+    other workers from their latest snapshots. Snapshots too old to matter
+    are deleted.
+
+    :param session: The database session.
+    :param tracker: The demand tracker of the worker.
+    :param hub: The weather hub with the worker's stream subscriptions.
+    :return: The demand of the cluster.
+    """
+    now = datetime.now(timezone.utc)
+    half_life = timedelta(hours=refresh_settings.demand_half_life_hours)
+    retained_since = now - half_life * RETENTION_HALF_LIVES
+    snapshot_dao = DemandSnapshotDAO(session)
+    await snapshot_dao.delete_before(retained_since)
+    own_worker = worker_id()
+    snapshots = [
+        snapshot
+        for snapshot in await snapshot_dao.get_since(retained_since)
+        if snapshot.worker_id != own_worker
+    ]
+
+    merged = DemandTracker()
+    merged.merge(tracker.snapshot(), 0)
+    subscriptions = _merge_snapshots(merged, snapshots, now)
+    for city_id, count in hub.subscribed_cities().items():
+        subscriptions[city_id] = subscriptions.get(city_id, 0) + count
+    notified: Set[int] = set()
+    if settings.notifications.enabled:
+        notified = await CityDAO(session).get_notified_city_ids()
+    logger.info(
+        "Planning with the demand of {0} workers.",
+        len(snapshots) + 1,
+    )
+    return ClusterDemand(merged, subscriptions, notified)
+
+
+def _merge_snapshots(
+    merged: DemandTracker,
+    snapshots: Iterable[DemandSnapshotModel],
+    now: datetime,
+) -> Dict[int, int]:
+    """
+    Merge the snapshots of other workers into a tracker.
+
+    :param merged: The tracker.
+    :param snapshots: The snapshots.
+    :param now: The current time.
+    :return: Subscriptions per city ID of the workers still publishing.
+    """
+    live_since = now - timedelta(
+        seconds=refresh_settings.demand_publish_seconds * LIVE_PUBLISH_INTERVALS,
+    )
+    subscriptions: Dict[int, int] = {}
+    for snapshot in snapshots:
+        published_at = _aware_utc(snapshot.published_at)
+        age = (now - published_at).total_seconds()
+        merged.merge(DemandSnapshot(snapshot.sketch, snapshot.city_ids), age)
+        if published_at < live_since:
+            continue
+        for city_key, count in snapshot.subscriptions.items():
+            city_id = int(city_key)
+            subscriptions[city_id] = subscriptions.get(city_id, 0) + count
+    return subscriptions
+
+
+def _aware_utc(moment: datetime) -> datetime:
+    """
+    Attach UTC to datetimes read without a time zone, e.g. from SQLite.
+
+    :param moment: The datetime.
+    :return: The datetime with a time zone.
+    """
+    if moment.tzinfo is None:
+        return moment.replace(tzinfo=timezone.utc)
+    return moment
+
+
+demand_publisher = DemandPublisher()
@@ -0,0 +1,244 @@
+import hashlib
+import threading
+import time
+from array import array
+from typing import Callable, List, NamedTuple, Set
+
+from loguru import logger
+from mdpi_api.metrics import Counter, Gauge
+from mdpi_api.settings import settings
+
+refresh_settings = settings.weather_refresh
+
+INDEX_SIZE = 4
+SECONDS_PER_HOUR = 3600
+DECAY_INTERVAL_SECONDS = 60
+
+demand_requests = Counter(
+    "weather_demand_requests_total",
+    "Weather requests recorded by the demand tracker.",
+)
+demand_tracked_cities = Gauge(
+    "weather_demand_tracked_cities",
+    "Cities with recent weather requests.",
+)
+
+
+class DemandSnapshot(NamedTuple):
+    """The demand tracked by a worker, as shared with the other workers."""
+
+    # Cells of the count-min sketch, row after row
+    sketch: bytes
+    city_ids: List[int]
+
+
+class CountMinSketch:
+    """
+    Approximate per key counts in fixed memory.
+
+    Every key is counted in one cell of each row. Collisions only ever add
+    to a cell, so the smallest of a key's cells is the closest estimate,
+    and it never underestimates.
+    """
+
+    def __init__(self, width: int, depth: int) -> None:
+        self.width = width
+        self.depth = depth
+        empty_row = array("d", [0]) * width
+        self._rows = [array("d", empty_row) for _ in range(depth)]
+
+    def add(self, key: int, count: float = 1) -> None:
+        """
+        Count a key.
+
+        :param key: The key.
+        :param count: How many times to count it.
+        """
+        for row, index in zip(self._rows, self._indexes(key)):
+            row[index] += count
+
+    def estimate(self, key: int) -> float:
+        """
+        Estimate the count of a key.
+
+        :param key: The key.
+        :return: The estimated count.
+        """
+        cells = zip(self._rows, self._indexes(key))
+        return min(row[index] for row, index in cells)
+
+    def scale(self, factor: float) -> None:
+        """
+        Multiply all counts, e.g. to let old counts decay.
+
+        :param factor: The factor.
+        """
+        for row in self._rows:
+            for index in range(self.width):
+                row[index] *= factor
+
+    @property
+    def byte_size(self) -> int:
+        """
+        Size of the serialized counts.
+
+        :return: Size in bytes.
+        """
+        return self.width * self.depth * self._rows[0].itemsize
+
+    def to_bytes(self) -> bytes:
+        """
+        Serialize the counts.
+
+        :return: The cells, row after row.
+        """
+        return b"".join(row.tobytes() for row in self._rows)
+
+    def add_bytes(self, cells: bytes, factor: float = 1) -> None:
+        """
+        Add the counts of a sketch of the same size, e.g. another worker's.
+
+        Sketches with the same cells per key add up to the sketch of all
+        their keys.
+
+        :param cells: The cells of the other sketch, from ``to_bytes``.
+        :param factor: Multiplies the added counts.
+        """
+        other = array("d")
+        other.frombytes(cells)
+        for row_index, row in enumerate(self._rows):
+            offset = row_index * self.width
+            for index in range(self.width):
+                row[index] += other[offset + index] * factor
+
+    def _indexes(self, key: int) -> List[int]:
+        """
+        Get the cell of a key in every row.
+
+        :param key: The key.
+        :return: Cell index per row.
+        """
+        digest = hashlib.blake2b(
+            str(key).encode(),
+            digest_size=INDEX_SIZE * self.depth,
+        ).digest()
+        return [
+            int.from_bytes(digest[offset : offset + INDEX_SIZE], "big") % self.width
+            for offset in range(0, len(digest), INDEX_SIZE)
+        ]
+
+
+class DemandTracker:
+    """
+    Tracks how often the weather of every city is requested.
+
+    Counts decay exponentially with a configurable half life, so the
+    estimate of a city is roughly its request count over the last few half
+    lives. The tracker counts the requests of one worker; workers share
+    their ``snapshot`` and the leader ``merge``s them into the demand of the
+    cluster (``mdpi_api.services.demand_sharing``).
+    """
+
+    def __init__(
+        self,
+        width: int = refresh_settings.sketch_width,
+        depth: int = refresh_settings.sketch_depth,
+        half_life_hours: float = refresh_settings.demand_half_life_hours,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self._sketch = CountMinSketch(width, depth)
+        self._city_ids: Set[int] = set()
+        self._half_life = half_life_hours * SECONDS_PER_HOUR
+        self._clock = clock
+        self._decayed_at = clock()
+        self._lock = threading.Lock()
+
+    def record(self, city_id: int) -> None:
+        """
+        Record a weather request for a city.
+
+        :param city_id: The ID of the city.
+        """
+        with self._lock:
+            self._decay()
+            self._sketch.add(city_id)
+            self._city_ids.add(city_id)
+        demand_requests.inc()
+
+    def estimate(self, city_id: int) -> float:
+        """
+        Estimate the (decayed) number of requests for a city.
+
+        :param city_id: The ID of the city.
+        :return: The estimated demand.
+        """
+        with self._lock:
+            self._decay()
+            return self._sketch.estimate(city_id)
+
+    def city_ids(self) -> Set[int]:
+        """
+        Get the cities that still have demand.
+
+        Cities whose demand decayed below the cold threshold are forgotten,
+        which keeps the set as small as the set of active cities.
+
+        :return: IDs of the cities.
+        """
+        with self._lock:
+            self._forget_cold()
+            demand_tracked_cities.set(len(self._city_ids))
+            return set(self._city_ids)
+
+    def snapshot(self) -> DemandSnapshot:
+        """
+        Take the current demand, to be shared with the other workers.
+
+        :return: The demand.
+        """
+        with self._lock:
+            self._forget_cold()
+            return DemandSnapshot(self._sketch.to_bytes(), sorted(self._city_ids))
+
+    def merge(self, snapshot: DemandSnapshot, age_seconds: float) -> None:
+        """
+        Add the demand tracked by another worker.
+
+        :param snapshot: The demand of the other worker.
+        :param age_seconds: How long ago the snapshot was taken, its counts
+            decay for that long.
+        """
+        if len(snapshot.sketch) != self._sketch.byte_size:
+            # Taken with other sketch settings, the cells do not line up
+            logger.warning(
+                "Skipping demand snapshot of {0} bytes, expected {1}.",
+                len(snapshot.sketch),
+                self._sketch.byte_size,
+            )
+            return
+        factor = 0.5 ** (max(age_seconds, 0) / self._half_life)
+        with self._lock:
+            self._decay()
+            self._sketch.add_bytes(snapshot.sketch, factor)
+            self._city_ids.update(snapshot.city_ids)
+
+    def _forget_cold(self) -> None:
+        """Let the counts decay and forget the cities that became cold."""
+        self._decay()
+        self._city_ids = {
+            city_id
+            for city_id in self._city_ids
+            if self._sketch.estimate(city_id) >= refresh_settings.cold_demand
+        }
+
+    def _decay(self) -> None:
+        """Let the counts decay, at most once a minute."""
+        now = self._clock()
+        elapsed = now - self._decayed_at
+        if elapsed < DECAY_INTERVAL_SECONDS:
+            return
+        self._sketch.scale(0.5 ** (elapsed / self._half_life))
+        self._decayed_at = now
+
+
+demand_tracker = DemandTracker()
@@ -0,0 +1,263 @@
+import asyncio
+import csv
+import enum
+import io
+import tempfile
+from datetime import datetime, timezone
+from functools import lru_cache
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, AsyncIterator, Dict, List, Optional, Sequence
+
+import aiofiles
+import pydantic_core
+from loguru import logger
+from mdpi_api.db.dao.weather_dao import WeatherDAO, WeatherRows
+from mdpi_api.lazy_imports import LazyModule
+from mdpi_api.settings import settings
+from sqlalchemy import Row
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+if TYPE_CHECKING:
+    import polars as pl
+else:
+    pl = LazyModule("polars")  # noqa: WPS440
+
+export_settings = settings.export
+
+EXPORT_COLUMNS = ("id", "city_id", "created_at", "data")
+
+
+@lru_cache(maxsize=None)
+def parquet_schema() -> "pl.Schema":
+    """
+    Get the schema of Parquet exports.
+
+    Built on first use, so that importing the service does not import Polars.
+
+    :return: The schema.
+    """
+    return pl.Schema(
+        {
+            "id": pl.Int64(),
+            "city_id": pl.Int64(),
+            "created_at": pl.Datetime(time_zone="UTC"),
+            "data": pl.Utf8(),
+        },
+    )
+
+
+class ExportFormatEnum(str, enum.Enum):  # noqa: WPS600
+    """Supported weather export formats."""
+
+    NDJSON = "ndjson"
+    CSV = "csv"
+    PARQUET = "parquet"
+
+    @property
+    def media_type(self) -> str:
+        """
+        Media type of the exported file.
+
+        :return: media type.
+        """
+        return {
+            ExportFormatEnum.NDJSON: "application/x-ndjson",
+            ExportFormatEnum.CSV: "text/csv",
+            ExportFormatEnum.PARQUET: "application/vnd.apache.parquet",
+        }[self]
+
+
+class WeatherExportService:
+    """
+    Class for streaming weather rows into export files.
+
+    The service owns its database session instead of using the request scoped
+    one, because the export is produced while the response is being sent.
+    """
+
+    def __init__(
+        self,
+        session_factory: async_sessionmaker[AsyncSession],
+        chunk_size: int = export_settings.chunk_size,
+    ):
+        self.session_factory = session_factory
+        self.chunk_size = chunk_size
+
+    async def export(
+        self,
+        export_format: ExportFormatEnum,
+        *,
+        city_ids: Optional[Sequence[int]] = None,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+    ) -> AsyncIterator[bytes]:
+        """
+        Export weather rows in the requested format.
+
+        :param export_format: The export format.
+        :param city_ids: Only export these cities, all cities if None.
+        :param start: Start of the range (inclusive), unbounded if None.
+        :param end: End of the range (exclusive), unbounded if None.
+        :yield: Chunks of the exported file.
+        """
+        logger.info(
+            "Exporting weather as {0} [cities: {1}, from: {2}, to: {3}]",
+            export_format.value,
+            city_ids,
+            start,
+            end,
+        )
+        async with self.session_factory() as session:
+            chunks = WeatherDAO(session).stream_weather(
+                city_ids=city_ids,
+                start=start,
+                end=end,
+                chunk_size=self.chunk_size,
+            )
+            if export_format == ExportFormatEnum.NDJSON:
+                encoded = self._encode_ndjson(chunks)
+            elif export_format == ExportFormatEnum.CSV:
+                encoded = self._encode_csv(chunks)
+            else:
+                encoded = self._encode_parquet(chunks)
+            async for data in encoded:
+                yield data
+
+    @staticmethod
+    async def _encode_ndjson(
+        chunks: AsyncIterator[WeatherRows],
+    ) -> AsyncIterator[bytes]:
+        """
+        Encode rows as newline delimited JSON.
+
+        :param chunks: Chunks of weather rows.
+        :yield: Encoded chunks.
+        """
+        async for chunk in chunks:
+            yield b"".join(
+                pydantic_core.to_json(_row_to_dict(row)) + b"\n"  # noqa: WPS336
+                for row in chunk
+            )
+
+    @staticmethod
+    async def _encode_csv(
+        chunks: AsyncIterator[WeatherRows],
+    ) -> AsyncIterator[bytes]:
+        """
+        Encode rows as CSV with the weather data as a JSON column.
+
+        :param chunks: Chunks of weather rows.
+        :yield: Encoded chunks.
+        """
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(EXPORT_COLUMNS)
+        async for chunk in chunks:
+            writer.writerows(
+                (
+                    row.id,
+                    row.city_id,
+                    _as_utc(row.created_at).isoformat(),
+                    pydantic_core.to_json(row.data).decode(),
+                )
+                for row in chunk
+            )
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+        if buffer.tell():
+            # Only the header was written, the export is empty
+            yield buffer.getvalue().encode()
+
+    async def _encode_parquet(
+        self,
+        chunks: AsyncIterator[WeatherRows],
+    ) -> AsyncIterator[bytes]:
+        """
+        Encode rows as a Parquet file.
+
+        Parquet keeps its metadata in a footer, so the file can not be sent
+        before the last row is known. Every chunk is spooled to disk as an
+        Arrow IPC file and the Polars streaming engine then sinks them into
+        a single Parquet file, which is streamed to the client. Memory only
+        ever holds one chunk.
+
+        :param chunks: Chunks of weather rows.
+        :yield: Encoded chunks.
+        """
+        with tempfile.TemporaryDirectory(prefix="weather-export-") as tmp_dir:
+            spool_dir = Path(tmp_dir)
+            spooled: List[Path] = []
+            async for chunk in chunks:
+                chunk_number = len(spooled)
+                path = spool_dir / f"chunk-{chunk_number}.arrow"
+                frame = pl.DataFrame(
+                    [_row_to_dict(row, encode_data=True) for row in chunk],
+                    schema=parquet_schema(),
+                    orient="row",
+                )
+                await asyncio.to_thread(frame.write_ipc, path)
+                spooled.append(path)
+
+            parquet_path = spool_dir / "export.parquet"
+            await asyncio.to_thread(_sink_parquet, spooled, parquet_path)
+            async for data in _read_file(parquet_path):
+                yield data
+
+
+def _row_to_dict(row: Row[Any], encode_data: bool = False) -> Dict[str, Any]:
+    """
+    Convert a weather row to an export record.
+
+    :param row: The weather row.
+    :param encode_data: Whether to encode the weather data as a JSON string.
+    :return: The export record.
+    """
+    return {
+        "id": row.id,
+        "city_id": row.city_id,
+        "created_at": _as_utc(row.created_at),
+        "data": pydantic_core.to_json(row.data).decode() if encode_data else row.data,
+    }
+
+
+def _as_utc(timestamp: datetime) -> datetime:
+    """
+    Mark a stored timestamp as UTC.
+
+    Timestamps are stored in UTC without a timezone, exports state it.
+
+    :param timestamp: The stored timestamp.
+    :return: The timezone aware timestamp.
+    """
+    if timestamp.tzinfo is None:
+        return timestamp.replace(tzinfo=timezone.utc)
+    return timestamp.astimezone(timezone.utc)
+
+
+def _sink_parquet(spooled: List[Path], parquet_path: Path) -> None:
+    """
+    Combine spooled IPC chunks into one Parquet file.
+
+    :param spooled: Paths of the spooled chunks.
+    :param parquet_path: Path of the Parquet file to write.
+    """
+    if not spooled:
+        pl.DataFrame(schema=parquet_schema()).write_parquet(parquet_path)
+        return
+    pl.scan_ipc(spooled).sink_parquet(parquet_path)
+
+
+async def _read_file(path: Path) -> AsyncIterator[bytes]:
+    """
+    Read a file in chunks without blocking the event loop.
+
+    :param path: Path of the file.
+    :yield: Chunks of the file.
+    """
+    async with aiofiles.open(path, "rb") as export_file:
+        while True:
+            data = await export_file.read(export_settings.file_chunk_size)
+            if not data:
+                return
+            yield data
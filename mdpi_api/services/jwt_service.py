@@ -6,12 +6,12 @@ from typing import Dict
 import jwt
 from fastapi import status
 from loguru import logger
-from mdpi_api.settings import Settings
+from mdpi_api.settings import settings
 from mdpi_api.web.api.errors.auth import JWTError
 from mdpi_api.web.api.schemas.auth import DecodedTokenResponse
 from pydantic import UUID4
 
-jwt_settings = Settings().jwt
+jwt_settings = settings.jwt
 
 
 class JWTTokenTypeEnum(enum.Enum):
@@ -0,0 +1,105 @@
+from typing import Optional
+
+from loguru import logger
+from mdpi_api.settings import settings
+from sqlalchemy import func, select, text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+scheduler_settings = settings.scheduler
+
+
+class LeaderElection:
+    """
+    Elects a single leader among all workers sharing a database.
+
+    On PostgreSQL the leader holds a session level advisory lock on a
+    dedicated connection. The lock is released when the leader shuts down
+    or its connection drops, and another worker picks it up on its next try.
+    Other databases have no cluster wide lock, so every process is its own
+    leader and duplicate runs are left to the scheduler run ledger.
+    """
+
+    def __init__(
+        self,
+        engine: AsyncEngine,
+        lock_key: int = scheduler_settings.leader_lock_key,
+    ):
+        self.engine = engine
+        self.lock_key = lock_key
+        self.is_leader = False
+        self._connection: Optional[AsyncConnection] = None
+
+    async def try_acquire(self) -> bool:
+        """
+        Become the leader, or confirm the leadership is still held.
+
+        :return: True if this worker is the leader.
+        """
+        if self.engine.dialect.name != "postgresql":
+            self.is_leader = True
+            return self.is_leader
+        if self._connection is None or not await self._check_connection():
+            self._connection = await self._acquire_lock()
+        self.is_leader = self._connection is not None
+        return self.is_leader
+
+    async def release(self) -> None:
+        """Give up the leadership."""
+        self.is_leader = False
+        if self._connection is None:
+            return
+        connection = self._connection
+        self._connection = None
+        try:
+            await connection.execute(
+                select(func.pg_advisory_unlock(self.lock_key)),
+            )
+            await connection.commit()
+        except Exception as exception:
+            logger.warning(f"Failed to release the leader lock: {exception}")
+            await connection.invalidate()
+        finally:
+            await connection.close()
+
+    async def _acquire_lock(self) -> Optional[AsyncConnection]:
+        """
+        Try to take the advisory lock on a new connection.
+
+        :return: The connection holding the lock, None if another worker holds it.
+
+        :raises Exception: If the lock query fails.
+        """
+        connection = await self.engine.connect()
+        try:
+            acquired = await connection.scalar(
+                select(func.pg_try_advisory_lock(self.lock_key)),
+            )
+            await connection.commit()
+        except Exception as exception:
+            await connection.close()
+            raise exception
+        if acquired:
+            return connection
+        await connection.close()
+        return None
+
+    async def _check_connection(self) -> bool:
+        """
+        Check that the connection holding the lock is still alive.
+
+        :return: True if the lock is still held.
+        """
+        if self._connection is None:
+            return False
+        try:
+            await self._connection.execute(text("SELECT 1"))
+            await self._connection.commit()
+        except Exception as exception:
+            logger.warning(f"Lost the leader lock connection: {exception}")
+            connection = self._connection
+            self._connection = None
+            # The lock died with the connection, it must not go back to the pool
+            await connection.invalidate()
+            await connection.close()
+            return False
+        return True
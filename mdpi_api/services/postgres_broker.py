@@ -0,0 +1,128 @@
+import asyncio
+from contextlib import suppress
+from typing import Any, Optional, Sequence
+
+from loguru import logger
+from mdpi_api.services.weather_hub import MessageHandler, WeatherBroker, WeatherMessage
+from mdpi_api.settings import settings
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+# PostgreSQL refuses notification payloads of 8000 bytes and more
+NOTIFY_PAYLOAD_LIMIT = 8000
+
+stream_settings = settings.weather_stream
+
+
+class PostgresBroker(WeatherBroker):
+    """
+    Delivers published weather to the workers sharing a PostgreSQL database.
+
+    Every city's weather is sent as a notification on a channel, which
+    every worker listens on with a dedicated connection. A lost connection
+    is opened again; weather published meanwhile is missed, its clients get
+    the next refresh.
+    """
+
+    def __init__(
+        self,
+        engine: AsyncEngine,
+        channel: str = stream_settings.channel,
+        reconnect_delay: float = stream_settings.reconnect_seconds,
+    ) -> None:
+        self.engine = engine
+        self.channel = channel
+        self.reconnect_delay = reconnect_delay
+        self._handler: Optional[MessageHandler] = None
+        self._task: Optional["asyncio.Task[None]"] = None
+
+    async def start(self, handler: MessageHandler) -> None:
+        """
+        Start delivering published weather.
+
+        Listening starts in the background, as soon as the database accepts
+        connections.
+
+        :param handler: Called with every batch of published weather.
+        """
+        self._handler = handler
+        self._task = asyncio.create_task(self._listen(), name="weather_broker")
+
+    async def stop(self) -> None:
+        """Stop delivering published weather."""
+        self._handler = None
+        if self._task is None:
+            return
+        self._task.cancel()
+        with suppress(asyncio.CancelledError):
+            await self._task
+        self._task = None
+
+    async def publish(self, messages: Sequence[WeatherMessage]) -> None:
+        """
+        Publish a batch of weather.
+
+        Updates are best effort, a failure is logged and the weather stays
+        stored.
+
+        :param messages: City ID, version and weather as JSON of every city.
+        """
+        notifications = [
+            f"{city_id} {version} {payload.decode()}"
+            for city_id, version, payload in messages
+        ]
+        # Weather too large for a notification is left to the next refresh
+        notifications = [
+            notification
+            for notification in notifications
+            if len(notification.encode()) < NOTIFY_PAYLOAD_LIMIT
+        ]
+        try:
+            async with self.engine.begin() as connection:
+                for notification in notifications:
+                    await connection.execute(
+                        select(func.pg_notify(self.channel, notification)),
+                    )
+        except Exception as exception:
+            logger.warning("Failed to publish weather updates: {0}", exception)
+
+    async def _listen(self) -> None:
+        """Listen on the channel, again whenever the connection is lost."""
+        while True:  # noqa: WPS457
+            try:
+                await self._listen_once()
+            except Exception as exception:
+                logger.warning(
+                    "Weather update channel lost, listening again in {0} s: {1}",
+                    self.reconnect_delay,
+                    exception,
+                )
+            await asyncio.sleep(self.reconnect_delay)
+
+    async def _listen_once(self) -> None:
+        """Listen on the channel until the connection is lost."""
+        connection = await self.engine.connect()
+        try:  # noqa: WPS501
+            raw_connection = await connection.get_raw_connection()
+            driver_connection: Any = raw_connection.driver_connection
+            lost = asyncio.Event()
+            driver_connection.add_termination_listener(lambda _: lost.set())
+            await driver_connection.add_listener(self.channel, self._receive)
+            logger.info("Listening for weather updates on {0}.", self.channel)
+            await lost.wait()
+        finally:
+            # The connection listens on the channel, it must not go back to the pool
+            await connection.invalidate()
+            await connection.close()
+
+    def _receive(self, *args: Any) -> None:
+        """
+        Hand a notification to the hub.
+
+        :param args: Connection, sender process ID, channel and payload.
+        """
+        if self._handler is None:
+            return
+        city_id, version, payload = args[-1].split(" ", 2)
+        message = (int(city_id), int(version), payload.encode())
+        self._handler([message])
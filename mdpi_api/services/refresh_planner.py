@@ -0,0 +1,279 @@
+import hashlib
+import random
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, List, Mapping, NamedTuple, Optional
+
+from mdpi_api.metrics import Gauge
+from mdpi_api.settings import settings
+
+refresh_settings = settings.weather_refresh
+
+HASH_SIZE = 8
+HASH_RANGE = 2 ** (HASH_SIZE * 8)
+
+planned_cities = Gauge(
+    "weather_refresh_planned_cities",
+    "Cities planned for refresh in the current hour, by demand tier.",
+    labelnames=("tier",),
+)
+planned_calls = Gauge(
+    "weather_refresh_planned_calls",
+    "Upstream calls planned for the current hour.",
+)
+skipped_cities = Gauge(
+    "weather_refresh_skipped_cities",
+    "Cities not refreshed in the current hour, by reason.",
+    labelnames=("reason",),
+)
+skipped_calls = Gauge(
+    "weather_refresh_skipped_calls",
+    "Batches of refreshes not fetched in the current hour, over the call budget.",
+)
+refresh_budget = Gauge(
+    "weather_refresh_budget_calls",
+    "Upstream calls the refresh may plan per hour.",
+)
+
+
+class PlannedRefresh(NamedTuple):
+    """The moment a city's weather is refreshed at."""
+
+    at: datetime
+    city_id: int
+    # Weather stored since then is fresh enough to skip the refresh
+    fresh_since: datetime
+
+
+class RefreshSelection(NamedTuple):
+    """The cities to refresh in an hour."""
+
+    # Number of refreshes in the hour per city ID
+    refreshes: Dict[int, int]
+    cold: int
+    over_budget: int
+
+
+def refresh_window() -> timedelta:
+    """
+    Get the length of the refresh window before every hour.
+
+    :return: The refresh window.
+    """
+    return timedelta(minutes=refresh_settings.window_minutes)
+
+
+def target_hour(now: datetime) -> datetime:
+    """
+    Get the hour a refresh started at ``now`` prepares.
+
+    Inside the refresh window that is the coming hour. A run started
+    outside of it (a late or catch-up run) fills the current hour.
+
+    :param now: The current time.
+    :return: Start of the target hour.
+    """
+    return (now + refresh_window()).replace(minute=0, second=0, microsecond=0)
+
+
+def city_slot_offset(city_id: int, span: float) -> float:
+    """
+    Get a city's deterministic offset within the refresh window.
+
+    The offset is derived from a hash of the city ID, so cities are spread
+    evenly across the window and keep their slot from hour to hour.
+
+    :param city_id: The ID of the city.
+    :param span: Length of the window in seconds.
+    :return: Offset from the start of the window in seconds.
+    """
+    digest = hashlib.blake2b(str(city_id).encode(), digest_size=HASH_SIZE).digest()
+    return int.from_bytes(digest, "big") / HASH_RANGE * span
+
+
+def select_refreshes(
+    city_ids: Iterable[int],
+    estimate: Callable[[int], float],
+    budget: int = refresh_settings.upstream_budget_per_hour,
+    group_size: int = settings.weather_api.group_limit,
+) -> RefreshSelection:
+    """
+    Decide which cities to refresh in the coming hour, and how often.
+
+    Cities with less demand than ``cold_demand`` are not refreshed, their
+    weather is fetched when it is requested. One upstream call refreshes
+    up to ``group_size`` cities; within the refreshes the call budget buys,
+    every other city is refreshed once, hottest first, and the remaining
+    refreshes go to hot cities, another one per ``hot_demand``, up to
+    ``max_refreshes_per_hour``. The calls actually made are capped by
+    ``limit_calls`` once the refreshes are batched.
+
+    :param city_ids: IDs of the candidate cities.
+    :param estimate: Function estimating the demand of a city.
+    :param budget: Maximum number of upstream calls.
+    :param group_size: Maximum number of cities per upstream call.
+    :return: The selected refreshes.
+    """
+    capacity = budget * group_size
+    demand = sorted(
+        ((estimate(city_id), city_id) for city_id in set(city_ids)),
+        reverse=True,
+    )
+    active = [
+        (city_demand, city_id)
+        for city_demand, city_id in demand
+        if city_demand >= refresh_settings.cold_demand
+    ]
+    refreshes = {city_id: 1 for _, city_id in active[:capacity]}
+    remaining = capacity - len(refreshes)
+    for city_demand, city_id in active:
+        extra = min(
+            int(city_demand // refresh_settings.hot_demand),
+            refresh_settings.max_refreshes_per_hour - 1,
+            remaining,
+        )
+        if extra <= 0:
+            break
+        refreshes[city_id] += extra
+        remaining -= extra
+
+    selection = RefreshSelection(
+        refreshes=refreshes,
+        cold=len(demand) - len(active),
+        over_budget=len(active) - len(refreshes),
+    )
+    _record_selection(selection, budget)
+    return selection
+
+
+def plan_refreshes(
+    refreshes: Mapping[int, int],
+    now: datetime,
+    rng: Optional[random.Random] = None,
+) -> List[PlannedRefresh]:
+    """
+    Plan the refreshes of the target hour.
+
+    The first refresh of every city is placed in the refresh window before
+    the hour, at the city's hashed slot shifted by a random jitter and
+    wrapped within the window, so that it lands before the hour boundary.
+    Further refreshes of hot cities follow at even intervals, as long as
+    they end ``margin_seconds`` before the next refresh window opens, when
+    the next run is triggered; a run still going then makes the scheduler
+    skip it.
+
+    :param refreshes: Number of refreshes in the hour per city ID.
+    :param now: The current time.
+    :param rng: Random generator for the jitter.
+    :return: The refreshes ordered by time.
+    """
+    rng = rng or random.Random()  # noqa: S311
+    window = refresh_window()
+    hour = target_hour(now)
+    start = max(hour - window, now)
+    margin = timedelta(seconds=refresh_settings.margin_seconds)
+    plan_end = hour + timedelta(hours=1) - window - margin
+    span = (window - margin).total_seconds()
+    jitter = refresh_settings.jitter_seconds
+
+    plan = []
+    for city_id, count in refreshes.items():
+        jittered = city_slot_offset(city_id, span) + rng.uniform(-jitter, jitter)
+        # Wrap around instead of clamping, which would pile cities up at the edges
+        refresh_at = start + timedelta(seconds=jittered % span)
+        plan.append(PlannedRefresh(refresh_at, city_id, hour - window))
+
+        interval = timedelta(hours=1) / count
+        repeats = (refresh_at + interval * repeat for repeat in range(1, count))
+        plan.extend(
+            PlannedRefresh(repeat_at, city_id, repeat_at - interval / 2)
+            for repeat_at in repeats
+            if repeat_at < plan_end
+        )
+    return sorted(plan)
+
+
+def batch_refreshes(
+    plan: Iterable[PlannedRefresh],
+    size: int = settings.weather_api.group_limit,
+    span: float = refresh_settings.batch_span_seconds,
+) -> List[List[PlannedRefresh]]:
+    """
+    Group planned refreshes into batches fetched with one upstream call.
+
+    A batch holds up to ``size`` refreshes of distinct cities planned within
+    ``span`` seconds of its first refresh, so the refreshes stay spread
+    across the window at batch granularity.
+
+    :param plan: The refreshes ordered by time.
+    :param size: Maximum number of cities per batch.
+    :param span: Maximum seconds between the first and last refresh of a batch.
+    :return: The batches ordered by time.
+    """
+    batches: List[List[PlannedRefresh]] = []
+    batch: List[PlannedRefresh] = []
+    for refresh in plan:
+        if batch and not _fits(batch, refresh, size, span):
+            batches.append(batch)
+            batch = []
+        batch.append(refresh)
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+def limit_calls(
+    batches: List[List[PlannedRefresh]],
+    budget: int = refresh_settings.upstream_budget_per_hour,
+) -> List[List[PlannedRefresh]]:
+    """
+    Keep the batches the upstream call budget pays for.
+
+    Batches are not always full, refreshes due far apart are fetched
+    separately, so the batches of a selection can need more calls than it
+    was selected for. The last batches are dropped, they mostly hold the
+    extra refreshes of hot cities after the hour started.
+
+    :param batches: The batches ordered by time.
+    :param budget: Maximum number of upstream calls.
+    :return: The first ``budget`` batches.
+    """
+    planned_calls.set(min(len(batches), budget))
+    skipped_calls.set(max(len(batches) - budget, 0))
+    return batches[:budget]
+
+
+def _fits(
+    batch: List[PlannedRefresh],
+    refresh: PlannedRefresh,
+    size: int,
+    span: float,
+) -> bool:
+    """
+    Check whether a refresh can join a batch.
+
+    :param batch: The batch, not empty.
+    :param refresh: The refresh.
+    :param size: Maximum number of cities per batch.
+    :param span: Maximum seconds between the first and last refresh of a batch.
+    :return: True if the refresh fits.
+    """
+    if len(batch) >= size:
+        return False
+    if (refresh.at - batch[0].at).total_seconds() > span:
+        return False
+    return all(queued.city_id != refresh.city_id for queued in batch)
+
+
+def _record_selection(selection: RefreshSelection, budget: int) -> None:
+    """
+    Publish the decisions of the planner as metrics.
+
+    :param selection: The selected refreshes.
+    :param budget: The upstream call budget.
+    """
+    hot = sum(1 for count in selection.refreshes.values() if count > 1)
+    planned_cities.set(hot, tier="hot")
+    planned_cities.set(len(selection.refreshes) - hot, tier="warm")
+    skipped_cities.set(selection.cold, reason="cold")
+    skipped_cities.set(selection.over_budget, reason="budget")
+    refresh_budget.set(budget)
@@ -1,25 +1,85 @@
-from typing import Any, Callable, Union
+import os
+import socket
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, NamedTuple, Optional, Sequence, Union
 
 from apscheduler.events import EVENT_JOB_ERROR, EVENT_JOB_MISSED, JobExecutionEvent
 from apscheduler.jobstores.memory import MemoryJobStore
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.base import BaseTrigger
+from apscheduler.triggers.interval import IntervalTrigger
 from loguru import logger
+from mdpi_api.db.dao.scheduler_run_dao import SchedulerRunDAO
+from mdpi_api.db.query_inspector import query_scope
+from mdpi_api.metrics import Counter, Histogram
+from mdpi_api.services.leader_election import LeaderElection
 from mdpi_api.settings import settings
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+scheduler_settings = settings.scheduler
+
+EPOCH = datetime.fromtimestamp(0, tz=timezone.utc)
+ELECTION_JOB_ID = "leader_election"
+JOB_BUCKETS = (1, 5, 15, 30, 60, 120, 300, 600, 1200, 1800, 3600)
+
+job_runs = Counter(
+    "scheduler_job_runs_total",
+    "Leader job runs, by job and status: succeeded, failed or skipped.",
+    labelnames=("job", "status"),
+)
+job_seconds = Histogram(
+    "scheduler_job_seconds",
+    "Duration of leader job runs, by job.",
+    labelnames=("job",),
+    buckets=JOB_BUCKETS,
+)
+
+
+class LeaderJob(NamedTuple):
+    """A job that only the leader runs, at most once per period."""
+
+    func: Callable[..., Awaitable[Any]]
+    args: Sequence[Any]
+    period: timedelta
+    lead: timedelta
 
 
 class SchedulerManager:
-    """Scheduler manager."""
+    """
+    Scheduler manager.
+
+    Every worker runs a scheduler, but leader jobs only run on the worker
+    elected as leader, and each of their runs is claimed in the
+    scheduler_runs table first. A slot that was already claimed, by this or
+    any other worker, is skipped, so a job runs once per period per cluster
+    even while the leadership changes hands. A new leader runs its jobs
+    right away if their current slot was missed. Runs older than
+    ``run_retention_days`` are deleted after every run.
+    """
 
-    def __init__(self) -> None:
+    def __init__(
+        self,
+        session_factory: async_sessionmaker[AsyncSession],
+        election: Optional[LeaderElection] = None,
+    ) -> None:
         self.scheduler = AsyncIOScheduler(
             jobstores={"default": MemoryJobStore()},
+            job_defaults={
+                "coalesce": True,
+                "max_instances": 1,
+                "misfire_grace_time": scheduler_settings.misfire_grace_seconds,
+            },
             timezone="UTC",
         )
         self.scheduler.add_listener(
             self.job_listener,
             EVENT_JOB_MISSED | EVENT_JOB_ERROR,
         )
+        self.session_factory = session_factory
+        self.election = election
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self._leader_jobs: Dict[str, LeaderJob] = {}
 
     def add_job(
         self,
@@ -38,13 +98,93 @@ class SchedulerManager:
         """
         self.scheduler.add_job(func, trigger, *args, **kwargs)
 
+    def add_leader_job(
+        self,
+        func: Callable[..., Awaitable[Any]],
+        trigger: BaseTrigger,
+        *,
+        job_id: str,
+        period: timedelta,
+        lead: timedelta = timedelta(0),
+        args: Sequence[Any] = (),
+    ) -> None:
+        """
+        Add a job that runs on the leader only, at most once per period.
+
+        :param func: The coroutine function to run.
+        :param trigger: The trigger of the job.
+        :param job_id: The ID of the job, unique in the cluster.
+        :param period: Period the job runs once in, e.g. an hour.
+        :param lead: How long before its period a run starts, for jobs
+            preparing the coming period.
+        :param args: The function arguments.
+        """
+        self._leader_jobs[job_id] = LeaderJob(
+            func=func,
+            args=args,
+            period=period,
+            lead=lead,
+        )
+        self.scheduler.add_job(
+            self.run_leader_job,
+            trigger,
+            args=[job_id],
+            id=job_id,
+        )
+
+    async def run_leader_job(self, job_id: str) -> None:
+        """
+        Run a leader job if this worker leads and its slot is unclaimed.
+
+        :param job_id: The ID of the job.
+        """
+        if self.election is not None and not self.election.is_leader:
+            return
+        job = self._leader_jobs[job_id]
+        slot = slot_start(datetime.now(timezone.utc) + job.lead, job.period)
+        async with self.session_factory() as session:
+            claimed = await SchedulerRunDAO(session).claim_run(
+                job_id,
+                slot,
+                self.worker_id,
+            )
+        if not claimed:
+            logger.info("Job {0} already ran for {1}.", job_id, slot)
+            job_runs.inc(job=job_id, status="skipped")
+            return
+
+        status = "failed"
+        started = time.perf_counter()
+        try:  # noqa: WPS501
+            with query_scope(f"job {job_id}"):
+                await job.func(*job.args)
+            status = "succeeded"
+        finally:
+            job_seconds.observe(time.perf_counter() - started, job=job_id)
+            job_runs.inc(job=job_id, status=status)
+            async with self.session_factory() as finish_session:
+                run_dao = SchedulerRunDAO(finish_session)
+                await run_dao.finish_run(job_id, slot, status)
+                retention = timedelta(days=scheduler_settings.run_retention_days)
+                await run_dao.delete_runs_before(job_id, slot - retention)
+
     def start(self) -> None:
         """Start the scheduler."""
+        if self.election is not None:
+            self.scheduler.add_job(
+                self._elect,
+                IntervalTrigger(seconds=scheduler_settings.election_interval_seconds),
+                args=[self.election],
+                id=ELECTION_JOB_ID,
+                next_run_time=datetime.now(timezone.utc),
+            )
         self.scheduler.start()
 
-    def shutdown(self) -> None:
-        """Shutdown the scheduler."""
-        self.scheduler.shutdown()
+    async def shutdown(self) -> None:
+        """Shutdown the scheduler and give up the leadership."""
+        self.scheduler.shutdown(wait=False)
+        if self.election is not None:
+            await self.election.release()
 
     @staticmethod
     def job_listener(event: JobExecutionEvent) -> None:
@@ -73,3 +213,38 @@ class SchedulerManager:
         if settings.environment == "prod":
             # TODO: Implement alerting
             return
+
+    async def _elect(self, election: LeaderElection) -> None:
+        """
+        Try to become the leader and catch up on missed runs if elected.
+
+        :param election: The leader election.
+        """
+        was_leader = election.is_leader
+        try:
+            is_leader = await election.try_acquire()
+        except Exception as exception:
+            logger.error(f"Leader election failed: {exception}")
+            return
+        if is_leader and not was_leader:
+            logger.info("Worker {0} is the scheduler leader.", self.worker_id)
+            self._catch_up()
+        elif was_leader and not is_leader:
+            logger.warning(f"Worker {self.worker_id} lost the scheduler leadership.")
+
+    def _catch_up(self) -> None:
+        """Run the leader jobs now, their current slot may have been missed."""
+        now = datetime.now(timezone.utc)
+        for job_id in self._leader_jobs:
+            self.scheduler.modify_job(job_id, next_run_time=now)
+
+
+def slot_start(moment: datetime, period: timedelta) -> datetime:
+    """
+    Get the start of the period a moment falls in.
+
+    :param moment: The (timezone aware) moment.
+    :param period: The period length.
+    :return: Start of the period.
+    """
+    return moment - (moment - EPOCH) % period
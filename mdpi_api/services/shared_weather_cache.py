@@ -0,0 +1,310 @@
+"""
+Current weather cache shared by all workers of a host.
+
+The cache is a memory-mapped file with a fixed layout:
+
+* a header: magic, layout version, number of slots and payload size;
+* a table of fixed size records, one per city, found by open addressing
+  on the city ID: sequence number, city ID, weather version (row ID),
+  time stored and the offset and length of the payload;
+* a payload arena with ``payload_bytes`` reserved per slot, holding the
+  weather as JSON.
+
+The refresh leader writes the weather it stores, and every worker writes
+the refreshed weather delivered by the weather hub, so the cache of every
+host is refreshed, not only the leader's. One writer at a time is
+guaranteed by a file lock, and a version already cached is not written
+again. Readers take no lock: every record is guarded by a sequence
+number (a seqlock) that is odd while the record is written, a reader
+retries when it changed during its read. Memory stays the same however
+many workers map the file.
+"""
+import fcntl
+import mmap
+import os
+import struct
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Iterator, NamedTuple, Optional, Sequence, Tuple
+
+import orjson
+from loguru import logger
+from mdpi_api.metrics import Counter
+from mdpi_api.settings import settings
+from mdpi_api.web.api.schemas.weather import WeatherDTO
+
+cache_settings = settings.shared_cache
+
+MAGIC = b"MDWC"
+LAYOUT_VERSION = 1
+HEADER = struct.Struct("<4sIII")
+# seq, city ID, version, stored at, payload offset, payload length
+RECORD = struct.Struct("<IqqdII")
+SEQUENCE = struct.Struct("<I")
+CITY_ID = struct.Struct("<q")
+SEQUENCE_RANGE = 2 ** (SEQUENCE.size * 8)
+MAX_PROBES = 32
+READ_ATTEMPTS = 4
+FILE_MODE = 0o600
+
+cache_lookups = Counter(
+    "shared_weather_cache_lookups_total",
+    "Lookups in the shared weather cache, by result.",
+    labelnames=("result",),
+)
+
+
+class CachedWeather(NamedTuple):
+    """Weather of a city read from the shared cache."""
+
+    # ID of the stored weather row, used as the ETag version
+    version: int
+    weather: WeatherDTO
+
+
+class SharedWeatherCache:
+    """Fixed layout weather cache in a memory-mapped file."""
+
+    def __init__(
+        self,
+        path: Path = cache_settings.path,
+        slots: int = cache_settings.slots,
+        payload_bytes: int = cache_settings.payload_bytes,
+    ) -> None:
+        self.path = path
+        self.slots = slots
+        self.payload_bytes = payload_bytes
+        self._records_offset = HEADER.size
+        self._arena_offset = HEADER.size + RECORD.size * slots
+        self.size = self._arena_offset + payload_bytes * slots
+        self._mmap: Optional[mmap.mmap] = None
+        self._fd: Optional[int] = None
+
+    @property
+    def is_open(self) -> bool:
+        """
+        Whether the cache file is mapped.
+
+        :return: True if the cache is open.
+        """
+        return self._mmap is not None
+
+    def open(self) -> None:  # noqa: WPS231
+        """
+        Map the cache file, creating it if needed.
+
+        A file with another layout, e.g. left by an older release, is not
+        used and the cache stays closed.
+        """
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, FILE_MODE)
+        if os.fstat(fd).st_size < self.size:
+            os.ftruncate(fd, self.size)
+        mapped = mmap.mmap(fd, self.size)
+        layout = (MAGIC, LAYOUT_VERSION, self.slots, self.payload_bytes)
+        header = HEADER.unpack_from(mapped, 0)
+        if header[0] == bytes(len(MAGIC)):
+            HEADER.pack_into(mapped, 0, *layout)
+        elif header != layout:
+            logger.warning(f"Shared weather cache {self.path} has another layout.")
+            mapped.close()
+            os.close(fd)
+            return
+        self._mmap = mapped
+        self._fd = fd
+        logger.info("Shared weather cache mapped from {0}.", self.path)
+
+    def close(self) -> None:
+        """Unmap the cache file."""
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def get(self, city_id: int, since: datetime) -> Optional[CachedWeather]:
+        """
+        Get the weather of a city if it was stored since ``since``.
+
+        :param city_id: The ID of the city.
+        :param since: Oldest acceptable weather (naive UTC).
+        :return: The cached weather, None on a miss.
+        """
+        record = None if self._mmap is None else self._lookup(self._mmap, city_id)
+        if record is None or record[1] < _timestamp(since):
+            cache_lookups.inc(result="miss")
+            return None
+        cache_lookups.inc(result="hit")
+        # Written by this module from a validated DTO
+        weather = WeatherDTO.model_construct(**orjson.loads(record[2]))
+        return CachedWeather(version=record[0], weather=weather)
+
+    def get_version(self, city_id: int, since: datetime) -> Optional[int]:
+        """
+        Get the version of a city's weather if it was stored since ``since``.
+
+        Unlike ``get`` the weather itself is not decoded.
+
+        :param city_id: The ID of the city.
+        :param since: Oldest acceptable weather (naive UTC).
+        :return: ID of the weather row, None on a miss.
+        """
+        record = None if self._mmap is None else self._lookup(self._mmap, city_id)
+        if record is None or record[1] < _timestamp(since):
+            return None
+        return record[0]
+
+    def put_many(self, entries: Sequence[Tuple[int, WeatherDTO]]) -> None:
+        """
+        Store the weather of several cities.
+
+        Weather too large for a slot, or of a city that finds no slot, is not
+        cached and will be read from the database. Weather whose version is
+        already cached is skipped, the workers of a host all receive the
+        same updates.
+
+        :param entries: Version (weather row ID) and weather of every city.
+        """
+        if self._mmap is None or self._fd is None:
+            return
+        stored_at = time.time()
+        with _file_lock(self._fd):
+            for version, weather in entries:
+                self._put(self._mmap, version, weather, stored_at)
+
+    def _lookup(
+        self,
+        mapped: mmap.mmap,
+        city_id: int,
+    ) -> Optional[Tuple[int, float, bytes]]:
+        """
+        Read the record of a city without locking.
+
+        :param mapped: The mapped cache file.
+        :param city_id: The ID of the city.
+        :return: Version, time stored and payload, None if absent.
+        """
+        index = self._find_slot(mapped, city_id, insert=False)
+        if index is None:
+            return None
+        offset = self._records_offset + index * RECORD.size
+        for _ in range(READ_ATTEMPTS):
+            fields = RECORD.unpack_from(mapped, offset)
+            sequence = fields[0]
+            if sequence % 2:
+                continue
+            payload_offset = fields[4]
+            payload = mapped[payload_offset : payload_offset + fields[5]]
+            if SEQUENCE.unpack_from(mapped, offset)[0] == sequence:
+                return fields[2], fields[3], payload
+        return None
+
+    def _put(
+        self,
+        mapped: mmap.mmap,
+        version: int,
+        weather: WeatherDTO,
+        stored_at: float,
+    ) -> None:
+        """
+        Store the weather of a city, while holding the file lock.
+
+        :param mapped: The mapped cache file.
+        :param version: Weather row ID.
+        :param weather: The weather.
+        :param stored_at: UNIX time the weather is stored at.
+        """
+        payload = orjson.dumps(
+            weather.model_dump(include={"city_id", "city_name", "data"}),
+        )
+        index = self._find_slot(mapped, weather.city_id, insert=True)
+        if index is None or len(payload) > self.payload_bytes:
+            logger.warning(f"Weather of city {weather.city_id} not cached.")
+            return
+        offset = self._records_offset + index * RECORD.size
+        if RECORD.unpack_from(mapped, offset)[2] == version:
+            return
+        record = (weather.city_id, version, stored_at)
+        self._write_record(mapped, index, record, payload)
+
+    def _find_slot(
+        self,
+        mapped: mmap.mmap,
+        city_id: int,
+        insert: bool,
+    ) -> Optional[int]:
+        """
+        Find the slot of a city by linear probing.
+
+        Slots are never freed, so a reader stops at the first empty slot.
+
+        :param mapped: The mapped cache file.
+        :param city_id: The ID of the city.
+        :param insert: Also return the first empty slot.
+        :return: Index of the slot, None if not found.
+        """
+        for probe in range(MAX_PROBES):
+            index = (city_id + probe) % self.slots
+            offset = self._records_offset + index * RECORD.size + SEQUENCE.size
+            slot_city_id = CITY_ID.unpack_from(mapped, offset)[0]
+            if slot_city_id == city_id:
+                return index
+            if not slot_city_id:
+                return index if insert else None
+        return None
+
+    def _write_record(
+        self,
+        mapped: mmap.mmap,
+        index: int,
+        record: Tuple[int, int, float],
+        payload: bytes,
+    ) -> None:
+        """
+        Write a record, its sequence number is odd while it is written.
+
+        :param mapped: The mapped cache file.
+        :param index: Index of the slot.
+        :param record: City ID, version (weather row ID) and time stored.
+        :param payload: The weather as JSON.
+        """
+        offset = self._records_offset + index * RECORD.size
+        payload_offset = self._arena_offset + index * self.payload_bytes
+        sequence = SEQUENCE.unpack_from(mapped, offset)[0]
+        writing = (sequence + 1) % SEQUENCE_RANGE
+        SEQUENCE.pack_into(mapped, offset, writing)
+        mapped.seek(payload_offset)
+        mapped.write(payload)
+        RECORD.pack_into(mapped, offset, writing, *record, payload_offset, len(payload))
+        # Published last, readers that saw the odd number retry
+        SEQUENCE.pack_into(mapped, offset, (writing + 1) % SEQUENCE_RANGE)
+
+
+@contextmanager
+def _file_lock(fd: int) -> Iterator[None]:
+    """
+    Hold the exclusive lock of a file, shared by all processes.
+
+    :param fd: The file descriptor.
+    :yield: While the lock is held.
+    """
+    fcntl.flock(fd, fcntl.LOCK_EX)
+    try:  # noqa: WPS501
+        yield
+    finally:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+
+
+def _timestamp(moment: datetime) -> float:
+    """
+    Get the UNIX time of a naive UTC datetime.
+
+    :param moment: The datetime.
+    :return: UNIX time.
+    """
+    return moment.replace(tzinfo=timezone.utc).timestamp()
+
+
+shared_weather_cache = SharedWeatherCache()
@@ -0,0 +1,283 @@
+"""
+Push of weather updates to streaming clients.
+
+The refresh job publishes the weather it stored to the hub, the hub hands it
+to a broker and fans out what the broker delivers to the subscriptions of
+every city. The broker decides how far updates travel: ``LocalBroker``
+delivers within the worker, ``PostgresBroker``
+(``mdpi_api.services.postgres_broker``) sends them through PostgreSQL
+``LISTEN/NOTIFY`` to the subscribers of every worker. Delivered weather is
+also written to the shared weather cache of the worker's host, so hosts
+other than the leader's serve refreshed weather from memory too.
+"""
+import abc
+import asyncio
+from collections import defaultdict
+from typing import AsyncGenerator, Callable, Dict, Iterable, List, Sequence, Set, Tuple
+
+import orjson
+from mdpi_api.metrics import Counter, Gauge
+from mdpi_api.services.shared_weather_cache import (
+    SharedWeatherCache,
+    shared_weather_cache,
+)
+from mdpi_api.web.api.schemas.weather import WeatherDTO
+
+# City ID, version (weather row ID) and the weather as JSON
+WeatherMessage = Tuple[int, int, bytes]
+MessageHandler = Callable[[Sequence[WeatherMessage]], None]
+
+# Server-sent event framing
+EVENT_START = b"event: weather\ndata: "
+EVENT_END = b"\n\n"
+HEARTBEAT = b": heartbeat\n\n"
+
+subscriber_count = Gauge(
+    "weather_stream_subscribers",
+    "Clients subscribed to weather updates.",
+)
+delivered_updates = Counter(
+    "weather_stream_updates_total",
+    "Weather updates handed to subscribed clients.",
+)
+
+
+class WeatherBroker(abc.ABC):
+    """Carries published weather to the hubs that subscribed to it."""
+
+    @abc.abstractmethod
+    async def start(self, handler: MessageHandler) -> None:
+        """
+        Start delivering published weather.
+
+        :param handler: Called with every batch of published weather.
+        """
+
+    @abc.abstractmethod
+    async def stop(self) -> None:
+        """Stop delivering published weather."""
+
+    @abc.abstractmethod
+    async def publish(self, messages: Sequence[WeatherMessage]) -> None:
+        """
+        Publish a batch of weather.
+
+        :param messages: City ID, version and weather as JSON of every city.
+        """
+
+
+class LocalBroker(WeatherBroker):
+    """Delivers published weather within the worker."""
+
+    def __init__(self) -> None:
+        self._handler: MessageHandler = _drop
+
+    async def start(self, handler: MessageHandler) -> None:
+        """
+        Start delivering published weather.
+
+        :param handler: Called with every batch of published weather.
+        """
+        self._handler = handler
+
+    async def stop(self) -> None:
+        """Stop delivering published weather."""
+        self._handler = _drop
+
+    async def publish(self, messages: Sequence[WeatherMessage]) -> None:
+        """
+        Publish a batch of weather.
+
+        :param messages: City ID, version and weather as JSON of every city.
+        """
+        self._handler(messages)
+
+
+class Subscription:
+    """
+    Weather updates of some cities for one client.
+
+    Only the latest update of every city is kept, so a client that reads
+    slowly skips updates instead of holding a growing backlog, and an idle
+    subscription costs a dict and an event.
+    """
+
+    def __init__(self, city_ids: Iterable[int]) -> None:
+        self.city_ids = frozenset(city_ids)
+        self.closed = False
+        self._updates: Dict[int, bytes] = {}
+        self._ready = asyncio.Event()
+
+    def push(self, city_id: int, payload: bytes) -> None:
+        """
+        Replace the pending update of a city.
+
+        :param city_id: The ID of the city.
+        :param payload: The weather as JSON.
+        """
+        self._updates[city_id] = payload
+        self._ready.set()
+
+    def close(self) -> None:
+        """End the subscription, waiting readers return at once."""
+        self.closed = True
+        self._ready.set()
+
+    async def next_updates(self, timeout: float) -> List[bytes]:
+        """
+        Wait for updates.
+
+        :param timeout: Longest wait in seconds.
+        :return: The weather as JSON of every updated city, empty if there
+            was no update within ``timeout`` or the subscription is closed.
+        """
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            return []
+        self._ready.clear()
+        updates = list(self._updates.values())
+        self._updates.clear()
+        return updates
+
+
+class WeatherHub:
+    """Fans out published weather to the subscriptions of every city."""
+
+    def __init__(
+        self,
+        broker: WeatherBroker,
+        cache: SharedWeatherCache = shared_weather_cache,
+    ) -> None:
+        self.broker = broker
+        self.cache = cache
+        self._subscriptions: Dict[int, Set[Subscription]] = defaultdict(set)
+        self._subscription_count = 0
+
+    async def start(self) -> None:
+        """Start receiving published weather."""
+        await self.broker.start(self._deliver)
+
+    async def stop(self) -> None:
+        """Stop receiving published weather and close all subscriptions."""
+        await self.broker.stop()
+        for subscriptions in self._subscriptions.values():
+            for subscription in subscriptions:
+                subscription.close()
+
+    async def publish(self, entries: Sequence[Tuple[int, WeatherDTO]]) -> None:
+        """
+        Publish stored weather.
+
+        Every reading is serialized once here, whatever the number of
+        subscribers.
+
+        :param entries: Version (weather row ID) and weather of every city.
+        """
+        messages = [
+            (weather.city_id, version, orjson.dumps(weather.model_dump()))
+            for version, weather in entries
+        ]
+        if messages:
+            await self.broker.publish(messages)
+
+    def subscribe(self, city_ids: Iterable[int]) -> Subscription:
+        """
+        Subscribe to the weather updates of cities.
+
+        :param city_ids: IDs of the cities.
+        :return: The subscription, to be passed to ``unsubscribe``.
+        """
+        subscription = Subscription(city_ids)
+        for city_id in subscription.city_ids:
+            self._subscriptions[city_id].add(subscription)
+        self._subscription_count += 1
+        subscriber_count.set(self._subscription_count)
+        return subscription
+
+    def subscribed_cities(self) -> Dict[int, int]:
+        """
+        Count the subscriptions of every city.
+
+        :return: Number of subscriptions per city ID.
+        """
+        return {
+            city_id: len(subscriptions)
+            for city_id, subscriptions in self._subscriptions.items()
+        }
+
+    async def stream(
+        self,
+        city_ids: Iterable[int],
+        heartbeat: float,
+    ) -> AsyncGenerator[bytes, None]:
+        """
+        Write the weather updates of cities as server-sent events.
+
+        The subscription is taken when the stream starts and ends when the
+        stream is closed, e.g. cancelled by a client disconnect, or when the
+        hub stops.
+
+        :param city_ids: IDs of the cities.
+        :param heartbeat: Seconds without updates before a heartbeat comment.
+        :yield: ``weather`` events, and heartbeat comments while idle.
+        """
+        subscription = self.subscribe(city_ids)
+        try:  # noqa: WPS501
+            while not subscription.closed:
+                updates = await subscription.next_updates(heartbeat)
+                if not updates:
+                    yield HEARTBEAT
+                for payload in updates:
+                    yield b"".join((EVENT_START, payload, EVENT_END))
+        finally:
+            self.unsubscribe(subscription)
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        """
+        End a subscription.
+
+        :param subscription: The subscription.
+        """
+        for city_id in subscription.city_ids:
+            subscriptions = self._subscriptions.get(city_id)
+            if subscriptions is None:
+                continue
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                self._subscriptions.pop(city_id)
+        subscription.close()
+        self._subscription_count -= 1
+        subscriber_count.set(self._subscription_count)
+
+    def _deliver(self, messages: Sequence[WeatherMessage]) -> None:
+        """
+        Hand published weather to the subscriptions of its cities.
+
+        :param messages: City ID, version and weather as JSON of every city.
+        """
+        delivered = 0
+        for city_id, _, payload in messages:
+            for subscription in self._subscriptions.get(city_id, ()):
+                subscription.push(city_id, payload)
+                delivered += 1
+        delivered_updates.inc(delivered)
+        if self.cache.is_open:
+            # Versions already cached, e.g. by the leader's host, are skipped
+            self.cache.put_many(
+                [
+                    (version, WeatherDTO.model_validate_json(weather_json))
+                    for _, version, weather_json in messages
+                ],
+            )
+
+
+def _drop(messages: Sequence[WeatherMessage]) -> None:
+    """
+    Drop published weather while no hub receives it.
+
+    :param messages: City ID, version and weather as JSON of every city.
+    """
+
+
+weather_hub = WeatherHub(LocalBroker(), shared_weather_cache)
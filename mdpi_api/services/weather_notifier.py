@@ -0,0 +1,393 @@
+"""
+Notifications of weather changes in favorite cities.
+
+After every refresh the new weather is compared with the weather of the
+previous hour in one columnar pass: the readings of the refreshed cities are
+joined with those of the previous hour and with the users that allowed
+notifications for them. Every (user, city) pair whose temperature changed by
+at least ``temp_change_celsius``, or where it started raining, gets a
+notification. Notifications are delivered in the background, in batches sent
+concurrently through a ``NotificationSender``, and a batch that failed is
+sent again with exponential backoff. Every notification is delivered once per
+hour, however often its city is refreshed.
+"""
+import asyncio
+import time
+from datetime import datetime, timedelta
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Sequence, Set, Tuple
+
+from loguru import logger
+from mdpi_api.db.dao.city_dao import CityDAO
+from mdpi_api.db.dao.weather_dao import WeatherDAO
+from mdpi_api.integrations.notification_sender import (
+    LocalSender,
+    NotificationDeliveryError,
+    NotificationSender,
+    WebhookSender,
+)
+from mdpi_api.lazy_imports import LazyModule
+from mdpi_api.metrics import Counter
+from mdpi_api.settings import settings
+from mdpi_api.web.api.schemas.notification import NotificationDTO, NotificationKindEnum
+from mdpi_api.web.api.schemas.weather import WeatherDTO
+from sqlalchemy.ext.asyncio import AsyncSession
+
+if TYPE_CHECKING:
+    import polars as pl
+else:
+    pl = LazyModule("polars")  # noqa: WPS440
+
+notification_settings = settings.notifications
+
+RAIN_CONDITIONS = ("Rain", "Drizzle", "Thunderstorm")
+HOUR = timedelta(hours=1)
+# Polars types of the reading columns, Int64, Float64 and Utf8
+READING_SCHEMA = (
+    ("city_id", int),
+    ("temp", float),
+    ("condition", str),
+)
+# City ID and weather data as stored
+Reading = Tuple[int, Dict[str, Any]]
+
+notification_count = Counter(
+    "weather_notifications_total",
+    "Weather change notifications, by outcome.",
+    labelnames=("outcome",),
+)
+notification_batches = Counter(
+    "weather_notification_batches_total",
+    "Attempts to deliver a batch of notifications, by outcome.",
+    labelnames=("outcome",),
+)
+notification_send_seconds = Counter(
+    "weather_notification_send_seconds_total",
+    "Time spent delivering batches of notifications.",
+)
+
+
+class WeatherNotifier:
+    """Finds the weather changes users asked to hear about and delivers them."""
+
+    def __init__(
+        self,
+        sender: NotificationSender,
+        temp_change: float = notification_settings.temp_change_celsius,
+        batch_size: int = notification_settings.batch_size,
+        concurrency: int = notification_settings.concurrency,
+        max_attempts: int = notification_settings.max_attempts,
+        retry_delay: float = notification_settings.retry_delay_seconds,
+    ) -> None:
+        self.sender = sender
+        self.temp_change = temp_change
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        # Keys of the notifications delivered or being delivered, with their hour
+        self._delivered: Dict[str, datetime] = {}
+        self._tasks: Set["asyncio.Task[int]"] = set()
+
+    async def notify(self, session: AsyncSession, weathers: List[WeatherDTO]) -> None:
+        """
+        Notify the subscribers of refreshed cities about weather changes.
+
+        The changes are found right away, they are delivered in the background.
+        Errors are logged, notifications never fail the refresh.
+
+        :param session: The database session.
+        :param weathers: The weather just stored.
+        """
+        try:
+            notifications = await self.detect(session, weathers, datetime.utcnow())
+        except Exception as ex:
+            logger.error(f"Failed to detect weather changes: {ex}")
+            return
+        if notifications:
+            task = asyncio.create_task(self.dispatch(notifications))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def detect(
+        self,
+        session: AsyncSession,
+        weathers: Sequence[WeatherDTO],
+        now: datetime,
+    ) -> List[NotificationDTO]:
+        """
+        Find the notifications due for weather stored at ``now``.
+
+        :param session: The database session.
+        :param weathers: The weather stored.
+        :param now: When the weather was stored (naive UTC).
+        :return: The notifications, possibly delivered already.
+        """
+        city_ids = [weather.city_id for weather in weathers]
+        subscribers = await CityDAO(session).get_notification_subscribers(city_ids)
+        if not subscribers:
+            return []
+        hour = reading_hour(now)
+        previous_end = hour - refresh_lead()
+        previous = await WeatherDAO(session).get_latest_weathers(
+            city_ids,
+            since=previous_end - HOUR,
+            before=previous_end,
+        )
+        changes = detect_changes(
+            reading_frame(
+                (city_id, stored["data"]) for city_id, stored in previous.items()
+            ),
+            reading_frame((weather.city_id, weather.data) for weather in weathers),
+            subscriber_frame(subscribers),
+            self.temp_change,
+        )
+        return build_notifications(changes, hour)
+
+    async def dispatch(self, notifications: Sequence[NotificationDTO]) -> int:
+        """
+        Deliver notifications in concurrent batches.
+
+        :param notifications: The notifications.
+        :return: Number of notifications delivered.
+        """
+        fresh = self._reserve(notifications)
+        notification_count.inc(len(notifications) - len(fresh), outcome="duplicate")
+        batches = [
+            fresh[start : start + self.batch_size]
+            for start in range(0, len(fresh), self.batch_size)
+        ]
+        semaphore = asyncio.Semaphore(self.concurrency)
+        sent = await asyncio.gather(
+            *(self._send_batch(batch, semaphore) for batch in batches),
+        )
+        return sum(sent)
+
+    async def drain(self) -> None:
+        """Wait for the deliveries in flight."""
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    async def close(self) -> None:
+        """Wait for the deliveries in flight and close the sender."""
+        await self.drain()
+        await self.sender.close()
+
+    def _reserve(self, claimed: Iterable[NotificationDTO]) -> List[NotificationDTO]:
+        """
+        Claim the notifications not delivered yet.
+
+        Keys of hours past are forgotten.
+
+        :param claimed: The notifications.
+        :return: The notifications to deliver.
+        """
+        oldest_hour = reading_hour(datetime.utcnow()) - HOUR
+        self._delivered = {
+            key: hour for key, hour in self._delivered.items() if hour >= oldest_hour
+        }
+        fresh = []
+        for notification in claimed:
+            if notification.key not in self._delivered:
+                self._delivered[notification.key] = notification.hour
+                fresh.append(notification)
+        return fresh
+
+    async def _send_batch(
+        self,
+        batch: Sequence[NotificationDTO],
+        semaphore: asyncio.Semaphore,
+    ) -> int:
+        """
+        Deliver a batch, retrying with exponential backoff.
+
+        :param batch: The notifications.
+        :param semaphore: Bounds the batches sent at the same time.
+        :return: Number of notifications delivered.
+        """
+        batch_size = len(batch)
+        for attempt in range(self.max_attempts):
+            if attempt:
+                await asyncio.sleep(self.retry_delay * 2 ** (attempt - 1))
+            started = time.perf_counter()
+            try:
+                async with semaphore:
+                    await self.sender.send(batch)
+            except NotificationDeliveryError as ex:
+                logger.warning(f"Failed to deliver {batch_size} notifications: {ex}")
+                notification_batches.inc(outcome="failed")
+                continue
+            finally:
+                notification_send_seconds.inc(time.perf_counter() - started)
+            notification_batches.inc(outcome="delivered")
+            notification_count.inc(batch_size, outcome="delivered")
+            return batch_size
+        self._release(batch)
+        return 0
+
+    def _release(self, batch: Sequence[NotificationDTO]) -> None:
+        """
+        Give up on a batch, a later refresh within the hour may deliver it.
+
+        :param batch: The notifications.
+        """
+        for notification in batch:
+            self._delivered.pop(notification.key, None)
+        notification_count.inc(len(batch), outcome="failed")
+
+
+def refresh_lead() -> timedelta:
+    """
+    Get how long before its hour the weather of the hour is stored.
+
+    :return: Length of the refresh window.
+    """
+    return timedelta(minutes=settings.weather_refresh.window_minutes)
+
+
+def reading_hour(stored_at: datetime) -> datetime:
+    """
+    Get the hour weather stored at a time is for.
+
+    Weather stored within the refresh window is for the coming hour.
+
+    :param stored_at: When the weather was stored.
+    :return: Start of the hour.
+    """
+    shifted = stored_at + refresh_lead()
+    return shifted.replace(minute=0, second=0, microsecond=0)
+
+
+def reading_frame(readings: Iterable[Reading]) -> "pl.DataFrame":
+    """
+    Build a frame of the values notifications are about.
+
+    :param readings: City ID and weather data as stored of every reading.
+    :return: City ID, temperature and condition of every reading.
+    """
+    rows = [
+        (city_id, reading.get("temp"), _condition(reading))
+        for city_id, reading in readings
+    ]
+    return pl.DataFrame(rows, schema=READING_SCHEMA, orient="row")
+
+
+def subscriber_frame(subscribers: Iterable[Dict[str, Any]]) -> "pl.DataFrame":
+    """
+    Build a frame of the users subscribed to cities.
+
+    :param subscribers: User ID, city ID and city name of every subscription.
+    :return: The subscriptions.
+    """
+    rows = [
+        (str(subscriber["user_id"]), subscriber["city_id"], subscriber["city_name"])
+        for subscriber in subscribers
+    ]
+    return pl.DataFrame(
+        rows,
+        schema=[("user_id", pl.Utf8), ("city_id", pl.Int64), ("city_name", pl.Utf8)],
+        orient="row",
+    )
+
+
+def detect_changes(
+    previous: "pl.DataFrame",
+    current: "pl.DataFrame",
+    subscribers: "pl.DataFrame",
+    temp_change: float,
+) -> "pl.DataFrame":
+    """
+    Diff the readings of two hours for every subscription.
+
+    Cities without a reading in both hours have no change.
+
+    :param previous: Readings of the previous hour.
+    :param current: Readings of the new hour.
+    :param subscribers: The subscriptions.
+    :param temp_change: Smallest temperature change worth a notification.
+    :return: Subscriptions with a change, flagged ``temp_changed`` and
+        ``rain_started``, with both temperatures.
+    """
+    is_rain = pl.col("condition").is_in(RAIN_CONDITIONS)
+    was_rain = pl.col("condition_previous").is_in(RAIN_CONDITIONS)
+    temp_delta = (pl.col("temp") - pl.col("temp_previous")).abs()
+    changes = (
+        current.join(previous, on="city_id", suffix="_previous")
+        .with_columns(
+            (temp_delta >= temp_change).fill_null(value=False).alias("temp_changed"),
+            is_rain.and_(was_rain.not_()).fill_null(value=False).alias("rain_started"),
+        )
+        .filter(pl.col("temp_changed") | pl.col("rain_started"))
+    )
+    return subscribers.join(changes, on="city_id")
+
+
+def build_notifications(
+    changes: "pl.DataFrame",
+    hour: datetime,
+) -> List[NotificationDTO]:
+    """
+    Build the notifications of the detected changes.
+
+    :param changes: Output of ``detect_changes``.
+    :param hour: The hour the new weather is for.
+    :return: The notifications.
+    """
+    notifications = []
+    for change in changes.to_dicts():
+        common = {
+            "user_id": change["user_id"],
+            "city_id": change["city_id"],
+            "city_name": change["city_name"],
+            "hour": hour,
+            "previous_temp": change["temp_previous"],
+            "temp": change["temp"],
+        }
+        city_name = change["city_name"]
+        if change["temp_changed"]:
+            notifications.append(
+                NotificationDTO(
+                    kind=NotificationKindEnum.TEMPERATURE_CHANGE,
+                    message=(
+                        f"Temperature in {city_name} changes from "
+                        f"{change['temp_previous']:g} to {change['temp']:g} °C."
+                    ),
+                    **common,
+                ),
+            )
+        if change["rain_started"]:
+            notifications.append(
+                NotificationDTO(
+                    kind=NotificationKindEnum.RAIN_START,
+                    message=f"Rain is starting in {city_name}.",
+                    **common,
+                ),
+            )
+    return notifications
+
+
+def _condition(reading: Dict[str, Any]) -> Any:
+    """
+    Get the main weather condition of a reading, e.g. ``Rain``.
+
+    :param reading: Weather data as stored.
+    :return: The condition, None if the reading has none.
+    """
+    conditions = reading.get("weather") or [{}]
+    return conditions[0].get("main")
+
+
+def _create_sender() -> NotificationSender:
+    """
+    Create the sender of the configured webhook.
+
+    :return: The webhook sender, or the local stand-in without a webhook.
+    """
+    if notification_settings.webhook_url is None:
+        return LocalSender()
+    return WebhookSender(
+        notification_settings.webhook_url,
+        pool_size=notification_settings.concurrency,
+        timeout=notification_settings.webhook_timeout_seconds,
+    )
+
+
+weather_notifier = WeatherNotifier(_create_sender())
@@ -0,0 +1,93 @@
+import asyncio
+from functools import partial
+from typing import Dict
+
+from loguru import logger
+from mdpi_api.db.dao.weather_dao import WeatherDAO
+from mdpi_api.integrations.weather_client import WeatherAPIClient
+from mdpi_api.metrics import Counter
+from mdpi_api.services.weather_writer import weather_writer
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+revalidations = Counter(
+    "weather_revalidations_total",
+    "Background fetches of weather served stale, by outcome.",
+    labelnames=("outcome",),
+)
+
+
+class WeatherRevalidator:
+    """
+    Fetches the current weather of cities in the background.
+
+    Requests serving stale weather schedule a revalidation and return at
+    once. Every city has at most one revalidation in flight, however many
+    requests served its stale weather meanwhile.
+    """
+
+    def __init__(self) -> None:
+        self._pending: Dict[int, "asyncio.Task[None]"] = {}
+
+    def schedule(
+        self,
+        city_id: int,
+        session_factory: async_sessionmaker[AsyncSession],
+        weather_client: WeatherAPIClient,
+    ) -> None:
+        """
+        Revalidate the weather of a city unless that is already under way.
+
+        :param city_id: The ID of the city.
+        :param session_factory: The database session factory.
+        :param weather_client: The weather API client.
+        """
+        if city_id in self._pending:
+            return
+        task = asyncio.create_task(
+            self._revalidate(city_id, session_factory, weather_client),
+        )
+        self._pending[city_id] = task
+        task.add_done_callback(partial(self._forget, city_id))
+
+    async def drain(self) -> None:
+        """Wait for the revalidations in flight."""
+        await asyncio.gather(*self._pending.values(), return_exceptions=True)
+
+    async def _revalidate(
+        self,
+        city_id: int,
+        session_factory: async_sessionmaker[AsyncSession],
+        weather_client: WeatherAPIClient,
+    ) -> None:
+        """
+        Fetch and store the current weather of a city.
+
+        :param city_id: The ID of the city.
+        :param session_factory: The database session factory.
+        :param weather_client: The weather API client.
+        """
+        async with session_factory() as session:
+            weather_dao = WeatherDAO(session)
+            try:
+                if await weather_dao.get_current_weather_id(city_id) is not None:
+                    revalidations.inc(outcome="fresh")
+                    return
+                weather = await weather_client.get_weather_for_city_id(city_id)
+                await weather_writer.save(weather, weather_dao)
+            except Exception as ex:
+                logger.warning(f"Failed to revalidate weather of city {city_id}: {ex}")
+                revalidations.inc(outcome="failed")
+                return
+        revalidations.inc(outcome="fetched")
+
+    def _forget(self, city_id: int, _task: "asyncio.Task[None]") -> None:
+        """
+        Forget a finished revalidation.
+
+        :param city_id: The ID of the city.
+        :param _task: The finished task.
+        """
+        self._pending.pop(city_id, None)
+
+
+weather_revalidator = WeatherRevalidator()
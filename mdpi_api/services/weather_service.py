@@ -1,21 +1,66 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Sequence
+
 from fastapi import Depends
 from loguru import logger
 from mdpi_api.db.dao.city_dao import CityDAO
 from mdpi_api.db.dao.weather_dao import WeatherDAO
-from mdpi_api.db.dependencies import get_db_session
+from mdpi_api.db.dependencies import get_db_session, get_db_session_factory
 from mdpi_api.db.models.weather_model import WeatherModel
 from mdpi_api.integrations.weather_client import WeatherAPIClient
-from mdpi_api.web.api.errors.city import CityNotFoundError
-from mdpi_api.web.api.schemas.weather import WeatherDTO
-from sqlalchemy.ext.asyncio import AsyncSession
+from mdpi_api.metrics import Counter
+from mdpi_api.services.demand_sharing import load_cluster_demand
+from mdpi_api.services.refresh_planner import (
+    PlannedRefresh,
+    batch_refreshes,
+    limit_calls,
+    plan_refreshes,
+    select_refreshes,
+)
+from mdpi_api.services.shared_weather_cache import shared_weather_cache
+from mdpi_api.services.weather_hub import weather_hub
+from mdpi_api.services.weather_notifier import weather_notifier
+from mdpi_api.services.weather_revalidator import weather_revalidator
+from mdpi_api.services.weather_writer import weather_writer
+from mdpi_api.settings import settings
+from mdpi_api.web.api.errors.city import CityNotFoundError, InvalidCitySelectionError
+from mdpi_api.web.api.errors.weather import InvalidDateRangeError, WeatherAPIError
+from mdpi_api.web.api.schemas.weather import (
+    WeatherBucketEnum,
+    WeatherDTO,
+    WeatherHistoryDTO,
+)
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 from sqlalchemy.ext.mutable import MutableDict
 
+history_settings = settings.weather_history
+
+weather_lookups = Counter(
+    "weather_lookups_total",
+    "Cities whose weather was served, by source: shared_cache, database, "
+    "write_queue, stale or weather_api.",
+    labelnames=("source",),
+)
+refresh_calls = Counter(
+    "weather_refresh_total",
+    "Scheduled city weather refreshes, by outcome.",
+    labelnames=("outcome",),
+)
+
 
 class WeatherService:
     """Class for city service."""
 
-    def __init__(self, session: AsyncSession = Depends(get_db_session)):
+    def __init__(
+        self,
+        session: AsyncSession = Depends(get_db_session),
+        session_factory: async_sessionmaker[AsyncSession] = Depends(
+            get_db_session_factory,
+        ),
+    ):
         self.session = session
+        self.session_factory = session_factory
         self.weather_dao = WeatherDAO(session)
         self.weather_client = WeatherAPIClient()
 
@@ -23,76 +68,437 @@ class WeatherService:
         """
         Get weather data for a city by city ID.
 
+        Without weather for the current hour, the most recent stored weather
+        is served at once, marked stale, and the current weather is fetched
+        in the background. Only cities without any recent weather wait for
+        the weather API.
+
         :param city_id: The ID of the city.
         :return: WeatherDTO.
 
         :raises CityNotFoundError: If the city is not found.
         """
+        hour_start, _ = self.weather_dao.current_hour_window()
+        cached = shared_weather_cache.get(city_id, hour_start)
+        if cached:
+            weather_lookups.inc(source="shared_cache")
+            return cached.weather
         weather = await self.weather_dao.get_current_weather(city_id)
-        if not weather:
-            # Call the weather API
-            logger.info(f"Getting weather for city ID {city_id} from API.")
-            city_dao = CityDAO(self.session)
-            city = await city_dao.get_by_id(city_id)
-            if not city:
-                raise CityNotFoundError(detail=f"City with ID {city_id} not found.")
-            api_result = await self.weather_client.get_weather_for_city(
-                city_name=city.name,
+        if weather:
+            weather_lookups.inc(source="database")
+            return WeatherDTO(**weather)
+        queued_weather = weather_writer.pending(city_id)
+        if queued_weather:
+            weather_lookups.inc(source="write_queue")
+            return queued_weather
+
+        stale_weather = await self.weather_dao.get_latest_weather(
+            city_id,
+            _stale_since(),
+        )
+        if stale_weather:
+            return self._serve_stale(stale_weather)
+
+        # Call the weather API
+        logger.info("Getting weather for city ID {0} from API.", city_id)
+        city_dao = CityDAO(self.session)
+        city = await city_dao.get_by_id(city_id)
+        if not city:
+            raise CityNotFoundError(detail=f"City with ID {city_id} not found.")
+        api_result = await self.weather_client.get_weather_for_city_id(city_id)
+        weather_lookups.inc(source="weather_api")
+        # Written in the background, the response does not wait for the insert
+        await weather_writer.save(api_result, self.weather_dao)
+        return api_result
+
+    async def get_weather_by_city_ids(
+        self,
+        city_ids: Sequence[int],
+    ) -> List[WeatherDTO]:
+        """
+        Get weather data for several cities.
+
+        Cities are resolved in tiers, every tier with one lookup for all
+        cities still missing: the shared cache, one query for the stored
+        weather, the write queue, and one concurrent fan-out to the weather
+        API. Old weather is served stale as in ``get_weather_by_city_id``.
+
+        :param city_ids: The IDs of the cities.
+        :return: WeatherDTO of every city, in the requested order.
+
+        :raises InvalidCitySelectionError: If too few or too many cities
+            are requested.
+        """
+        unique_ids = list(dict.fromkeys(city_ids))
+        max_cities = settings.weather_batch.max_cities
+        if not unique_ids or len(unique_ids) > max_cities:
+            raise InvalidCitySelectionError(
+                detail=f"Request the weather of 1 to {max_cities} cities.",
             )
-            # Save the weather data, TODO: add this to a task queue
-            await self.weather_dao.add_weather(
-                WeatherModel(
-                    city_id=city_id,
-                    data=MutableDict(api_result or {}),
+
+        hour_start, _ = self.weather_dao.current_hour_window()
+        weathers: Dict[int, WeatherDTO] = {}
+        for city_id in unique_ids:
+            cached = shared_weather_cache.get(city_id, hour_start)
+            if cached:
+                weathers[city_id] = cached.weather
+        weather_lookups.inc(len(weathers), source="shared_cache")
+        missing_ids = [
+            unique_id for unique_id in unique_ids if unique_id not in weathers
+        ]
+        if missing_ids:
+            weathers.update(await self._get_stored_weathers(missing_ids, hour_start))
+        missing_ids = [
+            unique_id for unique_id in unique_ids if unique_id not in weathers
+        ]
+        if missing_ids:
+            weathers.update(await self._fetch_weathers(missing_ids))
+        return [weathers[requested_id] for requested_id in city_ids]
+
+    async def get_current_weather_version(self, city_id: int) -> Optional[int]:
+        """
+        Get the version of the stored weather for the current hour.
+
+        :param city_id: The ID of the city.
+        :return: ID of the stored weather row, None if there is none yet.
+        """
+        hour_start, _ = self.weather_dao.current_hour_window()
+        cached_version = shared_weather_cache.get_version(city_id, hour_start)
+        if cached_version is not None:
+            return cached_version
+        return await self.weather_dao.get_current_weather_id(city_id)
+
+    async def get_weather_history(
+        self,
+        city_id: int,
+        start: datetime,
+        end: datetime,
+        bucket: WeatherBucketEnum,
+    ) -> List[WeatherHistoryDTO]:
+        """
+        Get aggregated weather history for a city.
+
+        :param city_id: The ID of the city.
+        :param start: Start of the range (inclusive).
+        :param end: End of the range (exclusive).
+        :param bucket: The bucket size.
+        :return: List of aggregated weather buckets.
+
+        :raises InvalidDateRangeError: If the range is empty or too long.
+        :raises CityNotFoundError: If the city is not found.
+        """
+        if end <= start:
+            raise InvalidDateRangeError(detail="'to' must be after 'from'.")
+        if end - start > timedelta(days=history_settings.max_range_days):
+            raise InvalidDateRangeError(
+                detail=(
+                    "The range can not be longer than "
+                    f"{history_settings.max_range_days} days."
                 ),
             )
-            return api_result
-        return WeatherDTO(**weather)
+        city_dao = CityDAO(self.session)
+        if await city_dao.get_by_id(city_id) is None:
+            raise CityNotFoundError(detail=f"City with ID {city_id} not found.")
+
+        buckets = await self.weather_dao.get_weather_history(
+            city_id,
+            start,
+            end,
+            bucket.value,
+        )
+        return [WeatherHistoryDTO(**row) for row in buckets]
 
-    async def update_weather_for_all_cities(self) -> None:
+    async def plan_refresh(self) -> List[List[PlannedRefresh]]:
         """
-        Update weather data for all distinct cities in the favorite_cities table.
+        Plan the refreshes of the cities in demand for the coming hour.
+
+        Favorite cities and the cities in demand on any worker are candidates.
+        Cities nobody asked for, streams or gets notified about lately are
+        skipped, hot cities are refreshed more than once per hour, all within
+        the upstream call budget.
 
-        This method fetches weather from the API for each city and updates the database.
+        The refreshes are spread across the refresh window before the coming
+        hour, every city at its own slot, so the upstream API and the database
+        see a steady trickle instead of a burst at minute 0, and the hour is
+        never cold when it starts. Refreshes due close together are fetched
+        in one group request.
+
+        :return: Batches of refreshes fetched with one upstream request each,
+            ordered by time.
         """
-        logger.info("Updating weather data for all cities in favorite_cities table...")
+        logger.info("Planning weather refreshes for cities in demand...")
 
-        # Fetch all distinct city IDs from the favorite_cities table
         city_dao = CityDAO(self.session)
-        cities = await city_dao.get_all_favorite_cities()
+        favorite_cities = await city_dao.get_all_favorite_cities()
+        # Requests, stream subscriptions and notifications of every worker
+        demand = await load_cluster_demand(self.session)
+        selection = select_refreshes(
+            {city.id for city in favorite_cities} | demand.city_ids(),
+            demand.estimate,
+        )
+        city_count = len(selection.refreshes)
+        logger.info(
+            "Refreshing {0} cities, skipping {1} cold and {2} over budget.",
+            city_count,
+            selection.cold,
+            selection.over_budget,
+        )
+        if not selection.refreshes:
+            return []
+
+        # Requested city IDs are tracked before they are known to exist
+        cities = await city_dao.get_by_ids(selection.refreshes)
+        known_ids = {city.id for city in cities}
+        plan = [
+            refresh
+            for refresh in plan_refreshes(selection.refreshes, datetime.utcnow())
+            if refresh.city_id in known_ids
+        ]
+        return limit_calls(batch_refreshes(plan))
 
-        if not cities:
-            logger.info("No favorite cities found to update.")
+    async def refresh_cities(self, city_ids: Sequence[int]) -> None:
+        """
+        Refresh the weather of cities right away, in group requests.
+
+        Replays the work of the hourly refresh without waiting for the
+        refresh window, e.g. in load tests.
+
+        :param city_ids: IDs of the cities.
+        """
+        now = datetime.utcnow()
+        plan = [PlannedRefresh(now, city_id, now) for city_id in city_ids]
+        for batch in batch_refreshes(plan):
+            await self.refresh_batch(batch)
+
+    async def refresh_batch(self, batch: Sequence[PlannedRefresh]) -> None:
+        """
+        Update the weather of a batch of cities with one upstream request.
+
+        Cities with weather stored since their ``fresh_since`` are skipped.
+
+        :param batch: The planned refreshes of distinct cities.
+        """
+        last_stored = await self.weather_dao.get_last_stored_at(
+            [refresh.city_id for refresh in batch],
+            since=min(refresh.fresh_since for refresh in batch),
+        )
+        stale_ids = [
+            refresh.city_id
+            for refresh in batch
+            if not _stored_since(last_stored.get(refresh.city_id), refresh.fresh_since)
+        ]
+        refresh_calls.inc(len(batch) - len(stale_ids), outcome="fresh")
+        if not stale_ids:
             return
 
-        # Fetch and update weather data for each city
-        for city in cities:
-            try:
-                if await self.weather_dao.get_current_weather(city.id):
-                    logger.info(
-                        (
-                            f"Weather for current hour already exists "
-                            f"for city ID {city.id}."
-                        ),
-                    )
-                else:
-                    # Call the weather API
-                    logger.info(f"Getting weather for city ID {city.id} from API.")
-                    api_result = await self.weather_client.get_weather_for_city(
-                        city_name=city.name,
-                    )
-                    # Update the weather data
-                    await self.weather_dao.add_weather(
-                        WeatherModel(
-                            city_id=city.id,
-                            data=MutableDict(api_result or {}),
-                        ),
-                    )
-                    logger.info(
-                        (
-                            f"Weather data updated for city ID {city.id}, "
-                            f"name: {city.name}."
-                        ),
-                    )
-            except Exception as ex:
-                logger.error(f"Failed to update weather for city ID {city.id}: {ex}")
+        try:
+            fetched = await self._fetch_and_store(stale_ids)
+        except Exception as ex:
+            logger.error(f"Failed to update weather for city IDs {stale_ids}: {ex}")
+            fetched = 0
+        refresh_calls.inc(fetched, outcome="fetched")
+        refresh_calls.inc(len(stale_ids) - fetched, outcome="failed")
+
+    async def _get_stored_weathers(
+        self,
+        city_ids: List[int],
+        hour_start: datetime,
+    ) -> Dict[int, WeatherDTO]:
+        """
+        Get the stored weather of several cities with one query.
+
+        Queued weather wins over weather stored before the current hour.
+
+        :param city_ids: The IDs of the cities.
+        :param hour_start: Start of the current hour window (naive UTC).
+        :return: WeatherDTO by city ID, cities without any are missing.
+        """
+        stored = await self.weather_dao.get_latest_weathers(city_ids, _stale_since())
+        weathers = {}
+        for city_id in city_ids:
+            queued_weather = weather_writer.pending(city_id)
+            stored_weather = stored.get(city_id)
+            if stored_weather and _is_current(stored_weather, hour_start):
+                weather_lookups.inc(source="database")
+                weathers[city_id] = WeatherDTO(**stored_weather)
+            elif queued_weather:
+                weather_lookups.inc(source="write_queue")
+                weathers[city_id] = queued_weather
+            elif stored_weather:
+                weathers[city_id] = self._serve_stale(stored_weather)
+        return weathers
+
+    async def _fetch_weathers(self, city_ids: List[int]) -> Dict[int, WeatherDTO]:
+        """
+        Fetch the weather of several cities from the weather API.
+
+        :param city_ids: The IDs of the cities.
+        :return: WeatherDTO by city ID.
+
+        :raises CityNotFoundError: If a city is not found.
+        :raises WeatherAPIError: If the weather of a city could not be fetched.
+        """
+        cities = await CityDAO(self.session).get_by_ids(city_ids)
+        unknown_ids = sorted(set(city_ids) - {city.id for city in cities})
+        if unknown_ids:
+            raise CityNotFoundError(detail=f"Cities with IDs {unknown_ids} not found.")
+
+        logger.info("Getting weather for city IDs {0} from API.", city_ids)
+        fetched = await self.weather_client.get_weather_for_city_ids(city_ids)
+        weathers = {weather.city_id: weather for weather in fetched}
+        if len(weathers) < len(city_ids):
+            raise WeatherAPIError(detail="Failed to fetch weather data.")
+        weather_lookups.inc(len(weathers), source="weather_api")
+        for weather in fetched:
+            # Written in the background, the response does not wait for the insert
+            await weather_writer.save(weather, self.weather_dao)
+        return weathers
+
+    def _serve_stale(self, stored_weather: Dict[str, Any]) -> WeatherDTO:
+        """
+        Serve weather stored before the current hour, and fetch it again.
+
+        :param stored_weather: The stored weather with the time it was stored.
+        :return: The weather marked stale.
+        """
+        city_id = stored_weather["city_id"]
+        logger.info("Serving stale weather for city ID {0}.", city_id)
+        weather_lookups.inc(source="stale")
+        weather_revalidator.schedule(city_id, self.session_factory, self.weather_client)
+        return WeatherDTO(
+            city_id=city_id,
+            city_name=stored_weather["city_name"],
+            data=stored_weather["data"],
+            stale=True,
+            age_seconds=_age(stored_weather["created_at"]),
+        )
+
+    async def _fetch_and_store(self, city_ids: List[int]) -> int:
+        """
+        Fetch the weather of cities with one upstream request and store it.
+
+        :param city_ids: IDs of the cities.
+        :return: Number of cities whose weather was stored.
+        """
+        # Call the weather API
+        logger.info("Getting weather for city IDs {0} from API.", city_ids)
+        fetched_weathers = await self.weather_client.get_weather_for_city_ids(city_ids)
+        weathers = [
+            weather for weather in fetched_weathers if weather.city_id in city_ids
+        ]
+        rows = [
+            WeatherModel(city_id=weather.city_id, data=MutableDict(weather.data))
+            for weather in weathers
+        ]
+        # Update the weather data
+        await self.weather_dao.add_weathers(rows)
+        entries = [(row.id, weather) for row, weather in zip(rows, weathers)]
+        # Served from memory by every worker of the host
+        shared_weather_cache.put_many(entries)
+        # Pushed to the clients streaming these cities, and to the shared
+        # cache of the other hosts
+        await weather_hub.publish(entries)
+        if settings.notifications.enabled:
+            await weather_notifier.notify(self.session, weathers)
+        return len(rows)
+
+
+async def refresh_weather_for_all_cities(
+    session_factory: async_sessionmaker[AsyncSession],
+) -> None:
+    """
+    Scheduled job updating the weather of the cities in demand.
+
+    The run waits for every batch of its plan across the refresh window, so
+    the plan and every batch get their own short-lived session instead of
+    holding a connection for the whole window.
+
+    :param session_factory: The database session factory.
+    """
+    async with session_factory() as session:
+        batches = await WeatherService(session, session_factory).plan_refresh()
+    for batch in batches:
+        delay = (batch[0].at - datetime.utcnow()).total_seconds()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        async with session_factory() as session:  # noqa: WPS440
+            await WeatherService(session, session_factory).refresh_batch(batch)
+
+
+async def warm_weather_cache(
+    session_factory: async_sessionmaker[AsyncSession],
+    limit: int,
+) -> int:
+    """
+    Load the weather of the current hour into the shared cache.
+
+    A new worker then serves the cities refreshed lately from memory from its
+    first request on.
+
+    :param session_factory: The database session factory.
+    :param limit: Most cities to load.
+    :return: Number of cities loaded.
+    """
+    if not shared_weather_cache.is_open:
+        return 0
+    async with session_factory() as session:
+        rows = await WeatherDAO(session).get_current_weathers(limit)
+    shared_weather_cache.put_many(
+        [(row["id"], WeatherDTO(**row)) for row in rows],
+    )
+    return len(rows)
+
+
+def _stale_since() -> datetime:
+    """
+    Get the oldest weather that may still be served stale.
+
+    :return: The time (naive UTC).
+    """
+    return datetime.utcnow() - timedelta(hours=settings.weather_api.stale_max_age_hours)
+
+
+def _is_current(stored_weather: Dict[str, Any], hour_start: datetime) -> bool:
+    """
+    Check whether stored weather belongs to the current hour.
+
+    :param stored_weather: The stored weather with the time it was stored.
+    :param hour_start: Start of the current hour window (naive UTC).
+    :return: True if the weather was stored in the current hour window.
+    """
+    return _naive_utc(stored_weather["created_at"]) >= hour_start
+
+
+def _stored_since(stored_at: Optional[datetime], since: datetime) -> bool:
+    """
+    Check whether weather was stored since a time.
+
+    :param stored_at: When the weather was last stored, None if never.
+    :param since: The time (naive UTC).
+    :return: True if the weather was stored since ``since``.
+    """
+    return stored_at is not None and _naive_utc(stored_at) >= since
+
+
+def _naive_utc(moment: datetime) -> datetime:
+    """
+    Convert a datetime to naive UTC, naive datetimes are UTC already.
+
+    :param moment: The datetime.
+    :return: The naive UTC datetime.
+    """
+    if moment.tzinfo is None:
+        return moment
+    return moment.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def _age(stored_at: datetime) -> int:
+    """
+    Get the age of stored weather.
+
+    :param stored_at: When the weather was stored, naive datetimes are UTC.
+    :return: Age in whole seconds.
+    """
+    if stored_at.tzinfo is None:
+        stored_at = stored_at.replace(tzinfo=timezone.utc)
+    return int((datetime.now(timezone.utc) - stored_at).total_seconds())
@@ -0,0 +1,236 @@
+import asyncio
+import time
+from contextlib import suppress
+from typing import Dict, List, Optional
+
+from loguru import logger
+from mdpi_api.db.dao.weather_dao import WeatherDAO
+from mdpi_api.db.models.weather_model import WeatherModel
+from mdpi_api.metrics import Counter, Gauge
+from mdpi_api.settings import settings
+from mdpi_api.web.api.schemas.weather import WeatherDTO
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from sqlalchemy.ext.mutable import MutableDict
+
+writer_settings = settings.weather_writer
+
+queue_depth = Gauge(
+    "weather_write_queue_depth",
+    "Weather readings waiting to be written.",
+)
+written_rows = Counter(
+    "weather_write_rows_total",
+    "Weather readings taken from the write queue, by outcome: written or dropped.",
+    labelnames=("outcome",),
+)
+write_retries = Counter(
+    "weather_write_retries_total",
+    "Failed batch writes that were retried.",
+)
+flushes = Counter(
+    "weather_write_flushes_total",
+    "Batches written from the write queue.",
+)
+flush_seconds = Counter(
+    "weather_write_flush_seconds_total",
+    "Time spent writing batches from the write queue.",
+)
+last_flush_seconds = Gauge(
+    "weather_write_last_flush_seconds",
+    "Duration of the last batch written from the write queue.",
+    aggregation="max",
+)
+
+
+class WeatherWriter:
+    """
+    Write-behind queue for weather fetched on the request path.
+
+    Requests queue the weather they fetched and return at once, a background
+    task inserts the queue in batches. A full queue makes requests wait for
+    room, so a slow database slows requests down instead of growing the
+    queue without bound. A failed batch is retried with backoff a bounded
+    number of times and then dropped. Queued weather is served from the
+    queue until it is written, and the queue is written out when the writer
+    stops.
+    """
+
+    def __init__(
+        self,
+        queue_size: int = writer_settings.queue_size,
+        batch_size: int = writer_settings.batch_size,
+        flush_interval: float = writer_settings.flush_interval_seconds,
+        max_attempts: int = writer_settings.max_attempts,
+        retry_delay: float = writer_settings.retry_delay_seconds,
+    ) -> None:
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self._queue: "asyncio.Queue[WeatherDTO]" = asyncio.Queue(queue_size)
+        self._pending: Dict[int, WeatherDTO] = {}
+        self._task: Optional["asyncio.Task[None]"] = None
+        self._stopping = False
+        # Set when weather is queued or the writer stops
+        self._wakeup = asyncio.Event()
+
+    @property
+    def is_running(self) -> bool:
+        """
+        Whether the background task is writing the queue.
+
+        :return: True if the writer is running.
+        """
+        return self._task is not None and not self._task.done()
+
+    def start(self, session_factory: async_sessionmaker[AsyncSession]) -> None:
+        """
+        Start writing the queue in the background.
+
+        :param session_factory: The database session factory.
+        """
+        self._stopping = False
+        self._task = asyncio.create_task(self._run(session_factory))
+
+    async def stop(self) -> None:
+        """Write out the queue and stop the background task."""
+        if self._task is None:
+            return
+        self._stopping = True
+        self._wakeup.set()
+        await self._task
+        self._task = None
+
+    async def save(self, weather: WeatherDTO, weather_dao: WeatherDAO) -> None:
+        """
+        Queue weather for writing.
+
+        While the writer is not running, e.g. in scripts and tests, the
+        weather is inserted right away.
+
+        :param weather: The fetched weather.
+        :param weather_dao: DAO inserting the weather if the writer is stopped.
+        """
+        if not self.is_running:
+            await weather_dao.add_weather(_to_model(weather))
+            return
+        self._pending[weather.city_id] = weather
+        await self._queue.put(weather)
+        self._wakeup.set()
+        queue_depth.set(self._queue.qsize())
+
+    def pending(self, city_id: int) -> Optional[WeatherDTO]:
+        """
+        Get weather of a city that is queued but not written yet.
+
+        :param city_id: The ID of the city.
+        :return: The queued weather, None if there is none.
+        """
+        return self._pending.get(city_id)
+
+    async def _run(self, session_factory: async_sessionmaker[AsyncSession]) -> None:
+        """
+        Write the queue in batches until the writer stops and it is empty.
+
+        :param session_factory: The database session factory.
+        """
+        while not (self._stopping and self._queue.empty()):
+            batch = await self._next_batch()
+            if batch:
+                await self._write(batch, session_factory)
+
+    async def _next_batch(self) -> List[WeatherDTO]:
+        """
+        Collect the next batch from the queue.
+
+        :return: Up to ``batch_size`` readings, those queued within
+            ``flush_interval`` seconds or until the writer stops.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.flush_interval
+        batch: List[WeatherDTO] = []
+        while len(batch) < self.batch_size:
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            timeout = deadline - loop.time()
+            if self._stopping or timeout <= 0:
+                break
+            self._wakeup.clear()
+            with suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+        return batch
+
+    async def _write(
+        self,
+        batch: List[WeatherDTO],
+        session_factory: async_sessionmaker[AsyncSession],
+    ) -> None:
+        """
+        Insert a batch, drop it if every attempt fails.
+
+        :param batch: The readings.
+        :param session_factory: The database session factory.
+        """
+        started = time.perf_counter()
+        row_count = len(batch)
+        outcome = "written"
+        if not await self._insert(batch, session_factory):
+            logger.error("Dropped {0} weather readings.", row_count)
+            outcome = "dropped"
+        for weather in batch:
+            if self._pending.get(weather.city_id) is weather:
+                self._pending.pop(weather.city_id)
+        elapsed = time.perf_counter() - started
+        written_rows.inc(row_count, outcome=outcome)
+        flushes.inc()
+        flush_seconds.inc(elapsed)
+        last_flush_seconds.set(elapsed)
+        queue_depth.set(self._queue.qsize())
+
+    async def _insert(
+        self,
+        batch: List[WeatherDTO],
+        session_factory: async_sessionmaker[AsyncSession],
+    ) -> bool:
+        """
+        Insert a batch in one transaction, retrying with backoff.
+
+        :param batch: The readings.
+        :param session_factory: The database session factory.
+        :return: True if the batch was written.
+        """
+        delay = self.retry_delay
+        for attempt in range(1, self.max_attempts + 1):
+            # Rows of a failed attempt belong to its session, so build new ones
+            rows = [_to_model(weather) for weather in batch]
+            try:
+                async with session_factory() as session:
+                    await WeatherDAO(session).add_weathers(rows)
+            except Exception as ex:
+                logger.warning(
+                    "Failed to write {0} weather readings (attempt {1}): {2}",
+                    len(rows),
+                    attempt,
+                    ex,
+                )
+            else:
+                return True
+            if attempt < self.max_attempts:
+                write_retries.inc()
+                await asyncio.sleep(delay)
+                delay *= 2
+        return False
+
+
+def _to_model(weather: WeatherDTO) -> WeatherModel:
+    """
+    Build the row of fetched weather.
+
+    :param weather: The fetched weather.
+    :return: The weather model.
+    """
+    return WeatherModel(city_id=weather.city_id, data=MutableDict(weather.data))
+
+
+weather_writer = WeatherWriter()
@@ -1,6 +1,8 @@
 import enum
+from functools import lru_cache
 from pathlib import Path
 from tempfile import gettempdir
+from typing import Optional
 
 from decouple import config
 from pydantic import BaseModel
@@ -8,6 +10,9 @@ from pydantic_settings import BaseSettings, SettingsConfigDict
 from yarl import URL
 
 TEMP_DIR = Path(gettempdir())
+SHM_DIR = Path("/dev/shm")  # noqa: S108
+# tmpfs where available, so shared memory-mapped files never hit the disk
+SHARED_DIR = SHM_DIR if SHM_DIR.is_dir() else TEMP_DIR
 
 
 class LogLevel(str, enum.Enum):  # noqa: WPS600
@@ -31,8 +36,15 @@ class LogSettings(BaseModel):
     format: str = (
         "<green>{time:YYYY-MM-DD HH:mm:ss.SSS}</green> | {level} | "
         "<cyan>{name}</cyan>:<cyan>{function}</cyan>:<cyan>{line}</cyan>:"
-        "<blue>[{correlation_id}]</blue> - <level>{message}</level>"
+        "<blue>[{extra[correlation_id]}]</blue> - <level>{message}</level>"
     )
+    # Sinks only queue records, a background thread writes them
+    enqueue: bool = True
+    # Info and debug records are dropped once this many records are queued
+    queue_size: int = 10000
+    to_file: bool = True
+    # Share of requests whose info and debug records are kept
+    info_sample_rate: float = 1.0
 
 
 class DatabaseSettings(BaseModel):
@@ -85,6 +97,8 @@ class SecuritySettings(BaseModel):
     allowed_hosts: list[str]
     cors_allowed_origins: list[str]
     session_secret_key: str
+    # Users allowed to use the diagnostics endpoints, by email, nobody if empty
+    admin_emails: list[str] = []
 
 
 class WeatherAPISettings(BaseModel):
@@ -93,6 +107,212 @@ class WeatherAPISettings(BaseModel):
     api_key: str
     base_url: str
     timeout: int
+    # OpenWeather accepts at most this many city IDs per group request
+    group_limit: int = 20
+    # Deadline of a single upstream call, below the client timeout
+    deadline_seconds: float = 3
+    # Consecutive failures opening the circuit, and how long it stays open
+    breaker_failure_threshold: int = 5
+    breaker_reset_seconds: float = 30
+    # Stored weather up to this age is served while fresh weather is fetched
+    stale_max_age_hours: int = 24
+
+    @property
+    def group_url(self) -> str:
+        """
+        URL of the multi-city group endpoint, next to the single city one.
+
+        :return: group endpoint URL.
+        """
+        api_root = self.base_url.rstrip("/").rsplit("/", 1)[0]
+        return f"{api_root}/group"
+
+
+class WeatherHistorySettings(BaseModel):
+    """Weather history settings."""
+
+    # Longest range a single history request may cover
+    max_range_days: int = 366
+    # Responses with more buckets than this are streamed in chunks
+    stream_threshold: int = 1000
+    stream_chunk_size: int = 500
+
+
+class WeatherBatchSettings(BaseModel):
+    """Settings of multi-city weather requests."""
+
+    # Most cities one request may ask the weather of
+    max_cities: int = 50
+
+
+class ExportSettings(BaseModel):
+    """Weather export settings."""
+
+    # Rows fetched from the server side cursor per round trip
+    chunk_size: int = 5000
+    # Size of the chunks a spooled export file is streamed in
+    file_chunk_size: int = 65536
+
+
+class CompressionSettings(BaseModel):
+    """Response compression settings."""
+
+    # Responses smaller than this are sent uncompressed
+    minimum_size: int = 1024
+    level: int = 6
+
+
+class WeatherRefreshSettings(BaseModel):
+    """Scheduled weather refresh settings."""
+
+    # Refreshes are spread over the last minutes (1-59) before every hour
+    window_minutes: int = 15
+    # Refreshes end at least this many seconds before the hour
+    margin_seconds: int = 60
+    # Every city's slot is shifted randomly by up to this many seconds
+    jitter_seconds: int = 30
+    # Refreshes due within this many seconds of each other share a group request
+    batch_span_seconds: int = 60
+    # Upstream calls the refresh may plan per hour, hottest cities first; one
+    # group request is one call, whatever its number of cities
+    upstream_budget_per_hour: int = 1000
+    # Cities with less (decayed) demand than this are not refreshed
+    cold_demand: float = 0.5
+    # Every this much demand earns a city another refresh within the hour
+    hot_demand: float = 60
+    max_refreshes_per_hour: int = 4
+    # Request counts halve over this many hours
+    demand_half_life_hours: float = 6
+    # Size of the count-min sketch the demand is tracked in
+    sketch_width: int = 2048
+    sketch_depth: int = 4
+    # Every worker publishes its demand this often for the leader to merge
+    demand_publish_seconds: float = 60
+
+
+class WeatherWriterSettings(BaseModel):
+    """Write-behind settings of weather fetched on the request path."""
+
+    # Requests wait for room once this many readings are queued
+    queue_size: int = 1000
+    # Queued readings are inserted in batches of up to this many rows
+    batch_size: int = 200
+    # Longest time a reading waits in the queue for its batch to fill up
+    flush_interval_seconds: float = 0.5
+    # A failed batch is written again up to this many times in all, then dropped
+    max_attempts: int = 3
+    # Wait before the first retry, doubled before every next one
+    retry_delay_seconds: float = 1
+
+
+class SharedCacheSettings(BaseModel):
+    """Settings of the weather cache shared by all workers of a host."""
+
+    enabled: bool = True
+    # Memory-mapped file holding the cache
+    path: Path = SHARED_DIR / "mdpi_api_weather.cache"
+    # Cities the cache holds, and bytes reserved for each city's weather
+    slots: int = 8192
+    payload_bytes: int = 1024
+
+
+class WeatherStreamSettings(BaseModel):
+    """Settings of the weather update stream."""
+
+    # Idle streams get a comment this often, so proxies keep them open
+    heartbeat_seconds: float = 15
+    # PostgreSQL channel carrying the updates to every worker
+    channel: str = "weather_updates"
+    reconnect_seconds: float = 5
+
+
+class NotificationSettings(BaseModel):
+    """Settings of the weather change notifications."""
+
+    enabled: bool = True
+    # Notifications are POSTed here in batches, only logged if unset
+    webhook_url: Optional[str] = None
+    webhook_timeout_seconds: float = 10
+    # Change from the previous hour that is worth a notification
+    temp_change_celsius: float = 5
+    batch_size: int = 100
+    # Batches sent at the same time, also the webhook connection pool size
+    concurrency: int = 4
+    # A failed batch is sent again after 1, 2, 4... times this delay
+    max_attempts: int = 3
+    retry_delay_seconds: float = 1
+
+
+class MetricsSettings(BaseModel):
+    """Settings of the metrics shared by the workers of a host."""
+
+    # Report the metrics of all workers on /metrics, not only of the one asked
+    multiprocess: bool = True
+    # Every worker writes a snapshot of its metrics here this often
+    snapshot_dir: Path = SHARED_DIR / "mdpi_api_metrics"
+    snapshot_interval_seconds: float = 5
+
+
+class QueryInspectionSettings(BaseModel):
+    """Settings of the N+1 and slow query detection, for debugging and CI."""
+
+    enabled: bool = False
+    # Statements repeated this often within a request or job are reported
+    repeat_threshold: int = 5
+    # Statements slower than this are reported, with their plan if explain is on
+    slow_query_ms: float = 100
+    explain: bool = True
+
+
+class LoopWatchdogSettings(BaseModel):
+    """Settings of the event loop lag and blocking call watchdog."""
+
+    enabled: bool = True
+    # The loop is probed this often, its lag is exported as a histogram
+    interval_seconds: float = 0.1
+    # A loop not run for this long is blocked, the blocking stack is logged
+    block_threshold_ms: float = 200
+    # At most one report per this many seconds, the others are only counted
+    report_interval_seconds: float = 60
+    # asyncio debug mode reports slow callbacks too, but slows the loop down
+    slow_callbacks: bool = False
+
+
+class ProfilerSettings(BaseModel):
+    """Settings of the on-demand sampling profiler."""
+
+    # Stacks are sampled this often
+    interval_ms: float = 5
+    # Longest profile a request may take
+    max_seconds: float = 60
+    # Largest share of the time the sampler may stall the event loop
+    max_overhead: float = 0.05
+
+
+class SchedulerSettings(BaseModel):
+    """Scheduler settings."""
+
+    enabled: bool = True
+    # Key of the PostgreSQL advisory lock held by the scheduler leader
+    leader_lock_key: int = 1835295849
+    # How often workers try to become (or confirm they still are) the leader
+    election_interval_seconds: int = 15
+    # How late a job may start and still run for its slot
+    misfire_grace_seconds: int = 600
+    # Runs of a job are deleted from scheduler_runs once their slot is this old
+    run_retention_days: int = 7
+
+
+class StartupSettings(BaseModel):
+    """Settings of the startup of a worker."""
+
+    # Database connections opened before the worker is ready, up to the pool size
+    warm_connections: int = 5
+    # Cities whose weather of the current hour is loaded into the shared cache
+    warm_cache_cities: int = 1000
+    # A failed startup step is run again after 1, 2, 4... times this delay
+    retry_delay_seconds: float = 1
+    max_retry_delay_seconds: float = 30
 
 
 class Settings(BaseSettings):
@@ -122,6 +342,21 @@ class Settings(BaseSettings):
     rate_limit: RateLimitSettings = RateLimitSettings()
     security: SecuritySettings
     weather_api: WeatherAPISettings
+    weather_history: WeatherHistorySettings = WeatherHistorySettings()
+    export: ExportSettings = ExportSettings()
+    compression: CompressionSettings = CompressionSettings()
+    scheduler: SchedulerSettings = SchedulerSettings()
+    startup: StartupSettings = StartupSettings()
+    weather_refresh: WeatherRefreshSettings = WeatherRefreshSettings()
+    weather_writer: WeatherWriterSettings = WeatherWriterSettings()
+    weather_batch: WeatherBatchSettings = WeatherBatchSettings()
+    shared_cache: SharedCacheSettings = SharedCacheSettings()
+    weather_stream: WeatherStreamSettings = WeatherStreamSettings()
+    notifications: NotificationSettings = NotificationSettings()
+    metrics: MetricsSettings = MetricsSettings()
+    query_inspection: QueryInspectionSettings = QueryInspectionSettings()
+    loop_watchdog: LoopWatchdogSettings = LoopWatchdogSettings()
+    profiler: ProfilerSettings = ProfilerSettings()
 
     model_config = SettingsConfigDict(
         env_file=".env",
@@ -131,4 +366,17 @@ class Settings(BaseSettings):
     )
 
 
-settings = Settings()
+@lru_cache(maxsize=None)
+def get_settings() -> Settings:
+    """
+    Get the application settings.
+
+    The environment and ``.env`` are read and validated on the first call
+    only, every module shares the instance.
+
+    :return: The settings.
+    """
+    return Settings()
+
+
+settings = get_settings()
@@ -0,0 +1,56 @@
+import uuid
+from typing import Any, Dict, List, Tuple
+
+import pytest
+from httpx import AsyncClient
+from loguru import logger
+from mdpi_api.logging import is_sampled, log_settings
+
+REQUEST_ID = "client-request-1"
+# Correlation ID returned and records logged for a request
+LoggedRequest = Tuple[str, List[Dict[str, Any]]]
+
+
+async def _get_cities(
+    client: AsyncClient,
+    auth_headers: Dict[str, str],
+    request_id: str,
+) -> LoggedRequest:
+    headers = {**auth_headers, "X-Request-ID": request_id}
+    messages: List[Any] = []
+    sink_id = logger.add(messages.append, filter=is_sampled, format="{message}")
+    try:  # noqa: WPS501
+        response = await client.get("/api/cities/", headers=headers)
+    finally:
+        logger.remove(sink_id)
+    assert response.status_code == 200
+    return response.headers["x-request-id"], [message.record for message in messages]
+
+
+@pytest.mark.anyio
+async def test_request_id_tags_logs(
+    client: AsyncClient,
+    auth_headers: Dict[str, str],
+) -> None:
+    """Tests that the request ID is returned and carried by the request logs."""
+    response_id, records = await _get_cities(client, auth_headers, REQUEST_ID)
+
+    assert response_id == REQUEST_ID
+    assert records
+    for record in records:
+        assert record["extra"]["correlation_id"] == REQUEST_ID
+
+
+@pytest.mark.anyio
+async def test_unsampled_requests_skip_info_logs(
+    client: AsyncClient,
+    auth_headers: Dict[str, str],
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Tests that unsafe request IDs are replaced and info logs are sampled."""
+    monkeypatch.setattr(log_settings, "info_sample_rate", 0)
+
+    response_id, records = await _get_cities(client, auth_headers, "forged\nline")
+
+    assert uuid.UUID(response_id).hex == response_id
+    assert not records
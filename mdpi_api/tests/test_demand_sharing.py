@@ -0,0 +1,77 @@
+import pytest
+from mdpi_api.db.models.city_model import CityModel
+from mdpi_api.db.models.favorite_cities_model import FavoriteCityModel
+from mdpi_api.db.models.user_model import UserModel
+from mdpi_api.services.demand_sharing import (
+    load_cluster_demand,
+    publish_demand,
+    refresh_settings,
+)
+from mdpi_api.services.demand_tracker import DemandTracker
+from mdpi_api.services.weather_hub import LocalBroker, WeatherHub
+from mdpi_api.services.weather_service import WeatherService
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+def test_merged_demand_decays_with_age() -> None:
+    """Tests that the demand of another worker decays for the snapshot's age."""
+    other_worker = DemandTracker(width=64, depth=2, half_life_hours=1)
+    for _ in range(8):
+        other_worker.record(42)
+    merged = DemandTracker(width=64, depth=2, half_life_hours=1)
+    merged.record(42)
+
+    merged.merge(other_worker.snapshot(), age_seconds=3600)
+
+    assert merged.estimate(42) == pytest.approx(5)
+    assert merged.city_ids() == {42}
+
+
+@pytest.mark.anyio
+async def test_plan_follows_demand_of_other_workers(dbsession: AsyncSession) -> None:
+    """Tests that the leader plans cities requested on another worker only."""
+    dbsession.add(CityModel(id=3190261, name="Subotica"))
+    await dbsession.flush()
+    other_worker = DemandTracker()
+    for _ in range(5):
+        other_worker.record(3190261)
+
+    await publish_demand(
+        dbsession,
+        "other-host:1",
+        other_worker,
+        WeatherHub(LocalBroker()),
+    )
+    service = WeatherService(dbsession, None)  # type: ignore[arg-type]
+    plan = await service.plan_refresh()
+
+    planned_ids = {refresh.city_id for batch in plan for refresh in batch}
+    assert 3190261 in planned_ids
+
+
+@pytest.mark.anyio
+async def test_subscriptions_count_as_demand(
+    dbsession: AsyncSession,
+    user: UserModel,
+) -> None:
+    """Tests that stream and notification subscriptions keep cities warm."""
+    dbsession.add(CityModel(id=32, name="Sombor"))
+    dbsession.add(CityModel(id=33, name="Pirot"))
+    dbsession.add(
+        FavoriteCityModel(user_id=user.id, city_id=32, allow_notifications=True),
+    )
+    await dbsession.flush()
+    other_hub = WeatherHub(LocalBroker())
+    other_hub.subscribe([33])
+    other_hub.subscribe([33])
+    await publish_demand(dbsession, "other-host:2", DemandTracker(), other_hub)
+
+    demand = await load_cluster_demand(
+        dbsession,
+        DemandTracker(),
+        WeatherHub(LocalBroker()),
+    )
+
+    assert demand.city_ids() >= {32, 33}
+    assert demand.estimate(32) == refresh_settings.cold_demand
+    assert demand.estimate(33) == 2
@@ -0,0 +1,72 @@
+from typing import Dict
+
+import pytest
+from httpx import AsyncClient
+from mdpi_api.db.models.city_model import CityModel
+from mdpi_api.db.models.weather_model import WeatherModel
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette import status
+
+
+@pytest.mark.anyio
+async def test_cities_revalidate_with_etag(
+    client: AsyncClient,
+    dbsession: AsyncSession,
+    auth_headers: Dict[str, str],
+) -> None:
+    """Tests that an unchanged city list is answered with 304 Not Modified."""
+    dbsession.add(CityModel(id=1, name="Belgrade"))
+    await dbsession.flush()
+    headers = auth_headers
+
+    response = await client.get("/api/cities/", headers=headers)
+    etag = response.headers["etag"]
+    assert response.status_code == status.HTTP_200_OK
+    assert "max-age" in response.headers["cache-control"]
+
+    response = await client.get(
+        "/api/cities/",
+        headers={**headers, "If-None-Match": etag},
+    )
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+    dbsession.add(CityModel(id=2, name="Novi Sad"))
+    await dbsession.flush()
+    response = await client.get(
+        "/api/cities/",
+        headers={**headers, "If-None-Match": etag},
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["etag"] != etag
+
+
+@pytest.mark.anyio
+async def test_weather_revalidates_with_weak_etag(
+    client: AsyncClient,
+    dbsession: AsyncSession,
+    auth_headers: Dict[str, str],
+) -> None:
+    """Tests that stored weather is answered with 304 for its weak ETag."""
+    dbsession.add(CityModel(id=21, name="Kragujevac"))
+    dbsession.add(WeatherModel(city_id=21, data={"temp": 18}))
+    await dbsession.flush()
+    params = {"city_id": 21}
+
+    response = await client.get(
+        "/api/cities/weather",
+        params=params,
+        headers=auth_headers,
+    )
+    etag = response.headers["etag"]
+    assert response.status_code == status.HTTP_200_OK
+    assert etag.startswith('W/"')
+
+    for if_none_match in (etag, etag.removeprefix("W/")):
+        response = await client.get(
+            "/api/cities/weather",
+            params=params,
+            headers={**auth_headers, "If-None-Match": if_none_match},
+        )
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+        assert response.headers["etag"] == etag
+        assert not response.content
@@ -0,0 +1,46 @@
+from mdpi_api.commands.index_audit import QueryShape, audit_metadata
+from mdpi_api.db.meta import meta
+from mdpi_api.db.models import load_all_models
+from sqlalchemy import (
+    Column,
+    ForeignKey,
+    Index,
+    Integer,
+    MetaData,
+    Table,
+    UniqueConstraint,
+)
+
+
+def test_models_have_no_index_findings() -> None:
+    """Tests that every index of the models serves a DAO query, once."""
+    load_all_models()
+
+    assert not audit_metadata(meta)
+
+
+def test_redundant_and_missing_indexes_are_found() -> None:
+    """Tests that redundant indexes, unindexed keys and lookups are reported."""
+    metadata = MetaData()
+    Table("parents", metadata, Column("id", Integer, primary_key=True))
+    Table(
+        "children",
+        metadata,
+        Column("id", Integer, primary_key=True),
+        Column("parent_id", Integer, ForeignKey("parents.id")),
+        Column("owner_id", Integer),
+        Column("created", Integer),
+        Index("ix_children_id", "id"),
+        Index("ix_children_owner_id", "owner_id"),
+        UniqueConstraint("owner_id", "created", name="unique_owner_created"),
+    )
+    shape = QueryShape("children", ("parent_id",), "created", "ChildDAO")
+
+    findings = audit_metadata(metadata, [shape])
+
+    assert [(finding.kind, finding.name) for finding in findings] == [
+        ("duplicates_primary_key", "ix_children_id"),
+        ("redundant_prefix", "ix_children_owner_id"),
+        ("unindexed_foreign_key", ""),
+        ("unserved_query", ""),
+    ]
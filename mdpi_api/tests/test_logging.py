@@ -0,0 +1,50 @@
+import threading
+from typing import List
+
+from loguru import logger
+from mdpi_api.logging import QueuedSink, dropped_records
+
+WAIT_SECONDS = 5
+
+
+class BlockedWriter:
+    """Writer that blocks on its first record until released."""
+
+    def __init__(self) -> None:
+        self.started = threading.Event()
+        self.released = threading.Event()
+        self.messages: List[str] = []
+
+    def write(self, message: str) -> None:
+        """
+        Write a record once released.
+
+        :param message: The formatted record.
+        """
+        self.started.set()
+        self.released.wait(WAIT_SECONDS)
+        self.messages.append(message.strip())
+
+    def stop(self) -> None:
+        """Nothing to release."""
+
+
+def test_full_queue_drops_info_records() -> None:
+    """Tests that a full queue drops info records but keeps warnings."""
+    writer = BlockedWriter()
+    sink = QueuedSink(writer, queue_size=1)  # type: ignore[arg-type]
+    handler_id = logger.add(sink, format="{message}", level="INFO")
+    dropped_before = dict(dropped_records.samples()).get(("INFO",), 0)
+
+    logger.info("written")
+    assert writer.started.wait(WAIT_SECONDS)
+    logger.info("queued")
+    logger.info("dropped")
+    writer.released.set()
+    logger.warning("kept")
+    logger.remove(handler_id)
+    sink.stop()
+
+    assert writer.messages == ["written", "queued", "kept"]
+    dropped_after = dict(dropped_records.samples()).get(("INFO",), 0)
+    assert dropped_after == dropped_before + 1
@@ -0,0 +1,36 @@
+import asyncio
+import time
+from typing import Any, List
+
+import pytest
+from loguru import logger
+from mdpi_api.diagnostics.loop_watchdog import LoopWatchdog, loop_blocks
+
+BLOCK_SECONDS = 0.2
+
+
+def _block_the_loop() -> None:
+    time.sleep(BLOCK_SECONDS)
+
+
+@pytest.mark.anyio
+async def test_blocking_call_is_reported_once() -> None:
+    """Tests that a blocked loop is counted and its stack reported, rate limited."""
+    watchdog = LoopWatchdog(interval=0.01, block_threshold=0.05, report_interval=60)
+    blocks_before = loop_blocks.samples()[0][1] if loop_blocks.samples() else 0
+    messages: List[Any] = []
+    sink_id = logger.add(messages.append, level="WARNING", format="{message}")
+    watchdog.start()
+    try:  # noqa: WPS501
+        for _ in range(2):
+            await asyncio.sleep(0.05)
+            _block_the_loop()
+        await asyncio.sleep(0.05)
+    finally:
+        await watchdog.stop()
+        logger.remove(sink_id)
+
+    assert loop_blocks.samples()[0][1] - blocks_before == 2
+    assert len(messages) == 1
+    assert "Event loop blocked" in messages[0]
+    assert "_block_the_loop" in messages[0]
@@ -0,0 +1,66 @@
+import os
+import re
+from pathlib import Path
+from typing import Dict
+
+import orjson
+import pytest
+from httpx import AsyncClient
+from mdpi_api.db.models.city_model import CityModel
+from mdpi_api.metrics import MetricsSnapshots, registry
+from sqlalchemy.ext.asyncio import AsyncSession
+
+EXITED_PID = 2**22 + 1
+CITIES_LABELS = 'route="/api/cities/",method="GET"'
+
+
+def _sample(metrics: str, line_start: str) -> float:
+    pattern = re.escape(line_start)
+    match = re.search(f"^{pattern} (.+)$", metrics, re.MULTILINE)
+    assert match is not None, line_start
+    return float(match.group(1))
+
+
+@pytest.mark.anyio
+async def test_requests_are_measured_per_route(
+    client: AsyncClient,
+    dbsession: AsyncSession,
+    auth_headers: Dict[str, str],
+) -> None:
+    """Tests that requests are counted by route template with their SQL."""
+    dbsession.add(CityModel(id=1, name="Zrenjanin"))
+    await dbsession.flush()
+
+    await client.get("/api/cities/", headers=auth_headers)
+    metrics = (await client.get("/api/metrics")).text
+
+    requests_line = f'http_requests_total{{{CITIES_LABELS},status="200"}}'
+    assert _sample(metrics, requests_line) >= 1
+    statements_line = f"http_request_db_statements_sum{{{CITIES_LABELS}}}"
+    assert _sample(metrics, statements_line) >= 1
+    assert f'http_request_seconds_bucket{{{CITIES_LABELS},le="+Inf"}}' in metrics
+
+
+def test_snapshots_of_workers_are_merged(tmp_path: Path) -> None:
+    """Tests that counters of all workers add up and gauges of live ones."""
+    snapshots = MetricsSnapshots(registry)
+    snapshots.enable(tmp_path)
+    other_workers = {os.getppid(): 5, EXITED_PID: 7}
+    for pid, sample_value in other_workers.items():
+        (tmp_path / f"metrics-{pid}.json").write_bytes(
+            orjson.dumps(
+                {
+                    "db_statements_total": [[[], sample_value]],
+                    "http_requests_in_flight": [[[], sample_value]],
+                },
+            ),
+        )
+
+    local = registry.snapshot()
+    metrics = registry.render(snapshots.read_others())
+    snapshots.disable()
+
+    local_statements = local["db_statements_total"][0][1]
+    local_in_flight = local["http_requests_in_flight"][0][1]
+    assert _sample(metrics, "db_statements_total") == local_statements + 12
+    assert _sample(metrics, "http_requests_in_flight") == local_in_flight + 5
@@ -0,0 +1,68 @@
+import asyncio
+import time
+from typing import Dict
+
+import pytest
+from httpx import AsyncClient
+from mdpi_api.db.models.user_model import UserModel
+from mdpi_api.diagnostics.profiler import SamplingProfiler
+from mdpi_api.settings import settings
+
+
+class Busy:
+    """Work the profiler has to find."""
+
+    @staticmethod
+    def spin(seconds: float) -> None:
+        """
+        Use the CPU without yielding to the loop.
+
+        :param seconds: How long to spin.
+        """
+        deadline = time.perf_counter() + seconds
+        while time.perf_counter() < deadline:  # noqa: WPS328
+            pass  # noqa: WPS420
+
+
+@pytest.mark.anyio
+async def test_profile_attributes_time_to_functions() -> None:
+    """Tests that sampled time goes to the function using the loop."""
+    profiler = SamplingProfiler(interval=0.002, max_overhead=0.05)
+    profiling = asyncio.create_task(profiler.profile(0.3))
+    while not profiling.done():
+        Busy.spin(0.01)
+        await asyncio.sleep(0)
+    profile = profiling.result()
+
+    total = sum(profile.weights.values())
+    busy = sum(
+        weight
+        for stack, weight in profile.weights.items()
+        if any(frame.name.endswith(":Busy.spin") for frame in stack)
+    )
+    assert busy > total * 0.8
+    assert profile.overhead * 100 <= 6
+    for line in profile.collapsed().splitlines():
+        frames, microseconds = line.rsplit(" ", 1)
+        assert frames.startswith("task ") or ";" in frames
+        assert int(microseconds) >= 0
+
+
+@pytest.mark.anyio
+async def test_profile_endpoint_is_for_admins(
+    client: AsyncClient,
+    user: UserModel,
+    auth_headers: Dict[str, str],
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Tests that only administrators may profile a worker."""
+    url = "/api/diagnostics/profile?seconds=0.1&mode=wall&output=speedscope"
+
+    refused = await client.get(url, headers=auth_headers)
+    monkeypatch.setattr(settings.security, "admin_emails", [user.email])
+    response = await client.get(url, headers=auth_headers)
+
+    assert refused.status_code == 403
+    assert response.status_code == 200
+    assert int(response.headers["x-profile-samples"]) > 0
+    assert response.json()["profiles"][0]["type"] == "sampled"
@@ -0,0 +1,97 @@
+from typing import Dict, List
+
+import pytest
+from httpx import AsyncClient
+from loguru import logger
+from mdpi_api.conftest import QueryBudget
+from mdpi_api.db.dao.city_dao import CityDAO
+from mdpi_api.db.models.city_model import CityModel
+from mdpi_api.db.query_inspector import (
+    EXPLAIN_SAVEPOINT,
+    inspection_settings,
+    normalize_sql,
+    query_scope,
+)
+from sqlalchemy import select, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+CITY_NAMES = ("Novi Sad", "Subotica", "Kikinda", "Sombor", "Vrsac", "Pancevo")
+
+
+def test_statements_are_normalized() -> None:
+    """Tests that values and parameter lists do not tell statements apart."""
+    statement = "SELECT name\n  FROM city WHERE id IN (?, ?, ?) AND name = 'Nis'"
+    other_values = "SELECT name FROM city WHERE id IN ($1) AND name = 'Novi Sad'"
+
+    assert normalize_sql(statement) == normalize_sql(other_values)
+    assert normalize_sql(statement) == (
+        "SELECT name FROM city WHERE id IN (...) AND name = ?"
+    )
+
+
+@pytest.mark.anyio
+async def test_repeated_statements_are_detected(dbsession: AsyncSession) -> None:
+    """Tests that a query run in a loop is counted as one repeated statement."""
+    cities = [
+        CityModel(id=city_id, name=name)
+        for city_id, name in enumerate(CITY_NAMES, start=1)
+    ]
+    dbsession.add_all(cities)
+    await dbsession.flush()
+    city_dao = CityDAO(dbsession)
+
+    with query_scope("loop") as scope:
+        for city in cities:
+            await city_dao.get_by_id(city.id)
+        repeated = scope.repeated(threshold=len(cities))
+
+    assert len(repeated) == 1
+    assert repeated[0][1].executions == len(cities)
+
+
+@pytest.mark.anyio
+async def test_cities_endpoint_query_budget(
+    client: AsyncClient,
+    dbsession: AsyncSession,
+    auth_headers: Dict[str, str],
+    query_budget: QueryBudget,
+) -> None:
+    """Tests that listing cities runs a fixed number of statements."""
+    dbsession.add_all(
+        CityModel(id=city_id, name=name)
+        for city_id, name in enumerate(CITY_NAMES, start=1)
+    )
+    await dbsession.flush()
+
+    with query_budget(3):
+        response = await client.get("/api/cities/", headers=auth_headers)
+
+    assert response.status_code == 200
+
+
+@pytest.mark.anyio
+async def test_failed_explain_keeps_transaction(
+    dbsession: AsyncSession,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Tests that a failed EXPLAIN is rolled back to its savepoint."""
+    dbsession.add(CityModel(id=1, name="Novi Sad"))
+    await dbsession.flush()
+    monkeypatch.setattr(inspection_settings, "slow_query_ms", 0)
+    monkeypatch.setattr(
+        "mdpi_api.db.query_inspector.EXPLAIN_PREFIXES",
+        {"sqlite": "BOGUS "},
+    )
+    messages: List[str] = []
+    sink_id = logger.add(messages.append, level="WARNING", format="{message}")
+
+    try:
+        names = await dbsession.scalars(select(CityModel.name))
+    finally:
+        logger.remove(sink_id)
+
+    assert names.all() == ["Novi Sad"]
+    assert any("EXPLAIN failed" in message for message in messages)
+    with pytest.raises(OperationalError, match="no such savepoint"):
+        await dbsession.execute(text(f"RELEASE SAVEPOINT {EXPLAIN_SAVEPOINT}"))
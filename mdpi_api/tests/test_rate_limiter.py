@@ -0,0 +1,31 @@
+import pytest
+from fastapi import FastAPI
+from httpx import AsyncClient
+from mdpi_api.web.middlewares.rate_limiter import RateLimiterMiddleware
+from mdpi_api.web.utils.token_bucket import TokenBucket
+from starlette import status
+from starlette.responses import PlainTextResponse, Response
+
+
+async def _ok() -> Response:
+    return PlainTextResponse("ok")
+
+
+@pytest.mark.anyio
+async def test_probes_are_not_rate_limited() -> None:
+    """Tests that health checks and metrics answer once the bucket is empty."""
+    app = FastAPI()
+    app.add_api_route("/api/cities", _ok)
+    app.add_api_route("/api/health/ready", _ok)
+    app.add_api_route("/api/metrics", _ok)
+    app.add_middleware(RateLimiterMiddleware, bucket=TokenBucket(1, 0.001))
+
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        statuses = [
+            (await client.get(path)).status_code
+            for path in ("/api/cities", "/api/cities", "/api/health/ready")
+        ]
+        metrics = await client.get("/api/metrics")
+
+    assert statuses == [200, status.HTTP_429_TOO_MANY_REQUESTS, 200]
+    assert metrics.status_code == status.HTTP_200_OK
@@ -0,0 +1,93 @@
+import random
+from datetime import datetime, timedelta
+
+import pytest
+from mdpi_api.services.demand_tracker import DemandTracker
+from mdpi_api.services.refresh_planner import (
+    batch_refreshes,
+    limit_calls,
+    plan_refreshes,
+    refresh_settings,
+    refresh_window,
+    select_refreshes,
+    target_hour,
+)
+
+
+def test_refreshes_land_before_the_hour() -> None:
+    """Tests that planned refreshes are spread over the window before the hour."""
+    hour = datetime(2024, 9, 1, 13)
+    window_start = hour - refresh_window()
+    rng = random.Random(1)  # noqa: S311
+
+    plan = plan_refreshes(dict.fromkeys(range(1000), 1), window_start, rng=rng)
+
+    assert len(plan) == 1000
+    assert all(window_start <= refresh.at < hour for refresh in plan)
+    spread = plan[-1].at - plan[0].at
+    assert spread > refresh_window() / 2
+
+
+def test_repeats_end_before_the_next_run() -> None:
+    """Tests that hot cities are refreshed again only until the next run is due."""
+    hour = datetime(2024, 9, 1, 13)
+    next_run = hour + timedelta(hours=1) - refresh_window()
+    margin = timedelta(seconds=refresh_settings.margin_seconds)
+    window_start = next_run - timedelta(hours=1)
+    rng = random.Random(1)  # noqa: S311
+
+    plan = plan_refreshes(dict.fromkeys(range(100), 4), window_start, rng=rng)
+
+    assert len(plan) > 200
+    assert all(refresh.at <= next_run - margin for refresh in plan)
+
+
+def test_late_run_targets_the_current_hour() -> None:
+    """Tests that a run outside the refresh window fills the current hour."""
+    hour = datetime(2024, 9, 1, 13)
+
+    assert target_hour(hour.replace(minute=20)) == hour
+    assert target_hour(hour.replace(hour=12, minute=50)) == hour
+
+
+def test_selection_follows_demand_within_budget() -> None:
+    """Tests that cold cities are skipped and hot ones refreshed more often."""
+    demand = {1: 500.0, 2: 70.0, 3: 5.0, 4: 0.1}
+
+    selection = select_refreshes(
+        demand,
+        lambda city_id: demand[city_id],
+        budget=2,
+        group_size=3,
+    )
+
+    assert selection.refreshes == {1: 4, 2: 1, 3: 1}
+    assert selection.cold == 1
+
+
+def test_calls_are_charged_per_group_request() -> None:
+    """Tests that a batch of cities costs one call of the budget."""
+    window_start = datetime(2024, 9, 1, 12, 45)
+    rng = random.Random(1)  # noqa: S311
+    plan = plan_refreshes(dict.fromkeys(range(100), 1), window_start, rng=rng)
+
+    batches = limit_calls(batch_refreshes(plan, size=20, span=3600), budget=3)
+
+    assert [len(batch) for batch in batches] == [20, 20, 20]
+
+
+def test_demand_decays_with_half_life() -> None:
+    """Tests that tracked demand halves every half life."""
+    now = [0]
+    tracker = DemandTracker(
+        width=64,
+        depth=2,
+        half_life_hours=1,
+        clock=lambda: now[0],
+    )
+    for _ in range(8):
+        tracker.record(42)
+
+    now[0] = 2 * 3600
+    assert tracker.estimate(42) == pytest.approx(2)
+    assert tracker.city_ids() == {42}
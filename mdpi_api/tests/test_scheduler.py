@@ -0,0 +1,84 @@
+from datetime import datetime, timedelta, timezone
+from typing import List
+
+import pytest
+from apscheduler.triggers.cron import CronTrigger
+from mdpi_api.db.models.scheduler_run_model import SchedulerRunModel
+from mdpi_api.services.leader_election import LeaderElection
+from mdpi_api.services.scheduler_service import SchedulerManager, slot_start
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker
+
+
+@pytest.mark.anyio
+async def test_leader_job_runs_once_per_slot(_engine: AsyncEngine) -> None:
+    """Tests that a job scheduled on several workers runs once per slot."""
+    session_factory = async_sessionmaker(_engine, expire_on_commit=False)
+    runs: List[int] = []
+
+    async def job(worker: int) -> None:  # noqa: WPS430
+        runs.append(worker)
+
+    for worker in range(3):
+        manager = SchedulerManager(session_factory, election=LeaderElection(_engine))
+        manager.add_leader_job(
+            job,
+            CronTrigger(minute=0),
+            job_id="test_job",
+            period=timedelta(hours=1),
+            args=[worker],
+        )
+        await manager.election.try_acquire()  # type: ignore[union-attr]
+        await manager.run_leader_job("test_job")
+
+    async with session_factory() as session:
+        await session.execute(delete(SchedulerRunModel))
+        await session.commit()
+    assert runs == [0]
+
+
+@pytest.mark.anyio
+async def test_old_runs_are_deleted(_engine: AsyncEngine) -> None:
+    """Tests that a run deletes the runs of its job past the retention."""
+    session_factory = async_sessionmaker(_engine, expire_on_commit=False)
+    old_slot = datetime.now(timezone.utc) - timedelta(days=30)
+    async with session_factory() as session:
+        for job_id in ("test_job", "other_job"):
+            session.add(
+                SchedulerRunModel(
+                    job_id=job_id,
+                    slot=old_slot,
+                    owner="gone",
+                    status="succeeded",
+                ),
+            )
+        await session.commit()
+
+    async def job() -> None:  # noqa: WPS430
+        """Do nothing."""
+
+    manager = SchedulerManager(session_factory)
+    manager.add_leader_job(
+        job,
+        CronTrigger(minute=0),
+        job_id="test_job",
+        period=timedelta(hours=1),
+    )
+    await manager.run_leader_job("test_job")
+
+    async with session_factory() as session:  # noqa: WPS440
+        runs = await session.execute(
+            select(SchedulerRunModel.job_id, SchedulerRunModel.status),
+        )
+        remaining = sorted(runs.tuples())
+        await session.execute(delete(SchedulerRunModel))
+        await session.commit()
+    assert remaining == [("other_job", "succeeded"), ("test_job", "succeeded")]
+
+
+def test_slot_start() -> None:
+    """Tests that moments are floored to the start of their period."""
+    moment = datetime(2024, 9, 1, 13, 59, 59, tzinfo=timezone.utc)
+    hour_start = datetime(2024, 9, 1, 13, tzinfo=timezone.utc)
+
+    assert slot_start(moment, timedelta(hours=1)) == hour_start
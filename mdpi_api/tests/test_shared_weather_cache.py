@@ -0,0 +1,30 @@
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from mdpi_api.services.shared_weather_cache import SharedWeatherCache
+from mdpi_api.web.api.schemas.weather import WeatherDTO
+
+
+def test_weather_is_shared_between_mappings(tmp_path: Path) -> None:
+    """Tests that weather stored in the cache file is visible to every mapping."""
+    path = tmp_path / "weather.cache"
+    writer = SharedWeatherCache(path, slots=8, payload_bytes=256)
+    reader = SharedWeatherCache(path, slots=8, payload_bytes=256)
+    writer.open()
+    reader.open()
+    hour_start = datetime.utcnow() - timedelta(minutes=1)
+    # Both cities hash to the same slot
+    belgrade = WeatherDTO(city_id=3, city_name="Belgrade", data={"temp": 21})
+    nis = WeatherDTO(city_id=11, city_name="Nis", data={"temp": 24})
+
+    writer.put_many([(101, belgrade), (102, nis)])
+    cached = reader.get(11, hour_start)
+
+    assert cached is not None
+    assert cached.version == 102
+    assert cached.weather.data == {"temp": 24}
+    assert reader.get_version(3, hour_start) == 101
+    next_hour = datetime.utcnow() + timedelta(minutes=1)
+    assert reader.get(3, next_hour) is None
+    writer.close()
+    reader.close()
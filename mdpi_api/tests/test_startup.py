@@ -0,0 +1,61 @@
+import asyncio
+from functools import partial
+from typing import List
+
+import pytest
+from fastapi import FastAPI
+from httpx import AsyncClient
+from mdpi_api.web.startup import Startup, StartupStep
+
+STEP_SECONDS = 0.05
+
+
+@pytest.mark.anyio
+async def test_steps_run_after_dependencies_and_retry() -> None:
+    """Tests that steps run at once, after their dependencies, and are retried."""
+    events: List[str] = []
+    failures = [ConnectionError("database not up yet")]
+
+    async def database() -> None:  # noqa: WPS430
+        events.append("database")
+        if failures:
+            raise failures.pop()
+
+    async def translations() -> None:  # noqa: WPS430
+        await asyncio.sleep(STEP_SECONDS)
+        events.append("translations")
+
+    async def weather_cache() -> None:  # noqa: WPS430
+        events.append("weather_cache")
+
+    startup = Startup(retry_delay=STEP_SECONDS / 5, max_retry_delay=STEP_SECONDS)
+    await startup.run(
+        [
+            StartupStep("translations", translations),
+            StartupStep("weather_cache", weather_cache, after=("database",)),
+            StartupStep("database", database),
+        ],
+    )
+
+    assert startup.is_ready
+    assert events == ["database", "database", "weather_cache", "translations"]
+
+
+@pytest.mark.anyio
+async def test_ready_once_startup_succeeded(
+    fastapi_app: FastAPI,
+    client: AsyncClient,
+) -> None:
+    """Tests that the worker is live at once and ready after its startup."""
+    live = await client.get("/api/health/live")
+    starting = await client.get("/api/health/ready")
+
+    await fastapi_app.state.startup.run(
+        [StartupStep("database", partial(asyncio.sleep, 0))],
+    )
+    ready = await client.get("/api/health/ready")
+
+    assert live.status_code == 200
+    assert starting.status_code == 503
+    assert ready.status_code == 200
+    assert ready.json() == {"status": "ready", "steps": {"database": "done"}}
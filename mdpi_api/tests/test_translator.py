@@ -0,0 +1,22 @@
+from mdpi_api.localization.catalog import catalog, compile_message
+from mdpi_api.localization.translator import Translator
+
+
+def test_translator_uses_preloaded_catalog() -> None:
+    """Tests that translations are served from the flattened catalog."""
+    messages = catalog.load()
+
+    assert ("sr", "response_messages.auth-success") in messages
+    assert Translator("en").t("response_messages.auth-success") == (
+        "Congratulations! You have successfully logged in."
+    )
+    assert Translator("en").t("response_messages.missing") is None
+
+
+def test_compiled_message_formats_fields() -> None:
+    """Tests that format fields are parsed once and filled on render."""
+    message = compile_message("Hello {name}, {{escaped}}")
+
+    assert message.fields == frozenset(("name",))
+    assert message.render({"name": "Ana"}) == "Hello Ana, {escaped}"
+    assert message.render({}) == "Hello {name}, {{escaped}}"
@@ -0,0 +1,103 @@
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pytest
+from httpx import ASGITransport, AsyncClient
+from mdpi_api.integrations.openweather_recording import Recording
+from mdpi_api.integrations.openweather_stub import Faults, create_stub_app
+from mdpi_api.integrations.weather_client import WeatherAPIClient
+from mdpi_api.services.refresh_planner import PlannedRefresh, batch_refreshes
+
+
+@pytest.mark.anyio
+async def test_group_fetch_batches_city_ids() -> None:
+    """Tests that cities are fetched in group requests of at most 20 IDs."""
+    stub = create_stub_app()
+    async with AsyncClient(transport=ASGITransport(app=stub)) as http_client:
+        client = WeatherAPIClient(http_client=http_client)
+        weathers = await client.get_weather_for_city_ids(list(range(1, 46)))
+
+    group_sizes = [len(city_ids) for _, city_ids in stub.state.stub.requests]
+    assert group_sizes == [20, 20, 5]
+    fetched_ids = [weather.city_id for weather in weathers]
+    assert fetched_ids == list(range(1, 46))
+    # 271 K in Celsius
+    assert weathers[0].data["temp"] == -2
+    assert weathers[0].city_name == "City 1"
+
+
+def test_batches_respect_size_and_span() -> None:
+    """Tests that planned refreshes are grouped by size, time span and city."""
+    start = datetime(2024, 9, 1, 12, 45)
+    timeline = {0: 1, 10: 2, 20: 2, 30: 3, 100: 4}
+    plan = [
+        PlannedRefresh(start + timedelta(seconds=second), timeline[second], start)
+        for second in timeline
+    ]
+
+    batches = batch_refreshes(plan, size=2, span=60)
+
+    city_ids = [[refresh.city_id for refresh in batch] for batch in batches]
+    assert city_ids == [[1, 2], [2, 3], [4]]
+
+
+@pytest.mark.anyio
+async def test_stub_injects_errors() -> None:
+    """Tests that the stand-in fails the requested share of requests."""
+    stub = create_stub_app(faults=Faults(error_rate=0.5, seed=1))
+    async with AsyncClient(
+        transport=ASGITransport(app=stub),
+        base_url="http://stub",
+    ) as http_client:
+        statuses = [
+            (
+                await http_client.get(f"/data/2.5/weather?id={city_id}&appid=key")
+            ).status_code
+            for city_id in range(1, 41)
+        ]
+
+    assert 0 < statuses.count(503) < len(statuses)
+    assert set(statuses) == {200, 503}
+
+
+@pytest.mark.anyio
+async def test_stub_records_and_replays(tmp_path: Path) -> None:
+    """Tests that readings recorded from the upstream API are replayed."""
+    path = tmp_path / "weather.json"
+    upstream = AsyncClient(
+        transport=ASGITransport(app=create_stub_app()),
+        base_url="http://upstream/data/2.5/",
+    )
+    recorder = create_stub_app(recording=Recording.load(path), upstream=upstream)
+    async with AsyncClient(transport=ASGITransport(app=recorder)) as http_client:
+        client = WeatherAPIClient(http_client=http_client)
+        await client.get_weather_for_city_ids([3, 4])
+    await upstream.aclose()
+
+    recording = Recording.load(path)
+    recording.add({**recording.readings[3], "name": "Recorded"}, name="Recorded")
+    replayer = create_stub_app(recording=recording)
+    async with AsyncClient(transport=ASGITransport(app=replayer)) as replay_client:
+        client = WeatherAPIClient(http_client=replay_client)
+        by_name = await client.get_weather_for_city(city_name="recorded")
+        by_ids = await client.get_weather_for_city_ids([3, 5])
+
+    assert sorted(recording.readings) == [3, 4]
+    assert by_name.city_id == 3
+    assert [weather.city_name for weather in by_ids] == ["Recorded", "City 5"]
+
+
+@pytest.mark.anyio
+async def test_stub_rate_limits() -> None:
+    """Tests that the stand-in refuses requests beyond its rate limit."""
+    stub = create_stub_app(faults=Faults(rate_limit=2))
+    async with AsyncClient(
+        transport=ASGITransport(app=stub),
+        base_url="http://stub",
+    ) as http_client:
+        statuses = [
+            (await http_client.get("/data/2.5/group?id=1,2&appid=key")).status_code
+            for _ in range(3)
+        ]
+
+    assert statuses == [200, 200, 429]
@@ -0,0 +1,85 @@
+import csv
+import io
+from datetime import datetime, timezone
+from typing import Dict
+
+import polars as pl
+import pytest
+from httpx import AsyncClient
+from mdpi_api.db.models.city_model import CityModel
+from mdpi_api.db.models.weather_model import WeatherModel
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette import status
+
+STORED_AT = datetime(2024, 9, 1, 12, 30)
+
+
+async def _store_weather(dbsession: AsyncSession) -> None:
+    """
+    Store three hourly readings of one city.
+
+    :param dbsession: session to the database.
+    """
+    city = CityModel(id=792680, name="Belgrade")
+    dbsession.add(city)
+    for hour in range(3):
+        dbsession.add(
+            WeatherModel(
+                id=hour + 1,
+                city_id=city.id,
+                data={"temp": 20 + hour},
+                created_at=STORED_AT.replace(hour=12 + hour),
+            ),
+        )
+    await dbsession.flush()
+
+
+@pytest.mark.anyio
+async def test_csv_export(
+    client: AsyncClient,
+    dbsession: AsyncSession,
+    auth_headers: Dict[str, str],
+) -> None:
+    """Tests that weather is exported as CSV with UTC timestamps."""
+    await _store_weather(dbsession)
+
+    response = await client.get(
+        "/api/cities/weather/export",
+        params={"format": "csv", "city_id": 792680},
+        headers=auth_headers,
+    )
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"].startswith("text/csv")
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert [row["data"] for row in rows] == [
+        '{"temp":20}',
+        '{"temp":21}',
+        '{"temp":22}',
+    ]
+    assert datetime.fromisoformat(rows[0]["created_at"]) == STORED_AT.replace(
+        tzinfo=timezone.utc,
+    )
+
+
+@pytest.mark.anyio
+async def test_parquet_export(
+    client: AsyncClient,
+    dbsession: AsyncSession,
+    auth_headers: Dict[str, str],
+) -> None:
+    """Tests that weather is exported as Parquet with UTC timestamps."""
+    await _store_weather(dbsession)
+
+    response = await client.get(
+        "/api/cities/weather/export",
+        params={"format": "parquet", "from": "2024-09-01T13:00:00"},
+        headers=auth_headers,
+    )
+
+    assert response.status_code == status.HTTP_200_OK
+    frame = pl.read_parquet(io.BytesIO(response.content))
+    assert frame["id"].to_list() == [2, 3]
+    assert frame.schema["created_at"] == pl.Datetime(time_zone="UTC")
+    first_stored_at = STORED_AT.replace(hour=13, tzinfo=timezone.utc)
+    assert frame["created_at"][0] == first_stored_at
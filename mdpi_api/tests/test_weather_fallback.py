@@ -0,0 +1,180 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from typing import Dict
+
+import pytest
+from httpx import ASGITransport, AsyncClient
+from mdpi_api.db.models.city_model import CityModel
+from mdpi_api.db.models.weather_model import WeatherModel
+from mdpi_api.integrations.circuit_breaker import (
+    CircuitBreaker,
+    CircuitOpenError,
+    CircuitState,
+)
+from mdpi_api.integrations.openweather_stub import create_stub_app
+from mdpi_api.integrations.weather_client import WeatherAPIClient
+from mdpi_api.services.demand_tracker import demand_tracker
+from mdpi_api.services.weather_revalidator import weather_revalidator
+from mdpi_api.services.weather_service import (  # noqa: WPS450
+    WeatherService,
+    _stored_since,
+)
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from starlette import status
+
+
+async def _fail() -> None:
+    raise ConnectionError("upstream down")
+
+
+async def _succeed() -> str:
+    return "ok"
+
+
+@pytest.mark.anyio
+async def test_circuit_opens_and_recovers() -> None:
+    """Tests that the breaker fails fast when open and closes after a trial."""
+    now = [0]
+    breaker = CircuitBreaker("test", 2, reset_timeout=30, clock=lambda: now[0])
+
+    for _ in range(2):
+        with pytest.raises(ConnectionError):
+            await breaker.call(_fail)
+    assert breaker.state == CircuitState.OPEN
+    with pytest.raises(CircuitOpenError):
+        await breaker.call(_succeed)
+
+    now[0] = 31
+    assert await breaker.call(_succeed) == "ok"
+    assert breaker.state.name == "CLOSED"
+
+
+@pytest.mark.anyio
+async def test_only_the_trial_call_closes_the_circuit() -> None:
+    """Tests that only the trial call of a half open circuit can close it."""
+    now = [0]
+    breaker = CircuitBreaker("test", 1, reset_timeout=30, clock=lambda: now[0])
+    slow_call_done = asyncio.Event()
+    trial_done = asyncio.Event()
+
+    async def slow_call() -> str:  # noqa: WPS430
+        await slow_call_done.wait()
+        return "slow"
+
+    async def trial_call() -> str:  # noqa: WPS430
+        await trial_done.wait()
+        return "trial"
+
+    before_outage = asyncio.create_task(breaker.call(slow_call))
+    await asyncio.sleep(0)
+    with pytest.raises(ConnectionError):
+        await breaker.call(_fail)
+    now[0] = 31
+    # Starts before the call from before the outage resumes
+    trial = asyncio.create_task(breaker.call(trial_call))
+    slow_call_done.set()
+    await before_outage
+
+    assert breaker.state == CircuitState.HALF_OPEN
+    with pytest.raises(CircuitOpenError):
+        await breaker.call(_succeed)
+    trial_done.set()
+    assert await trial == "trial"
+    assert breaker.state.name == "CLOSED"
+
+
+@pytest.mark.anyio
+async def test_stale_weather_is_served_and_revalidated(
+    dbsession: AsyncSession,
+) -> None:
+    """Tests that last hour's weather is served at once and fetched again."""
+    city = CityModel(id=3194360, name="Novi Sad")
+    stored_at = datetime.utcnow() - timedelta(hours=2)
+    dbsession.add(city)
+    dbsession.add(
+        WeatherModel(id=1, city_id=city.id, data={"temp": 21}, created_at=stored_at),
+    )
+    await dbsession.flush()
+    stub = create_stub_app()
+    session_factory = async_sessionmaker(
+        dbsession.bind,
+        expire_on_commit=False,
+        join_transaction_mode="create_savepoint",
+    )
+    service = WeatherService(dbsession, session_factory)
+
+    async with AsyncClient(transport=ASGITransport(app=stub)) as http_client:
+        service.weather_client = WeatherAPIClient(http_client=http_client)
+        weather = await service.get_weather_by_city_id(city.id)
+        await weather_revalidator.drain()
+
+    assert weather.stale
+    assert weather.data == {"temp": 21}
+    assert weather.age_seconds is not None
+    assert weather.age_seconds >= 7200
+    assert stub.state.stub.requests == [("weather", [city.id])]
+
+
+@pytest.mark.anyio
+async def test_cities_weather_keeps_requested_order(
+    client: AsyncClient,
+    dbsession: AsyncSession,
+    auth_headers: Dict[str, str],
+) -> None:
+    """Tests that the weather of several cities is returned in request order."""
+    dbsession.add_all(
+        [CityModel(id=city_id, name="Subotica") for city_id in (11, 12, 13)],
+    )
+    for city_id in (11, 12, 13):
+        dbsession.add(
+            WeatherModel(city_id=city_id, data={"temp": city_id}),
+        )
+    await dbsession.flush()
+
+    response = await client.get(
+        "/api/cities/weather",
+        params={"city_ids": "13,11,12,11"},
+        headers=auth_headers,
+    )
+
+    assert response.status_code == status.HTTP_200_OK
+    temps = [weather["data"]["temp"] for weather in response.json()["data"]]
+    assert temps == [13, 11, 12, 11]
+
+
+@pytest.mark.anyio
+async def test_demand_skips_unknown_cities(
+    client: AsyncClient,
+    dbsession: AsyncSession,
+    auth_headers: Dict[str, str],
+) -> None:
+    """Tests that requests for unknown cities are not tracked as demand."""
+    dbsession.add(CityModel(id=14, name="Sombor"))
+    dbsession.add(WeatherModel(city_id=14, data={"temp": 14}))
+    await dbsession.flush()
+
+    for params in ({"city_id": 999001}, {"city_ids": "14,999002"}):
+        response = await client.get(
+            "/api/cities/weather",
+            params=params,
+            headers=auth_headers,
+        )
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+    response = await client.get(
+        "/api/cities/weather",
+        params={"city_ids": "14"},
+        headers=auth_headers,
+    )
+
+    assert response.status_code == status.HTTP_200_OK
+    assert demand_tracker.city_ids() & {14, 999001, 999002} == {14}
+
+
+def test_stored_since_accepts_aware_times() -> None:
+    """Tests that times stored by PostgreSQL, with a time zone, are compared."""
+    since = datetime.utcnow() - timedelta(minutes=30)
+    stored_at = datetime.now(timezone.utc)
+
+    assert _stored_since(stored_at, since)
+    assert not _stored_since(stored_at - timedelta(hours=1), since)
+    assert not _stored_since(None, since)
@@ -0,0 +1,72 @@
+from datetime import datetime, timedelta
+from typing import Dict
+
+import pytest
+from httpx import ASGITransport, AsyncClient
+from mdpi_api.db.models.city_model import CityModel
+from mdpi_api.db.models.weather_model import WeatherModel
+from mdpi_api.integrations.openweather_stub import create_stub_app
+from mdpi_api.integrations.weather_client import WeatherAPIClient
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.ext.mutable import MutableDict
+from starlette import status
+
+
+@pytest.mark.anyio
+async def test_weather_history_aggregates_daily_buckets(
+    client: AsyncClient,
+    dbsession: AsyncSession,
+    auth_headers: Dict[str, str],
+) -> None:
+    """Tests that hourly readings, stored as the API returns them, are aggregated."""
+    city = CityModel(id=792680, name="Belgrade")
+    dbsession.add(city)
+    transport = ASGITransport(app=create_stub_app())
+    async with AsyncClient(transport=transport) as http_client:
+        weather_client = WeatherAPIClient(http_client=http_client)
+        fetched = await weather_client.get_weather_for_city_ids([city.id])
+    day_start = datetime(2024, 9, 1)
+    for hour in range(48):
+        temps = {"temp": hour % 24, "temp_min": hour % 24, "temp_max": 30}
+        dbsession.add(
+            WeatherModel(
+                id=hour + 1,
+                city_id=city.id,
+                data=MutableDict({**fetched[0].data, **temps}),
+                created_at=day_start + timedelta(hours=hour),
+            ),
+        )
+    await dbsession.flush()
+
+    response = await client.get(
+        f"/api/cities/{city.id}/weather/history",
+        params={
+            "from": day_start.isoformat(),
+            "to": (day_start + timedelta(days=2)).isoformat(),
+            "bucket": "day",
+        },
+        headers=auth_headers,
+    )
+
+    assert response.status_code == status.HTTP_200_OK
+    first_day, second_day = response.json()["data"]
+    assert first_day["samples"] == 24
+    assert first_day["temp_avg"] == pytest.approx(11.5)
+    assert first_day["temp_min"] == 0
+    assert second_day["temp_max"] == 30
+
+
+@pytest.mark.anyio
+async def test_weather_history_rejects_reversed_range(
+    client: AsyncClient,
+    auth_headers: Dict[str, str],
+) -> None:
+    """Tests that an empty range is rejected before touching the database."""
+    response = await client.get(
+        "/api/cities/792680/weather/history",
+        params={"from": "2024-09-02T00:00:00", "to": "2024-09-01T00:00:00"},
+        headers=auth_headers,
+    )
+
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert response.json()["message"] == "Invalid date range"
@@ -0,0 +1,91 @@
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import List, Sequence, Tuple
+
+import orjson
+import pytest
+from mdpi_api.services.postgres_broker import PostgresBroker
+from mdpi_api.services.shared_weather_cache import SharedWeatherCache
+from mdpi_api.services.weather_hub import (
+    HEARTBEAT,
+    LocalBroker,
+    WeatherHub,
+    WeatherMessage,
+)
+from mdpi_api.web.api.schemas.weather import WeatherDTO
+
+HEARTBEAT_SECONDS = 0.01
+
+
+def _weather(city_id: int, temp: int) -> Tuple[int, WeatherDTO]:
+    weather = WeatherDTO(city_id=city_id, city_name="Kragujevac", data={"temp": temp})
+    return temp, weather
+
+
+@pytest.mark.anyio
+async def test_hub_fans_out_latest_weather() -> None:
+    """Tests that subscribers get the latest weather of their cities only."""
+    hub = WeatherHub(LocalBroker())
+    await hub.start()
+    both = hub.subscribe([1, 2])
+    second = hub.subscribe([2])
+
+    await hub.publish([_weather(1, 10), _weather(2, 20)])
+    await hub.publish([_weather(2, 21)])
+
+    updates = [orjson.loads(payload) for payload in await both.next_updates(1)]
+    assert [update["data"]["temp"] for update in updates] == [10, 21]
+    hub.unsubscribe(second)
+    await hub.publish([_weather(2, 22)])
+    assert not await second.next_updates(0)
+    await hub.stop()
+    assert both.closed
+
+
+@pytest.mark.anyio
+async def test_stream_writes_events_and_heartbeats() -> None:
+    """Tests that the stream sends heartbeats while idle and then events."""
+    hub = WeatherHub(LocalBroker())
+    await hub.start()
+    events = hub.stream([7], HEARTBEAT_SECONDS)
+
+    assert await anext(events) == HEARTBEAT
+    await hub.publish([_weather(7, 30)])
+    event = await anext(events)
+    await events.aclose()
+
+    assert event.startswith(b"event: weather\ndata: ")
+    payload = event.split(b"data: ")[1]
+    assert orjson.loads(payload)["data"] == {"temp": 30}
+
+
+@pytest.mark.anyio
+async def test_delivered_weather_is_cached(tmp_path: Path) -> None:
+    """Tests that weather delivered by the broker updates the host's cache."""
+    cache = SharedWeatherCache(tmp_path / "weather.cache", slots=8, payload_bytes=256)
+    cache.open()
+    hub = WeatherHub(LocalBroker(), cache)
+    await hub.start()
+
+    await hub.publish([_weather(3, 40)])
+    await hub.stop()
+
+    cached = cache.get(3, datetime.utcnow() - timedelta(minutes=1))
+    cache.close()
+    assert cached is not None
+    assert cached.version == 40
+    assert cached.weather.data == {"temp": 40}
+
+
+def test_postgres_notification_is_parsed() -> None:
+    """Tests that a notification is handed on with its city and version."""
+    received: List[WeatherMessage] = []
+
+    def handler(messages: Sequence[WeatherMessage]) -> None:  # noqa: WPS430
+        received.extend(messages)
+
+    broker = PostgresBroker(engine=None)  # type: ignore[arg-type]
+    broker._handler = handler  # noqa: WPS437
+    broker._receive(None, 1, broker.channel, '5 101 {"city_id": 5}')  # noqa: WPS437
+
+    assert received == [(5, 101, b'{"city_id": 5}')]
@@ -0,0 +1,83 @@
+import uuid
+from datetime import datetime
+from typing import Any, Dict
+
+import pytest
+from mdpi_api.db.models.city_model import CityModel
+from mdpi_api.db.models.favorite_cities_model import FavoriteCityModel
+from mdpi_api.db.models.user_model import UserModel
+from mdpi_api.db.models.weather_model import WeatherModel
+from mdpi_api.integrations.notification_sender import LocalSender
+from mdpi_api.services.weather_notifier import WeatherNotifier
+from mdpi_api.web.api.schemas.notification import NotificationDTO, NotificationKindEnum
+from mdpi_api.web.api.schemas.weather import WeatherDTO
+from sqlalchemy.ext.asyncio import AsyncSession
+
+STORED_AT = datetime(2026, 5, 1, 10, 50)
+PREVIOUS_STORED_AT = datetime(2026, 5, 1, 9, 55)
+
+
+def _reading(temp: float, condition: str) -> Dict[str, Any]:
+    return {"temp": temp, "weather": [{"main": condition}]}
+
+
+@pytest.mark.anyio
+async def test_changes_notify_subscribed_users(
+    dbsession: AsyncSession,
+    user: UserModel,
+) -> None:
+    """Tests that temperature jumps and rain starting notify subscribers only."""
+    for city_id, allowed in ((21, True), (22, True), (23, False)):
+        dbsession.add(CityModel(id=city_id, name="Nis"))
+        dbsession.add(
+            FavoriteCityModel(
+                user_id=user.id,
+                city_id=city_id,
+                allow_notifications=allowed,
+            ),
+        )
+        dbsession.add(
+            WeatherModel(
+                city_id=city_id,
+                data=_reading(10, "Clear"),
+                created_at=PREVIOUS_STORED_AT,
+            ),
+        )
+    await dbsession.flush()
+    weathers = [
+        WeatherDTO(city_id=21, city_name="Nis", data=_reading(16, "Rain")),
+        WeatherDTO(city_id=22, city_name="Nis", data=_reading(12, "Clear")),
+        WeatherDTO(city_id=23, city_name="Nis", data=_reading(20, "Rain")),
+    ]
+
+    notifier = WeatherNotifier(LocalSender(), temp_change=5)
+    notifications = await notifier.detect(dbsession, weathers, STORED_AT)
+
+    assert {notification.city_id for notification in notifications} == {21}
+    assert {notification.kind for notification in notifications} == {
+        NotificationKindEnum.TEMPERATURE_CHANGE,
+        NotificationKindEnum.RAIN_START,
+    }
+    assert notifications[0].hour == datetime(2026, 5, 1, 11)
+
+
+@pytest.mark.anyio
+async def test_dispatch_retries_and_deduplicates() -> None:
+    """Tests that failed batches are sent again and notifications only once."""
+    notifications = [
+        NotificationDTO(
+            user_id=uuid.uuid4(),
+            city_id=31,
+            city_name="Cacak",
+            kind=NotificationKindEnum.RAIN_START,
+            hour=datetime.utcnow(),
+            message="Rain is starting in Cacak.",
+        )
+        for _ in range(3)
+    ]
+    sender = LocalSender(failures=1)
+    notifier = WeatherNotifier(sender, batch_size=2, retry_delay=0)
+
+    assert await notifier.dispatch(notifications) == 3
+    assert await notifier.dispatch(notifications) == 0
+    assert sorted(len(batch) for batch in sender.batches) == [1, 2]
@@ -0,0 +1,82 @@
+from typing import Any, Sequence
+
+import pytest
+from mdpi_api.db.dao.weather_dao import WeatherDAO
+from mdpi_api.db.models.city_model import CityModel
+from mdpi_api.db.models.weather_model import WeatherModel
+from mdpi_api.services.weather_writer import WeatherWriter
+from mdpi_api.web.api.schemas.weather import WeatherDTO
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+
+@pytest.mark.anyio
+async def test_queued_weather_is_written_on_stop(
+    dbsession: AsyncSession,
+) -> None:
+    """Tests that queued weather is readable at once and written on stop."""
+    cities = [CityModel(id=city_id, name="Kragujevac") for city_id in (1, 2, 3)]
+    dbsession.add_all(cities)
+    await dbsession.flush()
+    session_factory = async_sessionmaker(
+        dbsession.bind,
+        expire_on_commit=False,
+        join_transaction_mode="create_savepoint",
+    )
+    weather_dao = WeatherDAO(dbsession)
+    writer = WeatherWriter(queue_size=10, batch_size=2, flush_interval=60)
+    writer.start(session_factory)
+
+    for city in cities:
+        weather = WeatherDTO(city_id=city.id, city_name=city.name, data={"temp": 20})
+        await writer.save(weather, weather_dao)
+    queued = writer.pending(3)
+    await writer.stop()
+
+    assert queued is not None
+    assert queued.data == {"temp": 20}
+    assert writer.pending(3) is None
+    for stored_city in cities:
+        stored_id = await weather_dao.get_current_weather_id(stored_city.id)
+        assert stored_id is not None
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize(("failures", "written"), [(1, True), (2, False)])
+async def test_failed_batches_are_retried_then_dropped(
+    dbsession: AsyncSession,
+    monkeypatch: pytest.MonkeyPatch,
+    failures: int,
+    written: bool,
+) -> None:
+    """Tests that a failed batch is written again, and dropped after two tries."""
+    dbsession.add(CityModel(id=4, name="Nis"))
+    await dbsession.flush()
+    session_factory = async_sessionmaker(
+        dbsession.bind,
+        expire_on_commit=False,
+        join_transaction_mode="create_savepoint",
+    )
+    add_weathers = WeatherDAO.add_weathers
+    attempts = []
+
+    async def flaky_add_weathers(  # noqa: WPS430
+        dao: WeatherDAO,
+        weathers: Sequence[WeatherModel],
+    ) -> Any:
+        attempts.append(len(weathers))
+        if len(attempts) <= failures:
+            raise ConnectionError("database went away")
+        return await add_weathers(dao, weathers)
+
+    monkeypatch.setattr(WeatherDAO, "add_weathers", flaky_add_weathers)
+    writer = WeatherWriter(max_attempts=2, retry_delay=0)
+    writer.start(session_factory)
+    weather = WeatherDTO(city_id=4, city_name="Nis", data={"temp": 20})
+    await writer.save(weather, WeatherDAO(dbsession))
+    await writer.stop()
+
+    assert attempts == [1, 1]
+    assert writer.pending(4) is None
+    stored_id = await WeatherDAO(dbsession).get_current_weather_id(4)
+    is_stored = stored_id is not None
+    assert is_stored == written
@@ -3,6 +3,7 @@ from loguru import logger
 from mdpi_api.services.auth_service import AuthService
 from mdpi_api.web.api.schemas.auth import TokenResponse
 from mdpi_api.web.api.schemas.common import APIResponse
+from mdpi_api.web.responses import APIJSONResponse
 from pydantic import EmailStr
 
 router = APIRouter()
@@ -13,7 +14,7 @@ async def get_token(
     email: EmailStr = Query(..., description="Email of the user"),
     password: str = Query(..., description="Password of the user"),
     auth_service: AuthService = Depends(),
-) -> APIResponse[TokenResponse]:
+) -> APIJSONResponse:
     """
     This endpoint is used to get a token for a user with the given email and password.
 
@@ -22,9 +23,9 @@ async def get_token(
     :param auth_service: AuthService dependency.
     :return: APIResponse containing the token.
     """
-    logger.info(f"Getting token for user with email: {email}")
+    logger.info("Getting token for user with email: {0}", email)
     result = await auth_service.verify_credentials(email, password)
     return APIResponse.create(
         message="auth-success",
         data=result,
-    )
+    ).to_response()
@@ -1,55 +1,256 @@
-from fastapi import APIRouter, Depends, Query
+from datetime import datetime
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from loguru import logger
+from mdpi_api.db.dependencies import get_db_session_factory
+from mdpi_api.localization.i18n_middleware import get_locale
 from mdpi_api.services.city_service import CityService
+from mdpi_api.services.demand_tracker import demand_tracker
+from mdpi_api.services.export_service import ExportFormatEnum, WeatherExportService
 from mdpi_api.services.weather_service import WeatherService
+from mdpi_api.settings import settings
+from mdpi_api.web.api.errors.city import InvalidCitySelectionError
 from mdpi_api.web.api.schemas.city import CityDTO
 from mdpi_api.web.api.schemas.common import APIResponse, PaginationParams
-from mdpi_api.web.api.schemas.weather import WeatherDTO
+from mdpi_api.web.api.schemas.weather import (
+    WeatherBucketEnum,
+    WeatherDTO,
+    WeatherHistoryDTO,
+)
+from mdpi_api.web.utils.http_cache import (
+    cache_headers,
+    is_not_modified,
+    make_etag,
+    not_modified_response,
+    seconds_until_next_hour,
+)
+from mdpi_api.web.utils.streaming import iter_api_response_json
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 
 router = APIRouter()
+history_settings = settings.weather_history
 
 
 @router.get("/", response_model=APIResponse[CityDTO])
 async def get_cities(
+    request: Request,
     pagination: PaginationParams = Depends(),
     city_service: CityService = Depends(),
-) -> APIResponse[CityDTO]:
+) -> Response:
     """
     This endpoint is used to get the list of cities.
 
+    The response carries an ETag derived from the catalog version, so clients
+    revalidating with ``If-None-Match`` get an empty 304 response.
+
+    :param request: The request.
     :param pagination: The pagination parameters.
     :param city_service: The city service.
     :return: APIResponse.
     """
     logger.info("Getting list of cities.")
+    catalog_version = await city_service.get_catalog_version()
+    etag = make_etag(
+        "cities",
+        catalog_version,
+        pagination.limit,
+        pagination.offset,
+        get_locale(),
+    )
+    max_age = seconds_until_next_hour()
+    if is_not_modified(request, etag):
+        return not_modified_response(etag, max_age)
+
     cities = await city_service.get_all_cities(pagination)
     return APIResponse.create(
         message="Success",
         data=cities,
-    )
+    ).to_response(headers=cache_headers(etag, max_age))
 
 
 @router.get("/weather", response_model=APIResponse[WeatherDTO])
 async def get_weather(
-    city_id: int = Query(
-        ...,
+    request: Request,
+    city_id: Optional[int] = Query(
+        None,
         description="The ID of the city to get weather for.",
     ),
+    city_ids: Optional[str] = Query(
+        None,
+        description="Comma separated IDs of several cities to get weather for.",
+        pattern=r"^\d+(,\d+)*$",
+    ),
     weather_service: WeatherService = Depends(),
-) -> APIResponse[WeatherDTO]:
+) -> Response:
     """
     Get the weather for a city in the user's list of favorite cities.
 
     This endpoint is used to get the weather for a city in the user's list of
-    favorite cities.
+    favorite cities. Stored weather carries an ETag derived from its ID and
+    stays fresh until the top of the hour.
+
+    With ``city_ids`` the weather of several cities is returned at once, in
+    the requested order.
 
+    :param request: The request.
     :param city_id: The ID of the city to get weather for.
+    :param city_ids: Comma separated IDs of several cities to get weather for.
     :param weather_service: The weather service.
     :return: APIResponse.
+
+    :raises InvalidCitySelectionError: If not exactly one of ``city_id``
+        and ``city_ids`` is given.
     """
-    logger.info(f"Getting weather for city {city_id}.")
+    if city_ids is not None and city_id is None:
+        return await _get_weather_of_cities(city_ids, weather_service)
+    if city_id is None or city_ids is not None:
+        raise InvalidCitySelectionError(detail="Pass either city_id or city_ids.")
+
+    logger.info("Getting weather for city {0}.", city_id)
+    weather_version = await weather_service.get_current_weather_version(city_id)
+    headers = None
+    if weather_version is not None:
+        etag = make_etag("weather", weather_version, get_locale())
+        max_age = seconds_until_next_hour()
+        if is_not_modified(request, etag):
+            demand_tracker.record(city_id)
+            return not_modified_response(etag, max_age)
+        headers = cache_headers(etag, max_age)
+
     weather = await weather_service.get_weather_by_city_id(city_id)
+    # Recorded once the city is known to exist, unknown IDs raised above
+    demand_tracker.record(city_id)
     return APIResponse.create(
         message="Success",
         data=weather,
+    ).to_response(headers=headers)
+
+
+@router.get(
+    "/{city_id}/weather/history",
+    response_model=APIResponse[WeatherHistoryDTO],
+)
+async def get_weather_history(
+    city_id: int,
+    start: datetime = Query(
+        ...,
+        alias="from",
+        description="Start of the range (inclusive).",
+    ),
+    end: datetime = Query(
+        ...,
+        alias="to",
+        description="End of the range (exclusive).",
+    ),
+    bucket: WeatherBucketEnum = Query(
+        WeatherBucketEnum.HOUR,
+        description="Size of the aggregation bucket.",
+    ),
+    weather_service: WeatherService = Depends(),
+) -> Response:
+    """
+    Get the aggregated weather history for a city.
+
+    Stored hourly readings are aggregated on the server into hourly or daily
+    buckets. Large results are streamed in chunks with the same JSON shape.
+
+    :param city_id: The ID of the city.
+    :param start: Start of the range (inclusive).
+    :param end: End of the range (exclusive).
+    :param bucket: Size of the aggregation bucket.
+    :param weather_service: The weather service.
+    :return: APIResponse or a streamed response with the same body.
+    """
+    logger.info("Getting {0} weather history for city {1}.", bucket.value, city_id)
+    history = await weather_service.get_weather_history(city_id, start, end, bucket)
+    if len(history) > history_settings.stream_threshold:
+        return StreamingResponse(
+            iter_api_response_json(
+                APIResponse.translate_message("Success"),
+                history,
+                history_settings.stream_chunk_size,
+            ),
+            media_type="application/json",
+        )
+    return APIResponse.create(
+        message="Success",
+        data=history,
+    ).to_response()
+
+
+@router.get("/weather/export", response_class=StreamingResponse)
+async def export_weather(
+    export_format: ExportFormatEnum = Query(
+        ExportFormatEnum.NDJSON,
+        alias="format",
+        description="Format of the exported file.",
+    ),
+    city_id: Optional[int] = Query(
+        None,
+        description="Only export weather for this city.",
+    ),
+    start: Optional[datetime] = Query(
+        None,
+        alias="from",
+        description="Start of the range (inclusive).",
+    ),
+    end: Optional[datetime] = Query(
+        None,
+        alias="to",
+        description="End of the range (exclusive).",
+    ),
+    session_factory: async_sessionmaker[AsyncSession] = Depends(
+        get_db_session_factory,
+    ),
+) -> StreamingResponse:
+    """
+    Export stored weather readings as NDJSON, CSV or Parquet.
+
+    Rows are read through a server side cursor and written to a chunked
+    response, so memory stays flat no matter how many rows are exported.
+
+    :param export_format: Format of the exported file.
+    :param city_id: Only export weather for this city.
+    :param start: Start of the range (inclusive).
+    :param end: End of the range (exclusive).
+    :param session_factory: The database session factory.
+    :return: Streamed export file.
+    """
+    logger.info("Exporting weather as {0}.", export_format.value)
+    export_service = WeatherExportService(session_factory)
+    filename = f"weather.{export_format.value}"
+    return StreamingResponse(
+        export_service.export(
+            export_format,
+            city_ids=[city_id] if city_id is not None else None,
+            start=start,
+            end=end,
+        ),
+        media_type=export_format.media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
     )
+
+
+async def _get_weather_of_cities(
+    city_ids: str,
+    weather_service: WeatherService,
+) -> Response:
+    """
+    Get the weather of several cities.
+
+    :param city_ids: Comma separated IDs of the cities.
+    :param weather_service: The weather service.
+    :return: APIResponse.
+    """
+    requested_ids = [int(city_id) for city_id in city_ids.split(",")]
+    logger.info("Getting weather for cities {0}.", requested_ids)
+    weathers = await weather_service.get_weather_by_city_ids(requested_ids)
+    # Recorded once every city is known to exist, unknown IDs raised above
+    for weather in weathers:
+        demand_tracker.record(weather.city_id)
+    return APIResponse.create(
+        message="Success",
+        data=weathers,
+    ).to_response()
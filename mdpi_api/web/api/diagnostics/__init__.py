@@ -0,0 +1,4 @@
+"""Routes for diagnosing live workers."""
+from mdpi_api.web.api.diagnostics.views import router
+
+__all__ = ["router"]
@@ -0,0 +1,70 @@
+import os
+from typing import Literal
+
+from fastapi import APIRouter, Depends, Query
+from fastapi.responses import JSONResponse, PlainTextResponse, Response
+from loguru import logger
+from mdpi_api.diagnostics.profiler import CPU, sampling_profiler
+from mdpi_api.settings import settings
+from mdpi_api.web.api.errors.diagnostics import ProfilerBusyError
+from mdpi_api.web.dependencies import get_admin
+
+router = APIRouter()
+
+profiler_settings = settings.profiler
+
+
+@router.get("/profile")
+async def profile_worker(
+    seconds: float = Query(
+        10,
+        gt=0,
+        le=profiler_settings.max_seconds,
+        description="How long to sample the worker.",
+    ),
+    mode: Literal["cpu", "wall"] = Query(
+        CPU,
+        description="cpu samples the running task, wall the waiting ones too.",
+    ),
+    output: Literal["collapsed", "speedscope"] = Query(
+        "collapsed",
+        description="Collapsed stacks, or a speedscope file.",
+    ),
+    admin_id: str = Depends(get_admin),
+) -> Response:
+    """
+    This endpoint is used to profile the worker that serves it.
+
+    The worker keeps serving requests while its event loop is sampled, see
+    ``mdpi_api.diagnostics.profiler``. One profile runs at a time per worker.
+
+    :param seconds: How long to sample.
+    :param mode: What to sample.
+    :param output: Format of the profile.
+    :param admin_id: The ID of the administrator.
+    :return: The profile, as a file.
+
+    :raises ProfilerBusyError: If the worker is already being profiled.
+    """
+    if sampling_profiler.is_running:
+        raise ProfilerBusyError(detail="This worker is already being profiled.")
+    logger.warning(
+        "Profiling worker {0} for {1} s ({2}), requested by {3}.",
+        os.getpid(),
+        seconds,
+        mode,
+        admin_id,
+    )
+    profile = await sampling_profiler.profile(seconds, mode)
+    filename = f"mdpi_api-{os.getpid()}-{mode}"
+    headers = {
+        "X-Profile-Samples": str(profile.samples),
+        "X-Profile-Overhead": f"{profile.overhead:.4f}",
+    }
+    if output == "speedscope":
+        headers[
+            "Content-Disposition"
+        ] = f'attachment; filename="{filename}.speedscope.json"'
+        return JSONResponse(profile.speedscope(), headers=headers)
+    headers["Content-Disposition"] = f'attachment; filename="{filename}.txt"'
+    return PlainTextResponse(profile.collapsed(), headers=headers)
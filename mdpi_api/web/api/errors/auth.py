@@ -72,3 +72,27 @@ class UserNotFoundError(HTTPExceptionResponseModelError):
         self.message = message
         self.detail = detail
         self.status_code = status_code
+
+
+class AdminRequiredError(HTTPExceptionResponseModelError):
+    """Exception raised for a user who is not an administrator."""
+
+    def __init__(
+        self,
+        error_code: str = "",
+        message: str = "Administrator required",
+        detail: str = "",
+        status_code: int = status.HTTP_403_FORBIDDEN,
+    ) -> None:
+        """
+        Initialize AdminRequiredError.
+
+        :param error_code: Error code.
+        :param message: Error message.
+        :param detail: Error detail.
+        :param status_code: Error status code.
+        """
+        self.error_code = error_code
+        self.message = message
+        self.detail = detail
+        self.status_code = status_code
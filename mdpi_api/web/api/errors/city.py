@@ -72,3 +72,27 @@ class FavoriteCityAlreadyExistsError(HTTPExceptionResponseModelError):
         self.message = message
         self.detail = detail
         self.status_code = status_code
+
+
+class InvalidCitySelectionError(HTTPExceptionResponseModelError):
+    """Exception raised for an invalid selection of cities."""
+
+    def __init__(
+        self,
+        error_code: str = "",
+        message: str = "Invalid city selection",
+        detail: str = "",
+        status_code: int = status.HTTP_400_BAD_REQUEST,
+    ) -> None:
+        """
+        Initialize InvalidCitySelectionError.
+
+        :param error_code: Error code.
+        :param message: Error message.
+        :param detail: Error detail.
+        :param status_code: Error status code.
+        """
+        self.error_code = error_code
+        self.message = message
+        self.detail = detail
+        self.status_code = status_code
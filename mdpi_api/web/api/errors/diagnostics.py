@@ -0,0 +1,26 @@
+from fastapi import status
+from mdpi_api.web.api.exception_handlers import HTTPExceptionResponseModelError
+
+
+class ProfilerBusyError(HTTPExceptionResponseModelError):
+    """Exception raised when a profile of the worker is already being taken."""
+
+    def __init__(
+        self,
+        error_code: str = "",
+        message: str = "Profiler busy",
+        detail: str = "",
+        status_code: int = status.HTTP_409_CONFLICT,
+    ) -> None:
+        """
+        Initialize ProfilerBusyError.
+
+        :param error_code: Error code.
+        :param message: Error message.
+        :param detail: Error detail.
+        :param status_code: Error status code.
+        """
+        self.error_code = error_code
+        self.message = message
+        self.detail = detail
+        self.status_code = status_code
@@ -24,3 +24,27 @@ class WeatherAPIError(HTTPExceptionResponseModelError):
         self.message = message
         self.detail = detail
         self.status_code = status_code
+
+
+class InvalidDateRangeError(HTTPExceptionResponseModelError):
+    """Exception raised for an invalid date range."""
+
+    def __init__(
+        self,
+        error_code: str = "",
+        message: str = "Invalid date range",
+        detail: str = "",
+        status_code: int = status.HTTP_400_BAD_REQUEST,
+    ) -> None:
+        """
+        Initialize InvalidDateRangeError.
+
+        :param error_code: Error code.
+        :param message: Error message.
+        :param detail: Error detail.
+        :param status_code: Error status code.
+        """
+        self.error_code = error_code
+        self.message = message
+        self.detail = detail
+        self.status_code = status_code
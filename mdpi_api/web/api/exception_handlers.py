@@ -5,7 +5,7 @@ from fastapi.encoders import jsonable_encoder
 from fastapi.exceptions import HTTPException, RequestValidationError
 from loguru import logger
 from mdpi_api.localization.translator import Translator
-from starlette.responses import JSONResponse
+from mdpi_api.web.responses import APIJSONResponse
 
 
 class HTTPExceptionResponseModelError(HTTPException):
@@ -35,7 +35,7 @@ class HTTPExceptionResponseModelError(HTTPException):
 def http_exception_handler(
     request: Request,
     exception: Exception,
-) -> JSONResponse:
+) -> APIJSONResponse:
     """
     A function used to handle HTTP errors.
 
@@ -50,7 +50,7 @@ def http_exception_handler(
         message = translator.t(message_t_key) or exception.message
         detail = translator.t(detail_t_key) or exception.detail
         logger.exception(f"HTTP error occurred. Message: {message}, Detail: {detail}")
-        return JSONResponse(
+        return APIJSONResponse(
             status_code=exception.status_code,
             content={
                 "error_code": exception.error_code,
@@ -58,7 +58,7 @@ def http_exception_handler(
                 "detail": detail,
             },
         )
-    return JSONResponse(
+    return APIJSONResponse(
         status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
         content={"error_code": "", "message": "Internal Server Error", "detail": ""},
     )
@@ -67,7 +67,7 @@ def http_exception_handler(
 def request_validation_exception_handler(
     request: Request,
     exception: Exception,
-) -> JSONResponse:
+) -> APIJSONResponse:
     """
     A function used to handle request validation errors.
 
@@ -77,7 +77,7 @@ def request_validation_exception_handler(
     """
     if isinstance(exception, RequestValidationError):
         logger.exception(f"Request validation error occurred: {exception.errors()}")
-        return JSONResponse(
+        return APIJSONResponse(
             status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
             content={
                 "error_code": "",
@@ -85,7 +85,7 @@ def request_validation_exception_handler(
                 "detail": jsonable_encoder(exception.errors()),
             },
         )
-    return JSONResponse(
+    return APIJSONResponse(
         status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
         content={"error_code": "", "message": "Internal Server Error", "detail": ""},
     )
@@ -1,9 +1,13 @@
 from fastapi import APIRouter, Depends, Query
+from fastapi.responses import StreamingResponse
 from loguru import logger
 from mdpi_api.services.city_service import CityService
+from mdpi_api.services.weather_hub import weather_hub
+from mdpi_api.settings import settings
 from mdpi_api.web.api.schemas.city import FavoriteCityDTO
 from mdpi_api.web.api.schemas.common import APIResponse, EmptyData
 from mdpi_api.web.dependencies import get_user
+from mdpi_api.web.responses import APIJSONResponse
 
 router = APIRouter()
 
@@ -12,7 +16,7 @@ router = APIRouter()
 async def get_favorite_cities(
     user_id: str = Depends(get_user),
     city_service: CityService = Depends(),
-) -> APIResponse[FavoriteCityDTO]:
+) -> APIJSONResponse:
     """
     This endpoint is used to get the list of favorite cities for the user.
 
@@ -20,12 +24,12 @@ async def get_favorite_cities(
     :param city_service: The city service.
     :return: APIResponse.
     """
-    logger.info(f"Getting list of favorite cities for user {user_id}.")
+    logger.info("Getting list of favorite cities for user {0}.", user_id)
     favorite_cities = await city_service.get_favorite_cities(user_id)
     return APIResponse.create(
         message="Success",
         data=favorite_cities,
-    )
+    ).to_response()
 
 
 @router.post("/", response_model=APIResponse[EmptyData])
@@ -33,7 +37,7 @@ async def add_favorite_city(
     user_id: str = Depends(get_user),
     city_id: int = Query(..., description="The ID of the city to add."),
     city_service: CityService = Depends(),
-) -> APIResponse[EmptyData]:
+) -> APIJSONResponse:
     """
     This endpoint is used to add a city to the user's list of favorite cities.
 
@@ -42,12 +46,12 @@ async def add_favorite_city(
     :param city_service: The city service.
     :return: APIResponse.
     """
-    logger.info(f"Adding city {city_id} to favorites for user {user_id}.")
+    logger.info("Adding city {0} to favorites for user {1}.", city_id, user_id)
     await city_service.add_favorite_city(user_id, city_id)
     return APIResponse.create(
         message="Success",
         data=EmptyData(),
-    )
+    ).to_response()
 
 
 @router.delete("/", response_model=APIResponse[EmptyData])
@@ -55,7 +59,7 @@ async def remove_favorite_city(
     user_id: str = Depends(get_user),
     city_id: int = Query(..., description="The ID of the city to remove."),
     city_service: CityService = Depends(),
-) -> APIResponse[EmptyData]:
+) -> APIJSONResponse:
     """
     This endpoint is used to remove a city from the user's list of favorite cities.
 
@@ -64,12 +68,12 @@ async def remove_favorite_city(
     :param city_service: The city service.
     :return: APIResponse.
     """
-    logger.info(f"Removing city {city_id} from favorites for user {user_id}.")
+    logger.info("Removing city {0} from favorites for user {1}.", city_id, user_id)
     await city_service.remove_favorite_city(user_id, city_id)
     return APIResponse.create(
         message="Success",
         data=EmptyData(),
-    )
+    ).to_response()
 
 
 @router.put("/notifications_toggle", response_model=APIResponse[EmptyData])
@@ -80,7 +84,7 @@ async def toggle_notifications(
         description="The ID of the city to toggle notifications for.",
     ),
     city_service: CityService = Depends(),
-) -> APIResponse[EmptyData]:
+) -> APIJSONResponse:
     """
     Toggle notifications for a city in the user's list of favorite cities.
 
@@ -92,9 +96,42 @@ async def toggle_notifications(
     :param city_service: The city service.
     :return: APIResponse.
     """
-    logger.info(f"Toggling notifications for city {city_id} for user {user_id}.")
+    logger.info("Toggling notifications for city {0} for user {1}.", city_id, user_id)
     await city_service.toggle_notifications(user_id, city_id)
     return APIResponse.create(
         message="Success",
         data=EmptyData(),
+    ).to_response()
+
+
+@router.get("/stream", response_class=StreamingResponse)
+async def stream_favorite_weather(
+    user_id: str = Depends(get_user),
+    city_service: CityService = Depends(),
+) -> StreamingResponse:
+    """
+    Stream weather updates of the user's favorite cities as server-sent events.
+
+    Every ``weather`` event carries the new weather of one city, as returned
+    by the weather endpoints. The stream starts with updates only, clients
+    get the current weather once from ``/api/cities/weather``. Cities added to
+    the favorites later are streamed after reconnecting.
+
+    :param user_id: The ID of the user.
+    :param city_service: The city service.
+    :return: Event stream.
+    """
+    favorite_cities = await city_service.get_favorite_cities(user_id)
+    city_ids = [city.id for city in favorite_cities]
+    logger.info("Streaming weather of cities {0} to user {1}.", city_ids, user_id)
+    return StreamingResponse(
+        weather_hub.stream(city_ids, settings.weather_stream.heartbeat_seconds),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            # Events are sent as they come, not buffered by the gzip middleware
+            # or a proxy
+            "Content-Encoding": "identity",
+            "X-Accel-Buffering": "no",
+        },
     )
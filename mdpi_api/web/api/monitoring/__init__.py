@@ -0,0 +1,4 @@
+"""Routes for application monitoring."""
+from mdpi_api.web.api.monitoring.views import router
+
+__all__ = ["router"]
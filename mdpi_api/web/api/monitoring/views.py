@@ -0,0 +1,58 @@
+from fastapi import APIRouter, Request, status
+from fastapi.responses import PlainTextResponse
+from mdpi_api.metrics import metrics_snapshots, registry
+from mdpi_api.web.responses import APIJSONResponse
+
+router = APIRouter()
+
+PROMETHEUS_MEDIA_TYPE = "text/plain; version=0.0.4"
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics() -> PlainTextResponse:
+    """
+    Get the application metrics in the Prometheus text format.
+
+    Counters and histograms are summed over the workers of the host, so any
+    worker answers for all of them.
+
+    :return: The metrics of all worker processes.
+    """
+    return PlainTextResponse(
+        registry.render(metrics_snapshots.read_others()),
+        media_type=PROMETHEUS_MEDIA_TYPE,
+    )
+
+
+@router.get("/health/live")
+async def get_liveness() -> APIJSONResponse:
+    """
+    Check that the worker serves requests.
+
+    :return: OK as long as the worker answers.
+    """
+    return APIJSONResponse({"status": "live"})
+
+
+@router.get("/health/ready")
+async def get_readiness(request: Request) -> APIJSONResponse:
+    """
+    Check that the worker may receive traffic.
+
+    The worker is ready once its startup steps, opening database connections
+    and warming up the caches, all succeeded, see ``mdpi_api.web.startup``.
+
+    :param request: The request.
+    :return: The state of every startup step, 503 until the worker is ready.
+    """
+    startup = request.app.state.startup
+    is_ready = startup.is_ready
+    return APIJSONResponse(
+        {
+            "status": "ready" if is_ready else "starting",
+            "steps": startup.states,
+        },
+        status_code=status.HTTP_200_OK
+        if is_ready
+        else status.HTTP_503_SERVICE_UNAVAILABLE,
+    )
@@ -1,10 +1,11 @@
 from fastapi.params import Depends
 from fastapi.routing import APIRouter
-from mdpi_api.web.api import auth, cities, docs, favorites
+from mdpi_api.web.api import auth, cities, diagnostics, docs, favorites, monitoring
 from mdpi_api.web.middlewares.jwt_bearer import JWTBearer
 
 api_router = APIRouter()
 api_router.include_router(docs.router)
+api_router.include_router(monitoring.router, tags=["monitoring"])
 api_router.include_router(auth.router, prefix="/auth", tags=["auth"])
 api_router.include_router(
     cities.router,
@@ -18,3 +19,9 @@ api_router.include_router(
     tags=["favorites"],
     dependencies=[Depends(JWTBearer())],
 )
+api_router.include_router(
+    diagnostics.router,
+    prefix="/diagnostics",
+    tags=["diagnostics"],
+    dependencies=[Depends(JWTBearer())],
+)
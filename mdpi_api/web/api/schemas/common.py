@@ -1,6 +1,7 @@
-from typing import Any, Generic, List, TypeVar, Union
+from typing import Any, Dict, Generic, List, Optional, TypeVar, Union
 
 from mdpi_api.localization.translator import Translator
+from mdpi_api.web.responses import APIJSONResponse
 from pydantic import BaseModel, Field, field_validator
 
 
@@ -32,9 +33,33 @@ class APIResponse(BaseModel, Generic[DataT]):
         :param kwargs: Additional keyword arguments.
         :return: The response.
         """
+        return cls(message=cls.translate_message(message, **kwargs), data=data)
+
+    def to_response(
+        self,
+        status_code: int = 200,
+        headers: Optional[Dict[str, str]] = None,
+    ) -> APIJSONResponse:
+        """
+        Wrap the response in a JSON response serialized by pydantic-core.
+
+        :param status_code: The HTTP status code.
+        :param headers: Additional response headers.
+        :return: The JSON response.
+        """
+        return APIJSONResponse(self, status_code=status_code, headers=headers)
+
+    @staticmethod
+    def translate_message(message: str, **kwargs: Any) -> str:
+        """
+        Translate a response message, falling back to the message itself.
+
+        :param message: The message key.
+        :param kwargs: Additional keyword arguments.
+        :return: The translated message.
+        """
         translator = Translator()
-        message = translator.t(f"response_messages.{message}", **kwargs) or message
-        return cls(message=message, data=data)
+        return translator.t(f"response_messages.{message}", **kwargs) or message
 
 
 class PaginationParams(BaseModel):
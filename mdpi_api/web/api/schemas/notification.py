@@ -0,0 +1,46 @@
+import enum
+import uuid
+from datetime import datetime
+from typing import Optional
+
+from pydantic import BaseModel, Field
+
+HOUR_FORMAT = "%Y%m%d%H"  # noqa: WPS323
+
+
+class NotificationKindEnum(str, enum.Enum):  # noqa: WPS600
+    """Weather change a notification is about."""
+
+    TEMPERATURE_CHANGE = "temperature_change"
+    RAIN_START = "rain_start"
+
+
+class NotificationDTO(BaseModel):
+    """Notification of a weather change in a favorite city."""
+
+    user_id: uuid.UUID = Field(..., description="The user to notify.")
+    city_id: int = Field(..., description="The city whose weather changed.")
+    city_name: str = Field(..., description="The name of the city.")
+    kind: NotificationKindEnum = Field(..., description="The kind of change.")
+    hour: datetime = Field(..., description="The hour the new weather is for (UTC).")
+    previous_temp: Optional[float] = Field(
+        None,
+        description="Temperature of the previous hour.",
+    )
+    temp: Optional[float] = Field(None, description="Temperature of the new hour.")
+    message: str = Field(..., description="Human readable description.")
+
+    @property
+    def key(self) -> str:
+        """
+        Key identifying the notification, the same for every refresh of the hour.
+
+        :return: Deduplication key.
+        """
+        parts = (
+            self.user_id,
+            self.city_id,
+            self.kind.value,
+            self.hour.strftime(HOUR_FORMAT),
+        )
+        return ":".join(map(str, parts))
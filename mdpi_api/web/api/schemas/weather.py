@@ -1,6 +1,8 @@
-from typing import Any, Dict
+import enum
+from datetime import datetime
+from typing import Any, Dict, Optional
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 
 class WeatherDTO(BaseModel):
@@ -9,6 +11,38 @@ class WeatherDTO(BaseModel):
     city_id: int
     city_name: str
     data: Dict[str, Any]
+    stale: bool = Field(
+        default=False,
+        description="Older weather served while the current one is fetched.",
+    )
+    age_seconds: Optional[int] = Field(
+        None,
+        description="Seconds since stale weather was stored.",
+    )
+
+    class Config:
+        """Pydantic configuration."""
+
+        from_attributes = True
+
+
+class WeatherBucketEnum(str, enum.Enum):  # noqa: WPS600
+    """Time bucket used to aggregate weather history."""
+
+    HOUR = "hour"
+    DAY = "day"
+
+
+class WeatherHistoryDTO(BaseModel):
+    """Data transfer object for one aggregated weather history bucket."""
+
+    bucket_start: datetime = Field(..., description="Start of the time bucket.")
+    samples: int = Field(..., description="Number of stored readings in the bucket.")
+    temp_avg: Optional[float] = Field(None, description="Average temperature.")
+    temp_min: Optional[float] = Field(None, description="Minimum temperature.")
+    temp_max: Optional[float] = Field(None, description="Maximum temperature.")
+    humidity_avg: Optional[float] = Field(None, description="Average humidity.")
+    pressure_avg: Optional[float] = Field(None, description="Average pressure.")
 
     class Config:
         """Pydantic configuration."""
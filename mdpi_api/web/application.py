@@ -3,24 +3,28 @@ from pathlib import Path
 from fastapi import FastAPI
 from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
-from fastapi.responses import UJSONResponse
 from fastapi.staticfiles import StaticFiles
 from mdpi_api.logging import configure_logging
-from mdpi_api.settings import Settings
+from mdpi_api.settings import settings
 from mdpi_api.web.api.exception_handlers import (
     HTTPExceptionResponseModelError,
     http_exception_handler,
     request_validation_exception_handler,
 )
 from mdpi_api.web.api.router import api_router
-from mdpi_api.web.lifetime import register_shutdown_event, register_startup_event
+from mdpi_api.web.lifetime import lifespan
+from mdpi_api.web.middlewares.correlation_id import CorrelationIdMiddleware
+from mdpi_api.web.middlewares.metrics import MetricsMiddleware
+from mdpi_api.web.middlewares.query_inspection import QueryInspectionMiddleware
 from mdpi_api.web.middlewares.rate_limiter import RateLimiterMiddleware
+from mdpi_api.web.responses import APIJSONResponse
+from mdpi_api.web.startup import Startup
 from mdpi_api.web.utils.token_bucket import TokenBucket
 from starlette.middleware.sessions import SessionMiddleware
 
 APP_ROOT = Path(__file__).parent.parent
-settings = Settings()
 
 
 def add_exception_handlers(api: FastAPI) -> None:
@@ -45,6 +49,13 @@ def add_middlewares(app: FastAPI) -> None:
 
     :param app: FastAPI instance.
     """
+    # Innermost, so it sees the response body in one piece and can leave
+    # responses below the minimum size uncompressed
+    app.add_middleware(
+        GZipMiddleware,
+        minimum_size=settings.compression.minimum_size,
+        compresslevel=settings.compression.level,
+    )
     app.add_middleware(
         CORSMiddleware,
         allow_origins=settings.security.cors_allowed_origins,
@@ -68,7 +79,12 @@ def add_middlewares(app: FastAPI) -> None:
             refill_rate=settings.rate_limit.refill_rate,
         ),
     )
-    # TODO: add request context log middleware
+    if settings.query_inspection.enabled:
+        app.add_middleware(QueryInspectionMiddleware)
+    # Rate limited requests are counted too
+    app.add_middleware(MetricsMiddleware)
+    # Outermost, so the logs of every other middleware carry the request ID
+    app.add_middleware(CorrelationIdMiddleware)
 
 
 def get_app() -> FastAPI:
@@ -85,12 +101,11 @@ def get_app() -> FastAPI:
         docs_url=None,
         redoc_url=None,
         openapi_url="/api/openapi.json",
-        default_response_class=UJSONResponse,
+        default_response_class=APIJSONResponse,
+        lifespan=lifespan,
     )
-
-    # Adds startup and shutdown events.
-    register_startup_event(app)
-    register_shutdown_event(app)
+    # Startup steps of the worker, the worker is ready once they all succeeded
+    app.state.startup = Startup()
 
     add_exception_handlers(app)
     add_middlewares(app)
@@ -1,5 +1,9 @@
-from fastapi import Request
-from mdpi_api.web.api.errors.auth import NotAuthorizedError
+import uuid
+
+from fastapi import Depends, Request
+from mdpi_api.db.dao.user_dao import UserDAO
+from mdpi_api.settings import settings
+from mdpi_api.web.api.errors.auth import AdminRequiredError, NotAuthorizedError
 
 
 def get_user(request: Request) -> str:
@@ -17,3 +21,22 @@ def get_user(request: Request) -> str:
             detail="User ID not found in this session",
         )
     return str(user_id)
+
+
+async def get_admin(
+    user_id: str = Depends(get_user),
+    user_dao: UserDAO = Depends(),
+) -> str:
+    """
+    Get the user from the request, if they are an administrator.
+
+    :param user_id: The ID of the user.
+    :param user_dao: The user DAO.
+    :return: The user ID.
+
+    :raises AdminRequiredError: If the user is not an administrator.
+    """
+    user = await user_dao.get_by_id(uuid.UUID(user_id))
+    if user is None or user.email not in settings.security.admin_emails:
+        raise AdminRequiredError(detail="Only administrators may use this endpoint.")
+    return user_id
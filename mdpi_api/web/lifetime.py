@@ -1,31 +1,62 @@
-from typing import Awaitable, Callable
+import asyncio
+from contextlib import asynccontextmanager, suppress
+from datetime import timedelta
+from functools import partial
+from typing import AsyncIterator, List
 
-from apscheduler.triggers.cron import CronTrigger
 from fastapi import FastAPI
 from loguru import logger
+from mdpi_api.db.instrumentation import instrument_engine
 from mdpi_api.db.meta import meta
 from mdpi_api.db.models import load_all_models
+from mdpi_api.db.query_inspector import inspect_engine
 from mdpi_api.db.seeders.initial_data import seed_data
-from mdpi_api.services.scheduler_service import SchedulerManager
-from mdpi_api.services.weather_service import WeatherService
+from mdpi_api.diagnostics.loop_watchdog import loop_watchdog
+from mdpi_api.integrations.weather_client import weather_http
+from mdpi_api.localization.catalog import catalog
+from mdpi_api.metrics import metrics_snapshots
+from mdpi_api.services.demand_sharing import demand_publisher
+from mdpi_api.services.leader_election import LeaderElection
+from mdpi_api.services.postgres_broker import PostgresBroker
+from mdpi_api.services.refresh_planner import refresh_window
+from mdpi_api.services.shared_weather_cache import shared_weather_cache
+from mdpi_api.services.weather_hub import weather_hub
+from mdpi_api.services.weather_notifier import weather_notifier
+from mdpi_api.services.weather_revalidator import weather_revalidator
+from mdpi_api.services.weather_service import (
+    refresh_weather_for_all_cities,
+    warm_weather_cache,
+)
+from mdpi_api.services.weather_writer import weather_writer
 from mdpi_api.settings import settings
+from mdpi_api.web.startup import StartupStep
 from sqlalchemy import text
-from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
+    AsyncSession,
+    async_sessionmaker,
+    create_async_engine,
+)
 
 db_settings = settings.db
+startup_settings = settings.startup
 
 
-async def _setup_db(app: FastAPI) -> None:  # pragma: no cover
+def _setup_db(app: FastAPI) -> None:  # pragma: no cover
     """
     Creates connection to the database.
 
     This function creates SQLAlchemy engine instance,
     session_factory for creating sessions
     and stores them in the application's state property.
+    Connections are opened by the ``database`` startup step.
 
     :param app: fastAPI application.
     """
     engine = create_async_engine(str(db_settings.db_url), echo=db_settings.echo)
+    instrument_engine(engine)
+    if settings.query_inspection.enabled:
+        inspect_engine(engine)
     session_factory = async_sessionmaker(
         engine,
         expire_on_commit=False,
@@ -33,13 +64,62 @@ async def _setup_db(app: FastAPI) -> None:  # pragma: no cover
     app.state.db_engine = engine
     app.state.db_session_factory = session_factory
 
-    # Check if the connection has been established
-    try:
-        async with engine.connect() as connection:
-            await connection.execute(text("SELECT 1"))
-        logger.info("Database connection established.")
-    except Exception as exception:
-        logger.error(f"Failed to establish database connection: {exception}")
+
+async def _warm_up_db(engine: AsyncEngine) -> None:  # pragma: no cover
+    """
+    Open database connections ahead of the first requests.
+
+    The connections are checked out at the same time, so the pool opens as
+    many, and stay in the pool once returned.
+
+    :param engine: The database engine.
+    """
+    await asyncio.gather(
+        *(_check_connection(engine) for _ in range(startup_settings.warm_connections)),
+    )
+    logger.info("Database connection established.")
+
+
+async def _check_connection(engine: AsyncEngine) -> None:  # pragma: no cover
+    """
+    Check out a connection and check that the database answers.
+
+    :param engine: The database engine.
+    """
+    async with engine.connect() as connection:
+        await connection.execute(text("SELECT 1"))
+
+
+async def _seed_data(
+    session_factory: async_sessionmaker[AsyncSession],
+) -> None:  # pragma: no cover
+    """
+    Insert the initial data.
+
+    :param session_factory: The database session factory.
+    """
+    async with session_factory() as session:
+        await seed_data(session)
+
+
+async def _load_translations() -> None:  # pragma: no cover
+    """Compile the message catalog in a thread."""
+    await asyncio.to_thread(catalog.load)
+
+
+async def _warm_up_weather_cache(
+    session_factory: async_sessionmaker[AsyncSession],
+) -> None:  # pragma: no cover
+    """
+    Load the weather of the current hour into the shared cache.
+
+    :param session_factory: The database session factory.
+    """
+    cities = await warm_weather_cache(
+        session_factory,
+        startup_settings.warm_cache_cities,
+    )
+    logger.info("Loaded the weather of {0} cities into the shared cache.", cities)
 
 
 async def _create_tables() -> None:  # pragma: no cover
@@ -51,61 +131,195 @@ async def _create_tables() -> None:  # pragma: no cover
     await engine.dispose()
 
 
-def _register_scheduled_events(session: AsyncSession) -> None:
+def _open_shared_cache() -> None:  # pragma: no cover
+    """Map the weather cache shared by the workers, if the host allows it."""
+    try:
+        shared_weather_cache.open()
+    except OSError as exception:
+        logger.warning(f"Shared weather cache disabled: {exception}")
+
+
+def _share_metrics(app: FastAPI) -> None:  # pragma: no cover
     """
-    Register scheduled events.
+    Share the metrics of this worker with the other workers of the host.
 
-    :param session: database session.
+    :param app: fastAPI application.
     """
-    scheduler = SchedulerManager()
-    weather_service = WeatherService(session)
-    scheduler.add_job(
-        func=weather_service.update_weather_for_all_cities,
-        trigger=CronTrigger(hour="*", minute=0),  # Runs every hour
+    metrics_settings = settings.metrics
+    try:
+        metrics_snapshots.enable(metrics_settings.snapshot_dir)
+    except OSError as exception:
+        logger.warning(f"Metrics of other workers not reported: {exception}")
+        return
+    app.state.metrics_task = asyncio.create_task(
+        _write_metrics_snapshots(metrics_settings.snapshot_interval_seconds),
     )
-    scheduler.start()
 
 
-def register_startup_event(
-    app: FastAPI,
-) -> Callable[[], Awaitable[None]]:  # pragma: no cover
+async def _write_metrics_snapshots(interval: float) -> None:  # pragma: no cover
+    """
+    Write the metrics snapshot of this worker periodically.
+
+    :param interval: Seconds between snapshots.
+    """
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await asyncio.to_thread(metrics_snapshots.write)
+        except OSError as exception:
+            logger.warning(f"Failed to write metrics snapshot: {exception}")
+
+
+async def _stop_sharing_metrics(app: FastAPI) -> None:  # pragma: no cover
+    """
+    Write a last metrics snapshot of this worker.
+
+    :param app: fastAPI application.
+    """
+    metrics_task = getattr(app.state, "metrics_task", None)
+    if metrics_task is not None:
+        metrics_task.cancel()
+        with suppress(asyncio.CancelledError):
+            await metrics_task
+    metrics_snapshots.disable()
+
+
+async def _start_weather_services(app: FastAPI) -> None:  # pragma: no cover
+    """
+    Start the background weather work and the update streams.
+
+    :param app: fastAPI application.
+    """
+    weather_writer.start(app.state.db_session_factory)
+    demand_publisher.start(app.state.db_session_factory)
+    # Only the leader refreshes, the others get its updates through PostgreSQL
+    if app.state.db_engine.dialect.name == "postgresql":
+        weather_hub.broker = PostgresBroker(app.state.db_engine)
+    await weather_hub.start()
+    if settings.shared_cache.enabled:
+        _open_shared_cache()
+
+
+async def _stop_weather_services() -> None:  # pragma: no cover
+    """Close the update streams and finish the weather work in flight."""
+    await weather_hub.stop()
+    await weather_revalidator.drain()
+    await weather_notifier.close()
+    await weather_writer.stop()
+    await demand_publisher.stop()
+    shared_weather_cache.close()
+
+
+def _start_diagnostics(app: FastAPI) -> None:  # pragma: no cover
+    """
+    Watch the event loop and share the metrics, as configured.
+
+    :param app: fastAPI application.
     """
-    Actions to run on application startup.
+    watchdog_settings = settings.loop_watchdog
+    if watchdog_settings.enabled:
+        loop_watchdog.start(debug_slow_callbacks=watchdog_settings.slow_callbacks)
+    if settings.metrics.multiprocess:
+        _share_metrics(app)
 
-    This function uses fastAPI app to store data
-    in the state, such as db_engine.
 
-    :param app: the fastAPI application.
-    :return: function that actually performs actions.
+async def _start_scheduler(app: FastAPI) -> None:  # pragma: no cover
     """
+    Register scheduled events and start the scheduler.
 
-    @app.on_event("startup")
-    async def _startup() -> None:  # noqa: WPS430
-        app.middleware_stack = None
-        await _setup_db(app)
-        # await _create_tables()
-        app.middleware_stack = app.build_middleware_stack()
-        async with app.state.db_session_factory() as session:
-            await seed_data(session)
-            _register_scheduled_events(session)
+    :param app: fastAPI application.
+    """
+    # Only workers running the scheduler import APScheduler
+    from apscheduler.triggers.cron import CronTrigger  # noqa: WPS433
+    from mdpi_api.services.scheduler_service import SchedulerManager  # noqa: WPS433
 
-    return _startup
+    session_factory = app.state.db_session_factory
+    scheduler = SchedulerManager(
+        session_factory,
+        election=LeaderElection(app.state.db_engine),
+    )
+    # Runs every hour, when the refresh window before the next hour opens
+    window = refresh_window()
+    scheduler.add_leader_job(
+        refresh_weather_for_all_cities,
+        CronTrigger(hour="*", minute=60 - settings.weather_refresh.window_minutes),
+        job_id="refresh_weather",
+        period=timedelta(hours=1),
+        lead=window,
+        args=[session_factory],
+    )
+    scheduler.start()
+    app.state.scheduler = scheduler
 
 
-def register_shutdown_event(
-    app: FastAPI,
-) -> Callable[[], Awaitable[None]]:  # pragma: no cover
+def _startup_steps(app: FastAPI) -> List[StartupStep]:  # pragma: no cover
     """
-    Actions to run on application's shutdown.
+    Get the steps the worker is ready after.
 
     :param app: fastAPI application.
-    :return: function that actually performs actions.
+    :return: The startup steps.
     """
+    session_factory = app.state.db_session_factory
+    steps = [
+        StartupStep("database", partial(_warm_up_db, app.state.db_engine)),
+        StartupStep("translations", _load_translations),
+        StartupStep("http_client", weather_http.open),
+        StartupStep(
+            "seed_data",
+            partial(_seed_data, session_factory),
+            after=("database",),
+        ),
+        StartupStep(
+            "weather_cache",
+            partial(_warm_up_weather_cache, session_factory),
+            after=("database",),
+        ),
+    ]
+    if settings.scheduler.enabled:
+        steps.append(
+            StartupStep(
+                "scheduler",
+                partial(_start_scheduler, app),
+                after=("seed_data",),
+            ),
+        )
+    return steps
 
-    @app.on_event("shutdown")
-    async def _shutdown() -> None:  # noqa: WPS430
-        await app.state.db_engine.dispose()
 
-        pass  # noqa: WPS420
+async def _shutdown(app: FastAPI) -> None:  # pragma: no cover
+    """
+    Stop the work of the worker and close its connections.
 
-    return _shutdown
+    :param app: fastAPI application.
+    """
+    await app.state.startup.stop()
+    scheduler = getattr(app.state, "scheduler", None)
+    if scheduler is not None:
+        await scheduler.shutdown()
+    await _stop_weather_services()
+    await weather_http.close()
+    await _stop_sharing_metrics(app)
+    await loop_watchdog.stop()
+    await app.state.db_engine.dispose()
+    # Write the records still queued for the log sinks
+    await logger.complete()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:  # pragma: no cover
+    """
+    Run the worker.
+
+    The worker serves requests as soon as its services are created, and is
+    ready once its startup steps, run in the background, all succeeded.
+
+    :param app: fastAPI application.
+    :yield: While the worker serves requests.
+    """
+    _start_diagnostics(app)
+    _setup_db(app)
+    # await _create_tables()
+    await _start_weather_services(app)
+    app.state.startup.start(_startup_steps(app))
+    yield
+    await _shutdown(app)
@@ -0,0 +1,67 @@
+import random
+import re
+import uuid
+from typing import Optional
+
+from mdpi_api.logging import correlation_id, log_sampled, log_settings
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+REQUEST_ID_HEADER = "X-Request-ID"
+# IDs of callers are logged as is, anything else is replaced
+VALID_REQUEST_ID = re.compile(r"[\w.:-]{1,64}")
+
+
+class CorrelationIdMiddleware:
+    """
+    Tags the logs of every request with a correlation ID.
+
+    The ID is taken from the ``X-Request-ID`` header of the request when it
+    has a sane one, generated otherwise, and returned in the same header of
+    the response. Whether the info and debug logs of the request are kept is
+    drawn here too, once per request, so a sampled request is logged whole.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        """
+        Handle a request with its correlation ID set.
+
+        :param scope: The ASGI scope.
+        :param receive: The ASGI receive channel.
+        :param send: The ASGI send channel.
+        """
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = incoming_request_id(scope) or uuid.uuid4().hex
+
+        async def send_with_id(message: Message) -> None:  # noqa: WPS430
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message)[REQUEST_ID_HEADER] = request_id
+            await send(message)
+
+        id_token = correlation_id.set(request_id)
+        sampled = random.random() < log_settings.info_sample_rate  # noqa: S311
+        sampled_token = log_sampled.set(sampled)
+        try:  # noqa: WPS501
+            await self.app(scope, receive, send_with_id)
+        finally:
+            log_sampled.reset(sampled_token)
+            correlation_id.reset(id_token)
+
+
+def incoming_request_id(scope: Scope) -> Optional[str]:
+    """
+    Get the request ID sent by the caller.
+
+    :param scope: The ASGI scope.
+    :return: The ID, None if there is none or it is not safe to log.
+    """
+    request_id = Headers(scope=scope).get(REQUEST_ID_HEADER)
+    if request_id is None or not VALID_REQUEST_ID.fullmatch(request_id):
+        return None
+    return request_id
@@ -5,11 +5,11 @@ from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from loguru import logger
 from mdpi_api.services.auth_service import AuthService
 from mdpi_api.services.jwt_service import JWTService
-from mdpi_api.settings import Settings
+from mdpi_api.settings import settings
 from mdpi_api.web.api.errors.auth import JWTError
 from mdpi_api.web.api.schemas.auth import DecodedTokenResponse
 
-jwt_settings = Settings().jwt
+jwt_settings = settings.jwt
 
 
 class JWTBearer(HTTPBearer):
@@ -73,7 +73,7 @@ class JWTBearer(HTTPBearer):
             raise JWTError(detail="Invalid token or expired token.")
 
         jwt_decoded = jwt_service.decode_jwt(credentials.credentials)
-        logger.info(f"jwt_decoded: {jwt_decoded}")
+        logger.debug("jwt_decoded: {0}", jwt_decoded)
 
         if jwt_decoded.token_type != jwt_settings.default_token_type:
             raise JWTError(detail="Invalid token type.")
@@ -0,0 +1,114 @@
+import time
+
+from mdpi_api.db.instrumentation import RequestDBStats, request_db_stats
+from mdpi_api.metrics import Counter, Gauge, Histogram
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# Requests matching no route share a label, unknown paths must not add series
+UNMATCHED_ROUTE = "unmatched"
+STATEMENT_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+http_requests = Counter(
+    "http_requests_total",
+    "HTTP requests, by route template, method and status.",
+    labelnames=("route", "method", "status"),
+)
+http_requests_in_flight = Gauge(
+    "http_requests_in_flight",
+    "HTTP requests being handled, streamed responses included.",
+)
+http_request_seconds = Histogram(
+    "http_request_seconds",
+    "Duration of HTTP requests until the response is sent, by route template.",
+    labelnames=("route", "method"),
+)
+http_request_db_statements = Histogram(
+    "http_request_db_statements",
+    "SQL statements executed per HTTP request, by route template.",
+    labelnames=("route", "method"),
+    buckets=STATEMENT_COUNT_BUCKETS,
+)
+http_request_db_seconds = Histogram(
+    "http_request_db_seconds",
+    "Time spent in SQL statements per HTTP request, by route template.",
+    labelnames=("route", "method"),
+)
+
+
+class MetricsMiddleware:
+    """
+    Records the count, latency and SQL statements of HTTP requests.
+
+    A plain ASGI middleware, cheaper than ``BaseHTTPMiddleware`` and not in
+    the way of streamed responses. Requests are labelled with the template
+    of the route they matched, e.g. ``/api/cities/{city_id}``, which is known
+    once the request was handled.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        """
+        Handle a request and record its metrics.
+
+        :param scope: The ASGI scope.
+        :param receive: The ASGI receive channel.
+        :param send: The ASGI send channel.
+        """
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        response_status = []
+
+        async def send_with_status(message: Message) -> None:  # noqa: WPS430
+            if message["type"] == "http.response.start":
+                response_status.append(message["status"])
+            await send(message)
+
+        stats = RequestDBStats()
+        token = request_db_stats.set(stats)
+        http_requests_in_flight.inc()
+        started = time.perf_counter()
+        try:  # noqa: WPS501
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            http_requests_in_flight.inc(-1)
+            request_db_stats.reset(token)
+            # Unhandled errors are answered with a 500 further out
+            status_code = str(response_status[0]) if response_status else "500"
+            self._record(scope, status_code, elapsed, stats)
+
+    @staticmethod
+    def _record(
+        scope: Scope,
+        status_code: str,
+        elapsed: float,
+        stats: RequestDBStats,
+    ) -> None:
+        """
+        Record the metrics of a handled request.
+
+        :param scope: The ASGI scope, with the matched route.
+        :param status_code: The response status.
+        :param elapsed: Duration of the request in seconds.
+        :param stats: SQL statements of the request.
+        """
+        route = route_template(scope)
+        method = scope["method"]
+        http_requests.inc(route=route, method=method, status=status_code)
+        http_request_seconds.observe(elapsed, route=route, method=method)
+        http_request_db_statements.observe(stats.statements, route=route, method=method)
+        http_request_db_seconds.observe(stats.seconds, route=route, method=method)
+
+
+def route_template(scope: Scope) -> str:
+    """
+    Get the template of the route a handled request matched.
+
+    :param scope: The ASGI scope.
+    :return: The path template, e.g. ``/api/cities/{city_id}``.
+    """
+    return getattr(scope.get("route"), "path_format", UNMATCHED_ROUTE)
@@ -0,0 +1,29 @@
+from mdpi_api.db.query_inspector import query_scope
+from mdpi_api.web.middlewares.metrics import route_template
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+
+class QueryInspectionMiddleware:
+    """Collects the SQL statements of every request in its own query scope."""
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        """
+        Handle a request in a query scope named after its route.
+
+        :param scope: The ASGI scope.
+        :param receive: The ASGI receive channel.
+        :param send: The ASGI send channel.
+        """
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        with query_scope(scope["path"]) as statements:
+            try:  # noqa: WPS501
+                await self.app(scope, receive, send)
+            finally:
+                # The route is known once the request was routed
+                route = route_template(scope)
+                statements.name = f"{scope['method']} {route}"
@@ -1,8 +1,12 @@
 from fastapi import FastAPI, Request, Response, status
 from loguru import logger
+from mdpi_api.web.responses import APIJSONResponse
 from mdpi_api.web.utils.token_bucket import TokenBucket
 from starlette.middleware.base import BaseHTTPMiddleware, RequestResponseEndpoint
-from starlette.responses import JSONResponse
+
+# Probes and scrapes must answer under load, or healthy workers are taken
+# out of service exactly when traffic peaks
+UNLIMITED_PATHS = frozenset(("/api/health/live", "/api/health/ready", "/api/metrics"))
 
 
 class RateLimiterMiddleware(BaseHTTPMiddleware):
@@ -24,8 +28,9 @@ class RateLimiterMiddleware(BaseHTTPMiddleware):
         :param call_next: Next middleware in the chain.
         :return: Response to the incoming request.
         """
-        # Check if the request path starts with '/static'
-        if request.url.path.startswith("/static"):
+        # Check if the request path starts with '/static' or is a probe
+        path = request.url.path
+        if path.startswith("/static") or path in UNLIMITED_PATHS:
             # If it does, bypass the rate limiting logic
             return await call_next(request)
 
@@ -37,7 +42,7 @@ class RateLimiterMiddleware(BaseHTTPMiddleware):
         retry_after: float = self.bucket.capacity / self.bucket.refill_rate
         detail: str = f"Try again in {retry_after} sec."
         logger.warning(detail)
-        return JSONResponse(
+        return APIJSONResponse(
             content={
                 "error": "",
                 "message": "Rate limit exceeded",
@@ -0,0 +1,29 @@
+from typing import Any
+
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel
+
+
+class APIJSONResponse(ORJSONResponse):
+    """
+    JSON response used by the whole API.
+
+    Pydantic models are serialized straight to bytes by pydantic-core, without
+    the ``jsonable_encoder`` round trip. Everything else (error payloads built
+    from dictionaries) is serialized with orjson.
+
+    Endpoints return this response with an already validated ``APIResponse``,
+    so FastAPI skips the second validation against ``response_model``, which
+    is then only used for the OpenAPI schema.
+    """
+
+    def render(self, content: Any) -> bytes:
+        """
+        Render the content as JSON.
+
+        :param content: A pydantic model or JSON serializable data.
+        :return: JSON bytes.
+        """
+        if isinstance(content, BaseModel):
+            return content.__pydantic_serializer__.to_json(content)
+        return super().render(content)
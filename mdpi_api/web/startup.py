@@ -0,0 +1,168 @@
+"""
+Readiness-gated startup of a worker.
+
+The worker accepts connections as soon as the application is built, while
+its startup steps run in the background: opening database connections,
+loading the translations, warming up the caches. Steps run concurrently, a
+step waits only for the steps it comes ``after``. A failed step is logged and
+run again with exponential backoff until it succeeds, e.g. until the database
+accepts connections.
+
+The worker is ready once every step succeeded. ``/api/health/ready`` answers
+503 until then, so the load balancer sends no traffic to a worker whose first
+requests would be slow or fail, while ``/api/health/live`` answers as soon as
+the worker serves requests at all.
+"""
+import asyncio
+import enum
+import time
+from contextlib import suppress
+from typing import Awaitable, Callable, Dict, NamedTuple, Optional, Sequence, Tuple
+
+from loguru import logger
+from mdpi_api.metrics import Gauge
+from mdpi_api.settings import settings
+
+startup_settings = settings.startup
+
+step_seconds = Gauge(
+    "startup_step_seconds",
+    "Time the startup steps of the worker took to succeed, retries included.",
+    labelnames=("step",),
+    aggregation="max",
+)
+ready_workers = Gauge(
+    "workers_ready",
+    "Workers whose startup steps all succeeded.",
+)
+
+
+class StepState(str, enum.Enum):  # noqa: WPS600
+    """States of a startup step."""
+
+    PENDING = "pending"
+    RUNNING = "running"
+    RETRYING = "retrying"
+    DONE = "done"
+
+
+class StartupStep(NamedTuple):
+    """A step of the startup of a worker."""
+
+    name: str
+    run: Callable[[], Awaitable[None]]
+    # Names of the steps that must succeed first
+    after: Tuple[str, ...] = ()
+
+
+class Startup:
+    """Runs the startup steps of a worker and tells whether it is ready."""
+
+    def __init__(
+        self,
+        retry_delay: float = startup_settings.retry_delay_seconds,
+        max_retry_delay: float = startup_settings.max_retry_delay_seconds,
+    ) -> None:
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.states: Dict[str, StepState] = {}
+        self._task: Optional["asyncio.Task[None]"] = None
+
+    @property
+    def is_ready(self) -> bool:
+        """
+        Whether every startup step succeeded.
+
+        :return: True once the worker may receive traffic.
+        """
+        return bool(self.states) and all(
+            state == StepState.DONE for state in self.states.values()
+        )
+
+    def start(self, steps: Sequence[StartupStep]) -> None:
+        """
+        Run the steps in the background.
+
+        :param steps: The startup steps.
+        """
+        self._task = asyncio.create_task(self.run(steps), name="startup")
+
+    async def stop(self) -> None:
+        """Cancel the steps still running."""
+        if self._task is None:
+            return
+        self._task.cancel()
+        with suppress(asyncio.CancelledError):
+            await self._task
+        self._task = None
+        if self.is_ready:
+            ready_workers.inc(-1)
+
+    async def run(self, steps: Sequence[StartupStep]) -> None:
+        """
+        Run the steps until they all succeeded.
+
+        :param steps: The startup steps.
+
+        :raises ValueError: If a step comes after an unknown step.
+        """
+        names = {step.name for step in steps}
+        unknown = {name for step in steps for name in step.after} - names
+        if unknown:
+            unknown_names = ", ".join(sorted(unknown))
+            raise ValueError(f"Steps come after unknown steps: {unknown_names}.")
+        self.states = {step.name: StepState.PENDING for step in steps}
+        started = time.monotonic()
+        tasks: Dict[str, "asyncio.Future[None]"] = {}
+        for step in steps:
+            tasks[step.name] = asyncio.ensure_future(self._run_step(step, tasks))
+        await asyncio.gather(*tasks.values())
+        ready_workers.inc()
+        logger.info(
+            "Worker ready, startup took {0:.3f} s.",
+            time.monotonic() - started,
+        )
+
+    async def _run_step(
+        self,
+        step: StartupStep,
+        tasks: Dict[str, "asyncio.Future[None]"],
+    ) -> None:
+        """
+        Run a step once the steps before it succeeded, until it succeeds.
+
+        :param step: The step.
+        :param tasks: Tasks of all the steps, by name.
+        """
+        await asyncio.gather(*(tasks[name] for name in step.after))
+        started = time.monotonic()
+        delay = self.retry_delay
+        self.states[step.name] = StepState.RUNNING
+        while not await self._attempt(step, delay):
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.max_retry_delay)
+        elapsed = time.monotonic() - started
+        step_seconds.set(elapsed, step=step.name)
+        self.states[step.name] = StepState.DONE
+        logger.info("Startup step {0} took {1:.3f} s.", step.name, elapsed)
+
+    async def _attempt(self, step: StartupStep, delay: float) -> bool:
+        """
+        Run a step once.
+
+        :param step: The step.
+        :param delay: Seconds until the next attempt if this one fails.
+        :return: True if the step succeeded.
+        """
+        try:
+            await step.run()
+        except Exception as exception:
+            self.states[step.name] = StepState.RETRYING
+            logger.warning(
+                "Startup step {0} failed, retrying in {1:.1f} s: {2}",
+                step.name,
+                delay,
+                exception,
+            )
+            return False
+        return True
@@ -0,0 +1,90 @@
+import hashlib
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional
+
+from fastapi import Request, Response, status
+from mdpi_api.metrics import Counter
+
+ETAG_DIGEST_SIZE = 16
+
+revalidations = Counter(
+    "http_revalidations_total",
+    "Conditional requests, by result: not_modified (304) or modified.",
+    labelnames=("result",),
+)
+
+
+def make_etag(*parts: Any) -> str:
+    """
+    Build a weak ETag from the parts that identify a representation.
+
+    The ETag is weak because the gzip middleware may compress the body, so
+    the same representation is not always sent byte for byte.
+
+    :param parts: Values the response body is derived from.
+    :return: Weak quoted ETag value.
+    """
+    digest = hashlib.blake2b(
+        "|".join(str(part) for part in parts).encode(),
+        digest_size=ETAG_DIGEST_SIZE,
+    ).hexdigest()
+    return f'W/"{digest}"'
+
+
+def seconds_until_next_hour(now: Optional[datetime] = None) -> int:
+    """
+    Get the number of seconds until the top of the next hour.
+
+    :param now: Current time, defaults to now in UTC.
+    :return: Seconds until the next hour, at least 1.
+    """
+    now = now or datetime.now(timezone.utc)
+    hour_start = now.replace(minute=0, second=0, microsecond=0)
+    next_hour = hour_start + timedelta(hours=1)
+    return max(1, int((next_hour - now).total_seconds()))
+
+
+def cache_headers(etag: str, max_age: int) -> Dict[str, str]:
+    """
+    Build the caching headers of a response.
+
+    Responses are only available to authenticated users, so they may be kept
+    by the client but not by shared caches.
+
+    :param etag: The ETag of the response.
+    :param max_age: Seconds the response stays fresh.
+    :return: Response headers.
+    """
+    return {"ETag": etag, "Cache-Control": f"private, max-age={max_age}"}
+
+
+def is_not_modified(request: Request, etag: str) -> bool:
+    """
+    Check whether the client already has the current representation.
+
+    :param request: The request.
+    :param etag: The ETag of the current representation.
+    :return: True if ``If-None-Match`` matches the ETag.
+    """
+    if_none_match = request.headers.get("If-None-Match")
+    if not if_none_match:
+        return False
+    # If-None-Match uses the weak comparison, so W/ prefixes are ignored
+    candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    not_modified = etag.removeprefix("W/") in candidates or "*" in candidates
+    revalidations.inc(result="not_modified" if not_modified else "modified")
+    return not_modified
+
+
+def not_modified_response(etag: str, max_age: int) -> Response:
+    """
+    Build an empty 304 response.
+
+    :param etag: The ETag of the current representation.
+    :param max_age: Seconds the response stays fresh.
+    :return: The 304 response.
+    """
+    return Response(
+        status_code=status.HTTP_304_NOT_MODIFIED,
+        headers=cache_headers(etag, max_age),
+    )
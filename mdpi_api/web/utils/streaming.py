@@ -0,0 +1,30 @@
+from typing import Iterator, Sequence
+
+import pydantic_core
+from pydantic import BaseModel
+
+
+def iter_api_response_json(
+    message: str,
+    items: Sequence[BaseModel],
+    chunk_size: int,
+) -> Iterator[bytes]:
+    """
+    Encode an ``APIResponse`` envelope as a sequence of JSON chunks.
+
+    The produced body has the same shape as a regular ``APIResponse`` with a
+    list in ``data``, but it is never materialized as one large string.
+
+    :param message: The (already translated) response message.
+    :param items: The items to put in ``data``.
+    :param chunk_size: Number of items encoded per chunk.
+    :yield: Chunks of the JSON document.
+    """
+    yield b"".join((b'{"message":', pydantic_core.to_json(message), b',"data":['))
+    for offset in range(0, len(items), chunk_size):
+        chunk = items[offset : offset + chunk_size]  # noqa: E203
+        separator = b"," if offset else b""
+        yield separator.join(
+            (b"", b",".join(pydantic_core.to_json(item) for item in chunk)),
+        )
+    yield b"]}"